@@ -0,0 +1,65 @@
+"""
+Shared File-Based Cache Backend for Django
+FileBasedCache with process-safe add()/incr() so cache locks and counters work
+across gunicorn workers when Redis is not available.
+"""
+import os
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+
+class SharedFileBasedCache(FileBasedCache):
+    """
+    File-based cache shared by every worker process on the host.
+
+    Django's FileBasedCache implements add() as has_key() followed by set(), so
+    two workers can both "acquire" the same lock. add() and incr() here run
+    under an exclusive flock on the cache directory, which makes them atomic
+    across processes (on Windows they fall back to the default behaviour).
+    """
+
+    # Not a *.djcache file, so culling and clear() leave it alone
+    LOCK_FILE_NAME = '.cache_lock'
+
+    def _mutex(self):
+        return _FileMutex(os.path.join(self._dir, self.LOCK_FILE_NAME))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        with self._mutex():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._createdir()
+        with self._mutex():
+            return super().incr(key, delta, version)
+
+
+class _FileMutex:
+    """Exclusive inter-process lock held on a file for the duration of a with block."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        return False
@@ -1,15 +1,123 @@
 """
 Microsoft Graph API Email Backend for Django
 Sends emails using Microsoft Graph API instead of SMTP
+
+- The access token is cached (Django cache) until shortly before it expires,
+  so a run of sends doesn't log in to Microsoft Identity every time.
+- Several messages go out through Graph JSON batching ($batch, 20 sendMail
+  requests per round-trip); throttled requests are retried after Retry-After.
+- Attachments over 3 MB don't fit a sendMail request (4 MB cap after base64).
+  Those messages are created as drafts, the large files are streamed into an
+  upload session in chunks, and the draft is then sent.
 """
 import logging
 import json
+import mimetypes
+import os
+import time
+import base64
+from email.mime.base import MIMEBase
+
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
 from django.core.mail.backends.base import BaseEmailBackend
 from django.conf import settings
 import requests
 
 logger = logging.getLogger(__name__)
 
+GRAPH_ROOT = 'https://graph.microsoft.com/v1.0'
+# Graph JSON batching accepts at most 20 requests per $batch call
+MAX_BATCH_REQUESTS = 20
+# Graph rejects request bodies over 4 MB (sendMail, $batch and attachment POSTs)
+MAX_REQUEST_BYTES = 4 * 1000 * 1000
+# Attachments above this go through an upload session instead of inline base64
+LARGE_ATTACHMENT_SIZE = 3 * 1024 * 1024
+# Upload session chunks must be a multiple of 320 KiB
+UPLOAD_CHUNK_SIZE = 10 * 320 * 1024
+# Refresh the token this many seconds before Microsoft says it expires
+TOKEN_EXPIRY_MARGIN = 300
+MAX_RETRIES = 3
+RETRYABLE_STATUSES = {429, 503, 504}
+REQUEST_TIMEOUT = 30
+
+
+class GraphEmailMessage(EmailMultiAlternatives):
+    """
+    Email (with optional HTML alternative) that attaches files by path.
+
+    attach_file() reads each file into memory and the MIME encoder base64s it
+    again; attach_path() only records the path. GraphEmailBackend streams the
+    file from disk, and other backends (SMTP, console) still get a normal MIME
+    message because the files are read in message().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_attachments = []
+
+    def attach_path(self, path, mimetype=None):
+        """Attach a file from disk without reading it yet"""
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        self.file_attachments.append((path, mimetype))
+
+    def message(self, *args, **kwargs):
+        attachments = self.attachments
+        self.attachments = list(attachments)
+        try:
+            for path, mimetype in self.file_attachments:
+                self.attach_file(path, mimetype)
+            return super().message(*args, **kwargs)
+        finally:
+            self.attachments = attachments
+
+
+class _Attachment:
+    """An attachment read from memory or streamed from a file"""
+
+    def __init__(self, name, mimetype, data=None, path=None):
+        self.name = name
+        self.mimetype = mimetype or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.data = data
+        self.path = path
+        self.size = len(data) if data is not None else os.path.getsize(path)
+
+    @property
+    def is_large(self):
+        return self.size > LARGE_ATTACHMENT_SIZE
+
+    @property
+    def encoded_size(self):
+        return (self.size + 2) // 3 * 4
+
+    def read(self):
+        if self.data is not None:
+            return self.data
+        with open(self.path, 'rb') as handle:
+            return handle.read()
+
+    def chunks(self, chunk_size):
+        if self.data is not None:
+            for start in range(0, self.size, chunk_size):
+                yield self.data[start:start + chunk_size]
+            return
+        with open(self.path, 'rb') as handle:
+            while True:
+                chunk = handle.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def resource(self):
+        """Graph fileAttachment with the content inline"""
+        return {
+            '@odata.type': '#microsoft.graph.fileAttachment',
+            'name': self.name,
+            'contentType': self.mimetype,
+            'contentBytes': base64.b64encode(self.read()).decode('ascii'),
+        }
+
 
 class GraphEmailBackend(BaseEmailBackend):
     """
@@ -23,15 +131,44 @@ class GraphEmailBackend(BaseEmailBackend):
         self.tenant_id = getattr(settings, 'GRAPH_TENANT_ID', None)
         self.from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'info@eclick.co.za')
         self.access_token = None
+        self.session = None
+
+    @property
+    def token_cache_key(self):
+        return f"graph_email_token_{self.tenant_id}_{self.client_id}"
+
+    @property
+    def mailbox_url(self):
+        return f"{GRAPH_ROOT}/users/{self.from_email}"
+
+    def open(self):
+        if self.session is None:
+            self.session = requests.Session()
+            return True
+        return False
 
-    def get_access_token(self):
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def get_access_token(self, force_refresh=False):
         """
         Obtain an access token from Microsoft Identity Platform using client credentials flow.
+
+        The token is cached until TOKEN_EXPIRY_MARGIN seconds before it expires;
+        force_refresh skips the cache (e.g. after Graph answered 401).
         """
         if not all([self.client_id, self.client_secret, self.tenant_id]):
             logger.error("Microsoft Graph API credentials are not properly configured.")
             return None
 
+        if not force_refresh:
+            cached_token = cache.get(self.token_cache_key)
+            if cached_token:
+                self.access_token = cached_token
+                return self.access_token
+
         token_url = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
 
         token_data = {
@@ -42,10 +179,13 @@ class GraphEmailBackend(BaseEmailBackend):
         }
 
         try:
-            response = requests.post(token_url, data=token_data, timeout=30)
+            response = requests.post(token_url, data=token_data, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             token_response = response.json()
             self.access_token = token_response.get('access_token')
+            if self.access_token:
+                expires_in = int(token_response.get('expires_in', 3600))
+                cache.set(self.token_cache_key, self.access_token, max(expires_in - TOKEN_EXPIRY_MARGIN, 60))
             logger.info("Successfully obtained Microsoft Graph API access token")
             return self.access_token
         except requests.exceptions.RequestException as e:
@@ -69,22 +209,71 @@ class GraphEmailBackend(BaseEmailBackend):
             logger.error("Cannot send emails without access token")
             return 0
 
-        num_sent = 0
-        for message in email_messages:
-            try:
-                if self._send_message(message):
+        new_session = self.open()
+        try:
+            num_sent = 0
+            inline_messages = []
+            for message in email_messages:
+                try:
+                    attachments = self._collect_attachments(message)
+                    payload = self._send_mail_payload(message, attachments)
+                    if payload is None:
+                        # Too big for one request - draft + upload session
+                        if self._send_with_upload_sessions(message, attachments):
+                            num_sent += 1
+                    else:
+                        inline_messages.append((message, payload))
+                except Exception as e:
+                    logger.error(f"Failed to send email: {str(e)}")
+                    if not self.fail_silently:
+                        raise
+
+            if len(inline_messages) == 1:
+                message, payload = inline_messages[0]
+                if self._send_message(message, payload):
                     num_sent += 1
-            except Exception as e:
-                logger.error(f"Failed to send email: {str(e)}")
-                if not self.fail_silently:
-                    raise
+            elif inline_messages:
+                for batch in self._batches(inline_messages):
+                    num_sent += self._send_batch(batch)
 
-        return num_sent
+            return num_sent
+        finally:
+            if new_session:
+                self.close()
 
-    def _send_message(self, message):
+    def _request(self, method, url, **kwargs):
         """
-        Send a single EmailMessage using Microsoft Graph API.
+        Authenticated Graph request. Refreshes the token once on 401 and retries
+        throttled requests after their Retry-After.
         """
+        extra_headers = kwargs.pop('headers', {})
+        refreshed = False
+        attempt = 0
+        while True:
+            headers = {'Authorization': f'Bearer {self.access_token}', **extra_headers}
+            response = self.session.request(method, url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            if response.status_code == 401 and not refreshed:
+                refreshed = True
+                if self.get_access_token(force_refresh=True):
+                    continue
+            if response.status_code in RETRYABLE_STATUSES and attempt < MAX_RETRIES:
+                attempt += 1
+                delay = self._retry_after(response.headers, attempt)
+                logger.warning(f"Graph API throttled ({response.status_code}), retry {attempt}/{MAX_RETRIES} in {delay}s")
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response
+
+    @staticmethod
+    def _retry_after(headers, attempt):
+        try:
+            return max(int((headers or {}).get('Retry-After', 0)), 1)
+        except (TypeError, ValueError):
+            return 2 ** attempt
+
+    def _message_resource(self, message):
+        """Graph message resource (without attachments) for an EmailMessage"""
         # Check if there's an HTML alternative (for emails with both text and HTML versions)
         content_type = "Text"
         content = message.body
@@ -99,49 +288,81 @@ class GraphEmailBackend(BaseEmailBackend):
         elif message.content_subtype == 'html':
             content_type = "HTML"
 
-        # Build the email payload
-        email_data = {
-            "message": {
-                "subject": message.subject,
-                "body": {
-                    "contentType": content_type,
-                    "content": content
-                },
-                "toRecipients": [
-                    {"emailAddress": {"address": recipient}} for recipient in message.to
-                ],
-                "from": {
-                    "emailAddress": {
-                        "address": self.from_email
-                    }
-                }
+        resource = {
+            "subject": message.subject,
+            "body": {
+                "contentType": content_type,
+                "content": content
             },
-            "saveToSentItems": "true"
+            "toRecipients": [
+                {"emailAddress": {"address": recipient}} for recipient in message.to
+            ],
+            "from": {
+                "emailAddress": {
+                    "address": self.from_email
+                }
+            }
         }
 
         # Add CC recipients if any
         if message.cc:
-            email_data["message"]["ccRecipients"] = [
+            resource["ccRecipients"] = [
                 {"emailAddress": {"address": recipient}} for recipient in message.cc
             ]
 
         # Add BCC recipients if any
         if message.bcc:
-            email_data["message"]["bccRecipients"] = [
+            resource["bccRecipients"] = [
                 {"emailAddress": {"address": recipient}} for recipient in message.bcc
             ]
 
-        # Send email using Graph API
-        graph_url = f"https://graph.microsoft.com/v1.0/users/{self.from_email}/sendMail"
+        if message.reply_to:
+            resource["replyTo"] = [
+                {"emailAddress": {"address": recipient}} for recipient in message.reply_to
+            ]
+
+        return resource
+
+    def _collect_attachments(self, message):
+        attachments = []
+        for attachment in message.attachments:
+            if isinstance(attachment, MIMEBase):
+                attachments.append(_Attachment(
+                    attachment.get_filename() or 'attachment',
+                    attachment.get_content_type(),
+                    data=attachment.get_payload(decode=True) or b'',
+                ))
+                continue
+            filename, content, mimetype = attachment
+            if isinstance(content, str):
+                content = content.encode(settings.DEFAULT_CHARSET)
+            attachments.append(_Attachment(filename or 'attachment', mimetype, data=content))
+
+        for path, mimetype in getattr(message, 'file_attachments', []):
+            attachments.append(_Attachment(os.path.basename(path), mimetype, path=path))
+        return attachments
+
+    def _send_mail_payload(self, message, attachments):
+        """sendMail body, or None when the attachments need upload sessions"""
+        if any(attachment.is_large for attachment in attachments):
+            return None
+        if sum(attachment.encoded_size for attachment in attachments) > MAX_REQUEST_BYTES - 100 * 1000:
+            return None
 
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
+        email_data = {
+            "message": self._message_resource(message),
+            "saveToSentItems": "true"
         }
+        if attachments:
+            email_data["message"]["attachments"] = [attachment.resource() for attachment in attachments]
+        return email_data
 
+    def _send_message(self, message, email_data):
+        """
+        Send a single EmailMessage using Microsoft Graph API.
+        """
         try:
-            response = requests.post(graph_url, headers=headers, json=email_data, timeout=30)
-            response.raise_for_status()
+            self._request('POST', f"{self.mailbox_url}/sendMail", json=email_data)
 
             logger.info(f"Successfully sent email to {', '.join(message.to)}")
             logger.info(f"Subject: {message.subject}")
@@ -157,3 +378,140 @@ class GraphEmailBackend(BaseEmailBackend):
             if not self.fail_silently:
                 raise
             return False
+
+    def _batches(self, inline_messages):
+        """Split (message, payload) pairs into $batch calls under the count and size limits"""
+        batch = []
+        batch_bytes = 0
+        for message, payload in inline_messages:
+            payload_bytes = len(json.dumps(payload))
+            if batch and (len(batch) >= MAX_BATCH_REQUESTS or batch_bytes + payload_bytes > MAX_REQUEST_BYTES):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append((message, payload))
+            batch_bytes += payload_bytes
+        if batch:
+            yield batch
+
+    def _send_batch(self, batch):
+        """Send up to 20 sendMail requests in one $batch call; returns the number sent"""
+        pending = {str(index): item for index, item in enumerate(batch, start=1)}
+        failures = []
+        num_sent = 0
+        attempt = 0
+
+        while pending:
+            batch_body = {
+                "requests": [
+                    {
+                        "id": request_id,
+                        "method": "POST",
+                        "url": f"/users/{self.from_email}/sendMail",
+                        "headers": {"Content-Type": "application/json"},
+                        "body": payload,
+                    }
+                    for request_id, (message, payload) in pending.items()
+                ]
+            }
+            try:
+                response = self._request('POST', f"{GRAPH_ROOT}/$batch", json=batch_body)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Batch Error sending {len(pending)} emails: {str(e)}")
+                if not self.fail_silently:
+                    raise
+                return num_sent
+
+            retry_delay = 0
+            for result in response.json().get('responses', []):
+                request_id = str(result.get('id'))
+                if request_id not in pending:
+                    continue
+                status = int(result.get('status', 0))
+                message, _ = pending[request_id]
+                if 200 <= status < 300:
+                    pending.pop(request_id)
+                    num_sent += 1
+                    logger.info(f"Successfully sent email to {', '.join(message.to)}")
+                elif status in RETRYABLE_STATUSES and attempt < MAX_RETRIES:
+                    retry_delay = max(retry_delay, self._retry_after(result.get('headers'), attempt + 1))
+                else:
+                    pending.pop(request_id)
+                    failures.append((message, status, result.get('body')))
+
+            if not pending:
+                break
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                failures.extend((message, 'no response', None) for message, _ in pending.values())
+                break
+            logger.warning(f"Graph batch throttled, retrying {len(pending)} emails in {retry_delay}s")
+            time.sleep(retry_delay)
+
+        logger.info(f"Graph batch sent {num_sent}/{len(batch)} emails")
+        for message, status, body in failures:
+            logger.error(f"HTTP Error sending email to {', '.join(message.to)}: {status} - {body}")
+        if failures and not self.fail_silently:
+            raise requests.exceptions.HTTPError(
+                f"{len(failures)} of {len(batch)} batched emails failed (first status: {failures[0][1]})"
+            )
+        return num_sent
+
+    def _send_with_upload_sessions(self, message, attachments):
+        """
+        Create a draft, add the attachments (large ones through upload sessions) and send it.
+        """
+        draft = self._request('POST', f"{self.mailbox_url}/messages", json=self._message_resource(message)).json()
+        message_url = f"{self.mailbox_url}/messages/{draft['id']}"
+        try:
+            for attachment in attachments:
+                if attachment.is_large:
+                    self._upload_attachment(message_url, attachment)
+                else:
+                    self._request('POST', f"{message_url}/attachments", json=attachment.resource())
+            self._request('POST', f"{message_url}/send")
+        except Exception:
+            # Don't leave a half-built draft in the mailbox
+            try:
+                self._request('DELETE', message_url)
+            except requests.exceptions.RequestException:
+                pass
+            raise
+
+        logger.info(f"Successfully sent email with {len(attachments)} attachments to {', '.join(message.to)}")
+        logger.info(f"Subject: {message.subject}")
+        return True
+
+    def _upload_attachment(self, message_url, attachment):
+        """Stream one attachment into a draft through an upload session"""
+        upload_session = self._request('POST', f"{message_url}/attachments/createUploadSession", json={
+            "AttachmentItem": {
+                "attachmentType": "file",
+                "name": attachment.name,
+                "size": attachment.size,
+                "contentType": attachment.mimetype,
+            }
+        }).json()
+        upload_url = upload_session['uploadUrl']
+
+        offset = 0
+        for chunk in attachment.chunks(UPLOAD_CHUNK_SIZE):
+            end = offset + len(chunk) - 1
+            headers = {
+                'Content-Length': str(len(chunk)),
+                'Content-Range': f'bytes {offset}-{end}/{attachment.size}',
+                'Content-Type': 'application/octet-stream',
+            }
+            attempt = 0
+            while True:
+                # The upload URL is pre-authenticated - an Authorization header makes it fail
+                response = self.session.put(upload_url, data=chunk, headers=headers, timeout=REQUEST_TIMEOUT)
+                if response.status_code in RETRYABLE_STATUSES | {500, 502} and attempt < MAX_RETRIES:
+                    attempt += 1
+                    time.sleep(self._retry_after(response.headers, attempt))
+                    continue
+                response.raise_for_status()
+                break
+            offset = end + 1
+
+        logger.info(f"Uploaded attachment {attachment.name} ({attachment.size} bytes)")
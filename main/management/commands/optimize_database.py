@@ -1,99 +1,81 @@
+from django.apps import apps
 from django.core.management.base import BaseCommand
 from django.db import connection
-from django.db.models import Index
-from main.models import FoodSafetyAgencyInspection, Client, ClientEmail
 
 
 class Command(BaseCommand):
-    help = 'Add database indexes for better performance with large datasets'
+    help = ('Create any indexes declared on the main models that are missing from the database '
+            '(e.g. after a faked migration) and refresh the planner statistics')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the missing indexes without creating them',
+        )
+        parser.add_argument(
+            '--skip-analyze',
+            action='store_true',
+            help='Do not refresh table statistics after creating indexes',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Adding database indexes for performance optimization...')
-        
+        # Indexes live in the migrations (Meta.indexes); this only repairs databases where
+        # they are missing. Uses the schema editor so the DDL matches the backend - MySQL
+        # has no CREATE INDEX IF NOT EXISTS.
+        self.stdout.write('Checking model indexes against the database...')
+        existing_tables = set(connection.introspection.table_names())
+        missing = []
+        tables = []
+
         with connection.cursor() as cursor:
-            # Add indexes for FoodSafetyAgencyInspection model
-            self.stdout.write('Adding indexes to FoodSafetyAgencyInspection...')
-            
-            # Index for filtering by inspector
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_fsa_inspection_inspector_id 
-                    ON food_safety_agency_inspections (inspector_id)
-                """)
-                self.stdout.write('✓ Added inspector_id index')
-            except Exception as e:
-                self.stdout.write(f'⚠ Inspector index error: {e}')
-            
-            # Index for filtering by client and date (most common query)
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_fsa_inspection_client_date 
-                    ON food_safety_agency_inspections (client_name, date_of_inspection)
-                """)
-                self.stdout.write('✓ Added client_name + date_of_inspection index')
-            except Exception as e:
-                self.stdout.write(f'⚠ Client-date index error: {e}')
-            
-            # Index for filtering by sample taken
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_fsa_inspection_sample_taken 
-                    ON food_safety_agency_inspections (is_sample_taken)
-                """)
-                self.stdout.write('✓ Added is_sample_taken index')
-            except Exception as e:
-                self.stdout.write(f'⚠ Sample taken index error: {e}')
-            
-            # Index for commodity filtering
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_fsa_inspection_commodity 
-                    ON food_safety_agency_inspections (commodity)
-                """)
-                self.stdout.write('✓ Added commodity index')
-            except Exception as e:
-                self.stdout.write(f'⚠ Commodity index error: {e}')
-            
-            # Index for inspector name filtering
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_fsa_inspection_inspector_name 
-                    ON food_safety_agency_inspections (inspector_name)
-                """)
-                self.stdout.write('✓ Added inspector_name index')
-            except Exception as e:
-                self.stdout.write(f'⚠ Inspector name index error: {e}')
-            
-            # Index for Client model
-            self.stdout.write('Adding indexes to Client...')
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_client_client_id 
-                    ON food_safety_agency_clients (client_id)
-                """)
-                self.stdout.write('✓ Added client_id index')
-            except Exception as e:
-                self.stdout.write(f'⚠ Client ID index error: {e}')
-            
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_client_name 
-                    ON food_safety_agency_clients (name)
-                """)
-                self.stdout.write('✓ Added client name index')
-            except Exception as e:
-                self.stdout.write(f'⚠ Client name index error: {e}')
-            
-            # Index for ClientEmail model
-            self.stdout.write('Adding indexes to ClientEmail...')
+            for model in apps.get_app_config('main').get_models():
+                table = model._meta.db_table
+                if not model._meta.managed or table not in existing_tables:
+                    continue
+                tables.append(table)
+                constraints = connection.introspection.get_constraints(cursor, table)
+                existing_columns = {
+                    tuple(info['columns']) for info in constraints.values() if info.get('index') or info.get('unique')
+                }
+                for index in model._meta.indexes:
+                    columns = tuple(model._meta.get_field(name.lstrip('-')).column for name in index.fields)
+                    if index.name in constraints or columns in existing_columns:
+                        continue
+                    missing.append((model, index))
+
+        if not missing:
+            self.stdout.write('✓ All model indexes are present')
+        for model, index in missing:
+            label = f"{model._meta.db_table}.{index.name} ({', '.join(index.fields)})"
+            if options['dry_run']:
+                self.stdout.write(f'⚠ Missing index {label}')
+                continue
             try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_clientemail_client_id 
-                    ON food_safety_agency_client_emails (client_id)
-                """)
-                self.stdout.write('✓ Added client_id index for emails')
+                with connection.schema_editor() as schema_editor:
+                    schema_editor.add_index(model, index)
+                self.stdout.write(f'✓ Added index {label}')
             except Exception as e:
-                self.stdout.write(f'⚠ ClientEmail index error: {e}')
-        
+                self.stdout.write(f'⚠ Index error {label}: {e}')
+
+        if not options['dry_run'] and not options['skip_analyze']:
+            self.analyze(tables)
+
         self.stdout.write(self.style.SUCCESS('Database optimization completed!'))
-        self.stdout.write('Performance should be significantly improved for large datasets.')
+
+    def analyze(self, tables):
+        """Refresh the statistics the planner (and the approximate page counts) rely on"""
+        self.stdout.write('Refreshing table statistics...')
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                for table in tables:
+                    cursor.execute(f'ANALYZE TABLE {quote(table)}')
+                    cursor.fetchall()
+            elif connection.vendor in ('postgresql', 'sqlite'):
+                for table in tables:
+                    cursor.execute(f'ANALYZE {quote(table)}')
+            else:
+                self.stdout.write(f'⚠ ANALYZE not supported on {connection.vendor}')
+                return
+        self.stdout.write(f'✓ Analyzed {len(tables)} tables')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from main.models import OutboundEmail
+from main.services.email_outbox_service import email_outbox_service
+
+
+class Command(BaseCommand):
+    help = 'Send every due email in the outbox (emails left queued by a restarted web worker, or from cron)'
+
+    def handle(self, *args, **options):
+        due = OutboundEmail.objects.filter(status='queued').count()
+        self.stdout.write(f'{due} queued email(s) in the outbox...')
+        sent = email_outbox_service.process_due()
+        failed = OutboundEmail.objects.filter(status='failed').count()
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} email(s); {failed} failed email(s) in the outbox'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from main.utils.client_autocomplete import refresh_client_search_index
+
+
+class Command(BaseCommand):
+    help = 'Bring the client autocomplete index up to date with the clients and inspections tables'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Collecting client names, account codes and latest towns...')
+        changed = refresh_client_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Client autocomplete index refreshed: {changed} entries changed'))
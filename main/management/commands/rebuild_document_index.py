@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from main.models import FoodSafetyAgencyInspection
+from main.utils.document_status import refresh_document_status
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the inspection document status index from the media folders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of inspections to scan per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only rebuild inspections on or after this date (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        inspections = FoodSafetyAgencyInspection.objects.only(
+            'id', 'client_id', 'client_name', 'date_of_inspection'
+        ).order_by('id')
+        if options.get('since'):
+            inspections = inspections.filter(date_of_inspection__gte=options['since'])
+
+        total = inspections.count()
+        self.stdout.write(f'Scanning media folders for {total} inspections...')
+
+        processed = 0
+        batch = []
+        for inspection in inspections.iterator(chunk_size=batch_size):
+            batch.append(inspection)
+            if len(batch) >= batch_size:
+                refresh_document_status(batch)
+                processed += len(batch)
+                batch = []
+                self.stdout.write(f'  Indexed {processed}/{total}')
+        if batch:
+            refresh_document_status(batch)
+            processed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Document index rebuilt for {processed} inspections'))
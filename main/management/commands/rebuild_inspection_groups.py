@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from main.utils.inspection_groups import rebuild_inspection_groups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the inspection group summary table used by the inspections page'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of groups to insert per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Summarising inspections by client and date...')
+        total = rebuild_inspection_groups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Inspection group summary rebuilt: {total} groups'))
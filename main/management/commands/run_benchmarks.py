@@ -0,0 +1,316 @@
+"""
+Offline benchmark suite for the hot views and sync paths.
+
+Runs against a throwaway test database filled with synthetic data (see
+main/utils/benchmark_data.py), a temporary MEDIA_ROOT and a local memory cache,
+so it needs no running server, SQL Server, Google Drive or production data.
+SQL Server is replaced by the pool's LocalSQLServer stand-in serving generated rows.
+
+Usage:
+    python manage.py run_benchmarks --output results.json
+    python manage.py run_benchmarks --clients 500 --inspections 20000 --compare baseline.json
+
+Results are JSON (timings in ms plus database query counts per benchmark), so a
+run on one release can be compared with a run on the next using --compare.
+"""
+
+import contextlib
+import io
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the inspections page, export, analytics, SQL Server sync and compliance lookups on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help='Synthetic clients to generate (default 200)')
+        parser.add_argument('--inspections', type=int, default=5000, help='Synthetic inspections to generate (default 5000)')
+        parser.add_argument('--days', type=int, default=180, help='Days of inspection history (default 180)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the data generator (default 42)')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark (default 3)')
+        parser.add_argument('--only', nargs='+', help='Run only these benchmarks')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', help='Compare with a previous results JSON file')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Median slowdown (fraction) counted as a regression in --compare (default 0.25)')
+        parser.add_argument('--verbose', action='store_true', help="Show the benchmarked code's own output")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        self.options = options
+        media_root = tempfile.mkdtemp(prefix='benchmark_media_')
+        old_name = connection.settings_dict['NAME']
+        self.stdout.write('Creating benchmark database...')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}},
+                ALLOWED_HOSTS=['testserver', 'localhost'],
+                DEBUG=False,
+            ):
+                results = self._run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        self._print_results(results)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self._compare(baseline, results, options['threshold'])
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    # ------------------------------------------------------------------
+    # Suite
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        from main.utils.benchmark_data import create_benchmark_user, generate_benchmark_data
+
+        options = self.options
+        self.anchor = date.today()
+        self.stdout.write(f"Generating {options['clients']} clients / {options['inspections']} inspections (seed {options['seed']})...")
+        started = time.perf_counter()
+        with self._quiet():
+            dataset = generate_benchmark_data(
+                clients=options['clients'], inspections=options['inspections'], days=options['days'],
+                seed=options['seed'], anchor=self.anchor,
+            )
+        dataset['generate_seconds'] = round(time.perf_counter() - started, 2)
+
+        self.client = TestClient()
+        self.client.force_login(create_benchmark_user())
+
+        benchmarks = [
+            ('shipment_list_cold', self._clear_cache, self._shipment_list),
+            ('shipment_list_warm', None, self._shipment_list),
+            ('export_sheet', self._clear_cache, self._export_sheet),
+            ('invoice_export_full_range', None, self._invoice_export_full_range),
+            ('analytics_dashboard', self._clear_cache, self._analytics_dashboard),
+            ('find_document_link', self._prepare_document_links, self._find_document_links),
+            # The sync benchmarks recreate inspections, so they run last
+            ('sync_sql_server_unchanged', self._prepare_sql_rows, self._sync_sql_server),
+            ('sync_sql_server_initial', self._delete_synced_inspections, self._sync_sql_server),
+        ]
+        if options['only']:
+            unknown = set(options['only']) - {name for name, _, _ in benchmarks}
+            if unknown:
+                raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+            benchmarks = [entry for entry in benchmarks if entry[0] in options['only']]
+
+        results = {'metadata': self._metadata(dataset), 'benchmarks': {}}
+        for name, setup, func in benchmarks:
+            self.stdout.write(f'  {name}...')
+            results['benchmarks'][name] = self._measure(setup, func)
+        return results
+
+    def _measure(self, setup, func):
+        runs = []
+        error = None
+        for _ in range(self.options['repeat']):
+            if setup:
+                with self._quiet():
+                    setup()
+            with CaptureQueriesContext(connection) as queries, self._quiet():
+                started = time.perf_counter()
+                try:
+                    detail = func()
+                except Exception as e:
+                    error = f'{type(e).__name__}: {e}'
+                    break
+                elapsed = time.perf_counter() - started
+            runs.append({'ms': round(elapsed * 1000, 2), 'queries': len(queries), **(detail or {})})
+
+        timings = [run['ms'] for run in runs]
+        result = {'runs': runs}
+        if timings:
+            result.update({
+                'min_ms': min(timings),
+                'median_ms': round(statistics.median(timings), 2),
+                'mean_ms': round(statistics.mean(timings), 2),
+                'max_ms': max(timings),
+                'queries': runs[-1]['queries'],
+            })
+        if error:
+            result['error'] = error
+        return result
+
+    @contextlib.contextmanager
+    def _quiet(self):
+        """The views and sync print progress - keep it out of the results unless --verbose"""
+        if self.options['verbose']:
+            yield
+            return
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+    def _clear_cache(self):
+        cache.clear()
+
+    def _get(self, url_name, params=None):
+        response = self.client.get(reverse(url_name), params or {})
+        if response.status_code != 200:
+            raise RuntimeError(f'{url_name} returned HTTP {response.status_code}')
+        return {'bytes': len(response.content)}
+
+    def _shipment_list(self):
+        return self._get('shipment_list')
+
+    def _export_sheet(self):
+        from main.views.core_views import EXPORT_SHEET_INLINE_MAX_DAYS
+
+        # Longer ranges are handed to a background export job - benchmark the widest range the page renders
+        date_from = self.anchor - timedelta(days=min(self.options['days'], EXPORT_SHEET_INLINE_MAX_DAYS))
+        return self._get('export_sheet', {'date_from': date_from.isoformat(), 'date_to': self.anchor.isoformat()})
+
+    def _invoice_export_full_range(self):
+        from main.views.core_views import build_invoice_items
+
+        # What a background export job builds for the whole generated range
+        invoice_items, visits = build_invoice_items(self.anchor - timedelta(days=self.options['days']), self.anchor)
+        return {'items': len(invoice_items), 'visits': visits}
+
+    def _analytics_dashboard(self):
+        return self._get('analytics_dashboard')
+
+    def _prepare_document_links(self):
+        from main.models import FoodSafetyAgencyInspection
+        from main.utils.benchmark_data import drive_file_lookup
+
+        if not hasattr(self, '_drive_lookup'):
+            self._drive_lookup = drive_file_lookup(seed=self.options['seed'], anchor=self.anchor, days=self.options['days'])
+            self._link_keys = list(
+                FoodSafetyAgencyInspection.objects.values_list('internal_account_code', 'commodity', 'date_of_inspection')
+            )
+
+    def _find_document_links(self):
+        from main.views.core_views import find_document_link_apps_script_replica
+
+        found = 0
+        for account_code, commodity, inspection_date in self._link_keys:
+            if find_document_link_apps_script_replica(account_code, commodity, inspection_date, self._drive_lookup):
+                found += 1
+        return {'lookups': len(self._link_keys), 'found': found}
+
+    def _prepare_sql_rows(self):
+        from main.utils.benchmark_data import sql_server_rows
+
+        if not hasattr(self, '_sql_rows'):
+            self._sql_rows = sql_server_rows()
+
+    def _delete_synced_inspections(self):
+        from main.models import FoodSafetyAgencyInspection
+        from main.utils.benchmark_data import REMOTE_ID_START
+
+        self._prepare_sql_rows()
+        FoodSafetyAgencyInspection.objects.filter(is_manual=False, remote_id__gte=REMOTE_ID_START).delete()
+
+    def _sync_sql_server(self):
+        from main.services.scheduled_sync_service import ScheduledSyncService
+        from main.utils.sql_server_pool import use_local_sql_server
+
+        with use_local_sql_server() as server:
+            # Only the inspection query has rows; lab-sample queries find none
+            server.add_result('InternalAccountNumber', self._sql_rows)
+            if not ScheduledSyncService()._do_sync_sql_server(full_reconcile=True):
+                raise RuntimeError('SQL Server sync failed (run with --verbose for its output)')
+        return {'rows': len(self._sql_rows)}
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def _metadata(self, dataset):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=10,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'platform': platform.platform(),
+            'repeat': self.options['repeat'],
+            'dataset': dataset,
+        }
+
+    def _print_results(self, results):
+        self.stdout.write('')
+        self.stdout.write(f"{'Benchmark':<28}{'median ms':>12}{'min ms':>12}{'max ms':>12}{'queries':>10}")
+        for name, result in results['benchmarks'].items():
+            if 'median_ms' in result:
+                self.stdout.write(
+                    f"{name:<28}{result['median_ms']:>12.1f}{result['min_ms']:>12.1f}{result['max_ms']:>12.1f}{result['queries']:>10}"
+                )
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f"{name:<28}{result['error']}"))
+
+    def _compare(self, baseline, results, threshold):
+        """Print median ratios against the baseline; return the names of regressed benchmarks"""
+        baseline_dataset = baseline.get('metadata', {}).get('dataset', {})
+        current_dataset = results['metadata']['dataset']
+        for key in ('clients', 'inspections', 'days', 'seed'):
+            if baseline_dataset.get(key) != current_dataset.get(key):
+                self.stdout.write(self.style.WARNING(
+                    f"[WARNING] Dataset differs from baseline ({key}: {baseline_dataset.get(key)} vs {current_dataset.get(key)})"
+                ))
+
+        self.stdout.write('')
+        self.stdout.write(f"Compared with {baseline.get('metadata', {}).get('git_commit') or 'baseline'}:")
+        regressions = []
+        for name, result in results['benchmarks'].items():
+            previous = baseline.get('benchmarks', {}).get(name)
+            if not previous or 'median_ms' not in previous:
+                self.stdout.write(f'  {name:<28}no baseline')
+                continue
+            if 'median_ms' not in result:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'  {name:<28}failed'))
+                continue
+            ratio = result['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+            line = (f"  {name:<28}{previous['median_ms']:>10.1f} -> {result['median_ms']:>10.1f} ms"
+                    f"  x{ratio:.2f}  queries {previous.get('queries')} -> {result['queries']}")
+            if ratio > 1 + threshold:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+            elif ratio < 1 - threshold:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+        return regressions
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from main.services.scheduled_sync_service import scheduled_sync_service
+
+
+class Command(BaseCommand):
+    help = 'Sync inspections from SQL Server (incremental by default, --full for a full reconciliation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-read every inspection from SQL Server instead of only new/recent rows',
+        )
+
+    def handle(self, *args, **options):
+        mode = 'full reconciliation' if options['full'] else 'incremental'
+        self.stdout.write(f'Starting SQL Server inspection sync ({mode})...')
+
+        success = scheduled_sync_service.sync_sql_server(full_reconcile=options['full'])
+
+        if success:
+            self.stdout.write(self.style.SUCCESS(f'SQL Server sync ({mode}) completed'))
+        else:
+            self.stdout.write(self.style.ERROR('SQL Server sync failed or is already running'))
@@ -1,3 +1,5 @@
+from django.conf import settings as django_settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils import timezone
 from django.contrib.auth import logout
 from django.shortcuts import redirect
@@ -6,7 +8,8 @@ from .models import Settings
 from datetime import timedelta
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import User
-from .models import SystemLog
+from .utils.activity_log_buffer import queue_activity_log, should_log_path
+from .utils import request_metrics
 import json
 
 
@@ -60,6 +63,37 @@ class SecurityHeadersMiddleware:
 
         return response
 
+class PerformanceInstrumentationMiddleware:
+    """
+    Opt-in per-request metrics (PERF_INSTRUMENTATION=True): wall time, database,
+    filesystem, cache and external-service counters in a Server-Timing header and
+    the ring buffer summarised on the server status page. Not loaded when disabled.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(django_settings, 'PERF_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed('PERF_INSTRUMENTATION is off')
+        request_metrics.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(('/static/', '/media/')):
+            return self.get_response(request)
+
+        with request_metrics.instrument_request() as metrics:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else request.path
+        response['Server-Timing'] = metrics.server_timing()
+        request_metrics.record(metrics.as_dict(request.method, request.path, view, response.status_code))
+        return response
+
+
+# Seconds between last_activity writes for an active session
+ACTIVITY_UPDATE_INTERVAL = getattr(django_settings, 'SESSION_ACTIVITY_UPDATE_INTERVAL', 60)
+
+
 class SessionTimeoutMiddleware:
     """Middleware to enforce session timeout based on database settings"""
     
@@ -74,8 +108,9 @@ class SessionTimeoutMiddleware:
         # Only check session timeout for authenticated users
         if request.user.is_authenticated:
             try:
-                # Get settings from database
-                settings = Settings.get_settings()
+                # PERFORMANCE FIX: Process-level settings copy (reloaded after Settings.save())
+                # instead of a SELECT on every request
+                settings = Settings.get_cached_settings()
                 session_timeout_minutes = settings.session_timeout
                 
                 # Get last activity from session
@@ -96,10 +131,14 @@ class SessionTimeoutMiddleware:
                         return redirect('login')
                 
                 # Update last activity timestamp only if not in sync operation
+                # PERFORMANCE FIX: At most once per ACTIVITY_UPDATE_INTERVAL per session (never more
+                # than a tenth of the timeout), so polling requests don't each write the session
                 if not getattr(request, '_sync_in_progress', False):
-                    request.session['last_activity'] = current_time.isoformat()
-                    # Don't explicitly save the session here to avoid conflicts
-                    # Django will save it automatically at the end of the request
+                    update_interval = min(ACTIVITY_UPDATE_INTERVAL, session_timeout_minutes * 6)
+                    if not last_activity or (current_time - last_activity).total_seconds() >= update_interval:
+                        request.session['last_activity'] = current_time.isoformat()
+                        # Don't explicitly save the session here to avoid conflicts
+                        # Django will save it automatically at the end of the request
                 
             except Exception as e:
                 # If there's an error getting settings, use default 30 minutes
@@ -141,16 +180,19 @@ class ActivityLoggingMiddleware(MiddlewareMixin):
             # Determine action based on request
             action = self._determine_action(request)
             
-            # Only log if it's a meaningful action
-            if action:
+            # Only log if it's a meaningful action (polling endpoints are sampled)
+            sample_rate = should_log_path(request.path) if action else None
+            if sample_rate is not None:
                 try:
-                    SystemLog.log_activity(
+                    # PERFORMANCE FIX: Queued for the background bulk writer - no INSERT in the request
+                    queue_activity_log(
                         user=request.user,
                         action=action,
                         page=request.path,
                         ip_address=ip,
                         user_agent=user_agent,
-                        description=self._get_description(request, action)
+                        description=self._get_description(request, action),
+                        details={'sample_rate': sample_rate} if sample_rate < 1.0 else None,
                     )
                 except Exception as e:
                     # Don't let logging errors break the application
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_add_client_fk_to_inspection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InspectionDocumentStatus',
+            fields=[
+                ('inspection', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document_status', serialize=False, to='main.foodsafetyagencyinspection')),
+                ('docs_flags', models.PositiveIntegerField(default=0, help_text='Categories present under docs/{client_id}/{inspection_id}/')),
+                ('legacy_flags', models.PositiveIntegerField(default=0, help_text='Categories present under the legacy inspection/YEAR/MONTH/CLIENT/ tree')),
+                ('scanned_at', models.DateTimeField(auto_now=True, help_text='When the media folders were last scanned')),
+            ],
+            options={
+                'verbose_name': 'Inspection Document Status',
+                'verbose_name_plural': 'Inspection Document Statuses',
+                'db_table': 'inspection_document_status',
+            },
+        ),
+    ]
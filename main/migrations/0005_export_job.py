@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_inspection_document_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(choices=[('invoice_sheet', 'Invoice Sheet'), ('invoice_google_sheet', 'Invoice Sheet (Google Sheets)'), ('shipments', 'Shipments')], max_length=30)),
+                ('export_format', models.CharField(help_text='xlsx, csv, pdf or gsheet', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Normalised export parameters')),
+                ('params_hash', models.CharField(help_text='SHA-256 of type, format and params (used to reuse artifacts)', max_length=64)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Percent complete (0-100)')),
+                ('message', models.CharField(blank=True, default='', help_text='Current step shown to the user', max_length=255)),
+                ('artifact_path', models.CharField(blank=True, default='', help_text='Generated file, relative to MEDIA_ROOT', max_length=500)),
+                ('result_url', models.URLField(blank=True, default='', help_text='External result (e.g. Google Sheet URL)', max_length=500)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Times a worker has started this job')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Heartbeat - bumped on every progress update')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Export Job',
+                'verbose_name_plural': 'Export Jobs',
+                'db_table': 'export_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['params_hash', 'status'], name='idx_export_job_params'), models.Index(fields=['status', 'updated_at'], name='idx_export_job_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriveIndexState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_name', models.CharField(max_length=50, unique=True)),
+                ('root_folder_id', models.CharField(max_length=100)),
+                ('drive_id', models.CharField(blank=True, default='', help_text='Shared drive ID (blank for My Drive)', max_length=100)),
+                ('page_token', models.CharField(blank=True, default='', help_text='Drive changes.list page token', max_length=255)),
+                ('folders', models.JSONField(blank=True, default=dict, help_text='Tracked folders: id -> {name, parent, depth}')),
+                ('last_full_scan_at', models.DateTimeField(blank=True, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Drive Index State',
+                'verbose_name_plural': 'Drive Index States',
+                'db_table': 'drive_index_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='DriveIndexedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_name', models.CharField(max_length=50)),
+                ('file_id', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=255)),
+                ('parent_id', models.CharField(help_text='Drive folder the file is in', max_length=100)),
+                ('commodity', models.CharField(max_length=50)),
+                ('account_code', models.CharField(max_length=50)),
+                ('zip_date', models.DateField()),
+                ('web_view_link', models.URLField(blank=True, default='', max_length=500)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Drive Indexed File',
+                'verbose_name_plural': 'Drive Indexed Files',
+                'db_table': 'drive_indexed_files',
+                'ordering': ['zip_date', 'name'],
+                'indexes': [models.Index(fields=['index_name', 'parent_id'], name='idx_drive_file_parent')],
+                'constraints': [models.UniqueConstraint(fields=('index_name', 'file_id'), name='uniq_drive_indexed_file')],
+            },
+        ),
+    ]
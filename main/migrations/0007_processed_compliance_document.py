@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_drive_change_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedComplianceDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_id', models.CharField(max_length=64, unique=True)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Processed Compliance Document',
+                'verbose_name_plural': 'Processed Compliance Documents',
+                'db_table': 'processed_compliance_documents',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_processed_compliance_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InspectionGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('date_of_inspection', models.DateField(blank=True, null=True)),
+                ('is_manual', models.BooleanField(default=False)),
+                ('inspection_count', models.PositiveIntegerField(default=0)),
+                ('latest_inspection_id', models.IntegerField(blank=True, null=True)),
+                ('earliest_inspection_id', models.IntegerField(blank=True, null=True)),
+                ('sent_count', models.PositiveIntegerField(default=0, help_text='Inspections marked as sent')),
+                ('rfi_count', models.PositiveIntegerField(default=0, help_text='Inspections with an RFI uploaded')),
+                ('lab_form_count', models.PositiveIntegerField(default=0, help_text='Inspections with a lab form uploaded')),
+                ('km_traveled', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('hours', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('comment', models.TextField(blank=True, null=True)),
+                ('approved_status', models.CharField(blank=True, max_length=10, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Inspection Group',
+                'verbose_name_plural': 'Inspection Groups',
+                'db_table': 'inspection_groups',
+                'indexes': [models.Index(fields=['is_manual', '-date_of_inspection', 'client_name'], name='idx_group_page')],
+                'constraints': [models.UniqueConstraint(fields=('client_name', 'date_of_inspection', 'is_manual'), name='uniq_inspection_group')],
+            },
+        ),
+    ]
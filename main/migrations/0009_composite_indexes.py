@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_inspection_group'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='foodsafetyagencyinspection',
+            index=models.Index(fields=['is_manual', '-date_of_inspection', 'client_name'], name='idx_fsa_manual_date_client'),
+        ),
+        migrations.AddIndex(
+            model_name='foodsafetyagencyinspection',
+            index=models.Index(fields=['inspector_id', 'date_of_inspection'], name='idx_fsa_inspector_date'),
+        ),
+        migrations.AddIndex(
+            model_name='foodsafetyagencyinspection',
+            index=models.Index(fields=['client_name', 'date_of_inspection'], name='idx_fsa_client_date'),
+        ),
+        migrations.AddIndex(
+            model_name='foodsafetyagencyinspection',
+            index=models.Index(fields=['commodity', 'date_of_inspection', 'hours', 'km_traveled'], name='idx_fsa_export_sheet'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['user', 'timestamp'], name='idx_system_log_user_time'),
+        ),
+        # Leading columns of idx_fsa_client_date / idx_fsa_inspector_date - dropped once those exist
+        migrations.RemoveIndex(
+            model_name='foodsafetyagencyinspection',
+            name='food_safety_client__f07db9_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='foodsafetyagencyinspection',
+            name='food_safety_inspect_a2643c_idx',
+        ),
+    ]
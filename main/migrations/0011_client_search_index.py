@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientSearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name_key', models.CharField(help_text='Lower-cased client name', max_length=255, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(db_index=True, help_text='Lower-cased, punctuation removed', max_length=255)),
+                ('account_code', models.CharField(blank=True, default='', max_length=100)),
+                ('client_code', models.CharField(blank=True, default='', help_text='Client.client_id', max_length=200)),
+                ('town', models.CharField(blank=True, default='', help_text='Town of the most recent inspection', max_length=100)),
+                ('last_inspection_date', models.DateField(blank=True, null=True)),
+                ('inspection_count', models.PositiveIntegerField(default=0)),
+                ('is_client', models.BooleanField(default=False, help_text='Present in the Client table')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Client Search Entry',
+                'verbose_name_plural': 'Client Search Entries',
+                'db_table': 'client_search_index',
+            },
+        ),
+    ]
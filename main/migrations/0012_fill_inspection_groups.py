@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:00
+
+from django.db import migrations
+from django.db.models import Count, Max, Min, Q
+
+
+def fill_inspection_groups(apps, schema_editor):
+    """Build the inspection group summary so the inspections page isn't empty after deploy"""
+    FoodSafetyAgencyInspection = apps.get_model('main', 'FoodSafetyAgencyInspection')
+    InspectionGroup = apps.get_model('main', 'InspectionGroup')
+    if InspectionGroup.objects.exists():
+        return
+
+    # Same tallies as main.utils.inspection_groups, kept here so later changes there don't alter this migration
+    rows = FoodSafetyAgencyInspection.objects.values('client_name', 'date_of_inspection', 'is_manual').annotate(
+        inspection_count=Count('id'),
+        latest_id=Max('id'),
+        earliest_id=Min('id'),
+        sent=Count('id', filter=Q(is_sent=True)),
+        rfi=Count('id', filter=Q(rfi_uploaded_by__isnull=False)),
+        lab_form=Count('id', filter=Q(lab_form_uploaded_by__isnull=False)),
+        group_km_traveled=Max('km_traveled'),
+        group_hours=Max('hours'),
+        group_comment=Max('comment'),
+        group_approved_status=Max('approved_status'),
+    ).order_by()
+
+    groups = [
+        InspectionGroup(
+            client_name=row['client_name'],
+            date_of_inspection=row['date_of_inspection'],
+            is_manual=row['is_manual'],
+            inspection_count=row['inspection_count'],
+            latest_inspection_id=row['latest_id'],
+            earliest_inspection_id=row['earliest_id'],
+            sent_count=row['sent'],
+            rfi_count=row['rfi'],
+            lab_form_count=row['lab_form'],
+            km_traveled=row['group_km_traveled'],
+            hours=row['group_hours'],
+            comment=row['group_comment'],
+            approved_status=row['group_approved_status'],
+        )
+        for row in rows.iterator(chunk_size=1000)
+    ]
+    InspectionGroup.objects.bulk_create(groups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_client_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_inspection_groups, migrations.RunPython.noop),
+    ]
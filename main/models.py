@@ -5,6 +5,8 @@ from django.core.cache import cache
 from django.conf import settings
 from datetime import date
 import re
+import time
+import uuid
 from django.utils import timezone
 
 # Add role field to existing User model
@@ -471,10 +473,16 @@ class FoodSafetyAgencyInspection(models.Model):
             models.Index(fields=['commodity']),
             models.Index(fields=['date_of_inspection']),
             models.Index(fields=['inspector_name']),
-            models.Index(fields=['client_name']),
-            models.Index(fields=['inspector_id']),
             models.Index(fields=['internal_account_code']),
             models.Index(fields=['commodity', 'remote_id']),  # Composite key index for performance
+            # Inspections page: manual inspections, newest dates first, grouped by client
+            models.Index(fields=['is_manual', '-date_of_inspection', 'client_name'], name='idx_fsa_manual_date_client'),
+            # Inspector's own inspections in a date range (also serves inspector_id lookups)
+            models.Index(fields=['inspector_id', 'date_of_inspection'], name='idx_fsa_inspector_date'),
+            # One client's groups / group updates by (client_name, date_of_inspection)
+            models.Index(fields=['client_name', 'date_of_inspection'], name='idx_fsa_client_date'),
+            # export_sheet: commodity + date range with hours and km present, answered from the index
+            models.Index(fields=['commodity', 'date_of_inspection', 'hours', 'km_traveled'], name='idx_fsa_export_sheet'),
         ]
 
     @property
@@ -509,6 +517,126 @@ class FoodSafetyAgencyInspection(models.Model):
         """Check if Accurance document has been uploaded"""
         return self.occurrence_uploaded_date is not None
 
+
+class InspectionDocumentStatus(models.Model):
+    """
+    Persistent document-presence index for an inspection.
+
+    Stores which document categories exist on disk as bitmasks so the inspections
+    page can colour its buttons from one indexed query instead of probing the
+    media volume for every group. Kept current by main.utils.document_status.
+    """
+    # Bit values for each document category (shared by docs_flags and legacy_flags)
+    CATEGORY_BITS = {
+        'rfi': 1,
+        'invoice': 2,
+        'lab': 4,
+        'lab_form': 8,
+        'compliance': 16,
+        'composition': 32,
+        'occurrence': 64,
+        'retest': 128,
+    }
+
+    inspection = models.OneToOneField(FoodSafetyAgencyInspection, on_delete=models.CASCADE, primary_key=True, related_name='document_status')
+    docs_flags = models.PositiveIntegerField(default=0, help_text="Categories present under docs/{client_id}/{inspection_id}/")
+    legacy_flags = models.PositiveIntegerField(default=0, help_text="Categories present under the legacy inspection/YEAR/MONTH/CLIENT/ tree")
+    scanned_at = models.DateTimeField(auto_now=True, help_text="When the media folders were last scanned")
+
+    class Meta:
+        db_table = 'inspection_document_status'
+        verbose_name = "Inspection Document Status"
+        verbose_name_plural = "Inspection Document Statuses"
+
+    def __str__(self):
+        return f"Documents for inspection {self.inspection_id} (docs={self.docs_flags}, legacy={self.legacy_flags})"
+
+    def has_document(self, category, include_legacy=True):
+        """Check if a document category is present for this inspection"""
+        bit = self.CATEGORY_BITS.get(category, 0)
+        flags = self.docs_flags | self.legacy_flags if include_legacy else self.docs_flags
+        return bool(flags & bit)
+
+
+class InspectionGroup(models.Model):
+    """
+    Materialized summary of one inspections-page group (client + inspection date).
+
+    Replaces the GROUP BY with conditional counts that shipment_list ran on every
+    page load. Manual and SQL Server-synced inspections are summarised separately
+    (is_manual). Kept current by main.utils.inspection_groups.
+    """
+    SUMMARY_FIELDS = (
+        'inspection_count', 'latest_inspection_id', 'earliest_inspection_id',
+        'sent_count', 'rfi_count', 'lab_form_count',
+        'km_traveled', 'hours', 'comment', 'approved_status',
+    )
+
+    client_name = models.CharField(max_length=200, blank=True, null=True)
+    date_of_inspection = models.DateField(blank=True, null=True)
+    is_manual = models.BooleanField(default=False)
+    inspection_count = models.PositiveIntegerField(default=0)
+    latest_inspection_id = models.IntegerField(null=True, blank=True)
+    earliest_inspection_id = models.IntegerField(null=True, blank=True)
+    sent_count = models.PositiveIntegerField(default=0, help_text="Inspections marked as sent")
+    rfi_count = models.PositiveIntegerField(default=0, help_text="Inspections with an RFI uploaded")
+    lab_form_count = models.PositiveIntegerField(default=0, help_text="Inspections with a lab form uploaded")
+    km_traveled = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
+    hours = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    comment = models.TextField(blank=True, null=True)
+    approved_status = models.CharField(max_length=10, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'inspection_groups'
+        verbose_name = "Inspection Group"
+        verbose_name_plural = "Inspection Groups"
+        constraints = [
+            models.UniqueConstraint(fields=['client_name', 'date_of_inspection', 'is_manual'], name='uniq_inspection_group'),
+        ]
+        indexes = [
+            # Inspections page: newest groups first
+            models.Index(fields=['is_manual', '-date_of_inspection', 'client_name'], name='idx_group_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.client_name} {self.date_of_inspection} ({self.inspection_count} inspections)"
+
+
+class ClientSearchEntry(models.Model):
+    """
+    One client-name suggestion for the client autocomplete.
+
+    Merges the Client table with the client names found on inspections (keyed
+    case-insensitively) and keeps the account code and most recent town, so a
+    suggestion needs no per-client lookups. Kept current by
+    main.utils.client_autocomplete, which also serves the searches from memory.
+    """
+    ENTRY_FIELDS = (
+        'name', 'normalized_name', 'account_code', 'client_code', 'town',
+        'last_inspection_date', 'inspection_count', 'is_client',
+    )
+
+    name_key = models.CharField(max_length=255, unique=True, help_text="Lower-cased client name")
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, db_index=True, help_text="Lower-cased, punctuation removed")
+    account_code = models.CharField(max_length=100, blank=True, default='')
+    client_code = models.CharField(max_length=200, blank=True, default='', help_text="Client.client_id")
+    town = models.CharField(max_length=100, blank=True, default='', help_text="Town of the most recent inspection")
+    last_inspection_date = models.DateField(blank=True, null=True)
+    inspection_count = models.PositiveIntegerField(default=0)
+    is_client = models.BooleanField(default=False, help_text="Present in the Client table")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'client_search_index'
+        verbose_name = "Client Search Entry"
+        verbose_name_plural = "Client Search Entries"
+
+    def __str__(self):
+        return self.name
+
+
 class Shipment(models.Model):
     """Shipment/Claim data model for legal system"""
     
@@ -663,11 +791,57 @@ class Settings(models.Model):
     def __str__(self):
         return "Application Settings"
     
+    # Shared cache key bumped on every save, so other processes reload their copy
+    CACHE_VERSION_KEY = 'app_settings_version'
+    # Seconds a process uses its copy before checking the shared version
+    CACHE_CHECK_SECONDS = 5
+    _cached = None
+    _cached_version = None
+    _cached_checked_at = 0.0
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Settings.invalidate_cache()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Settings.invalidate_cache()
+        return result
+    
     @classmethod
     def get_settings(cls):
         """Get or create settings instance"""
         settings, created = cls.objects.get_or_create(pk=1)
         return settings
+    
+    @classmethod
+    def get_cached_settings(cls):
+        """
+        Process-level copy of the settings for per-request code (middleware).
+        Shared between requests - read it, don't modify or save it.
+        """
+        now = time.monotonic()
+        cached = cls._cached
+        if cached is not None and now - cls._cached_checked_at < cls.CACHE_CHECK_SECONDS:
+            return cached
+        try:
+            version = cache.get(cls.CACHE_VERSION_KEY)
+        except Exception:
+            version = cls._cached_version
+        if cached is None or version != cls._cached_version:
+            cached = cls.get_settings()
+            cls._cached = cached
+            cls._cached_version = version
+        cls._cached_checked_at = now
+        return cached
+    
+    @classmethod
+    def invalidate_cache(cls):
+        cls._cached = None
+        try:
+            cache.set(cls.CACHE_VERSION_KEY, uuid.uuid4().hex, None)
+        except Exception as e:
+            print(f"[Settings] Could not publish settings change: {e}")
 
 class SystemLog(models.Model):
     """System log to track user activities"""
@@ -723,6 +897,8 @@ class SystemLog(models.Model):
             models.Index(fields=['timestamp']),
             models.Index(fields=['page']),
             models.Index(fields=['object_type']),
+            # One user's activity, newest first
+            models.Index(fields=['user', 'timestamp'], name='idx_system_log_user_time'),
         ]
     
     def __str__(self):
@@ -1047,3 +1223,219 @@ class Ticket(models.Model):
     def __str__(self):
         return f"#{self.id} - {self.title}"
 
+
+
+class ExportJob(models.Model):
+    """
+    Background export job (invoice sheet, Google Sheets upload, shipments).
+
+    Rows form a persistent job queue worked by main.services.export_job_service;
+    queued/interrupted jobs are picked up again after a restart. Finished files
+    are stored under MEDIA_ROOT/exports/ and reused for identical parameters.
+    """
+    TYPE_CHOICES = [
+        ('invoice_sheet', 'Invoice Sheet'),
+        ('invoice_google_sheet', 'Invoice Sheet (Google Sheets)'),
+        ('shipments', 'Shipments'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    export_type = models.CharField(max_length=30, choices=TYPE_CHOICES)
+    export_format = models.CharField(max_length=10, help_text="xlsx, csv, pdf or gsheet")
+    params = models.JSONField(default=dict, blank=True, help_text="Normalised export parameters")
+    params_hash = models.CharField(max_length=64, help_text="SHA-256 of type, format and params (used to reuse artifacts)")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete (0-100)")
+    message = models.CharField(max_length=255, blank=True, default='', help_text="Current step shown to the user")
+    artifact_path = models.CharField(max_length=500, blank=True, default='', help_text="Generated file, relative to MEDIA_ROOT")
+    result_url = models.URLField(max_length=500, blank=True, default='', help_text="External result (e.g. Google Sheet URL)")
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0, help_text="Times a worker has started this job")
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Heartbeat - bumped on every progress update")
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'export_jobs'
+        ordering = ['-created_at']
+        verbose_name = 'Export Job'
+        verbose_name_plural = 'Export Jobs'
+        indexes = [
+            models.Index(fields=['params_hash', 'status'], name='idx_export_job_params'),
+            models.Index(fields=['status', 'updated_at'], name='idx_export_job_status'),
+        ]
+
+    def __str__(self):
+        return f"Export #{self.id} {self.export_type}/{self.export_format} ({self.status})"
+
+    def to_status_dict(self):
+        """JSON-ready status used by the export job endpoints"""
+        from django.urls import reverse
+        download_url = ''
+        if self.status == 'completed' and self.artifact_path:
+            download_url = reverse('download_export_job', args=[self.id])
+        return {
+            'id': self.id,
+            'export_type': self.export_type,
+            'format': self.export_format,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'row_count': self.row_count,
+            'error': self.error,
+            'download_url': download_url,
+            'result_url': self.result_url,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+        }
+
+
+class DriveIndexState(models.Model):
+    """
+    Sync position of an incremental Google Drive index (main.services.drive_change_index).
+
+    page_token is the Drive changes.list token the next refresh continues from;
+    folders holds the tracked folder tree so changes can be matched to it.
+    """
+    index_name = models.CharField(max_length=50, unique=True)
+    root_folder_id = models.CharField(max_length=100)
+    drive_id = models.CharField(max_length=100, blank=True, default='', help_text="Shared drive ID (blank for My Drive)")
+    page_token = models.CharField(max_length=255, blank=True, default='', help_text="Drive changes.list page token")
+    folders = models.JSONField(default=dict, blank=True, help_text="Tracked folders: id -> {name, parent, depth}")
+    last_full_scan_at = models.DateTimeField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'drive_index_state'
+        verbose_name = 'Drive Index State'
+        verbose_name_plural = 'Drive Index States'
+
+    def __str__(self):
+        return f"{self.index_name} (token {self.page_token or 'none'})"
+
+
+class DriveIndexedFile(models.Model):
+    """Compliance file listed in a Drive month folder, kept current from the Drive change feed"""
+    index_name = models.CharField(max_length=50)
+    file_id = models.CharField(max_length=100)
+    name = models.CharField(max_length=255)
+    parent_id = models.CharField(max_length=100, help_text="Drive folder the file is in")
+    commodity = models.CharField(max_length=50)
+    account_code = models.CharField(max_length=50)
+    zip_date = models.DateField()
+    web_view_link = models.URLField(max_length=500, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'drive_indexed_files'
+        ordering = ['zip_date', 'name']
+        verbose_name = 'Drive Indexed File'
+        verbose_name_plural = 'Drive Indexed Files'
+        constraints = [
+            models.UniqueConstraint(fields=['index_name', 'file_id'], name='uniq_drive_indexed_file'),
+        ]
+        indexes = [
+            models.Index(fields=['index_name', 'parent_id'], name='idx_drive_file_parent'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ProcessedComplianceDocument(models.Model):
+    """
+    Inspection whose compliance document the daily sync has already handled.
+
+    document_id is DailyComplianceSyncService.generate_document_id()
+    ("<inspection id>_<YYYYMMDD>"). Rows are cleared when the media/inspection
+    folder is deleted or recreated so everything is downloaded again.
+    """
+    document_id = models.CharField(max_length=64, unique=True)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'processed_compliance_documents'
+        verbose_name = 'Processed Compliance Document'
+        verbose_name_plural = 'Processed Compliance Documents'
+
+    def __str__(self):
+        return self.document_id
+
+
+class OutboundEmail(models.Model):
+    """
+    Email waiting to be sent (or already sent) by the outbox worker.
+
+    Views queue a row instead of sending inside the request; the worker pool in
+    main.services.email_outbox_service sends it, retrying with backoff. Group
+    document sends carry an idempotency key so a double click (or a retried
+    request) queues one email, not two.
+    """
+    KIND_CHOICES = [
+        ('group_documents', 'Group Documents'),
+        ('password_reset', 'Password Reset'),
+        ('notification', 'Notification'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True, default='')
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=255, blank=True, default='')
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    attachment_paths = models.JSONField(default=list, blank=True, help_text="Files attached by path when sending")
+    context = models.JSONField(default=dict, blank=True, help_text="Data for the post-delivery step (e.g. the inspection group)")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True, default='')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbound_emails')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Heartbeat - bumped when a worker claims the email")
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['-created_at']
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='idx_outbox_due'),
+        ]
+
+    def __str__(self):
+        return f"Email #{self.id} {self.kind} to {', '.join(self.to)} ({self.status})"
+
+    def to_status_dict(self):
+        """JSON-ready status used by the outbox status endpoint"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'recipients': self.to,
+            'attachments': len(self.attachment_paths),
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+        }
@@ -10,7 +10,7 @@ import django
 import threading
 import time
 import json
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta
 from django.conf import settings
 from django.core.cache import cache
 
@@ -22,7 +22,14 @@ django.setup()
 from django.conf import settings
 from django.core.cache import cache
 from ..models import SystemSettings, FoodSafetyAgencyInspection
-from ..views.core_views import load_drive_files_real, find_document_link_apps_script_replica, download_compliance_document
+from ..views.core_views import (
+    load_drive_files_real, find_document_link_apps_script_replica, compliance_document_path,
+    organize_downloaded_compliance_zip, refresh_compliance_document_status,
+)
+
+
+# Document IDs per membership query / bulk INSERT batch
+PROCESSED_LOOKUP_BATCH = 500
 
 
 class DailyComplianceSyncService:
@@ -89,12 +96,12 @@ class DailyComplianceSyncService:
         
         return True
     
-    def get_processed_documents_cache(self):
-        """Get cache of already processed documents with automatic reset detection."""
+    def check_processed_documents_reset(self):
+        """Clear the processed documents table if the media/inspection folder was deleted or recreated."""
         import os
         from django.conf import settings
+        from ..models import ProcessedComplianceDocument
         
-        cache_key = 'processed_compliance_documents'
         media_check_key = 'media_folder_exists'
         
         # Check if media/inspection folder exists
@@ -104,42 +111,66 @@ class DailyComplianceSyncService:
         # Get previous media folder state from cache
         previous_media_state = cache.get(media_check_key, True)
         
-        # If media folder was deleted since last check, clear the processed cache
+        # If media folder was deleted since last check, clear the processed documents
         if previous_media_state and not media_exists:
-            print("🧹 DETECTED: Media folder was deleted! Clearing processed documents cache...")
-            cache.delete(cache_key)
+            print("🧹 DETECTED: Media folder was deleted! Clearing processed documents...")
+            ProcessedComplianceDocument.objects.all().delete()
             cache.set(media_check_key, False, 60 * 60 * 24)  # Remember for 24 hours
-            return set()  # Return empty set to force reprocessing
+            return True
         
-        # If media folder was recreated, also clear cache
+        # If media folder was recreated, also clear them
         if not previous_media_state and media_exists:
-            print("DETECTED: Media folder was recreated! Clearing processed documents cache...")
-            cache.delete(cache_key)
+            print("DETECTED: Media folder was recreated! Clearing processed documents...")
+            ProcessedComplianceDocument.objects.all().delete()
             cache.set(media_check_key, True, 60 * 60 * 24)  # Remember for 24 hours
-            return set()  # Return empty set to force reprocessing
+            return True
         
         # Update media folder state in cache
         cache.set(media_check_key, media_exists, 60 * 60 * 24)
+        return False
+    
+    def get_processed_documents_cache(self):
+        """Get all already processed document IDs with automatic reset detection."""
+        from ..models import ProcessedComplianceDocument
+        
+        if self.check_processed_documents_reset():
+            return set()  # Return empty set to force reprocessing
+        return set(ProcessedComplianceDocument.objects.values_list('document_id', flat=True))
+    
+    def get_processed_document_ids(self, document_ids):
+        """Which of the given document IDs were already processed (one query per PROCESSED_LOOKUP_BATCH IDs)."""
+        from ..models import ProcessedComplianceDocument
         
-        # Return normal processed documents cache
-        processed_docs = cache.get(cache_key, set())
-        return processed_docs
+        if self.check_processed_documents_reset():
+            return set()
+        document_ids = list(document_ids)
+        processed = set()
+        for start in range(0, len(document_ids), PROCESSED_LOOKUP_BATCH):
+            processed.update(ProcessedComplianceDocument.objects.filter(
+                document_id__in=document_ids[start:start + PROCESSED_LOOKUP_BATCH]
+            ).values_list('document_id', flat=True))
+        return processed
+    
+    def mark_documents_processed(self, document_ids):
+        """Record document IDs as processed with one bulk INSERT (already-recorded IDs are ignored)."""
+        from ..models import ProcessedComplianceDocument
+        
+        ProcessedComplianceDocument.objects.bulk_create(
+            [ProcessedComplianceDocument(document_id=document_id) for document_id in set(document_ids)],
+            batch_size=PROCESSED_LOOKUP_BATCH,
+            ignore_conflicts=True,
+        )
     
     def add_to_processed_cache(self, document_id):
-        """Add document to processed cache."""
-        cache_key = 'processed_compliance_documents'
-        processed_docs = self.get_processed_documents_cache()
-        processed_docs.add(document_id)
-        # Cache for 7 days
-        cache.set(cache_key, processed_docs, 7 * 24 * 60 * 60)
+        """Mark one document as processed."""
+        self.mark_documents_processed([document_id])
     
     def is_document_processed(self, document_id):
         """Check if document has already been processed."""
         if not self.get_system_settings().compliance_skip_processed:
             return False
         
-        processed_docs = self.get_processed_documents_cache()
-        return document_id in processed_docs
+        return document_id in self.get_processed_document_ids([document_id])
     
     def generate_document_id(self, inspection):
         """Generate unique document ID for tracking."""
@@ -154,161 +185,25 @@ class DailyComplianceSyncService:
                 return None
 
             from ..services.google_drive_service import GoogleDriveService
-            import re
+            from .drive_change_index import COMPLIANCE_YEARS_INDEX
             from datetime import datetime
 
-            drive_service = GoogleDriveService()
-            # Parent folder containing year folders (2025, 2026, etc.)
-            parent_folder_id = "1Q8ZXVC2NhzrPpDCdwfHGt8o726fLtqE_"
+            def stop_requested():
+                if not self.is_running or getattr(self, '_force_stop_processing', False):
+                    return True
+                return hasattr(threading, '_global_stop_flag') and threading._global_stop_flag.is_set()
 
+            drive_service = GoogleDriveService()
+            # Parent folder containing year folders (2025, 2026, etc.) -> month folders from October 2025
             print("[Cloud] Loading Google Drive files for compliance sync (2025+)...")
-            print("[Wait] Fetching year folders...")
             start_time = datetime.now()
 
-            # Step 1: Get all year folders (2025, 2026, etc.)
-            all_year_items = drive_service.list_files_in_folder(parent_folder_id, request=None, max_items=None)
-            print(f"[Retrieved] {len(all_year_items)} items from parent folder")
-
-            # Filter for year folders (folders named with 4-digit years)
-            year_folders = []
-            for item in all_year_items:
-                if item.get('mimeType') != 'application/vnd.google-apps.folder':
-                    continue
-
-                folder_name = item.get('name', '')
-                folder_id = item.get('id', '')
-
-                # Match 4-digit year folders (2025, 2026, etc.)
-                if re.match(r'^\d{4}$', folder_name):
-                    year = int(folder_name)
-                    # Only process year 2025 and onwards
-                    if year >= 2025:
-                        year_folders.append({
-                            'name': folder_name,
-                            'id': folder_id,
-                            'year': year
-                        })
-                        print(f"   [OK] Found year folder: {folder_name}")
-                    else:
-                        print(f"   [SKIP] Skipping: {folder_name} (before 2025)")
-
-            if not year_folders:
-                print("[WARNING] No year folders found (2025+)")
-                return {}
-
-            print(f"[OK] Found {len(year_folders)} year folder(s) to process")
-
-            # Step 2: Get month folders from each year folder
-            month_folders = []
-            for year_folder in sorted(year_folders, key=lambda x: x['year']):
-                print(f"\n[Fetching] Month folders from: {year_folder['name']}")
-                month_items = drive_service.list_files_in_folder(year_folder['id'], request=None, max_items=None)
-                print(f"   [Retrieved] {len(month_items)} items from {year_folder['name']}")
-
-                for item in month_items:
-                    # Check if it's a folder
-                    if item.get('mimeType') != 'application/vnd.google-apps.folder':
-                        continue
-
-                    folder_name = item.get('name', '')
-                    folder_id = item.get('id', '')
-
-                    # Parse folder name like "October 2025", "November 2025"
-                    # Pattern: Month Year
-                    month_year_pattern = re.match(r'^([A-Za-z]+)\s+(\d{4})$', folder_name)
-                    if month_year_pattern:
-                        month_name = month_year_pattern.group(1)
-                        year = int(month_year_pattern.group(2))
-
-                        try:
-                            # Parse month name to month number
-                            month_date = datetime.strptime(f"{month_name} {year}", "%B %Y")
-                            folder_date = month_date.date()
-
-                            # Only include folders from October 2025 onwards
-                            if folder_date >= date(2025, 10, 1):
-                                month_folders.append({
-                                    'name': folder_name,
-                                    'id': folder_id,
-                                    'date': folder_date
-                                })
-                                print(f"      [OK] Including: {folder_name}")
-                            else:
-                                print(f"      [SKIP]  Skipping: {folder_name} (before October 2025)")
-                        except ValueError:
-                            print(f"      [WARN]  Could not parse folder name: {folder_name}")
-                            continue
-
-            print(f"\n[OK] Found {len(month_folders)} total month folders to process (October 2025+)")
-
-            # Step 3: Load files from each month folder
-            file_lookup = {}
-            total_file_count = 0
-
-            for month_folder in sorted(month_folders, key=lambda x: x['date']):
-                # Check stop flag
-                if not self.is_running or (hasattr(self, '_force_stop_processing') and self._force_stop_processing):
-                    print("[STOP] Stop requested during folder processing - aborting")
-                    break
-
-                print(f"\n[Fetching] Files from: {month_folder['name']}")
-                folder_files = drive_service.list_files_in_folder(month_folder['id'], request=None, max_items=None)
-                print(f"   [Retrieved] {len(folder_files)} files from {month_folder['name']}")
-
-                # Process files from this month folder
-                month_file_count = 0
-                for file in folder_files:
-                    # Check stop flag
-                    if not self.is_running or (hasattr(self, '_force_stop_processing') and self._force_stop_processing):
-                        print("[STOP] Stop requested during file loading - aborting")
-                        break
-
-                    # Check global stop flag
-                    import threading
-                    if hasattr(threading, '_global_stop_flag') and threading._global_stop_flag.is_set():
-                        print("[STOP] Global stop flag detected during file loading - aborting")
-                        break
-
-                    file_name = file.get('name', '')
-                    file_id = file.get('id', '')
-                    web_view_link = file.get('webViewLink', '')
-
-                    # Apps Script pattern: COMMODITY-ACCOUNT_CODE-DATE
-                    # Example: RAW-RE-IND-RAW-NA-1000-2025-10-15
-                    full_pattern = re.match(r'^([A-Za-z]+)-([A-Z]{2}-[A-Z]{3}-[A-Z]{3}-[A-Z]{2,3}-\d+)-(\d{4}-\d{2}-\d{2})', file_name)
-
-                    if full_pattern and file_id:
-                        commodity_prefix = full_pattern.group(1)
-                        account_code = full_pattern.group(2)
-                        zip_date_str = full_pattern.group(3)
-
-                        try:
-                            zip_date = datetime.strptime(zip_date_str, '%Y-%m-%d')
-                        except:
-                            continue
-
-                        # Create compound key exactly like Apps Script
-                        compound_key = f"{commodity_prefix.lower()}|{account_code}|{zip_date_str}"
-
-                        file_lookup[compound_key] = {
-                            'url': web_view_link or f"https://drive.google.com/file/d/{file_id}/view",
-                            'name': file_name,
-                            'commodity': commodity_prefix,
-                            'accountCode': account_code,
-                            'zipDate': zip_date,
-                            'zipDateStr': zip_date_str,
-                            'file_id': file_id
-                        }
-
-                        month_file_count += 1
-                        total_file_count += 1
-
-                print(f"   [OK] Processed {month_file_count} compliance files from {month_folder['name']}")
+            # PERFORMANCE FIX: Apply Drive change-feed deltas to the stored index instead of
+            # re-listing every year and month folder; new year/month folders are picked up from the feed
+            file_lookup = COMPLIANCE_YEARS_INDEX.refresh(drive_service, should_stop=stop_requested)
 
             load_time = (datetime.now() - start_time).total_seconds()
-            print(f"\n[COMPLETE] Loaded {len(file_lookup)} compliance files from {len(month_folders)} month folders across {len(year_folders)} year(s) in {load_time:.1f} seconds")
-            print(f"[Info] Processed year folders: {', '.join([yf['name'] for yf in year_folders])}")
-            print(f"[Optimization] Auto-detects new year folders (2026, 2027, etc.) as they become available")
+            print(f"[COMPLETE] Loaded {len(file_lookup)} compliance files in {load_time:.1f} seconds")
 
             return file_lookup
 
@@ -376,31 +271,41 @@ class DailyComplianceSyncService:
             
             documents_processed = 0
             documents_skipped = 0
-            
+
+            # PERFORMANCE FIX: One membership query per batch of inspections instead of
+            # loading the whole processed set for every inspection
+            inspections = list(inspections)
+            processed_ids = set()
+            if settings.compliance_skip_processed:
+                processed_ids = self.get_processed_document_ids(
+                    self.generate_document_id(inspection) for inspection in inspections
+                )
+            newly_processed = []  # Written with one bulk INSERT at the end of the run
+
+            def stop_requested():
+                if not self.is_running or getattr(self, '_force_stop_processing', False):
+                    return True
+                # Check global stop flag
+                return hasattr(threading, '_global_stop_flag') and threading._global_stop_flag.is_set()
+
+            # PERFORMANCE FIX: Match every inspection first (in-memory lookups), then download
+            # the matched ZIPs in parallel - each Drive file once, however many inspections share it
+            planned = []  # (inspection, document_id, drive file, destination, commodity_upper, date_obj)
             for inspection in inspections:
                 # Check stop flag and force stop before processing each inspection
-                if not self.is_running or (hasattr(self, '_force_stop_processing') and self._force_stop_processing):
+                if stop_requested():
                     print("STOP: Stop requested during processing - aborting sync")
                     break
-
-                # Check global stop flag
-                import threading
-                if hasattr(threading, '_global_stop_flag') and threading._global_stop_flag.is_set():
-                    print("STOP: Global stop flag detected during processing - aborting sync")
-                    break
                     
                 document_id = self.generate_document_id(inspection)
                 
                 # Skip if already processed
-                if self.is_document_processed(document_id):
+                if document_id in processed_ids:
                     documents_skipped += 1
                     print(f"[SKIP]  Skipping already processed: {inspection.id}")
                     continue
                 
                 try:
-                    # Process compliance documents for this inspection - SEQUENTIAL APPROACH
-                    print(f"🔄 Processing: {inspection.id}")
-
                     # Use the inspection's own account code directly (from SQL Server)
                     # This is more reliable than looking up by client name
                     account_code = inspection.internal_account_code
@@ -424,75 +329,77 @@ class DailyComplianceSyncService:
                     if document_link and document_link != "Document Not Found":
                         print(f"[OK] Found compliance document for {inspection.id} (Account: {account_code})")
 
-                        # IMMEDIATELY DOWNLOAD the document
-                        try:
-                            # Find the matching file in lookup for download
-                            # Build the compound key to find the exact file
-                            date_str = inspection.date_of_inspection.strftime('%Y-%m-%d')
-                            commodity_prefix = str(inspection.commodity).lower().strip()
-                            if commodity_prefix == 'eggs':
-                                commodity_prefix = 'egg'
-
-                            # Search for matching files within 15 days
-                            best_match = None
-                            best_days_diff = 999
-
-                            for file_key, file_info in file_lookup.items():
-                                # Match by account code only (ignore commodity)
-                                if file_info.get('accountCode') == account_code:
-
-                                    # Calculate days difference - ensure both are date objects
-                                    file_date = file_info['zipDate']
-                                    inspection_date = inspection.date_of_inspection
-
-                                    # Convert datetime to date if needed
-                                    if hasattr(file_date, 'date'):
-                                        file_date = file_date.date()
-                                    if hasattr(inspection_date, 'date'):
-                                        inspection_date = inspection_date.date()
-
-                                    days_diff = abs((file_date - inspection_date).days)
-
-                                    if days_diff <= 15 and days_diff < best_days_diff:
-                                        best_match = file_info
-                                        best_days_diff = days_diff
-
-                            if best_match:
-                                print(f"📥 Downloading: {best_match['name']} for {inspection.client_name}")
-
-                                # Download to client's compliance folder
-                                downloaded_path = download_compliance_document(
-                                    best_match['file_id'],
-                                    account_code,
-                                    inspection.commodity,
-                                    inspection.date_of_inspection,
-                                    best_match['name'],
-                                    inspection.client_name,
-                                    None  # No request object needed
-                                )
-
-                                if downloaded_path:
-                                    print(f"[OK] Downloaded successfully: {best_match['name']} -> {downloaded_path}")
-                                    documents_processed += 1
-                                else:
-                                    print(f"[ERROR] Download failed for: {best_match['name']}")
-                            else:
-                                print(f"[WARN]  Could not find matching file for download (Account: {account_code}, Commodity: {commodity_prefix})")
-
-                        except Exception as download_error:
-                            print(f"[ERROR] Download error for {inspection.id}: {download_error}")
-
-                        # Mark as processed only after successful download attempt
-                        self.add_to_processed_cache(document_id)
+                        # Find the matching file in lookup for download
+                        # (nearest ZIP within 15 days, matched by account code only)
+                        best_match = file_lookup.find_best(
+                            account_code,
+                            inspection.date_of_inspection,
+                            max_days=15
+                        )
+
+                        if best_match:
+                            file_path, commodity_upper, date_obj = compliance_document_path(
+                                inspection.client_name,
+                                inspection.commodity,
+                                inspection.date_of_inspection,
+                                best_match['name']
+                            )
+                            planned.append((inspection, document_id, best_match, file_path, commodity_upper, date_obj))
+                        else:
+                            print(f"[WARN]  Could not find matching file for download (Account: {account_code})")
+                            newly_processed.append(document_id)
                     else:
                         print(f"[WARN]  No document found for {inspection.id} (Account: {account_code})")
                     
-                    # Small delay to prevent overwhelming the system
-                    time.sleep(0.2)  # Slightly longer delay for download operations
-                    
                 except Exception as e:
                     print(f"[ERROR] Error processing {inspection.id}: {e}")
                     continue
+
+            if planned and not stop_requested():
+                from .google_drive_service import GoogleDriveService
+
+                already_on_disk = {plan[3] for plan in planned if os.path.exists(plan[3])}
+                print(f"📥 Downloading {len(planned)} compliance documents...")
+                try:
+                    engine = GoogleDriveService().download_engine()
+                    results = engine.download_many(
+                        [(plan[2]['file_id'], plan[3]) for plan in planned],
+                        should_stop=stop_requested
+                    )
+                except Exception as download_error:
+                    print(f"[ERROR] Download error: {download_error}")
+                    results = {}
+
+                refreshed_months = set()
+                organized_paths = set()
+                for inspection, document_id, best_match, file_path, commodity_upper, date_obj in planned:
+                    result = results.get(best_match['file_id'])
+                    if not result or not result.success or file_path not in result.paths:
+                        if result and result.error == 'stopped':
+                            # Not attempted - leave it for the next run
+                            continue
+                        print(f"[ERROR] Download failed for: {best_match['name']}")
+                    else:
+                        print(f"[OK] Downloaded successfully: {best_match['name']} -> {file_path}")
+                        documents_processed += 1
+
+                        if file_path not in already_on_disk and file_path not in organized_paths:
+                            organized_paths.add(file_path)
+                            organize_downloaded_compliance_zip(
+                                file_path, best_match['name'], inspection.client_name,
+                                inspection.date_of_inspection, commodity_upper
+                            )
+                            # One document-status refresh per client and month
+                            month_key = (inspection.client_name, date_obj.year, date_obj.month)
+                            if month_key not in refreshed_months:
+                                refreshed_months.add(month_key)
+                                refresh_compliance_document_status(inspection.client_name, date_obj)
+
+                    # Mark as processed only after the download attempt
+                    newly_processed.append(document_id)
+
+            if newly_processed:
+                self.mark_documents_processed(newly_processed)
             
             # Update statistics
             self.sync_stats['total_documents_processed'] += documents_processed
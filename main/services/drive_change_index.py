@@ -0,0 +1,390 @@
+"""
+Incremental Google Drive Index
+Keeps the compliance file lookup in the database (DriveIndexedFile) and brings
+it up to date from the Drive change feed instead of re-listing every month
+folder.
+
+- First run (or when the saved page token is rejected): list the folder tree
+  once, store every compliance file, and save a changes.list start token taken
+  before the listing began.
+- Every later refresh: read changes.list from the saved token and apply only
+  the deltas (new/renamed/moved/trashed files and month folders).
+
+A refresh therefore costs a couple of API calls instead of one list call per
+folder page.
+"""
+
+from datetime import date, datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..utils.cache_utils import acquire_lock, release_lock
+
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+# Refreshes of one index are serialised across processes
+REFRESH_LOCK_TIMEOUT = 30 * 60
+# Statuses Drive returns for an expired or unknown page token
+INVALID_TOKEN_STATUSES = {400, 404, 410}
+# Rows per bulk_create / ids per DELETE ... IN (...)
+BATCH_SIZE = 500
+
+MONTH_NAMES = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6,
+    'July': 7, 'August': 8, 'September': 9, 'October': 10, 'November': 11, 'December': 12
+}
+COMPLIANCE_START_DATE = date(2025, 10, 1)
+
+
+class DriveIndexStopped(Exception):
+    """Raised when should_stop() asks a full scan to abort"""
+
+
+def _month_folder_date(folder_name):
+    """date of a "October 2025" style folder name, or None"""
+    parts = (folder_name or '').split()
+    if len(parts) != 2 or parts[0] not in MONTH_NAMES or not parts[1].isdigit() or len(parts[1]) != 4:
+        return None
+    return date(int(parts[1]), MONTH_NAMES[parts[0]], 1)
+
+
+def is_2025_month_folder(folder_name):
+    """Month folders inside the 2025 folder, October 2025 onwards"""
+    folder_date = _month_folder_date(folder_name)
+    return bool(folder_date) and folder_date.year == 2025 and folder_date >= COMPLIANCE_START_DATE
+
+
+def is_year_folder(folder_name):
+    """Year folders (2025, 2026, ...) from 2025 onwards"""
+    return len(folder_name or '') == 4 and folder_name.isdigit() and int(folder_name) >= 2025
+
+
+def is_compliance_month_folder(folder_name):
+    """Month folders from October 2025 onwards"""
+    folder_date = _month_folder_date(folder_name)
+    return bool(folder_date) and folder_date >= COMPLIANCE_START_DATE
+
+
+def _is_invalid_token_error(error):
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return status is not None and int(status) in INVALID_TOKEN_STATUSES
+
+
+def _file_row(item, parent_id):
+    """DriveIndexedFile field values for a Drive file item, or None if it isn't a compliance file"""
+    from .google_drive_service import parse_compliance_file_name
+
+    file_id = item.get('id', '')
+    parsed = parse_compliance_file_name(item.get('name', ''))
+    if not parsed or not file_id:
+        return None
+    commodity, account_code, zip_date = parsed
+    return {
+        'file_id': file_id,
+        'name': item['name'][:255],
+        'parent_id': parent_id,
+        'commodity': commodity,
+        'account_code': account_code,
+        'zip_date': zip_date.date(),
+        'web_view_link': item.get('webViewLink') or '',
+    }
+
+
+class DriveChangeIndex:
+    """
+    Persisted file lookup for one Drive folder tree.
+
+    folder_levels holds one name predicate per folder level below the root;
+    compliance files are read from folders at the last level.
+    """
+
+    def __init__(self, index_name, root_folder_id, folder_levels):
+        self.index_name = index_name
+        self.root_folder_id = root_folder_id
+        self.folder_levels = list(folder_levels)
+
+    @property
+    def leaf_depth(self):
+        return len(self.folder_levels) - 1
+
+    def _lock_key(self):
+        return f'drive_index:{self.index_name}:refresh'
+
+    def _get_state(self):
+        from ..models import DriveIndexState
+        state, _ = DriveIndexState.objects.get_or_create(
+            index_name=self.index_name,
+            defaults={'root_folder_id': self.root_folder_id},
+        )
+        return state
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def refresh(self, drive_service, request=None, force_full=False, should_stop=None):
+        """
+        Bring the stored index up to date and return it as a DriveFileLookup.
+
+        Falls back to a full rescan when there is no saved page token, the root
+        folder changed, or Drive rejects the token. If Drive can't be reached the
+        stored index is returned as it is.
+        """
+        lock_token = acquire_lock(self._lock_key(), REFRESH_LOCK_TIMEOUT)
+        if not lock_token:
+            print(f"[DRIVE INDEX] {self.index_name}: refresh already running elsewhere - using stored index")
+            return self.file_lookup()
+
+        try:
+            state = self._get_state()
+            needs_full_scan = (
+                force_full
+                or not state.page_token
+                or state.root_folder_id != self.root_folder_id
+            )
+            if not needs_full_scan:
+                try:
+                    self.apply_changes(drive_service, state, request=request, should_stop=should_stop)
+                except Exception as e:
+                    if not _is_invalid_token_error(e):
+                        raise
+                    print(f"[DRIVE INDEX] {self.index_name}: page token rejected ({e}) - full rescan")
+                    needs_full_scan = True
+
+            if needs_full_scan:
+                self.full_scan(drive_service, state, request=request, should_stop=should_stop)
+        except DriveIndexStopped:
+            print(f"[DRIVE INDEX] {self.index_name}: stop requested - index left unchanged")
+        except Exception as e:
+            # Drive unreachable - the stored index is still better than nothing
+            print(f"[DRIVE INDEX] {self.index_name}: refresh failed ({e}) - using stored index")
+        finally:
+            release_lock(self._lock_key(), lock_token)
+
+        return self.file_lookup()
+
+    def _scan_folder(self, drive_service, folder_id, depth, request=None, should_stop=None):
+        """
+        List folder_id (at depth) and everything tracked below it.
+
+        Returns:
+            tuple: (folders dict id -> {name, parent, depth}, list of file rows)
+        """
+        if should_stop and should_stop():
+            raise DriveIndexStopped()
+
+        folders = {}
+        rows = []
+        items = drive_service.list_files_in_folder(folder_id, request=request, max_items=None)
+        child_depth = depth + 1
+        for item in items:
+            if item.get('mimeType') == FOLDER_MIME_TYPE:
+                if child_depth <= self.leaf_depth and self.folder_levels[child_depth](item.get('name', '')):
+                    folders[item['id']] = {'name': item.get('name', ''), 'parent': folder_id, 'depth': child_depth}
+                    sub_folders, sub_rows = self._scan_folder(
+                        drive_service, item['id'], child_depth, request=request, should_stop=should_stop
+                    )
+                    folders.update(sub_folders)
+                    rows.extend(sub_rows)
+            elif depth == self.leaf_depth:
+                row = _file_row(item, folder_id)
+                if row:
+                    rows.append(row)
+        return folders, rows
+
+    def full_scan(self, drive_service, state, request=None, should_stop=None):
+        """List the whole folder tree and replace the stored index"""
+        from ..models import DriveIndexedFile
+
+        started = datetime.now()
+        print(f"[DRIVE INDEX] {self.index_name}: full scan of {self.root_folder_id}")
+
+        drive_id = drive_service.get_shared_drive_id(self.root_folder_id, request=request) or ''
+        # Taken before listing, so anything changed during the scan is replayed next time
+        start_token = drive_service.get_start_page_token(drive_id or None, request=request)
+
+        folders, rows = self._scan_folder(
+            drive_service, self.root_folder_id, -1, request=request, should_stop=should_stop
+        )
+
+        with transaction.atomic():
+            DriveIndexedFile.objects.filter(index_name=self.index_name).delete()
+            DriveIndexedFile.objects.bulk_create(
+                [DriveIndexedFile(index_name=self.index_name, **row) for row in rows],
+                batch_size=BATCH_SIZE,
+            )
+            now = timezone.now()
+            state.root_folder_id = self.root_folder_id
+            state.drive_id = drive_id
+            state.page_token = start_token
+            state.folders = folders
+            state.last_full_scan_at = now
+            state.last_synced_at = now
+            state.save()
+
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"[DRIVE INDEX] {self.index_name}: indexed {len(rows)} files in {len(folders)} folders ({elapsed:.1f}s)")
+
+    def apply_changes(self, drive_service, state, request=None, should_stop=None):
+        """Apply changes.list deltas since state.page_token to the stored index"""
+        folders = dict(state.folders or {})
+        pending = {}  # file_id -> row, or None to delete
+        removed_folders = set()
+        change_count = 0
+
+        page_token = state.page_token
+        new_start_token = None
+        while page_token:
+            if should_stop and should_stop():
+                raise DriveIndexStopped()
+            page = drive_service.list_changes(page_token, state.drive_id or None, request=request)
+            for change in page.get('changes', []):
+                change_count += 1
+                self._apply_change(drive_service, change, folders, pending, removed_folders, request, should_stop)
+            new_start_token = page.get('newStartPageToken')
+            page_token = None if new_start_token else page.get('nextPageToken')
+
+        self._save_changes(state, folders, pending, removed_folders, new_start_token or state.page_token)
+        print(f"[DRIVE INDEX] {self.index_name}: applied {change_count} changes "
+              f"({sum(1 for row in pending.values() if row)} files updated, "
+              f"{sum(1 for row in pending.values() if row is None)} removed)")
+
+    def _parent_depth(self, parent_id, folders):
+        if parent_id == self.root_folder_id:
+            return -1
+        folder = folders.get(parent_id)
+        return folder['depth'] if folder else None
+
+    def _drop_folder(self, folder_id, folders, removed_folders, pending):
+        """Stop tracking a folder and everything below it"""
+        doomed = {folder_id}
+        changed = True
+        while changed:
+            changed = False
+            for child_id, folder in folders.items():
+                if child_id not in doomed and folder['parent'] in doomed:
+                    doomed.add(child_id)
+                    changed = True
+        for doomed_id in doomed:
+            if folders.pop(doomed_id, None) is not None:
+                removed_folders.add(doomed_id)
+        # Files seen earlier in this batch went with the folder
+        for file_id, row in pending.items():
+            if row and row['parent_id'] in doomed:
+                pending[file_id] = None
+
+    def _apply_change(self, drive_service, change, folders, pending, removed_folders, request, should_stop):
+        if change.get('changeType', 'file') != 'file':
+            return
+        file_id = change.get('fileId')
+        item = change.get('file') or {}
+        removed = change.get('removed') or item.get('trashed')
+
+        if item.get('mimeType') == FOLDER_MIME_TYPE or (removed and file_id in folders):
+            if removed:
+                self._drop_folder(file_id, folders, removed_folders, pending)
+                return
+
+            parent_id, depth = None, None
+            for candidate in item.get('parents', []):
+                parent_depth = self._parent_depth(candidate, folders)
+                if parent_depth is not None:
+                    parent_id, depth = candidate, parent_depth + 1
+                    break
+
+            tracked = folders.get(file_id)
+            matches = depth is not None and depth <= self.leaf_depth and self.folder_levels[depth](item.get('name', ''))
+            if not matches:
+                if tracked:
+                    self._drop_folder(file_id, folders, removed_folders, pending)
+                return
+            if tracked and tracked['parent'] == parent_id and tracked['depth'] == depth:
+                tracked['name'] = item.get('name', '')
+                return
+
+            # New (or moved-in) folder: list it once
+            if tracked:
+                self._drop_folder(file_id, folders, removed_folders, pending)
+            folders[file_id] = {'name': item.get('name', ''), 'parent': parent_id, 'depth': depth}
+            removed_folders.discard(file_id)
+            sub_folders, rows = self._scan_folder(drive_service, file_id, depth, request=request, should_stop=should_stop)
+            for sub_id in sub_folders:
+                removed_folders.discard(sub_id)
+            folders.update(sub_folders)
+            for row in rows:
+                pending[row['file_id']] = row
+            return
+
+        if removed:
+            pending[file_id] = None
+            return
+
+        row = None
+        for parent_id in item.get('parents', []):
+            folder = folders.get(parent_id)
+            if folder and folder['depth'] == self.leaf_depth:
+                row = _file_row(item, parent_id)
+                break
+        # Renamed to a non-compliance name or moved out of the month folders -> drop it
+        pending[file_id] = row
+
+    def _save_changes(self, state, folders, pending, removed_folders, page_token):
+        from ..models import DriveIndexedFile
+
+        files = DriveIndexedFile.objects.filter(index_name=self.index_name)
+        with transaction.atomic():
+            removed_folder_ids = list(removed_folders)
+            for start in range(0, len(removed_folder_ids), BATCH_SIZE):
+                files.filter(parent_id__in=removed_folder_ids[start:start + BATCH_SIZE]).delete()
+
+            changed_ids = list(pending)
+            for start in range(0, len(changed_ids), BATCH_SIZE):
+                files.filter(file_id__in=changed_ids[start:start + BATCH_SIZE]).delete()
+            DriveIndexedFile.objects.bulk_create(
+                [DriveIndexedFile(index_name=self.index_name, **row) for row in pending.values() if row],
+                batch_size=BATCH_SIZE,
+            )
+
+            state.folders = folders
+            state.page_token = page_token
+            state.last_synced_at = timezone.now()
+            state.save(update_fields=['folders', 'page_token', 'last_synced_at'])
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def file_lookup(self):
+        """Stored index as a DriveFileLookup keyed like the Apps Script compound keys"""
+        from ..models import DriveIndexedFile
+        from .google_drive_service import DriveFileLookup
+
+        file_lookup = DriveFileLookup()
+        rows = DriveIndexedFile.objects.filter(index_name=self.index_name).order_by('zip_date', 'name').values_list(
+            'file_id', 'name', 'commodity', 'account_code', 'zip_date', 'web_view_link'
+        )
+        for file_id, name, commodity, account_code, zip_date, web_view_link in rows.iterator(chunk_size=2000):
+            zip_date_str = zip_date.strftime('%Y-%m-%d')
+            # Create compound key exactly like Apps Script
+            file_lookup[f"{commodity.lower()}|{account_code}|{zip_date_str}"] = {
+                'url': web_view_link or f"https://drive.google.com/file/d/{file_id}/view",
+                'name': name,
+                'commodity': commodity,
+                'accountCode': account_code,
+                'zipDate': datetime.combine(zip_date, datetime.min.time()),
+                'zipDateStr': zip_date_str,
+                'file_id': file_id,
+            }
+        file_lookup.build_index()
+        return file_lookup
+
+
+# 2025 folder in the Shared Drive -> "{Month} 2025" folders (used by load_drive_files_real)
+COMPLIANCE_2025_INDEX = DriveChangeIndex(
+    'compliance_2025', '1pzot8MQ-m3u0f9-BWxpBO40QgLmeZhRP', [is_2025_month_folder],
+)
+# Parent of the year folders -> year -> "{Month} {Year}" folders (used by the daily compliance sync)
+COMPLIANCE_YEARS_INDEX = DriveChangeIndex(
+    'compliance_years', '1Q8ZXVC2NhzrPpDCdwfHGt8o726fLtqE_', [is_year_folder, is_compliance_month_folder],
+)
@@ -0,0 +1,223 @@
+"""
+Google Drive Download Engine
+Downloads Drive files straight to disk in fixed-size chunks, with retry and
+resume, and runs many downloads in parallel on a bounded thread pool.
+
+- Each chunk is appended to "<dest>.part" and the file is renamed into place
+  only once it is complete, so readers never see half-written ZIPs.
+- A failed chunk is retried with exponential backoff; the retry resumes from
+  the bytes already on disk (HTTP Range) instead of starting over.
+- download_many() de-duplicates by Drive file ID: a ZIP shared by several
+  inspections is fetched once and copied to the other destinations.
+
+httplib2 (used by googleapiclient) is not thread-safe, so every worker thread
+builds its own Drive client from the shared credentials.
+"""
+
+import os
+import random
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+
+# Bytes requested per Range call (MediaIoBaseDownload defaults to 100MB in one go)
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_RETRIES = 4
+# Backoff before retry n is RETRY_BASE_DELAY * 2**(n-1) seconds plus jitter
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# HTTP statuses worth retrying (rate limits and server errors); anything else fails straight away
+RETRYABLE_STATUSES = {403, 408, 429, 500, 502, 503, 504}
+
+PART_SUFFIX = '.part'
+
+
+def _is_retryable(error):
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is None:
+        # Socket/SSL/timeout errors carry no HTTP status
+        return isinstance(error, (OSError, TimeoutError)) or error.__class__.__name__ in (
+            'ServerNotFoundError', 'TransportError', 'IncompleteRead',
+        )
+    return int(status) in RETRYABLE_STATUSES
+
+
+def _backoff_delay(attempt):
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+    return delay + random.uniform(0, delay / 2)
+
+
+def download_to_path(drive, file_id, dest_path, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                     max_retries=DEFAULT_MAX_RETRIES, log_prefix='[Drive]'):
+    """
+    Download a Drive file to dest_path chunk by chunk.
+
+    Bytes are appended to dest_path + '.part' as they arrive; after a failed
+    chunk the download resumes from the size of the .part file. The .part file
+    is renamed to dest_path when complete.
+
+    Returns:
+        bool: True if dest_path now holds a non-empty file
+    """
+    from googleapiclient.http import MediaIoBaseDownload
+
+    part_path = dest_path + PART_SUFFIX
+    attempt = 0
+
+    while True:
+        try:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            with open(part_path, 'ab') as handle:
+                media_request = drive.files().get_media(fileId=file_id, supportsAllDrives=True)
+                downloader = MediaIoBaseDownload(handle, media_request, chunksize=chunk_size)
+                # Resume from what is already on disk - the next Range request starts here
+                downloader._progress = offset
+                if offset:
+                    print(f"{log_prefix} Download: resuming {file_id} at {offset} bytes")
+
+                done = False
+                while not done:
+                    status, done = downloader.next_chunk()
+                    if status and status.total_size:
+                        print(f"{log_prefix} Download: {file_id} {int(status.progress() * 100)}%")
+
+            file_size = os.path.getsize(part_path)
+            if file_size <= 0:
+                print(f"{log_prefix} Download: ERROR - file is empty ({file_size} bytes)")
+                os.remove(part_path)
+                return False
+
+            os.replace(part_path, dest_path)
+            print(f"{log_prefix} Download: completed {dest_path} ({file_size} bytes)")
+            return True
+
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries or not _is_retryable(e):
+                print(f"{log_prefix} Download: ERROR - {file_id}: {e}")
+                try:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                except OSError:
+                    pass
+                return False
+
+            delay = _backoff_delay(attempt)
+            print(f"{log_prefix} Download: {file_id} failed ({e}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class DownloadResult:
+    """Outcome of one Drive file in a download_many() batch"""
+
+    def __init__(self, file_id, paths, success=False, downloaded=False, error=None):
+        self.file_id = file_id
+        self.paths = paths  # Destination paths that now exist
+        self.success = success
+        self.downloaded = downloaded  # False when every destination was already on disk
+        self.error = error
+
+    def __repr__(self):
+        return f"<DownloadResult {self.file_id} success={self.success} paths={len(self.paths)}>"
+
+
+class DriveDownloadEngine:
+    """Bounded thread pool of chunked, retried Drive downloads."""
+
+    def __init__(self, creds, max_workers=None, chunk_size=None, max_retries=None):
+        self.creds = creds
+        self.max_workers = max_workers or getattr(settings, 'DRIVE_DOWNLOAD_WORKERS', DEFAULT_MAX_WORKERS)
+        self.chunk_size = chunk_size or getattr(settings, 'DRIVE_DOWNLOAD_CHUNK_SIZE', DOWNLOAD_CHUNK_SIZE)
+        self.max_retries = max_retries if max_retries is not None else getattr(
+            settings, 'DRIVE_DOWNLOAD_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+        self._local = threading.local()
+
+    def _drive(self):
+        """Drive client owned by the calling thread"""
+        drive = getattr(self._local, 'drive', None)
+        if drive is None:
+            from googleapiclient.discovery import build
+            drive = build('drive', 'v3', credentials=self.creds, cache_discovery=False)
+            self._local.drive = drive
+        return drive
+
+    def download(self, file_id, dest_path):
+        """Download one file on the calling thread"""
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        return download_to_path(self._drive(), file_id, dest_path, self.chunk_size, self.max_retries)
+
+    def _fetch(self, file_id, dest_paths):
+        existing = [path for path in dest_paths if os.path.exists(path)]
+        downloaded = False
+
+        if existing:
+            source = existing[0]
+        else:
+            source = dest_paths[0]
+            if not self.download(file_id, source):
+                return DownloadResult(file_id, [], error='download failed')
+            downloaded = True
+
+        # Shared ZIP - copy to the other inspections' folders instead of fetching it again
+        paths = [source]
+        for path in dest_paths:
+            if path == source:
+                continue
+            try:
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                    shutil.copyfile(source, path)
+                paths.append(path)
+            except OSError as e:
+                print(f"[Drive] Download: could not copy {file_id} to {path}: {e}")
+
+        return DownloadResult(file_id, paths, success=True, downloaded=downloaded)
+
+    def download_many(self, tasks, should_stop=None):
+        """
+        Download (file_id, dest_path) pairs in parallel.
+
+        Pairs with the same file_id are fetched once. Files already on disk are
+        not downloaded again. should_stop is polled between files; once it
+        returns True no new downloads are started.
+
+        Returns:
+            dict: file_id -> DownloadResult
+        """
+        grouped = OrderedDict()
+        for file_id, dest_path in tasks:
+            if not file_id or not dest_path:
+                continue
+            paths = grouped.setdefault(file_id, [])
+            if dest_path not in paths:
+                paths.append(dest_path)
+
+        results = {}
+        if not grouped:
+            return results
+
+        print(f"[Drive] Download: {len(grouped)} unique files for {sum(len(p) for p in grouped.values())} destinations "
+              f"({self.max_workers} workers)")
+
+        def run(file_id, dest_paths):
+            if should_stop and should_stop():
+                return DownloadResult(file_id, [], error='stopped')
+            try:
+                return self._fetch(file_id, dest_paths)
+            except Exception as e:
+                print(f"[Drive] Download: ERROR - {file_id}: {e}")
+                return DownloadResult(file_id, [], error=str(e))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='drive-download') as executor:
+            futures = [executor.submit(run, file_id, dest_paths) for file_id, dest_paths in grouped.items()]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.file_id] = result
+
+        return results
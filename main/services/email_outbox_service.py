@@ -0,0 +1,315 @@
+"""
+Email Outbox Service
+Sends queued OutboundEmail rows from a worker thread pool instead of the request thread.
+
+A view calls queue_email() and answers straight away; a worker claims the row,
+sends it through the configured email backend and, for group document sends,
+marks the inspection group as sent once the email has been delivered. Failed
+sends are retried with exponential backoff; queued and interrupted emails are
+picked up again when the pool starts (or by the process_email_outbox command).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..graph_email_backend import GraphEmailMessage
+from ..models import OutboundEmail
+
+
+OUTBOX_WORKERS = int(os.environ.get('EMAIL_OUTBOX_WORKERS', '2'))
+MAX_ATTEMPTS = 5
+# Retry n waits RETRY_BASE_SECONDS * 2**(n-1), capped at RETRY_MAX_SECONDS
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 30 * 60
+# A "sending" email without a heartbeat for this long was interrupted (worker restart)
+STALE_SEND_SECONDS = 300
+# While a send is in progress (large attachments, Graph upload sessions) the heartbeat
+# is bumped this often, so a slow send is never mistaken for an interrupted one
+HEARTBEAT_SECONDS = 60
+# Emails that still hold their idempotency key
+IN_FLIGHT_STATUSES = ('queued', 'sending')
+
+
+def group_send_key(group_id, recipients, attachment_paths):
+    """
+    Idempotency key for sending a group's documents.
+
+    The same group, recipients and files (by size and modification time) give the
+    same key, so repeated clicks while the email is still queued or sending queue
+    one email; uploading a new document makes the next send a new email.
+    """
+    files = []
+    for path in sorted(attachment_paths):
+        try:
+            stat = os.stat(path)
+            files.append([path, stat.st_size, int(stat.st_mtime)])
+        except OSError:
+            files.append([path, None, None])
+    payload = json.dumps(['group_documents', group_id, sorted(recipients), files])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def queue_email(kind, subject, to, body='', html_body='', from_email=None, cc=None, bcc=None,
+                reply_to=None, attachments=None, context=None, idempotency_key=None, user=None):
+    """
+    Queue an email for the outbox workers.
+
+    With an idempotency_key, a repeated call returns the email still queued or
+    being sent for that key. Once that email has been sent (or has failed) the key
+    is released, so a deliberate resend queues a new email.
+
+    Returns:
+        OutboundEmail
+    """
+    if idempotency_key:
+        # Finished emails give up their key - the unique constraint only guards in-flight sends
+        OutboundEmail.objects.filter(idempotency_key=idempotency_key).exclude(
+            status__in=IN_FLIGHT_STATUSES
+        ).update(idempotency_key=None)
+        existing = OutboundEmail.objects.filter(idempotency_key=idempotency_key).first()
+        if existing:
+            print(f"[EMAIL OUTBOX] Email #{existing.id} already {existing.status} for this send")
+            email_outbox_service.recover(existing)
+            return existing
+
+    try:
+        with transaction.atomic():
+            email = OutboundEmail.objects.create(
+                kind=kind,
+                idempotency_key=idempotency_key,
+                subject=subject[:255],
+                body=body or '',
+                html_body=html_body or '',
+                from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+                to=list(to),
+                cc=list(cc or []),
+                bcc=list(bcc or []),
+                reply_to=list(reply_to or []),
+                attachment_paths=list(attachments or []),
+                context=context or {},
+                requested_by=user,
+            )
+    except IntegrityError:
+        # A concurrent request queued the same send first
+        return OutboundEmail.objects.get(idempotency_key=idempotency_key)
+
+    print(f"[EMAIL OUTBOX] Queued email #{email.id} ({kind}) to {', '.join(email.to)}")
+    # Workers must not look for the row before the surrounding transaction commits
+    transaction.on_commit(lambda: email_outbox_service.enqueue(email.id))
+    return email
+
+
+def build_message(email):
+    """EmailMessage for an outbox row (files attached by path, read when sent)"""
+    message = GraphEmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=email.to,
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    for path in email.attachment_paths:
+        message.attach_path(path)
+    return message
+
+
+class _SendHeartbeat:
+    """Bump a claimed email's heartbeat from a side thread until the send returns."""
+
+    def __init__(self, email_id, interval=HEARTBEAT_SECONDS):
+        self.email_id = email_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f'email-outbox-heartbeat-{email_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(self.interval):
+                OutboundEmail.objects.filter(pk=self.email_id, status='sending').update(updated_at=timezone.now())
+        except Exception as e:
+            print(f"[EMAIL OUTBOX] Heartbeat for email #{self.email_id} stopped: {e}")
+        finally:
+            close_old_connections()
+
+
+def _retry_delay(attempts):
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+
+
+class EmailOutboxService:
+    """Thread pool that works the OutboundEmail queue for this process."""
+
+    def __init__(self, max_workers=OUTBOX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = set()
+
+    def start(self):
+        """Create the worker pool and pick up queued or interrupted emails."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='email-outbox')
+        print(f"[EMAIL OUTBOX] Worker pool started with {self.max_workers} workers")
+        try:
+            self.resume_pending()
+        except Exception as e:
+            print(f"[EMAIL OUTBOX] Could not resume pending emails: {e}")
+
+    def enqueue(self, email_id, delay=0):
+        """Send an email now, or after delay seconds (retries)"""
+        if delay > 0:
+            timer = threading.Timer(delay, self.enqueue, args=[email_id])
+            timer.daemon = True
+            timer.start()
+            return
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            if email_id in self._active:
+                return
+            self._active.add(email_id)
+        self._executor.submit(self._run, email_id)
+
+    def _requeue_stale(self):
+        stale_before = timezone.now() - timedelta(seconds=STALE_SEND_SECONDS)
+        requeued = OutboundEmail.objects.filter(
+            status='sending', updated_at__lt=stale_before
+        ).update(status='queued', next_attempt_at=timezone.now(), updated_at=timezone.now())
+        if requeued:
+            print(f"[EMAIL OUTBOX] Re-queued {requeued} interrupted email(s)")
+        return requeued
+
+    def resume_pending(self):
+        """Schedule every queued email, including ones whose worker died mid-send."""
+        self._requeue_stale()
+        now = timezone.now()
+        pending = OutboundEmail.objects.filter(status='queued').order_by('next_attempt_at').values_list(
+            'id', 'next_attempt_at'
+        )
+        count = 0
+        for email_id, next_attempt_at in pending:
+            self.enqueue(email_id, delay=max((next_attempt_at - now).total_seconds(), 0))
+            count += 1
+        return count
+
+    def recover(self, email):
+        """
+        Make sure an email someone is waiting on is being worked.
+
+        It may have been queued by a process that has since exited; claiming is
+        atomic, so an email still being sent elsewhere is not sent twice.
+        """
+        if email.status == 'sending':
+            if email.updated_at and timezone.now() - email.updated_at > timedelta(seconds=STALE_SEND_SECONDS):
+                if self._requeue_stale():
+                    email.refresh_from_db()
+        if email.status == 'queued' and email.next_attempt_at <= timezone.now():
+            self.enqueue(email.id)
+
+    def process_due(self):
+        """Send every due email on the calling thread (management command). Returns the number sent."""
+        self._requeue_stale()
+        due = list(OutboundEmail.objects.filter(
+            status='queued', next_attempt_at__lte=timezone.now()
+        ).order_by('next_attempt_at').values_list('id', flat=True))
+        return sum(1 for email_id in due if self._send(email_id))
+
+    def _run(self, email_id):
+        close_old_connections()
+        try:
+            self._send(email_id)
+        finally:
+            with self._lock:
+                self._active.discard(email_id)
+            close_old_connections()
+
+    def _send(self, email_id):
+        """Claim, send and record one email. Returns True if it was delivered."""
+        now = timezone.now()
+        claimed = OutboundEmail.objects.filter(pk=email_id, status='queued', next_attempt_at__lte=now).update(
+            status='sending', attempts=F('attempts') + 1, updated_at=now,
+        )
+        if not claimed:
+            return False
+
+        email = OutboundEmail.objects.get(pk=email_id)
+        try:
+            with _SendHeartbeat(email_id):
+                sent = build_message(email).send()
+            if not sent:
+                raise RuntimeError('Email backend did not accept the message')
+        except Exception as e:
+            self._record_failure(email, e)
+            return False
+
+        print(f"[EMAIL OUTBOX] Email #{email_id} sent to {', '.join(email.to)} (attempt {email.attempts})")
+        # Follow-up first, so a page that sees "sent" also sees the group marked as sent
+        try:
+            self._after_delivery(email)
+        except Exception as e:
+            print(f"[EMAIL OUTBOX] Email #{email_id} sent, but the follow-up step failed: {e}")
+            traceback.print_exc()
+
+        OutboundEmail.objects.filter(pk=email_id).update(
+            status='sent', sent_at=timezone.now(), updated_at=timezone.now(), error='',
+        )
+        return True
+
+    def _record_failure(self, email, error):
+        # A missing attachment won't appear by retrying
+        permanent = isinstance(error, FileNotFoundError) or email.attempts >= MAX_ATTEMPTS
+        if permanent:
+            OutboundEmail.objects.filter(pk=email.pk).update(
+                status='failed', error=str(error), updated_at=timezone.now(),
+            )
+            print(f"[EMAIL OUTBOX] Email #{email.id} failed after {email.attempts} attempt(s): {error}")
+            return
+
+        delay = _retry_delay(email.attempts)
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status='queued', error=str(error), updated_at=timezone.now(),
+            next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        )
+        print(f"[EMAIL OUTBOX] Email #{email.id} failed ({error}), retry {email.attempts}/{MAX_ATTEMPTS - 1} in {delay}s")
+        self.enqueue(email.id, delay=delay)
+
+    def _after_delivery(self, email):
+        if email.kind == 'group_documents':
+            from ..models import FoodSafetyAgencyInspection
+            from ..views.core_views import apply_group_sent_status
+
+            inspections = FoodSafetyAgencyInspection.objects.filter(
+                client_name=email.context.get('client_name'),
+                date_of_inspection=email.context.get('inspection_date'),
+            )
+            updated = apply_group_sent_status(inspections, True, email.requested_by)
+            print(f"[EMAIL OUTBOX] Marked {updated} inspection(s) of group {email.context.get('group_id')} as sent")
+
+
+# Global service instance
+email_outbox_service = EmailOutboxService()
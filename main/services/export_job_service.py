@@ -0,0 +1,469 @@
+"""
+Export Job Service
+Runs long exports (invoice sheet, invoice Google Sheet, shipments) in a worker
+thread pool instead of the request thread.
+
+A request queues an ExportJob row and polls its status; a worker claims the row,
+builds the export in chunks while reporting progress, and stores the file under
+MEDIA_ROOT/exports/. A new request from the same user with identical parameters
+gets the finished (or still running) job back instead of exporting again.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import ExportJob
+from ..utils.streaming_export import write_xlsx
+
+
+EXPORT_DIR_NAME = 'exports'
+EXPORT_WORKERS = int(os.environ.get('EXPORT_JOB_WORKERS', '2'))
+# A finished export is reused for identical parameters for this long
+ARTIFACT_REUSE_MINUTES = 30
+# Export files older than this are deleted when the worker pool starts
+ARTIFACT_RETENTION_DAYS = 7
+# A running job without a progress update for this long was interrupted (worker restart)
+STALE_JOB_SECONDS = 300
+MAX_ATTEMPTS = 3
+# Minimum seconds between progress writes to the database
+PROGRESS_WRITE_INTERVAL = 1.0
+SHIPMENT_CHUNK_SIZE = 500
+ROW_WRITE_CHUNK = 1000
+
+EXPORT_FORMATS = {
+    'invoice_sheet': ('xlsx', 'csv'),
+    'invoice_google_sheet': ('gsheet',),
+    'shipments': ('xlsx', 'csv', 'pdf'),
+}
+
+# Filters understood by views.utils.apply_filters
+SHIPMENT_FILTER_KEYS = (
+    'claim_no', 'client_reference', 'client', 'branch',
+    'intend_date_from', 'intend_date_to', 'formal_date_from', 'formal_date_to',
+)
+
+# Same columns (and order) as getExportData() on the export sheet page
+XERO_INVOICE_HEADERS = [
+    '*ContactName', 'EmailAddress', 'POAddressLine1', 'POAddressLine2', 'POAddressLine3',
+    'POAddressLine4', 'POCity', 'PORegion', 'POPostalCode', 'POCountry', '*InvoiceNumber',
+    'Reference', '*InvoiceDate', '*DueDate', 'Total', 'InventoryItemCode', '*Description',
+    '*Quantity', '*UnitAmount', 'Discount', '*AccountCode', '*TaxType', 'Tax Amount',
+    'TrackingName1', 'TrackingOption1', 'TrackingName2', 'TrackingOption2', 'Currency',
+    'BrandingTheme',
+]
+
+
+def invoice_item_to_xero_row(item):
+    """Convert a build_invoice_items() line into a Xero import row"""
+    def number(value):
+        return float(value) if value not in (None, '') else ''
+
+    return [
+        item.get('client_name') or '', '', '', '', '', '',
+        item.get('city') or '', '', '', '', '', '',
+        item.get('invoice_date') or '', '', '',
+        item.get('item_code') or '',
+        item.get('description') or '',
+        number(item.get('quantity')),
+        number(item.get('unit_amount')),
+        '',
+        item.get('account_code') or '',
+        item.get('tax_rate') or '',
+        '', '', '', '', '', '', '',
+    ]
+
+
+def normalise_export_params(export_type, params):
+    """
+    Validate and normalise parameters so equivalent requests hash the same.
+
+    Raises:
+        ValueError: unknown export type or invalid dates
+    """
+    params = params or {}
+    if export_type in ('invoice_sheet', 'invoice_google_sheet'):
+        today = datetime.now().date()
+        normalised = {}
+        for key, default in (('date_from', today - timedelta(days=1)), ('date_to', today)):
+            value = (params.get(key) or '').strip()
+            if value:
+                try:
+                    value = datetime.strptime(value, '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValueError(f"Invalid {key}: {value} (expected YYYY-MM-DD)")
+            else:
+                value = default
+            normalised[key] = value.isoformat()
+        if normalised['date_from'] > normalised['date_to']:
+            raise ValueError('date_from must be on or before date_to')
+        return normalised
+
+    if export_type == 'shipments':
+        normalised = {}
+        for key in SHIPMENT_FILTER_KEYS:
+            value = str(params.get(key) or '').strip()
+            if value:
+                normalised[key] = value
+        return normalised
+
+    raise ValueError(f"Unknown export type: {export_type}")
+
+
+def export_params_hash(export_type, export_format, params):
+    payload = json.dumps([export_type, export_format, params], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _artifact_available(job):
+    if job.result_url:
+        return True
+    if not job.artifact_path:
+        return False
+    return os.path.exists(os.path.join(settings.MEDIA_ROOT, job.artifact_path))
+
+
+def submit_export_job(export_type, export_format, params, user=None, force=False):
+    """
+    Queue an export, or return the same user's existing job for the same parameters.
+
+    Args:
+        force: Always start a new export (skip the in-flight/finished job lookup)
+
+    Returns:
+        ExportJob
+
+    Raises:
+        ValueError: unknown export type/format or invalid parameters
+    """
+    if export_format not in EXPORT_FORMATS.get(export_type, ()):
+        raise ValueError(f"Unsupported format '{export_format}' for {export_type} export")
+
+    params = normalise_export_params(export_type, params)
+    params_hash = export_params_hash(export_type, export_format, params)
+
+    if not force:
+        # Jobs are only reused for the user who requested them - their files are private to that user
+        in_flight = ExportJob.objects.filter(
+            params_hash=params_hash, requested_by=user, status__in=['queued', 'running']
+        ).order_by('-created_at').first()
+        if in_flight:
+            print(f"[EXPORT JOB] Joining in-flight job #{in_flight.id} for identical {export_type} export")
+            export_job_service.recover_job(in_flight)
+            return in_flight
+
+        reuse_after = timezone.now() - timedelta(minutes=ARTIFACT_REUSE_MINUTES)
+        finished = ExportJob.objects.filter(
+            params_hash=params_hash, requested_by=user, status='completed', completed_at__gte=reuse_after
+        ).order_by('-completed_at').first()
+        if finished and _artifact_available(finished):
+            print(f"[EXPORT JOB] Reusing artifact of job #{finished.id} for identical {export_type} export")
+            return finished
+
+    job = ExportJob.objects.create(
+        export_type=export_type,
+        export_format=export_format,
+        params=params,
+        params_hash=params_hash,
+        message='Queued',
+        requested_by=user,
+    )
+    print(f"[EXPORT JOB] Queued job #{job.id}: {export_type}/{export_format} {params}")
+    export_job_service.enqueue(job.id)
+    return job
+
+
+class _ProgressReporter:
+    """Writes job progress (and the heartbeat) at most every PROGRESS_WRITE_INTERVAL seconds."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def __call__(self, percent, message=''):
+        now = timezone.now().timestamp()
+        if now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        ExportJob.objects.filter(pk=self.job_id).update(
+            progress=max(0, min(int(percent), 99)),
+            message=message[:255],
+            updated_at=timezone.now(),
+        )
+
+
+class ExportJobService:
+    """Thread pool that works the ExportJob queue for this process."""
+
+    def __init__(self, max_workers=EXPORT_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = set()
+
+    def start(self):
+        """Create the worker pool and pick up queued or interrupted jobs."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='export-job')
+        print(f"[EXPORT JOB] Worker pool started with {self.max_workers} workers")
+        try:
+            self.cleanup_old_artifacts()
+            self.resume_interrupted_jobs()
+        except Exception as e:
+            print(f"[EXPORT JOB] Could not resume pending jobs: {e}")
+
+    def enqueue(self, job_id):
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self._executor.submit(self._run_job, job_id)
+
+    def _requeue_stale_jobs(self):
+        stale_before = timezone.now() - timedelta(seconds=STALE_JOB_SECONDS)
+        requeued = ExportJob.objects.filter(
+            status='running', updated_at__lt=stale_before
+        ).update(status='queued', message='Interrupted - queued to resume', updated_at=timezone.now())
+        if requeued:
+            print(f"[EXPORT JOB] Re-queued {requeued} interrupted job(s)")
+        return requeued
+
+    def resume_interrupted_jobs(self):
+        """Queue every waiting job, including ones whose worker died mid-export."""
+        self._requeue_stale_jobs()
+        job_ids = list(ExportJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True))
+        for job_id in job_ids:
+            self.enqueue(job_id)
+        return len(job_ids)
+
+    def recover_job(self, job):
+        """
+        Make sure a job someone is waiting on is being worked.
+
+        A queued job may belong to a process that has since exited, and a running
+        job without a heartbeat was interrupted; either way this process takes it.
+        Claiming is atomic, so a job that is still alive elsewhere is not run twice.
+        """
+        if job.status == 'running':
+            if job.updated_at and timezone.now() - job.updated_at > timedelta(seconds=STALE_JOB_SECONDS):
+                if self._requeue_stale_jobs():
+                    job.refresh_from_db()
+        if job.status == 'queued':
+            self.enqueue(job.id)
+
+    def cleanup_old_artifacts(self):
+        """Delete export files past ARTIFACT_RETENTION_DAYS."""
+        cutoff = timezone.now() - timedelta(days=ARTIFACT_RETENTION_DAYS)
+        removed = 0
+        for job in ExportJob.objects.filter(created_at__lt=cutoff).exclude(artifact_path=''):
+            path = os.path.join(settings.MEDIA_ROOT, job.artifact_path)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+            ExportJob.objects.filter(pk=job.pk).update(artifact_path='')
+        if removed:
+            print(f"[EXPORT JOB] Removed {removed} expired export file(s)")
+        return removed
+
+    def _run_job(self, job_id):
+        close_old_connections()
+        try:
+            now = timezone.now()
+            claimed = ExportJob.objects.filter(pk=job_id, status='queued').update(
+                status='running', started_at=now, updated_at=now, progress=0,
+                message='Starting', error='', attempts=F('attempts') + 1,
+            )
+            if not claimed:
+                return
+
+            job = ExportJob.objects.get(pk=job_id)
+            if job.attempts > MAX_ATTEMPTS:
+                raise RuntimeError(f"Gave up after {MAX_ATTEMPTS} attempts")
+
+            runner = {
+                'invoice_sheet': self._run_invoice_sheet,
+                'invoice_google_sheet': self._run_invoice_google_sheet,
+                'shipments': self._run_shipments,
+            }[job.export_type]
+
+            print(f"[EXPORT JOB] Job #{job.id} started (attempt {job.attempts})")
+            result = runner(job, _ProgressReporter(job.id))
+
+            ExportJob.objects.filter(pk=job_id).update(
+                status='completed', progress=100, message='Export ready',
+                completed_at=timezone.now(), updated_at=timezone.now(), **result
+            )
+            print(f"[EXPORT JOB] Job #{job_id} completed ({result.get('row_count', 0)} rows)")
+        except Exception as e:
+            print(f"[EXPORT JOB] Job #{job_id} failed: {e}")
+            traceback.print_exc()
+            ExportJob.objects.filter(pk=job_id).update(
+                status='failed', message='Export failed', error=str(e),
+                completed_at=timezone.now(), updated_at=timezone.now(),
+            )
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+            close_old_connections()
+
+    # ------------------------------------------------------------------
+    # Export runners - each returns the fields to store on the finished job
+    # ------------------------------------------------------------------
+
+    def _build_invoice_items(self, job, report):
+        from ..views.core_views import build_invoice_items
+
+        start_date = datetime.strptime(job.params['date_from'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(job.params['date_to'], '%Y-%m-%d').date()
+
+        report(1, 'Loading inspections')
+
+        def visit_progress(done, total):
+            report(5 + 75 * done / max(total, 1), f'Processed {done} of {total} visits')
+
+        invoice_items, _ = build_invoice_items(start_date, end_date, progress_callback=visit_progress)
+        return invoice_items
+
+    def _run_invoice_sheet(self, job, report):
+        invoice_items = self._build_invoice_items(job, report)
+        rows = (invoice_item_to_xero_row(item) for item in invoice_items)
+        filename = f"invoices_{job.params['date_from']}_to_{job.params['date_to']}_{job.id}.{job.export_format}"
+        artifact_path = _write_rows(job, filename, XERO_INVOICE_HEADERS, rows, len(invoice_items), report)
+        return {'artifact_path': artifact_path, 'row_count': len(invoice_items)}
+
+    def _run_invoice_google_sheet(self, job, report):
+        from googleapiclient.discovery import build
+        from ..views.core_views import load_google_sheets_credentials, share_spreadsheet_with_link
+
+        invoice_items = self._build_invoice_items(job, report)
+
+        creds, auth_error = load_google_sheets_credentials()
+        if auth_error:
+            raise RuntimeError(auth_error)
+
+        service = build('sheets', 'v4', credentials=creds)
+        title = f"Invoice Export {job.params['date_from']} to {job.params['date_to']}"
+        result = service.spreadsheets().create(
+            body={'properties': {'title': title}}, fields='spreadsheetId,spreadsheetUrl'
+        ).execute()
+        spreadsheet_id = result.get('spreadsheetId')
+
+        service.spreadsheets().values().update(
+            spreadsheetId=spreadsheet_id, range='A1', valueInputOption='RAW',
+            body={'values': [XERO_INVOICE_HEADERS]}
+        ).execute()
+
+        # Upload in chunks so a quarter's worth of lines stays under the API request size
+        total = len(invoice_items)
+        for start in range(0, total, ROW_WRITE_CHUNK):
+            chunk = [invoice_item_to_xero_row(item) for item in invoice_items[start:start + ROW_WRITE_CHUNK]]
+            service.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id, range='A1', valueInputOption='RAW',
+                insertDataOption='INSERT_ROWS', body={'values': chunk}
+            ).execute()
+            done = start + len(chunk)
+            report(80 + 20 * done / max(total, 1), f'Uploaded {done} of {total} rows')
+
+        share_spreadsheet_with_link(creds, spreadsheet_id)
+        return {'result_url': result.get('spreadsheetUrl', ''), 'row_count': total}
+
+    def _run_shipments(self, job, report):
+        from ..models import Shipment, Client
+        from ..views.data_views import export_to_excel, export_to_csv, export_to_pdf
+        from ..views.utils import apply_filters
+
+        shipments = apply_filters(SimpleNamespace(GET=job.params), Shipment.objects.select_related('client').all())
+        total = shipments.count()
+
+        def chunked_shipments():
+            for count, shipment in enumerate(shipments.iterator(chunk_size=SHIPMENT_CHUNK_SIZE), 1):
+                yield shipment
+                if count % SHIPMENT_CHUNK_SIZE == 0:
+                    report(90 * count / max(total, 1), f'Exported {count} of {total} shipments')
+
+        client_name = 'all_clients'
+        if job.params.get('client'):
+            client = Client.objects.filter(pk=job.params['client']).first()
+            if client:
+                client_name = client.name.replace(' ', '_').replace('/', '_')
+        filename_base = f"claims_{client_name}_{job.id}"
+
+        helper = {'xlsx': export_to_excel, 'csv': export_to_csv, 'pdf': export_to_pdf}[job.export_format]
+        response = helper(chunked_shipments(), filename_base)
+
+        artifact_path = _artifact_relpath(f"{filename_base}.{job.export_format}")
+
+        def write_response(handle):
+            # The export helpers return streaming responses - copy them block by block
+            if response.streaming:
+                for block in response.streaming_content:
+                    handle.write(block)
+            else:
+                handle.write(response.content)
+            response.close()
+
+        _write_artifact(artifact_path, write_response, binary=True)
+        return {'artifact_path': artifact_path, 'row_count': total}
+
+
+def _artifact_relpath(filename):
+    return f"{EXPORT_DIR_NAME}/{filename}"
+
+
+def _write_artifact(relpath, writer, binary=True):
+    """Write via a temporary file so a half-written export is never served."""
+    final_path = os.path.join(settings.MEDIA_ROOT, relpath)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    temp_path = final_path + '.part'
+    if binary:
+        with open(temp_path, 'wb') as handle:
+            writer(handle)
+    else:
+        with open(temp_path, 'w', newline='', encoding='utf-8') as handle:
+            writer(handle)
+    os.replace(temp_path, final_path)
+
+
+def _write_rows(job, filename, headers, rows, total, report, start_percent=80):
+    """Write header + rows as xlsx (openpyxl write-only mode) or csv, reporting progress."""
+    relpath = _artifact_relpath(filename)
+
+    def rows_with_progress():
+        for done, row in enumerate(rows, 1):
+            yield row
+            if done % ROW_WRITE_CHUNK == 0:
+                report(start_percent + (100 - start_percent) * done / max(total, 1), f'Wrote {done} of {total} rows')
+
+    if job.export_format == 'csv':
+        def write_csv(handle):
+            writer = csv.writer(handle)
+            writer.writerow(headers)
+            writer.writerows(rows_with_progress())
+        _write_artifact(relpath, write_csv, binary=False)
+    else:
+        _write_artifact(
+            relpath,
+            lambda handle: write_xlsx(handle, rows_with_progress(), 'Invoices', headers),
+            binary=True,
+        )
+
+    return relpath
+
+
+# Global service instance
+export_job_service = ExportJobService()
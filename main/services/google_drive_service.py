@@ -1,6 +1,7 @@
 import os
 import re
 import pickle
+from bisect import bisect_left
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -12,6 +13,112 @@ from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 
 
+# Apps Script pattern: COMMODITY-ACCOUNT_CODE-DATE
+# Example: RAW-RE-IND-RAW-NA-1000-2025-10-15
+COMPLIANCE_FILE_PATTERN = re.compile(r'^([A-Za-z]+)-([A-Z]{2}-[A-Z]{3}-[A-Z]{3}-[A-Z]{2,3}-\d+)-(\d{4}-\d{2}-\d{2})')
+
+
+def parse_compliance_file_name(file_name):
+    """Split a compliance ZIP name into (commodity, account_code, zip_date) or None."""
+    match = COMPLIANCE_FILE_PATTERN.match(file_name or '')
+    if not match:
+        return None
+    try:
+        zip_date = datetime.strptime(match.group(3), '%Y-%m-%d')
+    except ValueError:
+        return None
+    return match.group(1), match.group(2), zip_date
+
+
+class DriveFileLookup(dict):
+    """File lookup dict (keyed by compound_key) with an account-code/date index.
+
+    Compliance matching used to scan every entry in the lookup for every
+    inspection. This keeps, per accountCode, a sorted array of ZIP dates so the
+    nearest ZIP within the date window is found with bisect instead.
+    Ties keep the Apps Script behaviour: the first file in lookup order wins.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._account_index = None
+        self._indexed_count = -1
+
+    @classmethod
+    def ensure(cls, file_lookup):
+        """Return file_lookup as a DriveFileLookup (wrapping plain dicts from older caches)."""
+        if isinstance(file_lookup, cls):
+            return file_lookup
+        return cls(file_lookup or {})
+
+    @staticmethod
+    def _as_date(value):
+        return value.date() if hasattr(value, 'date') else value
+
+    def build_index(self):
+        """(Re)build the accountCode -> sorted ZIP dates index."""
+        entries = {}
+        for seq, file in enumerate(self.values()):
+            account_code = file.get('accountCode')
+            zip_date = file.get('zipDate')
+            if not account_code or not zip_date:
+                continue
+            try:
+                ordinal = self._as_date(zip_date).toordinal()
+            except Exception:
+                continue
+            entries.setdefault(account_code, []).append((ordinal, seq, file))
+
+        index = {}
+        for account_code, account_entries in entries.items():
+            account_entries.sort(key=lambda entry: (entry[0], entry[1]))
+            index[account_code] = (
+                [entry[0] for entry in account_entries],
+                [(entry[1], entry[2]) for entry in account_entries],
+            )
+        self._account_index = index
+        self._indexed_count = len(self)
+        return index
+
+    def find_best(self, account_code, inspection_date, max_days=15):
+        """Return the file nearest to inspection_date (within max_days) for an account code."""
+        if getattr(self, '_account_index', None) is None or self._indexed_count != len(self):
+            self.build_index()
+        entry = self._account_index.get(account_code)
+        if not entry:
+            return None
+        ordinals, files = entry
+        target = self._as_date(inspection_date).toordinal()
+        pos = bisect_left(ordinals, target)
+
+        # Only the closest date on each side can win; collect every file on those dates
+        candidates = []
+        if pos < len(ordinals):
+            nearest = ordinals[pos]
+            i = pos
+            while i < len(ordinals) and ordinals[i] == nearest:
+                candidates.append(i)
+                i += 1
+        if pos > 0:
+            nearest = ordinals[pos - 1]
+            i = pos - 1
+            while i >= 0 and ordinals[i] == nearest:
+                candidates.append(i)
+                i -= 1
+
+        best = None
+        best_key = None
+        for i in candidates:
+            days_diff = abs(ordinals[i] - target)
+            if days_diff > max_days:
+                continue
+            key = (days_diff, files[i][0])
+            if best_key is None or key < best_key:
+                best_key = key
+                best = files[i][1]
+        return best
+
+
 class GoogleDriveService:
     """Service class for interacting with Google Drive API (read-only)."""
 
@@ -141,7 +248,7 @@ class GoogleDriveService:
 
     @staticmethod
     def build_file_lookup(files: List[Dict]) -> Dict[str, Dict]:
-        lookup: Dict[str, Dict] = {}
+        lookup = DriveFileLookup()
         pattern = re.compile(r'^([A-Za-z]+)-([A-Z]{2}-[A-Z]{3}-[A-Z]{3}-[A-Z]{2,3}-\d+)-(\d{4}-\d{2}-\d{2})')
         for f in files:
             m = pattern.match(f.get('name', ''))
@@ -163,6 +270,7 @@ class GoogleDriveService:
                 'zipDate': zip_date,
                 'zipDateStr': date_str,
             }
+        lookup.build_index()
         return lookup
 
     @staticmethod
@@ -176,70 +284,33 @@ class GoogleDriveService:
             insp_date = inspection_date if hasattr(inspection_date, 'toordinal') else datetime.strptime(str(inspection_date), '%Y-%m-%d').date()
         except Exception:
             return None
-        best = None
-        best_days = 10**9
-        for file in file_lookup.values():
-            # Match by account code only (ignore commodity mismatch)
-            if file['accountCode'] == account_code:
-                days_diff = abs((file['zipDate'] - insp_date).days)
-                if days_diff <= 15 and days_diff < best_days:
-                    best = file
-                    best_days = days_diff
+        # Match by account code only (ignore commodity mismatch) via the account/date index
+        best = DriveFileLookup.ensure(file_lookup).find_best(account_code, insp_date, max_days=15)
         return best['url'] if best else None
 
     def download_file(self, file_id: str, dest_path: str, request=None) -> bool:
-        """Download file from Google Drive and return True if successful, False otherwise."""
+        """Download file from Google Drive and return True if successful, False otherwise.
+
+        Streams to disk in chunks with retry/resume (see drive_download_engine).
+        """
+        from .drive_download_engine import download_to_path
+
+        print(f"[Drive] Download: id={file_id} -> {dest_path}")
         try:
-            print(f"[Drive] Download: id={file_id} -> {dest_path}")
             if not self.drive:
                 self.authenticate(request)
-            
-            from googleapiclient.http import MediaIoBaseDownload
-            import io
-            
-            request = self.drive.files().get_media(fileId=file_id)
-            fh = io.FileIO(dest_path, 'wb')
-            downloader = MediaIoBaseDownload(fh, request)
-            
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-                if status:
-                    try:
-                        print(f"[Drive] Download: progress {int(status.progress() * 100)}%")
-                    except Exception:
-                        pass
-            
-            fh.close()
-            
-            # Verify the file was actually downloaded and has content
-            if os.path.exists(dest_path):
-                file_size = os.path.getsize(dest_path)
-                print(f"[Drive] Download: completed, file size: {file_size} bytes")
-                
-                if file_size > 0:
-                    return True
-                else:
-                    print(f"[Drive] Download: ERROR - file is empty ({file_size} bytes)")
-                    # Remove the empty file
-                    try:
-                        os.remove(dest_path)
-                    except:
-                        pass
-                    return False
-            else:
-                print(f"[Drive] Download: ERROR - file was not created")
-                return False
-                
         except Exception as e:
             print(f"[Drive] Download: ERROR - {e}")
-            # Clean up any partial file
-            try:
-                if os.path.exists(dest_path):
-                    os.remove(dest_path)
-            except:
-                pass
             return False
+        return download_to_path(self.drive, file_id, dest_path)
+
+    def download_engine(self, request=None, **options):
+        """Parallel download engine sharing this service's credentials."""
+        from .drive_download_engine import DriveDownloadEngine
+
+        if not self.creds or not self.creds.valid:
+            self.authenticate(request)
+        return DriveDownloadEngine(self.creds, **options)
 
     def download_file_content(self, file_id: str, request=None) -> bytes:
         """Download file content from Google Drive and return as bytes (in memory)."""
@@ -249,18 +320,19 @@ class GoogleDriveService:
         
         try:
             from googleapiclient.http import MediaIoBaseDownload
+            from .drive_download_engine import DOWNLOAD_CHUNK_SIZE
             import io
             
             # Get the file media
             request = self.drive.files().get_media(fileId=file_id)
             
-            # Use BytesIO to store content in memory
+            # Use BytesIO to store content in memory (callers that write to disk should use download_file)
             fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
+            downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
             
             done = False
             while not done:
-                status, done = downloader.next_chunk()
+                status, done = downloader.next_chunk(num_retries=3)
                 if status:
                     try:
                         print(f"[Drive] Download Content: progress {int(status.progress() * 100)}%")
@@ -278,6 +350,43 @@ class GoogleDriveService:
             print(f"[Drive] Download Content: error {e}")
             return None
 
+    def get_shared_drive_id(self, file_id: str, request=None) -> Optional[str]:
+        """Shared drive a file lives in (None for My Drive)."""
+        if not self.drive:
+            self.authenticate(request)
+        resp = self.drive.files().get(fileId=file_id, fields='id, driveId', supportsAllDrives=True).execute()
+        return resp.get('driveId')
+
+    def get_start_page_token(self, drive_id: Optional[str] = None, request=None) -> str:
+        """Current changes.list position - changes made after this call are returned from it."""
+        if not self.drive:
+            self.authenticate(request)
+        params = {'supportsAllDrives': True}
+        if drive_id:
+            params['driveId'] = drive_id
+        return self.drive.changes().getStartPageToken(**params).execute()['startPageToken']
+
+    def list_changes(self, page_token: str, drive_id: Optional[str] = None, request=None) -> Dict:
+        """
+        One page of the Drive change feed.
+
+        Returns the raw response: changes, plus nextPageToken (more pages) or
+        newStartPageToken (caught up - save it for the next call).
+        """
+        if not self.drive:
+            self.authenticate(request)
+        params = {
+            'pageToken': page_token,
+            'pageSize': 1000,
+            'fields': 'nextPageToken, newStartPageToken, '
+                      'changes(changeType, fileId, removed, file(id, name, mimeType, parents, trashed, webViewLink))',
+            'includeItemsFromAllDrives': True,
+            'supportsAllDrives': True,
+        }
+        if drive_id:
+            params['driveId'] = drive_id
+        return self.drive.changes().list(**params).execute()
+
     def search_files_in_folder_by_name(self, folder_id: str, name_contains: str, request=None, max_items: Optional[int] = 50) -> List[Dict]:
         print(f"[Drive] Search: folder={folder_id}, contains='{name_contains}', max_items={max_items}")
         if not self.drive:
@@ -703,6 +703,11 @@ class GoogleSheetsService:
             print(f"      📈 Summary: Created {clients_created} new clients, skipped {skipped_rows} empty rows")
             
             # Sync completed successfully
+            try:
+                from ..utils.client_autocomplete import refresh_client_search_index
+                refresh_client_search_index()
+            except Exception as e:
+                print(f"      ⚠️ Could not refresh client suggestions: {str(e)}")
             
             return {
                 'success': True,
@@ -726,25 +731,14 @@ class GoogleSheetsService:
         """Sync Food Safety Agency inspections from SQL Server to Django database"""
         from django.contrib import messages
         from ..models import FoodSafetyAgencyInspection
-        import pymssql
-        from django.conf import settings
+        from ..utils.sql_server_pool import SQLServerPoolError, sql_server_pool
         from ..views.data_views import FSA_INSPECTION_QUERY, INSPECTOR_NAME_MAP
 
         try:
             print("   🔌 Step 2.1: Connecting to SQL Server...")
 
-            # Get SQL Server configuration
-            sql_server_config = settings.DATABASES.get('sql_server', {})
-
-            # Connect to SQL Server using pymssql (more reliable than pyodbc)
-            connection = pymssql.connect(
-                server=sql_server_config.get('HOST'),
-                port=int(sql_server_config.get('PORT', 1433)),
-                user=sql_server_config.get('USER'),
-                password=sql_server_config.get('PASSWORD'),
-                database=sql_server_config.get('NAME'),
-                timeout=30
-            )
+            # Pooled pymssql connection (more reliable than pyodbc); close() returns it to the pool
+            connection = sql_server_pool.checkout(query_timeout=30)
             cursor = connection.cursor(as_dict=True)
             print("      ✅ Successfully connected to SQL Server using pymssql")
 
@@ -862,7 +856,7 @@ class GoogleSheetsService:
                 'inspections_created': 0,
                 'total_processed': 0
             }
-        except pymssql.Error as e:
+        except SQLServerPoolError as e:
             print(f"      ❌ SQL Server Connection Error: {str(e)}")
             return {
                 'success': False,
@@ -886,24 +880,13 @@ class GoogleSheetsService:
         Bulk fetch product names for all inspections in one go.
         This is much faster than individual calls.
         """
-        import pymssql
-        from django.conf import settings
+        from ..utils.sql_server_pool import sql_server_pool
         
         product_names_map = {}
         
         try:
-            # Get SQL Server configuration
-            sql_server_config = settings.DATABASES.get('sql_server', {})
-            
-            # Connect to SQL Server
-            connection = pymssql.connect(
-                server=sql_server_config.get('HOST'),
-                port=int(sql_server_config.get('PORT', 1433)),
-                user=sql_server_config.get('USER'),
-                password=sql_server_config.get('PASSWORD'),
-                database=sql_server_config.get('NAME'),
-                timeout=30
-            )
+            # PERFORMANCE FIX: Pooled connection - close() below returns it to the pool
+            connection = sql_server_pool.checkout(query_timeout=30)
             cursor = connection.cursor(as_dict=True)
             
             # Get all inspection IDs
@@ -32,6 +32,7 @@ from django.conf import settings
 from django.core.cache import cache
 # Q import removed - no longer needed with update_or_create approach
 from ..models import FoodSafetyAgencyInspection, Client, SystemSettings
+from ..utils.cache_utils import acquire_lock, release_lock, refresh_lock
 from ..views.core_views import load_drive_files_real, find_document_link_apps_script_replica
 from django.http import HttpRequest
 
@@ -142,10 +143,35 @@ def detect_corporate_group(client_name):
 
 class ScheduledSyncService:
     """Service for scheduled synchronization tasks."""
+
+    # Only the worker holding this lease runs the background loop (one loop per deployment,
+    # not one per gunicorn worker). Renewed on every loop iteration.
+    LEADER_LOCK_KEY = 'scheduled_sync_service:leader'
+    LEADER_LOCK_TIMEOUT = 3600
+
+    # SQL Server inspection sync: fields copied from SQL Server (km/hours etc. are never touched)
+    SQL_SYNC_FIELDS = [
+        'client_name',
+        'internal_account_code',
+        'inspector_id',
+        'inspector_name',
+        'product_name',
+        'is_direction_present_for_this_inspection',
+        'is_sample_taken',
+    ]
+    SQL_SYNC_COMMODITIES = ['POULTRY', 'EGGS', 'RAW', 'PMP']
+    # Rows fetched from SQL Server (and written to MySQL) per batch
+    SQL_SYNC_BATCH_SIZE = 1000
+    # Incremental syncs re-read inspections from the last N days to pick up edits to existing rows
+    INCREMENTAL_RECHECK_DAYS = 14
+    # A full reconciliation pass runs at least this often (or on demand)
+    FULL_RECONCILE_INTERVAL_HOURS = 24
+    FULL_RECONCILE_CACHE_KEY = 'scheduled_sync_service:last_full_sql_reconcile'
     
     def __init__(self):
         self.is_running = False
         self.sync_thread = None
+        self._leader_token = None
         self.last_sync_times = {
             'google_sheets': None,
             'sql_server': None,
@@ -256,18 +282,18 @@ class ScheduledSyncService:
 
         # LOCK: Prevent concurrent syncs
         lock_key = 'sync_google_sheets_lock'
-        if cache.get(lock_key):
+        # Acquire lock atomically (cache.add) so two workers can't both start the sync
+        # (expires after 10 minutes to prevent deadlock)
+        lock_token = acquire_lock(lock_key, 600)
+        if not lock_token:
             print("[SKIP] Google Sheets sync already running (locked)")
             return False
 
-        # Acquire lock (expires after 10 minutes to prevent deadlock)
-        cache.set(lock_key, True, 600)
-
         try:
             return self._do_sync_google_sheets()
         finally:
             # Always release lock
-            cache.delete(lock_key)
+            release_lock(lock_key, lock_token)
 
     def _do_sync_google_sheets(self):
         """Internal method that performs the actual sync."""
@@ -316,6 +342,7 @@ class ScheduledSyncService:
 
             return facility_type, group_type, commodity
 
+        sql_conn = None
         try:
             print("[DATA] Starting SQL Server client sync...")
 
@@ -428,6 +455,12 @@ class ScheduledSyncService:
                 # Bulk create all records in a single query
                 Client.objects.bulk_create(bulk_records, batch_size=500)
 
+            try:
+                from ..utils.client_autocomplete import refresh_client_search_index
+                refresh_client_search_index()
+            except Exception as e:
+                print(f"[CLIENT AUTOCOMPLETE] Could not refresh client suggestions: {e}")
+
             print(f"[OK] SQL Server client sync completed successfully")
             print(f"   - Clients deleted: {deleted_count}")
             print(f"   - Clients created: {len(bulk_records)}")
@@ -445,39 +478,165 @@ class ScheduledSyncService:
             cache.set('google_sheets_sync_error', f'Exception: {error_msg}', 300)
             return False
         finally:
+            # Hand the SQL Server connection back to the pool even when the sync failed
+            if sql_conn is not None:
+                sql_conn.disconnect()
             # Clean up connections after sync
             try:
                 close_old_connections()
             except:
                 pass
     
-    def sync_sql_server(self):
-        """Sync inspection data with SQL Server - DELETE ALL then fetch fresh data."""
+    def sync_sql_server(self, full_reconcile=False):
+        """Sync inspection data with SQL Server.
+
+        Incremental by default (new rows above each commodity's high-water mark plus a
+        recent re-check window). full_reconcile=True re-reads every row from SQL Server;
+        a full pass also runs automatically once every FULL_RECONCILE_INTERVAL_HOURS.
+        """
         # LOCK: Prevent concurrent syncs
         lock_key = 'sync_sql_server_lock'
-        if cache.get(lock_key):
+        # Acquire lock atomically (cache.add) so two workers can't both start the sync
+        # (expires after 30 minutes to prevent deadlock)
+        lock_token = acquire_lock(lock_key, 1800)
+        if not lock_token:
             print("[SKIP] SQL Server sync already running (locked)")
             return False
 
-        # Acquire lock (expires after 30 minutes to prevent deadlock)
-        cache.set(lock_key, True, 1800)
-
         try:
-            return self._do_sync_sql_server()
+            if not full_reconcile and self._full_reconcile_due():
+                print("[SQL] Last full reconciliation is older than "
+                      f"{self.FULL_RECONCILE_INTERVAL_HOURS}h - running a full pass")
+                full_reconcile = True
+            return self._do_sync_sql_server(full_reconcile=full_reconcile)
         finally:
             # Always release lock
-            cache.delete(lock_key)
+            release_lock(lock_key, lock_token)
 
-    def _do_sync_sql_server(self):
+    def _full_reconcile_due(self):
+        """True if no full SQL Server reconciliation has completed within the interval."""
+        last_full = cache.get(self.FULL_RECONCILE_CACHE_KEY)
+        if not last_full:
+            return True
+        return datetime.now() - last_full > timedelta(hours=self.FULL_RECONCILE_INTERVAL_HOURS)
+
+    def _get_sql_sync_watermarks(self):
+        """Per-commodity high-water mark: highest remote Id already synced locally."""
+        from django.db.models import Max
+        rows = FoodSafetyAgencyInspection.objects.filter(
+            is_manual=False, commodity__isnull=False
+        ).values('commodity').annotate(max_remote_id=Max('remote_id'))
+        return {row['commodity']: row['max_remote_id'] or 0 for row in rows}
+
+    def _build_incremental_sql_query(self, base_query, watermarks, recheck_since):
+        """
+        Wrap FSA_INSPECTION_QUERY so SQL Server only returns new or recently changed rows.
+
+        The source tables have no modified timestamp, so "changed" rows are approximated by
+        re-reading every inspection dated on/after recheck_since; anything older is picked up
+        by the periodic full reconciliation.
+
+        Returns:
+            tuple: (query, params) for cursor.execute
+        """
+        conditions = ["fsa.DateOfInspection >= %s"]
+        params = [recheck_since.strftime('%Y-%m-%d')]
+        for commodity in self.SQL_SYNC_COMMODITIES:
+            conditions.append("(fsa.Commodity = %s AND fsa.Id > %d)")
+            params.extend([commodity, int(watermarks.get(commodity, 0))])
+        query = f"SELECT * FROM ({base_query}) AS fsa WHERE {' OR '.join(conditions)}"
+        return query, tuple(params)
+
+    def _flush_sql_sync_batch(self, batch_values):
+        """
+        Write one fetched batch: create new inspections and update only the ones that changed.
+
+        Args:
+            batch_values: {(commodity, remote_id): (date_of_inspection, {field: value})}
+
+        Returns:
+            dict: created, updated, unchanged and manual (skipped) counts
+        """
+        from collections import defaultdict
+        from django.db.models import Q
+
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'manual': 0}
+        if not batch_values:
+            return stats
+
+        remote_ids_by_commodity = defaultdict(list)
+        for commodity, remote_id in batch_values:
+            remote_ids_by_commodity[commodity].append(remote_id)
+        key_filter = Q()
+        for commodity, remote_ids in remote_ids_by_commodity.items():
+            key_filter |= Q(commodity=commodity, remote_id__in=remote_ids)
+
+        # Plain tuples for just this batch's keys:
+        # (id, commodity, remote_id, is_manual, date_of_inspection, *SQL_SYNC_FIELDS)
+        existing_rows = {
+            (row[1], row[2]): row
+            for row in FoodSafetyAgencyInspection.objects.filter(key_filter).values_list(
+                'id', 'commodity', 'remote_id', 'is_manual', 'date_of_inspection', *self.SQL_SYNC_FIELDS
+            )
+        }
+
+        to_create = []
+        to_update = []
+        # (client_name, date_of_inspection) groups whose InspectionGroup summary must be recomputed
+        touched_groups = set()
+        for (commodity, remote_id), (inspection_date, values) in batch_values.items():
+            row = existing_rows.get((commodity, remote_id))
+            if row is None:
+                to_create.append(FoodSafetyAgencyInspection(
+                    commodity=commodity,
+                    remote_id=remote_id,
+                    date_of_inspection=inspection_date,
+                    **values
+                    # km_traveled and hours will be NULL for new records (correct!)
+                ))
+                touched_groups.add((values.get('client_name'), inspection_date))
+            elif row[3]:
+                stats['manual'] += 1
+            else:
+                current_values = dict(zip(self.SQL_SYNC_FIELDS, row[5:]))
+                if current_values == values:
+                    stats['unchanged'] += 1
+                    continue
+                # Only the synced fields are written - km_traveled and hours are preserved
+                to_update.append(FoodSafetyAgencyInspection(id=row[0], **values))
+                # A renamed client moves the inspection between groups
+                touched_groups.add((current_values.get('client_name'), row[4]))
+                touched_groups.add((values.get('client_name'), row[4]))
+
+        if to_create:
+            FoodSafetyAgencyInspection.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            FoodSafetyAgencyInspection.objects.bulk_update(to_update, fields=self.SQL_SYNC_FIELDS, batch_size=500)
+        if touched_groups:
+            # bulk writes skip the post_save signal - refresh the affected group summaries directly
+            from ..utils.inspection_groups import refresh_inspection_groups
+            refresh_inspection_groups(touched_groups)
+            try:
+                from ..utils.client_autocomplete import refresh_client_entries
+                refresh_client_entries({client_name for client_name, _ in touched_groups})
+            except Exception as e:
+                print(f"[CLIENT AUTOCOMPLETE] Could not refresh client suggestions: {e}")
+
+        stats['created'] = len(to_create)
+        stats['updated'] = len(to_update)
+        return stats
+
+    def _do_sync_sql_server(self, full_reconcile=True):
         """Internal method that performs the actual sync."""
         try:
+            sync_mode = 'FULL RECONCILIATION' if full_reconcile else 'INCREMENTAL'
             print("\n" + "="*80)
-            print("[SQL]  STARTING SQL SERVER SYNC (FULL REFRESH)")
+            print(f"[SQL]  STARTING SQL SERVER SYNC ({sync_mode})")
             print("="*80)
 
             from ..models import FoodSafetyAgencyInspection, Inspection, InspectorMapping
             from ..views.data_views import FSA_INSPECTION_QUERY
-            import pymssql
+            from ..utils.sql_server_pool import get_sql_server_config, sql_server_pool
             from datetime import datetime, timedelta
 
             # UPDATE OR CREATE APPROACH - km/hours preserved automatically!
@@ -487,20 +646,16 @@ class ScheduledSyncService:
             print(f"   Using update_or_create to preserve km/hours data...")
             print(f"   This will update existing records and create new ones without losing km/hours!\n")
 
-            # Connect to SQL Server using pymssql
-            sql_server_config = settings.DATABASES.get('sql_server', {})
+            # Connect to SQL Server through the shared connection pool
+            sql_server_config = get_sql_server_config()
 
             print(f"[CONNECT] STEP 2: CONNECTING TO SQL SERVER...")
-            print(f"   Server: {sql_server_config.get('HOST')}:{sql_server_config.get('PORT', 1433)}")
-            print(f"   Database: {sql_server_config.get('NAME')}")
-
-            connection = pymssql.connect(
-                server=sql_server_config.get('HOST'),
-                port=int(sql_server_config.get('PORT', 1433)),
-                user=sql_server_config.get('USER'),
-                password=sql_server_config.get('PASSWORD'),
-                database=sql_server_config.get('NAME'),
-                timeout=180  # Increased from 30 to 180 seconds for large datasets
+            print(f"   Server: {sql_server_config['HOST']}:{sql_server_config['PORT']}")
+            print(f"   Database: {sql_server_config['NAME']}")
+
+            # close() below hands the connection back to the pool
+            connection = sql_server_pool.checkout(
+                query_timeout=180  # Increased from 30 to 180 seconds for large datasets
             )
             cursor = connection.cursor(as_dict=True)
             print(f"[OK] Connected successfully!\n")
@@ -509,10 +664,25 @@ class ScheduledSyncService:
             print(f"   Query: FSA_INSPECTION_QUERY (includes InternalAccountNumber)")
 
             # Use the FSA_INSPECTION_QUERY that's already working
-            cursor.execute(FSA_INSPECTION_QUERY)
-
-            sql_inspections = cursor.fetchall()
-            print(f"\n[DATA] Retrieved {len(sql_inspections)} inspections from SQL Server")
+            if full_reconcile:
+                cursor.execute(FSA_INSPECTION_QUERY)
+            else:
+                # PERFORMANCE FIX: Only fetch rows above each commodity's high-water mark
+                # plus the recent re-check window instead of the whole UNION every hour
+                watermarks = self._get_sql_sync_watermarks()
+                recheck_since = (datetime.now() - timedelta(days=self.INCREMENTAL_RECHECK_DAYS)).date()
+                print(f"   Incremental mode: watermarks {watermarks}, re-checking from {recheck_since}")
+                incremental_query, query_params = self._build_incremental_sql_query(
+                    FSA_INSPECTION_QUERY, watermarks, recheck_since
+                )
+                cursor.execute(incremental_query, query_params)
+
+            # PERFORMANCE FIX: Stream rows with fetchmany() instead of fetchall() so the sync
+            # thread's memory stays flat as the dataset grows
+            batch_size = self.SQL_SYNC_BATCH_SIZE
+            # Row count is unknown until the cursor is drained - progress uses the local count as an estimate
+            expected_total = existing_count if full_reconcile else 0
+            print(f"\n[DATA] Streaming inspections from SQL Server in batches of {batch_size}")
             print(f"   Each inspection includes: Client Name, Account Code, Date, Inspector, Commodity")
 
             # Tracking stats
@@ -541,7 +711,7 @@ class ScheduledSyncService:
             cache.set('sync_progress', {
                 'status': 'running',
                 'current': 0,
-                'total': len(sql_inspections),
+                'total': expected_total,
                 'percent': 0,
                 'message': 'Syncing inspections with SQL Server clients...'
             }, 300)
@@ -563,245 +733,205 @@ class ScheduledSyncService:
             }
             print(f"[PERF] Loaded {len(clients_by_code)} clients with account codes")
 
-            # BULK OPERATIONS OPTIMIZATION: Process all inspections, then use bulk_create/bulk_update
-            # This converts ~10,000 queries into just 3 queries!
-            print(f"\n[PERF] Building inspection lists for bulk operations...")
-
-            # Fetch ALL existing inspections in ONE query (much faster than giant OR query)
-            # Build dictionary in memory for fast lookups
-            # IMPORTANT: Exclude manual entries (is_manual=True) from sync - they should not be overwritten
-            print(f"[PERF] Loading all existing inspections into memory...")
-            existing_inspections = FoodSafetyAgencyInspection.objects.filter(is_manual=False)
-            existing_inspections_dict = {
-                (insp.commodity, insp.remote_id): insp
-                for insp in existing_inspections
-            }
-            manual_count = FoodSafetyAgencyInspection.objects.filter(is_manual=True).count()
-            print(f"[PERF] Loaded {len(existing_inspections_dict)} existing inspections for fast lookups")
-            print(f"[PERF] Skipping {manual_count} manual entries (will not be overwritten)")
-
-            # Lists for bulk operations
-            inspections_to_create = []
-            inspections_to_update = []
-
-            print(f"[PERF] Processing {len(sql_inspections)} SQL inspections...")
-
-            for idx, sql_insp in enumerate(sql_inspections, 1):
-                try:
-                    inspection_id = sql_insp.get('Id')
-                    client_name_sql = sql_insp.get('Client')  # Client name from SQL Server
-                    # Strip trailing/leading spaces from client name and account code
-                    if client_name_sql:
-                        client_name_sql = client_name_sql.strip()
-                    internal_account_code = sql_insp.get('InternalAccountNumber')  # Account code from SQL Server
-                    if internal_account_code:
-                        internal_account_code = internal_account_code.strip()
-                    inspection_date = sql_insp.get('DateOfInspection')
-                    inspector_id = sql_insp.get('InspectorId')
-                    commodity = sql_insp.get('Commodity')
-
-                    # Get inspector name from database mapping
+            # BULK OPERATIONS OPTIMIZATION: bulk_create/bulk_update once per fetched batch
+            # PERFORMANCE FIX: Existing rows are loaded per batch as values_list tuples for just that
+            # batch's (commodity, remote_id) keys, instead of every model instance up front
+            # IMPORTANT: Manual entries (is_manual=True) are never overwritten
+            created_total = 0
+            updated_total = 0
+            unchanged_count = 0
+            manual_skipped = 0
+            batch_number = 0
+            idx = 0
+
+            print(f"[PERF] Processing SQL inspections batch by batch...")
+
+            while True:
+                sql_batch = cursor.fetchmany(batch_size)
+                if not sql_batch:
+                    break
+                batch_number += 1
+
+                # Keyed so duplicate product rows for one inspection produce a single
+                # create/update - the last row wins, as before
+                batch_values = {}
+
+                for sql_insp in sql_batch:
+                    idx += 1
                     try:
-                        inspector_id_int = int(inspector_id) if inspector_id is not None else None
-                    except (TypeError, ValueError):
-                        inspector_id_int = None
-                    inspector_name = inspector_name_map.get(inspector_id_int, 'Unknown')
-
-                    # IMPORTANT: Use SQL Server Client for client names
-                    # SQL Server provides: inspection data, account code, and client names
-                    client_name = None
-                    client_match_found = False
-
-                    # Log only every 100th inspection to reduce console spam (was every 10th - too verbose!)
-                    # Only log first 3 inspections for initial verification
-                    show_detailed_log = (idx <= 3) or (idx % 100 == 0)
-
-                    # Use client name from SQL query directly (relationship matching will normalize later)
-                    if client_name_sql:
-                        client_name = client_name_sql
-                        client_match_found = True
-                        if show_detailed_log:
-                            print(f"\n   [{idx}/{len(sql_inspections)}] Inspection #{inspection_id}")
-                            print(f"      [INFO] Using SQL client name: {client_name_sql}")
-
-                    if not client_match_found and internal_account_code:
-                        account_codes_found += 1
-
-                        # Look up client in pre-loaded dictionary (FAST - no database query!)
+                        inspection_id = sql_insp.get('Id')
+                        client_name_sql = sql_insp.get('Client')  # Client name from SQL Server
+                        # Strip trailing/leading spaces from client name and account code
+                        if client_name_sql:
+                            client_name_sql = client_name_sql.strip()
+                        internal_account_code = sql_insp.get('InternalAccountNumber')  # Account code from SQL Server
+                        if internal_account_code:
+                            internal_account_code = internal_account_code.strip()
+                        inspection_date = sql_insp.get('DateOfInspection')
+                        inspector_id = sql_insp.get('InspectorId')
+                        commodity = sql_insp.get('Commodity')
+
+                        # Get inspector name from database mapping
                         try:
-                            sql_client = clients_by_code.get(internal_account_code)
-
-                            if sql_client and sql_client.name:
-                                # Use SQL Server client name
-                                google_sheets_matched += 1
-                                client_match_found = True
-                                client_name = sql_client.name.strip() if sql_client.name else sql_client.name
-                                google_sheets_used += 1
-
-                                if show_detailed_log:
-                                    print(f"\n   [{idx}/{len(sql_inspections)}] Inspection #{inspection_id}")
-                                    print(f"      [INFO] Account Code: {internal_account_code}")
-                                    print(f"      [OK] SQL Server Match: FOUND")
-                                    print(f"      [DATA] Client Name: {sql_client.eclick_name}")
-                                    print(f"      ⭐ USING: {client_name} (from SQL Server)")
-                            else:
-                                # No match in SQL Server - leave as "-"
+                            inspector_id_int = int(inspector_id) if inspector_id is not None else None
+                        except (TypeError, ValueError):
+                            inspector_id_int = None
+                        inspector_name = inspector_name_map.get(inspector_id_int, 'Unknown')
+
+                        # IMPORTANT: Use SQL Server Client for client names
+                        # SQL Server provides: inspection data, account code, and client names
+                        client_name = None
+                        client_match_found = False
+
+                        # Log only every 100th inspection to reduce console spam (was every 10th - too verbose!)
+                        # Only log first 3 inspections for initial verification
+                        show_detailed_log = (idx <= 3) or (idx % 100 == 0)
+
+                        # Use client name from SQL query directly (relationship matching will normalize later)
+                        if client_name_sql:
+                            client_name = client_name_sql
+                            client_match_found = True
+                            if show_detailed_log:
+                                print(f"\n   [{idx}] Inspection #{inspection_id}")
+                                print(f"      [INFO] Using SQL client name: {client_name_sql}")
+
+                        if not client_match_found and internal_account_code:
+                            account_codes_found += 1
+
+                            # Look up client in pre-loaded dictionary (FAST - no database query!)
+                            try:
+                                sql_client = clients_by_code.get(internal_account_code)
+
+                                if sql_client and sql_client.name:
+                                    # Use SQL Server client name
+                                    google_sheets_matched += 1
+                                    client_match_found = True
+                                    client_name = sql_client.name.strip() if sql_client.name else sql_client.name
+                                    google_sheets_used += 1
+
+                                    if show_detailed_log:
+                                        print(f"\n   [{idx}] Inspection #{inspection_id}")
+                                        print(f"      [INFO] Account Code: {internal_account_code}")
+                                        print(f"      [OK] SQL Server Match: FOUND")
+                                        print(f"      [DATA] Client Name: {sql_client.eclick_name}")
+                                        print(f"      ⭐ USING: {client_name} (from SQL Server)")
+                                else:
+                                    # No match in SQL Server - leave as "-"
+                                    sql_server_fallback += 1
+                                    client_name = "-"
+                                    if show_detailed_log:
+                                        print(f"\n   [{idx}] Inspection #{inspection_id}")
+                                        print(f"      [INFO] Account Code: {internal_account_code}")
+                                        print(f"      ❌ SQL Server Match: NOT FOUND")
+                                        print(f"      [WARNING]  Client name set to: -")
+                                        print(f"      → Sync clients from SQL Server to populate client names!")
+
+                            except Exception as e:
+                                # Error looking up SQL Server client - leave as "-"
                                 sql_server_fallback += 1
                                 client_name = "-"
                                 if show_detailed_log:
-                                    print(f"\n   [{idx}/{len(sql_inspections)}] Inspection #{inspection_id}")
+                                    print(f"\n   [{idx}] Inspection #{inspection_id}")
                                     print(f"      [INFO] Account Code: {internal_account_code}")
-                                    print(f"      ❌ SQL Server Match: NOT FOUND")
+                                    print(f"      [WARNING]  Error looking up SQL Server client: {e}")
                                     print(f"      [WARNING]  Client name set to: -")
-                                    print(f"      → Sync clients from SQL Server to populate client names!")
 
-                        except Exception as e:
-                            # Error looking up SQL Server client - leave as "-"
+                        # If still no client name match, set to "-"
+                        if not client_match_found:
+                            # No account code or no match - leave as "-" (cannot look up without account code)
                             sql_server_fallback += 1
                             client_name = "-"
                             if show_detailed_log:
-                                print(f"\n   [{idx}/{len(sql_inspections)}] Inspection #{inspection_id}")
-                                print(f"      [INFO] Account Code: {internal_account_code}")
-                                print(f"      [WARNING]  Error looking up SQL Server client: {e}")
+                                print(f"\n   [{idx}] Inspection #{inspection_id}")
+                                print(f"      [INFO] Account Code: {internal_account_code if internal_account_code else 'NONE'}")
+                                print(f"      [WARNING]  Cannot look up client")
                                 print(f"      [WARNING]  Client name set to: -")
 
-                    # If still no client name match, set to "-"
-                    if not client_match_found:
-                        # No account code or no match - leave as "-" (cannot look up without account code)
-                        sql_server_fallback += 1
-                        client_name = "-"
-                        if show_detailed_log:
-                            print(f"\n   [{idx}/{len(sql_inspections)}] Inspection #{inspection_id}")
-                            print(f"      [INFO] Account Code: {internal_account_code if internal_account_code else 'NONE'}")
-                            print(f"      [WARNING]  Cannot look up client")
-                            print(f"      [WARNING]  Client name set to: -")
-
-                    # PHASE 1: Prepare inspection data for bulk operations
-                    product_name = sql_insp.get('ProductName')  # Get product name from SQL query result
-
-                    # IMPORTANT: Properly convert SQL Server bit fields to Python boolean
-                    # SQL Server can return bit as: True/False, 1/0, '1'/'0', 'True'/'False'
-                    raw_direction = sql_insp.get('IsDirectionPresentForthisInspection', False)
-                    if isinstance(raw_direction, bool):
-                        is_direction_present = raw_direction
-                    elif isinstance(raw_direction, (int, float)):
-                        is_direction_present = bool(raw_direction)  # 0 = False, 1 = True
-                    elif isinstance(raw_direction, str):
-                        is_direction_present = raw_direction.lower() in ('true', '1', 'yes')
-                    else:
-                        is_direction_present = False
-
-                    raw_sample = sql_insp.get('IsSampleTaken', False)
-                    if isinstance(raw_sample, bool):
-                        is_sample_taken = raw_sample
-                    elif isinstance(raw_sample, (int, float)):
-                        is_sample_taken = bool(raw_sample)
-                    elif isinstance(raw_sample, str):
-                        is_sample_taken = raw_sample.lower() in ('true', '1', 'yes')
-                    else:
-                        is_sample_taken = False
-
-                    # Track compliance statistics
-                    if is_direction_present:
-                        non_compliant_count += 1
-                    else:
-                        compliant_count += 1
-
-                    # Check if inspection exists (using database unique constraint key)
-                    inspection_key = (commodity, inspection_id)
-                    existing_inspection = existing_inspections_dict.get(inspection_key)
-
-                    if existing_inspection:
-                        # UPDATE existing inspection (preserving km_traveled and hours!)
-                        existing_inspection.client_name = client_name
-                        existing_inspection.internal_account_code = internal_account_code
-                        existing_inspection.inspector_id = inspector_id_int
-                        existing_inspection.inspector_name = inspector_name
-                        existing_inspection.product_name = product_name
-                        existing_inspection.is_direction_present_for_this_inspection = is_direction_present
-                        existing_inspection.is_sample_taken = is_sample_taken
-                        inspections_to_update.append(existing_inspection)
-                    else:
-                        # CREATE new inspection
-                        inspections_to_create.append(FoodSafetyAgencyInspection(
-                            commodity=commodity,
-                            remote_id=inspection_id,
-                            date_of_inspection=inspection_date,
-                            client_name=client_name,
-                            internal_account_code=internal_account_code,
-                            inspector_id=inspector_id_int,
-                            inspector_name=inspector_name,
-                            product_name=product_name,
-                            is_direction_present_for_this_inspection=is_direction_present,
-                            is_sample_taken=is_sample_taken
-                            # km_traveled and hours will be NULL for new records (correct!)
-                        ))
-
-                    synced_count += 1
-
-                    # Progress indicator every 500 inspections (reduced from 250 for better performance)
-                    if idx % 500 == 0:
-                        print(f"\n    Progress: {idx}/{len(sql_inspections)} inspections synced...")
-                        print(f"      - Account codes found: {account_codes_found}")
-                        print(f"      - SQL Server client matches: {google_sheets_matched}")
-                        print(f"      - Using SQL Server client names: {google_sheets_used}")
-                        print(f"      - Using placeholder names: {sql_server_fallback}")
-
-                        # Update progress in cache for frontend
-                        progress_percent = int((idx / len(sql_inspections)) * 100)
-                        cache.set('sync_progress', {
-                            'status': 'running',
-                            'current': idx,
-                            'total': len(sql_inspections),
-                            'percent': progress_percent,
-                            'message': f'Syncing inspections {idx}/{len(sql_inspections)} ({progress_percent}%)'
-                        }, 300)
-
-                except Exception as e:
-                    print(f"\n   [WARNING]  Error syncing inspection {inspection_id}: {e}")
-                    continue
-
-            # BULK OPERATIONS: Execute creates and updates in chunks to avoid timeout
-            print(f"\n[PERF] Executing bulk operations in chunks (no large transactions)...")
-            print(f"   - Inspections to create: {len(inspections_to_create)}")
-            print(f"   - Inspections to update: {len(inspections_to_update)}")
-
-            # Bulk create new inspections in chunks to avoid gunicorn timeout
-            # Each chunk is its own transaction, preventing long-running locks
-            if inspections_to_create:
-                chunk_size = 500
-                total_to_create = len(inspections_to_create)
-                print(f"[PERF] Creating {total_to_create} new inspections in chunks of {chunk_size}...")
-
-                for i in range(0, total_to_create, chunk_size):
-                    chunk = inspections_to_create[i:i + chunk_size]
-                    FoodSafetyAgencyInspection.objects.bulk_create(chunk, batch_size=500)
-                    print(f"[PERF]   Created chunk {i//chunk_size + 1}/{(total_to_create + chunk_size - 1)//chunk_size} ({len(chunk)} inspections)")
-
-                print(f"[PERF] All {total_to_create} new inspections created successfully")
-
-            # Bulk update existing inspections in chunks to avoid gunicorn timeout
-            # Each chunk is its own transaction, preventing long-running locks
-            if inspections_to_update:
-                chunk_size = 500
-                total_to_update = len(inspections_to_update)
-                print(f"[PERF] Updating {total_to_update} existing inspections in chunks of {chunk_size}...")
-
-                update_fields = [
-                    'client_name',
-                    'internal_account_code',
-                    'inspector_name',
-                    'product_name',
-                    'is_direction_present_for_this_inspection',
-                    'is_sample_taken'
-                ]
-
-                for i in range(0, total_to_update, chunk_size):
-                    chunk = inspections_to_update[i:i + chunk_size]
-                    FoodSafetyAgencyInspection.objects.bulk_update(chunk, fields=update_fields, batch_size=500)
-                    print(f"[PERF]   Updated chunk {i//chunk_size + 1}/{(total_to_update + chunk_size - 1)//chunk_size} ({len(chunk)} inspections)")
-
-                print(f"[PERF] All {total_to_update} existing inspections updated successfully (km/hours preserved)")
+                        # PHASE 1: Prepare inspection data for bulk operations
+                        product_name = sql_insp.get('ProductName')  # Get product name from SQL query result
+
+                        # IMPORTANT: Properly convert SQL Server bit fields to Python boolean
+                        # SQL Server can return bit as: True/False, 1/0, '1'/'0', 'True'/'False'
+                        raw_direction = sql_insp.get('IsDirectionPresentForthisInspection', False)
+                        if isinstance(raw_direction, bool):
+                            is_direction_present = raw_direction
+                        elif isinstance(raw_direction, (int, float)):
+                            is_direction_present = bool(raw_direction)  # 0 = False, 1 = True
+                        elif isinstance(raw_direction, str):
+                            is_direction_present = raw_direction.lower() in ('true', '1', 'yes')
+                        else:
+                            is_direction_present = False
+
+                        raw_sample = sql_insp.get('IsSampleTaken', False)
+                        if isinstance(raw_sample, bool):
+                            is_sample_taken = raw_sample
+                        elif isinstance(raw_sample, (int, float)):
+                            is_sample_taken = bool(raw_sample)
+                        elif isinstance(raw_sample, str):
+                            is_sample_taken = raw_sample.lower() in ('true', '1', 'yes')
+                        else:
+                            is_sample_taken = False
+
+                        # Track compliance statistics
+                        if is_direction_present:
+                            non_compliant_count += 1
+                        else:
+                            compliant_count += 1
+
+                        # Key matches the database unique constraint (commodity, remote_id)
+                        inspection_key = (commodity, inspection_id)
+                        synced_values = {
+                            'client_name': client_name,
+                            'internal_account_code': internal_account_code,
+                            'inspector_id': inspector_id_int,
+                            'inspector_name': inspector_name,
+                            'product_name': product_name,
+                            'is_direction_present_for_this_inspection': is_direction_present,
+                            'is_sample_taken': is_sample_taken,
+                        }
+
+                        batch_values[inspection_key] = (inspection_date, synced_values)
+
+                        synced_count += 1
+
+                        # Progress indicator every 500 inspections (reduced from 250 for better performance)
+                        if idx % 500 == 0:
+                            print(f"\n    Progress: {idx} inspections synced...")
+                            print(f"      - Account codes found: {account_codes_found}")
+                            print(f"      - SQL Server client matches: {google_sheets_matched}")
+                            print(f"      - Using SQL Server client names: {google_sheets_used}")
+                            print(f"      - Using placeholder names: {sql_server_fallback}")
+
+                            # Update progress in cache for frontend
+                            progress_total = max(expected_total, idx)
+                            progress_percent = min(99, int((idx / progress_total) * 100))
+                            cache.set('sync_progress', {
+                                'status': 'running',
+                                'current': idx,
+                                'total': progress_total,
+                                'percent': progress_percent,
+                                'message': f'Syncing inspections {idx}/{progress_total} ({progress_percent}%)'
+                            }, 300)
+
+                    except Exception as e:
+                        print(f"\n   [WARNING]  Error syncing inspection {inspection_id}: {e}")
+                        continue
+
+                # Flush this batch before fetching the next one
+                batch_stats = self._flush_sql_sync_batch(batch_values)
+                created_total += batch_stats['created']
+                updated_total += batch_stats['updated']
+                unchanged_count += batch_stats['unchanged']
+                manual_skipped += batch_stats['manual']
+                print(f"[PERF]   Batch {batch_number}: {len(sql_batch)} rows -> "
+                      f"{batch_stats['created']} created, {batch_stats['updated']} updated, "
+                      f"{batch_stats['unchanged']} unchanged")
+
+            print(f"\n[DATA] Retrieved {idx} inspections from SQL Server in {batch_number} batch(es)")
+            print(f"   - Inspections created: {created_total}")
+            print(f"   - Inspections updated: {updated_total} (km/hours preserved)")
+            print(f"   - Unchanged (skipped): {unchanged_count}")
+            print(f"   - Manual entries skipped: {manual_skipped}")
 
             # SYNC COMPLETE - km/hours preserved automatically!
             print(f"\n" + "="*80)
@@ -905,18 +1035,36 @@ class ScheduledSyncService:
                 if client_name_mapping:
                     print(f"\n[UPDATE] Applying canonical names to inspections...")
                     updated_count = 0
+                    # queryset.update() skips the signals, so refresh the summaries explicitly afterwards
+                    renamed_groups = set()
+                    renamed_clients = set()
 
                     with transaction.atomic():
                         for variant, canonical in client_name_mapping.items():
+                            variant_inspections = FoodSafetyAgencyInspection.objects.filter(client_name=variant)
+                            for inspection_date in variant_inspections.values_list(
+                                'date_of_inspection', flat=True
+                            ).distinct().order_by():
+                                renamed_groups.add((variant, inspection_date))
+                                renamed_groups.add((canonical, inspection_date))
+
                             # Update all inspections with this variant name
-                            result = FoodSafetyAgencyInspection.objects.filter(
-                                client_name=variant
-                            ).update(client_name=canonical)
+                            result = variant_inspections.update(client_name=canonical)
 
                             updated_count += result
                             if result > 0:
+                                renamed_clients.update({variant, canonical})
                                 print(f"   Updated {result} inspections: '{variant}' -> '{canonical}'")
 
+                    if renamed_groups:
+                        from ..utils.inspection_groups import refresh_inspection_groups
+                        refresh_inspection_groups(renamed_groups)
+                        try:
+                            from ..utils.client_autocomplete import refresh_client_entries
+                            refresh_client_entries(renamed_clients)
+                        except Exception as e:
+                            print(f"[CLIENT AUTOCOMPLETE] Could not refresh client suggestions: {e}")
+
                     print(f"\n[OK] Canonical name application complete!")
                     print(f"   - Total inspections updated: {updated_count}")
                 else:
@@ -960,14 +1108,15 @@ class ScheduledSyncService:
             total_inspections = FoodSafetyAgencyInspection.objects.count()
 
             print(f"\n" + "="*80)
-            print(f"[OK] SQL SERVER SYNC COMPLETED (FULL REFRESH)")
+            print(f"[OK] SQL SERVER SYNC COMPLETED ({sync_mode})")
             print("="*80)
             print(f"\n[DATA] Sync Statistics:")
-            print(f"   - Old inspections deleted: {existing_count:,}")
-            print(f"   - SQL Server inspections fetched: {len(sql_inspections)}")
-            print(f"   - New inspections created: {synced_count:,}")
+            print(f"   - Existing inspections before sync: {existing_count:,}")
+            print(f"   - SQL Server inspections fetched: {idx}")
+            print(f"   - New inspections created: {created_total:,}")
+            print(f"   - Inspections updated: {updated_total:,} ({unchanged_count:,} unchanged)")
             print(f"\n[INFO] Account Code & Name Matching Statistics:")
-            print(f"   - Inspections with account codes: {account_codes_found} ({(account_codes_found/len(sql_inspections)*100) if len(sql_inspections) > 0 else 0:.1f}%)")
+            print(f"   - Inspections with account codes: {account_codes_found} ({(account_codes_found/idx*100) if idx > 0 else 0:.1f}%)")
             print(f"   - Google Sheets matches found: {google_sheets_matched} ({(google_sheets_matched/account_codes_found*100) if account_codes_found > 0 else 0:.1f}% of those with codes)")
             print(f"   - Using Google Sheets names: {google_sheets_used}")
             print(f"   - Using placeholders (no match): {sql_server_fallback}")
@@ -983,13 +1132,15 @@ class ScheduledSyncService:
             # Set final progress to 100%
             cache.set('sync_progress', {
                 'status': 'completed',
-                'current': len(sql_inspections),
-                'total': len(sql_inspections),
+                'current': idx,
+                'total': idx,
                 'percent': 100,
-                'message': f'Sync completed! Processed {len(sql_inspections)} inspections.'
+                'message': f'Sync completed! Processed {idx} inspections.'
             }, 300)
 
             self.last_sync_times['sql_server'] = datetime.now()
+            if full_reconcile:
+                cache.set(self.FULL_RECONCILE_CACHE_KEY, datetime.now(), None)
             return True
 
         except Exception as e:
@@ -1002,18 +1153,18 @@ class ScheduledSyncService:
         """Sync compliance documents from Google Drive every 3 hours."""
         # LOCK: Prevent concurrent syncs
         lock_key = 'sync_compliance_documents_lock'
-        if cache.get(lock_key):
+        # Acquire lock atomically (cache.add) so two workers can't both start the sync
+        # (expires after 30 minutes to prevent deadlock)
+        lock_token = acquire_lock(lock_key, 1800)
+        if not lock_token:
             print("[SKIP] Compliance documents sync already running (locked)")
             return False
 
-        # Acquire lock (expires after 30 minutes to prevent deadlock)
-        cache.set(lock_key, True, 1800)
-
         try:
             return self._do_sync_compliance_documents()
         finally:
             # Always release lock
-            cache.delete(lock_key)
+            release_lock(lock_key, lock_token)
 
     def _do_sync_compliance_documents(self):
         """Internal method that performs the actual compliance document sync."""
@@ -1173,7 +1324,7 @@ class ScheduledSyncService:
             was_running = cache.get('scheduled_sync_service:running', False)
             if was_running:
                 # Don't print on every page load - only on actual restart
-                if not self.sync_thread or not self.sync_thread.is_alive():
+                if (not self.sync_thread or not self.sync_thread.is_alive()) and self._acquire_leadership():
                     print("[SYNC] Auto-restarting sync service (was running before)...")
                     self.is_running = True
                     self._load_stats()
@@ -1192,6 +1343,9 @@ class ScheduledSyncService:
             # Thread died but cache says running - restart it
             print("[WARNING] Service was marked running but thread died. Restarting...")
 
+        if not self._acquire_leadership():
+            return False, "Background sync service already running in another worker"
+
         self.is_running = True
         self._load_stats()
         # Increase cache TTL to 7 days (604800 seconds) for true persistence
@@ -1211,8 +1365,23 @@ class ScheduledSyncService:
         
         if self.sync_thread and self.sync_thread.is_alive():
             self.sync_thread.join(timeout=5)
+
+        # Clear the lease even if another worker holds it, so the service stays stopped everywhere
+        cache.delete(self.LEADER_LOCK_KEY)
+        self._leader_token = None
         
         return True, "Scheduled sync service stopped"
+
+    def _stop_requested(self):
+        """True once the service was stopped here or (via the shared running flag) in any worker"""
+        return not self.is_running or not cache.get('scheduled_sync_service:running')
+
+    def _acquire_leadership(self):
+        """Take (or keep) the cross-worker lease for running the background loop."""
+        if self._leader_token and refresh_lock(self.LEADER_LOCK_KEY, self._leader_token, self.LEADER_LOCK_TIMEOUT):
+            return True
+        self._leader_token = acquire_lock(self.LEADER_LOCK_KEY, self.LEADER_LOCK_TIMEOUT)
+        return self._leader_token is not None
     
     def _background_service_loop(self):
         """Background service loop."""
@@ -1222,6 +1391,17 @@ class ScheduledSyncService:
 
         while self.is_running:
             try:
+                # A stop in any worker clears the shared flag - check it before renewing the lease
+                if self._stop_requested():
+                    print("[STOP] Background sync service was stopped - stopping this loop")
+                    self.is_running = False
+                    break
+
+                # Renew the lease; if it was cleared or another worker took it over, stop this loop
+                if not refresh_lock(self.LEADER_LOCK_KEY, self._leader_token, self.LEADER_LOCK_TIMEOUT):
+                    print("[STOP] Background sync service is running in another worker - stopping this loop")
+                    break
+
                 # Update heartbeat to show service is alive
                 cache.set('scheduled_sync_service:heartbeat', datetime.now().isoformat(), 60)
 
@@ -1302,8 +1482,9 @@ class ScheduledSyncService:
                 check_interval_seconds = int(check_interval_minutes * 60)
 
                 print(f"[WAIT] Waiting {check_interval_minutes:.1f} minutes before next sync check...")
-                for _ in range(check_interval_seconds):
-                    if not self.is_running:
+                for second in range(check_interval_seconds):
+                    # The shared flag is a cache read - look at it every 15 seconds, not every second
+                    if not self.is_running or (second % 15 == 0 and self._stop_requested()):
                         break
                     time.sleep(1)
 
@@ -1386,7 +1567,7 @@ class ScheduledSyncService:
             if sync_type == 'google_sheets':
                 success = self.sync_google_sheets()
             elif sync_type == 'sql_server':
-                success = self.sync_sql_server()
+                success = self.sync_sql_server(full_reconcile=True)
             elif sync_type == 'compliance_documents':
                 success = self.sync_compliance_documents()
             elif sync_type == 'all':
@@ -0,0 +1,50 @@
+"""
+Cached Session Backend with Write-Behind
+cached_db sessions that skip the django_session UPDATE when a request only
+refreshed the activity timestamp.
+
+Sessions are read from the cache (falling back to the database), and any real
+change - login, logout, new session data, a changed expiry - is written to both
+as with django.contrib.sessions.backends.cached_db. A save that only moved
+last_activity goes to the cache alone, and reaches the database at most once
+every SESSION_DB_WRITE_INTERVAL seconds, so a session evicted from the cache
+loses at most that much activity time.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+# Seconds between database writes of a session whose only change is its activity timestamp
+DB_WRITE_INTERVAL = getattr(settings, 'SESSION_DB_WRITE_INTERVAL', 300)
+# Session keys that change on every active request
+ACTIVITY_KEYS = ('last_activity',)
+DB_WRITTEN_KEY = '_db_written_at'
+
+
+class SessionStore(CachedDBStore):
+
+    def _significant(self, data):
+        return {key: value for key, value in data.items() if key not in ACTIVITY_KEYS and key != DB_WRITTEN_KEY}
+
+    def load(self):
+        data = super().load()
+        self._loaded_data = self._significant(data)
+        return data
+
+    def _only_activity_changed(self):
+        loaded = getattr(self, '_loaded_data', None)
+        return loaded is not None and self._significant(self._session) == loaded
+
+    def save(self, must_create=False):
+        now = time.time()
+        if (not must_create and self.session_key is not None and self._only_activity_changed()
+                and now - self._session.get(DB_WRITTEN_KEY, 0) < DB_WRITE_INTERVAL):
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+            return
+
+        self._session[DB_WRITTEN_KEY] = now
+        super().save(must_create=must_create)
+        self._loaded_data = self._significant(self._session)
@@ -1,7 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from main.models import InspectorMapping, FoodSafetyAgencyInspection
+from main.models import Client, InspectorMapping, FoodSafetyAgencyInspection
 
 
 @receiver(post_save, sender=User)
@@ -33,3 +33,86 @@ def create_inspector_mapping(sender, instance, created, **kwargs):
                     'is_active': True
                 }
             )
+
+
+def _inspection_group_key(instance):
+    return (instance.client_name, instance.date_of_inspection)
+
+
+@receiver(post_init, sender=FoodSafetyAgencyInspection)
+def remember_inspection_group(sender, instance, **kwargs):
+    """Remember the loaded group so a save that moves the inspection refreshes both groups"""
+    # Read __dict__ directly - touching a deferred field here would cost a query per row
+    if 'client_name' in instance.__dict__ and 'date_of_inspection' in instance.__dict__:
+        instance._loaded_group_key = _inspection_group_key(instance)
+
+
+# Inspection fields the client suggestions are computed from
+CLIENT_SUGGESTION_FIELDS = {'client_name', 'town', 'date_of_inspection', 'internal_account_code'}
+
+
+# Connected before refresh_inspection_group_on_save, which moves _loaded_group_key on
+@receiver(post_save, sender=FoodSafetyAgencyInspection)
+def refresh_client_suggestions_on_save(sender, instance, update_fields=None, **kwargs):
+    """Keep the client autocomplete entry for the inspection's client (and a renamed-from client) current"""
+    from main.utils.client_autocomplete import refresh_client_entries
+
+    if update_fields and not CLIENT_SUGGESTION_FIELDS.intersection(update_fields):
+        return
+    try:
+        names = {instance.client_name}
+        loaded_key = getattr(instance, '_loaded_group_key', None)
+        if loaded_key:
+            names.add(loaded_key[0])
+        refresh_client_entries(names)
+    except Exception as e:
+        print(f"[CLIENT AUTOCOMPLETE] Could not refresh suggestions for inspection {instance.pk}: {e}")
+
+
+@receiver(post_save, sender=FoodSafetyAgencyInspection)
+def refresh_inspection_group_on_save(sender, instance, update_fields=None, **kwargs):
+    """Keep the InspectionGroup summary current"""
+    from main.utils.inspection_groups import GROUP_SOURCE_FIELDS, refresh_inspection_groups
+
+    if update_fields and not GROUP_SOURCE_FIELDS.intersection(update_fields):
+        return
+    try:
+        keys = {_inspection_group_key(instance)}
+        loaded_key = getattr(instance, '_loaded_group_key', None)
+        if loaded_key:
+            keys.add(loaded_key)
+        refresh_inspection_groups(keys)
+        instance._loaded_group_key = _inspection_group_key(instance)
+    except Exception as e:
+        print(f"[INSPECTION GROUPS] Could not refresh group for inspection {instance.pk}: {e}")
+
+
+@receiver(post_delete, sender=FoodSafetyAgencyInspection)
+def refresh_inspection_group_on_delete(sender, instance, **kwargs):
+    from main.utils.inspection_groups import refresh_inspection_groups
+
+    try:
+        refresh_inspection_groups([getattr(instance, '_loaded_group_key', None) or _inspection_group_key(instance)])
+    except Exception as e:
+        print(f"[INSPECTION GROUPS] Could not refresh group for inspection {instance.pk}: {e}")
+
+
+@receiver(post_delete, sender=FoodSafetyAgencyInspection)
+def refresh_client_suggestions_on_delete(sender, instance, **kwargs):
+    from main.utils.client_autocomplete import refresh_client_entries
+
+    try:
+        refresh_client_entries([instance.client_name])
+    except Exception as e:
+        print(f"[CLIENT AUTOCOMPLETE] Could not refresh suggestions for inspection {instance.pk}: {e}")
+
+
+@receiver(post_save, sender=Client)
+def refresh_client_suggestions_on_client_save(sender, instance, **kwargs):
+    """Clients added or edited one at a time (bulk client syncs refresh the whole index themselves)"""
+    from main.utils.client_autocomplete import refresh_client_entries
+
+    try:
+        refresh_client_entries([instance.name])
+    except Exception as e:
+        print(f"[CLIENT AUTOCOMPLETE] Could not refresh suggestions for client {instance.pk}: {e}")
@@ -1,3 +1,445 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+import zipfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from googleapiclient.errors import HttpError
+import httplib2
+
+from .models import (
+    Client, ClientSearchEntry, DriveIndexedFile, DriveIndexState, FoodSafetyAgencyInspection, OutboundEmail, SystemLog,
+)
+from .services.drive_change_index import DriveChangeIndex, is_year_folder, is_compliance_month_folder
+from .services.email_outbox_service import queue_email
+from .utils.cache_utils import acquire_lock, refresh_lock
+from .utils.client_autocomplete import ClientAutocompleteIndex, refresh_client_entries, refresh_client_search_index
+from .utils.lab_sample_sync import fetch_lab_sample_links, sync_all_lab_samples
+from .utils.sql_server_pool import LocalSQLServer, SQLServerPool, SQLServerPoolError, use_local_sql_server
+from .utils.sql_server_utils import SQLServerConnection
+from .utils.streaming_export import stream_zip
+from .views.core_views import _is_file_for_inspection_date
+
+
+FOLDER = 'application/vnd.google-apps.folder'
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class FakeDriveService:
+    """In-memory stand-in for GoogleDriveService (listing and change feed only)."""
+
+    def __init__(self):
+        self.items = {}  # id -> {'id', 'name', 'mimeType', 'parents'}
+        self.changes = []
+        self.list_calls = 0
+        self.expired_tokens = set()
+
+    def add(self, item_id, name, parent, folder=False):
+        item = {'id': item_id, 'name': name, 'mimeType': FOLDER if folder else 'application/zip', 'parents': [parent]}
+        self.items[item_id] = item
+        self.changes.append({'changeType': 'file', 'fileId': item_id, 'removed': False, 'file': dict(item)})
+        return item
+
+    def trash(self, item_id):
+        item = self.items.pop(item_id)
+        self.changes.append({'changeType': 'file', 'fileId': item_id, 'removed': False,
+                             'file': dict(item, trashed=True)})
+
+    def rename(self, item_id, name):
+        self.items[item_id]['name'] = name
+        self.changes.append({'changeType': 'file', 'fileId': item_id, 'removed': False,
+                             'file': dict(self.items[item_id])})
+
+    def list_files_in_folder(self, folder_id, request=None, max_items=None):
+        self.list_calls += 1
+        return [dict(item) for item in self.items.values() if folder_id in item['parents']]
+
+    def get_shared_drive_id(self, file_id, request=None):
+        return 'shared-drive'
+
+    def get_start_page_token(self, drive_id=None, request=None):
+        return str(len(self.changes))
+
+    def list_changes(self, page_token, drive_id=None, request=None):
+        if page_token in self.expired_tokens:
+            raise HttpError(httplib2.Response({'status': 404}), b'Invalid page token')
+        start = int(page_token)
+        page = self.changes[start:start + 2]
+        if start + 2 < len(self.changes):
+            return {'changes': page, 'nextPageToken': str(start + 2)}
+        return {'changes': page, 'newStartPageToken': str(len(self.changes))}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DriveChangeIndexTests(TestCase):
+
+    def setUp(self):
+        self.drive = FakeDriveService()
+        self.drive.add('y2025', '2025', 'root', folder=True)
+        self.drive.add('y2024', '2024', 'root', folder=True)
+        self.drive.add('oct', 'October 2025', 'y2025', folder=True)
+        self.drive.add('sep', 'September 2025', 'y2025', folder=True)
+        self.drive.add('f1', 'RAW-RE-IND-RAW-NA-1000-2025-10-15.zip', 'oct')
+        self.drive.add('f2', 'PMP-RE-IND-PMP-NA-2000-2025-10-20.zip', 'oct')
+        self.drive.add('f3', 'RAW-RE-IND-RAW-NA-1000-2025-09-15.zip', 'sep')
+        self.drive.add('junk', 'notes.txt', 'oct')
+        self.index = DriveChangeIndex('test_index', 'root', [is_year_folder, is_compliance_month_folder])
+
+    def test_first_refresh_runs_full_scan(self):
+        lookup = self.index.refresh(self.drive)
+
+        self.assertEqual(sorted(entry['file_id'] for entry in lookup.values()), ['f1', 'f2'])
+        entry = lookup['raw|RE-IND-RAW-NA-1000|2025-10-15']
+        self.assertEqual(entry['accountCode'], 'RE-IND-RAW-NA-1000')
+        self.assertEqual(entry['url'], 'https://drive.google.com/file/d/f1/view')
+        state = DriveIndexState.objects.get(index_name='test_index')
+        self.assertEqual(state.page_token, str(len(self.drive.changes)))
+        self.assertEqual(state.drive_id, 'shared-drive')
+        self.assertEqual(set(state.folders), {'y2025', 'oct'})
+
+    def test_refresh_applies_changes_without_listing(self):
+        self.index.refresh(self.drive)
+        list_calls = self.drive.list_calls
+
+        self.drive.add('f4', 'RAW-RE-IND-RAW-NA-3000-2025-10-25.zip', 'oct')
+        self.drive.trash('f2')
+        self.drive.rename('f1', 'RAW-RE-IND-RAW-NA-1000-2025-10-16.zip')
+        self.drive.add('f5', 'RAW-RE-IND-RAW-NA-5000-2025-09-01.zip', 'sep')
+        lookup = self.index.refresh(self.drive)
+
+        self.assertEqual(self.drive.list_calls, list_calls)
+        self.assertEqual(sorted(entry['file_id'] for entry in lookup.values()), ['f1', 'f4'])
+        self.assertIn('raw|RE-IND-RAW-NA-1000|2025-10-16', lookup)
+        self.assertIsNotNone(lookup.find_best('RE-IND-RAW-NA-3000', lookup['raw|RE-IND-RAW-NA-3000|2025-10-25']['zipDate'].date()))
+
+    def test_new_month_folder_is_listed_once(self):
+        self.index.refresh(self.drive)
+        self.drive.add('nov', 'November 2025', 'y2025', folder=True)
+        self.drive.items['f6'] = {'id': 'f6', 'name': 'EGG-RE-IND-EGG-NA-4000-2025-11-02.zip',
+                                  'mimeType': 'application/zip', 'parents': ['nov']}
+        list_calls = self.drive.list_calls
+
+        lookup = self.index.refresh(self.drive)
+
+        self.assertEqual(self.drive.list_calls, list_calls + 1)
+        self.assertIn('egg|RE-IND-EGG-NA-4000|2025-11-02', lookup)
+
+        self.drive.trash('nov')
+        lookup = self.index.refresh(self.drive)
+        self.assertNotIn('egg|RE-IND-EGG-NA-4000|2025-11-02', lookup)
+        self.assertFalse(DriveIndexedFile.objects.filter(parent_id='nov').exists())
+
+    def test_invalid_page_token_triggers_full_rescan(self):
+        self.index.refresh(self.drive)
+        state = DriveIndexState.objects.get(index_name='test_index')
+        self.drive.expired_tokens.add(state.page_token)
+        self.drive.items['f7'] = {'id': 'f7', 'name': 'RAW-RE-IND-RAW-NA-7000-2025-10-30.zip',
+                                  'mimeType': 'application/zip', 'parents': ['oct']}
+        list_calls = self.drive.list_calls
+
+        lookup = self.index.refresh(self.drive)
+
+        self.assertGreater(self.drive.list_calls, list_calls)
+        self.assertIn('raw|RE-IND-RAW-NA-7000|2025-10-30', lookup)
+
+
+@skipUnless(connection.vendor in ('sqlite', 'mysql'), 'query plans are only checked on SQLite and MySQL')
+class QueryPlanTests(TestCase):
+    """The hot queries keep using the composite indexes from migration 0009."""
+
+    start = datetime.date(2026, 1, 1)
+    end = datetime.date(2026, 1, 31)
+
+    def mysql_plan_keys(self, queryset):
+        """Indexes in the key column of MySQL's EXPLAIN for the query"""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)).get('key') or '' for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'mysql':
+            keys = self.mysql_plan_keys(queryset)
+            self.assertIn(index_name, keys, keys)
+            return
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan, plan)
+
+    def test_inspector_date_range(self):
+        self.assertUsesIndex(
+            FoodSafetyAgencyInspection.objects.filter(inspector_id=42, date_of_inspection__gte=self.start),
+            'idx_fsa_inspector_date',
+        )
+
+    def test_client_group(self):
+        self.assertUsesIndex(
+            FoodSafetyAgencyInspection.objects.filter(client_name='Client', date_of_inspection=self.start),
+            'idx_fsa_client_date',
+        )
+
+    def test_export_sheet(self):
+        self.assertUsesIndex(
+            FoodSafetyAgencyInspection.objects.filter(
+                commodity__in=['RAW', 'PMP'], hours__isnull=False, km_traveled__isnull=False,
+                date_of_inspection__gte=self.start, date_of_inspection__lte=self.end,
+            ),
+            'idx_fsa_export_sheet',
+        )
+
+    def test_system_logs_for_user(self):
+        self.assertUsesIndex(
+            SystemLog.objects.filter(user_id=1).order_by('-timestamp', '-id'),
+            'idx_system_log_user_time',
+        )
+
+    def test_system_logs_date_range(self):
+        since = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+        queryset = SystemLog.objects.filter(timestamp__gte=since).order_by('-timestamp', '-id')
+        if connection.vendor == 'mysql':
+            self.assertRegex(' '.join(self.mysql_plan_keys(queryset)), r'system_logs_timesta\w+')
+            return
+        self.assertRegex(queryset.explain(), r'USING INDEX system_logs_timesta_\w+ \(timestamp>\?\)')
+
+
+class ClientAutocompleteTests(TestCase):
+    """Client suggestions come from the search index, ranked and with the latest town."""
+
+    def setUp(self):
+        Client.objects.create(client_id='SQL-1', name='Acme Meat (Pty) Ltd', internal_account_code='RE-IND-RAW-NA-0042')
+        FoodSafetyAgencyInspection.objects.bulk_create([
+            FoodSafetyAgencyInspection(client_name='Acme Meat (Pty) Ltd', town='Tzaneen',
+                                       date_of_inspection=datetime.date(2026, 1, 1)),
+            FoodSafetyAgencyInspection(client_name='ACME MEAT (PTY) LTD', town='Polokwane',
+                                       date_of_inspection=datetime.date(2026, 2, 1)),
+            FoodSafetyAgencyInspection(client_name='Boxer Superstore Acornhoek', town='Acornhoek',
+                                       date_of_inspection=datetime.date(2026, 1, 15)),
+        ])
+        refresh_client_search_index()
+        self.index = ClientAutocompleteIndex()
+
+    def names(self, query):
+        return [suggestion['name'] for suggestion in self.index.search(query)]
+
+    def test_spellings_merge_into_client_entry(self):
+        suggestion = self.index.search('acme')[0]
+
+        self.assertEqual(ClientSearchEntry.objects.count(), 2)
+        self.assertEqual(suggestion, {
+            'name': 'Acme Meat (Pty) Ltd', 'account_code': 'RE-IND-RAW-NA-0042', 'town': 'Polokwane', 'type': 'client',
+        })
+
+    def test_ranking(self):
+        # Name prefix before a later word starting with the query
+        self.assertEqual(self.names('ac'), ['Acme Meat (Pty) Ltd', 'Boxer Superstore Acornhoek'])
+        self.assertEqual(self.names('meat pty'), ['Acme Meat (Pty) Ltd'])
+        self.assertEqual(self.names('0042'), ['Acme Meat (Pty) Ltd'])
+        # Typo - trigram match
+        self.assertEqual(self.names('supestore'), ['Boxer Superstore Acornhoek'])
+
+    def test_incremental_refresh(self):
+        FoodSafetyAgencyInspection.objects.bulk_create([
+            FoodSafetyAgencyInspection(client_name='Zebra Foods', town='Mbombela', date_of_inspection=datetime.date(2026, 3, 1)),
+        ])
+        self.assertEqual(refresh_client_entries(['Zebra Foods']), 1)
+        self.assertEqual(refresh_client_entries(['Zebra Foods']), 0)
+
+        FoodSafetyAgencyInspection.objects.filter(client_name='Boxer Superstore Acornhoek').delete()
+        self.index.invalidate()
+
+        self.assertEqual(self.names('zebra'), ['Zebra Foods'])
+        self.assertEqual(self.names('boxer'), [])
+
+
+class SQLServerPoolTests(SimpleTestCase):
+    """SQL Server connections are reused, bounded, health-checked and time-limited per checkout."""
+
+    def setUp(self):
+        self.server = LocalSQLServer()
+        self.pool = SQLServerPool(connector=self.server.connect, max_size=2, wait=0, query_timeout=60)
+
+    def test_connections_are_reused(self):
+        with self.pool.connection(query_timeout=180) as connection:
+            self.assertEqual(connection.raw.query_timeout, 180)
+        with self.pool.connection() as connection:
+            self.assertEqual(connection.raw.query_timeout, 60)
+
+        self.assertEqual(self.server.connections_opened, 1)
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_max_size(self):
+        first = self.pool.checkout()
+        second = self.pool.checkout()
+        with self.assertRaises(SQLServerPoolError):
+            self.pool.checkout()
+
+        # A checkout dropped without close() frees its slot
+        del second
+        third = self.pool.checkout()
+        first.close()
+        third.close()
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+    def test_dead_connection_is_replaced(self):
+        self.pool.checkout().close()
+        self.server.drop_connections()
+        self.pool._idle[0].last_used -= 3600
+
+        with self.pool.cursor(as_dict=True) as cursor:
+            cursor.execute('SELECT 1 AS One')
+
+        self.assertEqual(self.server.connections_opened, 2)
+        self.assertEqual(self.pool.counters['discarded'], 1)
+
+    def test_local_stand_in(self):
+        with use_local_sql_server() as server:
+            server.add_result('FROM Clients', [{'Id': 7, 'Name': 'Acme Meat'}])
+            with SQLServerConnection() as sql_conn:
+                cursor = sql_conn.connection.cursor(as_dict=True)
+                cursor.execute('SELECT Id, Name FROM Clients WHERE IsActive = %s', (1,))
+                self.assertEqual(cursor.fetchall(), [{'Id': 7, 'Name': 'Acme Meat'}])
+                cursor.execute('SELECT * FROM Inspections')
+                self.assertEqual(cursor.fetchall(), [])
+
+        self.assertEqual(server.queries[0][1], (1,))
+
+
+def _links_for(rows):
+    """LocalSQLServer answer: the rows whose InspectionId is in the query's IN parameters"""
+    return lambda sql, params: [row for row in rows if row['InspectionId'] in (params or ())]
+
+
+class LabSampleSyncTests(TestCase):
+    """Lab sample flags are synced in bulk, per commodity table, in chunked IN queries."""
+
+    PMP_LINKS = [{'InspectionId': 10}]
+    RAW_LINKS = [
+        {'InspectionId': 20, 'CategoryTestingId': 2, 'IsCalcuimContentTestRequired': False},
+        {'InspectionId': 30, 'CategoryTestingId': 3, 'IsCalcuimContentTestRequired': False},
+    ]
+
+    def register(self, server):
+        server.add_result('PMPInspectionLabSampleLinks', _links_for(self.PMP_LINKS))
+        server.add_result('RawRMPInspectionLabSampleLinks', _links_for(self.RAW_LINKS))
+        server.add_result('AllSamples', [{'InspectionId': 30}, {'InspectionId': 20}, {'InspectionId': 10}, {'InspectionId': 99}])
+
+    def test_bulk_sync_sets_flags(self):
+        FoodSafetyAgencyInspection.objects.bulk_create([
+            FoodSafetyAgencyInspection(commodity='PMP', remote_id=10),
+            FoodSafetyAgencyInspection(commodity='RAW', remote_id=20),
+            FoodSafetyAgencyInspection(commodity='RAW', remote_id=30, fat=True),
+            # Same remote ID in another SQL Server table - not this PMP inspection
+            FoodSafetyAgencyInspection(commodity='POULTRY', remote_id=10),
+        ])
+
+        with use_local_sql_server() as server:
+            self.register(server)
+            stats = sync_all_lab_samples(show_progress=False)
+
+        self.assertEqual((stats['success'], stats['updated'], stats['not_found']), (3, 3, 0))
+        flags = {
+            (row['commodity'], row['remote_id']): (row['fat'], row['protein'], row['calcium'])
+            for row in FoodSafetyAgencyInspection.objects.values('commodity', 'remote_id', 'fat', 'protein', 'calcium')
+        }
+        self.assertEqual(flags, {
+            ('PMP', 10): (True, True, False),
+            ('RAW', 20): (True, True, True),
+            ('RAW', 30): (False, False, False),
+            ('POULTRY', 10): (False, False, False),
+        })
+        # One DISTINCT query plus one IN query per link table
+        self.assertEqual(len(server.queries), 3)
+
+    def test_in_queries_are_chunked(self):
+        with use_local_sql_server() as server:
+            self.register(server)
+            with SQLServerConnection() as sql_conn:
+                pmp_links, raw_links = fetch_lab_sample_links(sql_conn.connection.cursor(as_dict=True), range(1, 4501))
+
+        self.assertEqual(list(pmp_links), [10])
+        self.assertEqual(sorted(raw_links), [20, 30])
+        self.assertEqual([len(params) for _, params in server.queries], [2000, 2000, 2000, 2000, 500, 500])
+
+
+
+class EmailOutboxTests(TestCase):
+    """Queued emails are deduplicated only while they are in flight."""
+
+    def queue(self):
+        return queue_email('group_documents', 'Documents', ['client@example.com'], idempotency_key='group-1-key')
+
+    def test_repeated_click_returns_queued_email(self):
+        first = self.queue()
+        self.assertEqual(self.queue().pk, first.pk)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_resend_after_delivery_queues_new_email(self):
+        first = self.queue()
+        OutboundEmail.objects.filter(pk=first.pk).update(status='sent')
+
+        second = self.queue()
+
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertEqual(second.status, 'queued')
+        first.refresh_from_db()
+        self.assertIsNone(first.idempotency_key)
+        self.assertEqual(first.status, 'sent')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CacheLockTests(SimpleTestCase):
+    """A lease that was cleared on purpose stays released."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_refresh_keeps_held_lock(self):
+        token = acquire_lock('test:lease', 60)
+        self.assertTrue(refresh_lock('test:lease', token, 60))
+        self.assertFalse(refresh_lock('test:lease', 'someone-else', 60))
+
+    def test_refresh_does_not_retake_deleted_lock(self):
+        token = acquire_lock('test:lease', 60)
+        cache.delete('test:lease')
+
+        self.assertFalse(refresh_lock('test:lease', token, 60))
+        self.assertIsNone(cache.get('test:lease'))
+
+
+class GroupDownloadTests(SimpleTestCase):
+    """Legacy files are matched to the inspection date; streamed ZIPs never hold truncated entries."""
+
+    def test_compliance_zip_within_match_window(self):
+        # Compliance ZIPs keep their Drive name, dated up to 15 days from the inspection
+        filename = 'RAW-RE-IND-RAW-NA-1000-2025-10-15.zip'
+        self.assertTrue(_is_file_for_inspection_date(filename, '2025-10-13', '20251013', max_days=15))
+        self.assertFalse(_is_file_for_inspection_date(filename, '2025-09-13', '20250913', max_days=15))
+        # Other legacy documents with another date belong to another inspection
+        self.assertFalse(_is_file_for_inspection_date('RFI-2025-10-15.pdf', '2025-10-13', '20251013'))
+        self.assertTrue(_is_file_for_inspection_date('RFI.pdf', '2025-10-13', '20251013'))
+
+    def test_stream_zip_skips_missing_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'rfi.pdf')
+            with open(path, 'wb') as handle:
+                handle.write(b'%PDF-1.4 test')
+            data = b''.join(stream_zip([(os.path.join(folder, 'missing.pdf'), 'missing.pdf'), (path, 'RFI/rfi.pdf')]))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertEqual(archive.namelist(), ['RFI/rfi.pdf'])
+            self.assertEqual(archive.read('RFI/rfi.pdf'), b'%PDF-1.4 test')
+
+    def test_stream_zip_aborts_on_read_error(self):
+        class FailingFile(io.BytesIO):
+            def read(self, size=-1):
+                raise OSError('disk error')
+
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as handle:
+            with mock.patch('main.utils.streaming_export.open', create=True, return_value=FailingFile()):
+                with self.assertRaises(OSError):
+                    b''.join(stream_zip([(handle.name, 'RFI/rfi.pdf')]))
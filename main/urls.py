@@ -9,7 +9,7 @@ from .views.core_views import (
     get_inspection_data, process_document_links, download_compliance_documents,
     process_all_compliance_documents, start_compliance_document_download,
     get_inspection_files, download_inspection_file, download_all_inspection_files, get_zip_contents,
-    send_group_documents, sync_client_emails_from_sheets, save_manual_client_email,
+    send_group_documents, outbound_email_status, sync_client_emails_from_sheets, save_manual_client_email,
     delete_client_email, start_compliance_background, stop_compliance_background,
     compliance_background_status, start_compliance_linking, pause_compliance_linking,
     reset_compliance_progress, compliance_linking_status, process_compliance_batch,
@@ -29,6 +29,7 @@ from .views.core_views import (
 )
 from .views.data_views import (
     export_shipments, get_inspection_fees, update_inspection_fees, get_inspection_fee_history,
+    start_export_job, export_job_status, download_export_job,
 )
 
 urlpatterns = [
@@ -74,6 +75,7 @@ urlpatterns = [
     path('inspections/update-sent-status/', update_sent_status, name='update_sent_status'),
     path('inspections/zip-contents/', get_zip_contents, name='get_zip_contents'),
     path('inspections/send-documents/', send_group_documents, name='send_group_documents'),
+    path('inspections/send-documents/<int:email_id>/status/', outbound_email_status, name='outbound_email_status'),
     path('inspections/edit/<int:pk>/', edit_shipment, name='edit_shipment'),
     path('inspections/delete/<int:pk>/', delete_shipment, name='delete_shipment'),
     path('edit-inspection/<str:inspection_id>/', views.edit_inspection, name='edit_inspection'),
@@ -104,6 +106,9 @@ urlpatterns = [
     path('inspector-dashboard/', inspector_dashboard, name='inspector_dashboard'),
     path('export-analytics/<str:format_type>/', views.export_analytics, name='export_analytics'),
     path('export-shipments/', export_shipments, name='export_shipments'),
+    path('export-jobs/start/', start_export_job, name='start_export_job'),
+    path('export-jobs/<int:job_id>/status/', export_job_status, name='export_job_status'),
+    path('export-jobs/<int:job_id>/download/', download_export_job, name='download_export_job'),
 
     path('check-compliance-documents-batch/', check_compliance_documents_batch, name='check_compliance_documents_batch'),
     path('populate-six-month-files/', populate_six_month_files, name='populate_six_month_files'),
@@ -0,0 +1,194 @@
+"""
+Buffered Activity Log Writer
+Takes SystemLog INSERTs off the request path: ActivityLoggingMiddleware queues
+unsaved SystemLog rows here and a background thread writes them with
+bulk_create every ACTIVITY_LOG_BATCH_SIZE rows or ACTIVITY_LOG_FLUSH_MS
+milliseconds, whichever comes first. Anything still queued is written when the
+process exits.
+
+High-frequency polling endpoints are sampled (ACTIVITY_LOG_SAMPLE_RATES) so
+they don't flood the log table.
+"""
+
+import atexit
+import queue
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_MS = 2000
+# Rows held in memory before new ones are dropped (the database is unreachable or very slow)
+MAX_QUEUED_ROWS = 10000
+
+# (path regex, fraction of requests logged) - first match wins, 0 disables logging for the path
+DEFAULT_SAMPLE_RATES = [
+    (r'^/check-sync-status/', 0.0),
+    (r'^/session-status/', 0.0),
+    (r'^/page-clients-status/', 0.05),
+    (r'^/api/notifications/$', 0.05),
+    (r'/status/$', 0.05),
+]
+
+
+_compiled_rules = None
+
+
+def _sample_rules():
+    global _compiled_rules
+    if _compiled_rules is None:
+        rules = getattr(settings, 'ACTIVITY_LOG_SAMPLE_RATES', DEFAULT_SAMPLE_RATES)
+        _compiled_rules = [(re.compile(pattern), float(rate)) for pattern, rate in rules]
+    return _compiled_rules
+
+
+def sample_rate_for_path(path):
+    """Fraction of requests to this path that should be logged (1.0 = all)"""
+    for pattern, rate in _sample_rules():
+        if pattern.search(path):
+            return rate
+    return 1.0
+
+
+def should_log_path(path):
+    """
+    Apply the sampling rule for a path.
+
+    Returns:
+        float: the sample rate the entry was kept at, or None if it should be skipped
+    """
+    rate = sample_rate_for_path(path)
+    if rate >= 1.0:
+        return 1.0
+    if rate > 0 and random.random() < rate:
+        return rate
+    return None
+
+
+class ActivityLogBuffer:
+    """In-process queue of SystemLog rows drained by one background writer thread."""
+
+    def __init__(self, batch_size=None, flush_interval_ms=None, max_queued=MAX_QUEUED_ROWS):
+        self.batch_size = batch_size or getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        flush_ms = flush_interval_ms or getattr(settings, 'ACTIVITY_LOG_FLUSH_MS', DEFAULT_FLUSH_MS)
+        self.flush_interval = flush_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def add(self, log_entry):
+        """Queue an unsaved SystemLog instance (never blocks the request)"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(log_entry)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"[ACTIVITY LOG] Queue full - dropped {self.dropped} log entries so far")
+
+    def _collect_batch(self):
+        """Wait for the first row, then gather more until batch_size or flush_interval is reached."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        from ..models import SystemLog
+
+        if not batch:
+            return
+        try:
+            close_old_connections()
+            SystemLog.objects.bulk_create(batch, batch_size=self.batch_size)
+            self.written += len(batch)
+        except Exception as e:
+            # Don't let logging errors take the writer thread down
+            print(f"[ACTIVITY LOG] Error writing {len(batch)} log entries: {e}")
+        finally:
+            close_old_connections()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._write(self._collect_batch())
+
+    def flush(self):
+        """Write everything currently queued from the calling thread."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+
+    def shutdown(self, timeout=5):
+        """Stop the writer thread and write whatever is left."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+
+activity_log_buffer = ActivityLogBuffer()
+atexit.register(activity_log_buffer.shutdown)
+
+
+def queue_activity_log(user, action, page=None, object_type=None, object_id=None,
+                       description=None, details=None, ip_address=None, user_agent=None):
+    """
+    Record a SystemLog entry without a database round-trip on the calling thread.
+
+    Same arguments as SystemLog.log_activity. Writes inline when
+    settings.ACTIVITY_LOG_ASYNC is False.
+    """
+    from ..models import SystemLog
+
+    fields = dict(
+        action=action,
+        # One over-long value would fail the whole bulk_create batch
+        page=page[:100] if page else page,
+        object_type=object_type,
+        object_id=object_id,
+        description=description,
+        details=details,
+        ip_address=ip_address,
+        user_agent=user_agent,
+    )
+    if not getattr(settings, 'ACTIVITY_LOG_ASYNC', True):
+        return SystemLog.log_activity(user=user, **fields)
+
+    # Store the id only - the user object must not travel to the writer thread
+    activity_log_buffer.add(SystemLog(user_id=user.pk, **fields))
@@ -0,0 +1,263 @@
+"""
+Benchmark Data Generator
+Deterministic synthetic data for the offline benchmark suite (run_benchmarks).
+
+Creates clients, inspections (grouped per client and day like the real data),
+inspection fees with rate history and a media tree with the docs/ and legacy
+inspection/YEAR/MONTH/CLIENT/ folders the inspections page checks. Also builds
+the SQL Server rows and Google Drive file lookup the sync and compliance-link
+benchmarks run against. The same seed and sizes always give the same data.
+
+Only meant for the throwaway database and media folder run_benchmarks sets up.
+"""
+
+import os
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+
+from ..models import (
+    Client, FeeHistory, FoodSafetyAgencyInspection, InspectionFee, InspectorMapping,
+)
+from .document_status import DOCS_CATEGORIES, create_folder_name
+
+
+COMMODITIES = ['RAW', 'PMP', 'POULTRY', 'EGGS']
+PRODUCTS = {
+    'RAW': ['Mince', 'Boerewors', 'Steak', 'Chops'],
+    'PMP': ['Polony', 'Russians', 'Bacon', 'Viennas'],
+    'POULTRY': ['Whole Bird', 'Portions', 'Fillets'],
+    'EGGS': ['Large Eggs', 'Jumbo Eggs'],
+}
+TOWNS = ['Polokwane', 'Tzaneen', 'Mbombela', 'Nelspruit', 'Pretoria', 'Rustenburg', 'Bloemfontein', 'Kimberley']
+NAME_WORDS = ['Boxer', 'Superspar', 'Choppies', 'Meat', 'Butchery', 'Foods', 'Market', 'Fresh', 'Valley', 'Farm']
+FEES = [
+    ('inspection_hour_rate', 'Inspection Hour Rate', Decimal('510.00')),
+    ('travel_km_rate', 'Travel per km', Decimal('6.50')),
+    ('fat_test', 'Fat Test', Decimal('250.00')),
+    ('protein_test', 'Protein Test', Decimal('250.00')),
+    ('calcium_test', 'Calcium Test', Decimal('300.00')),
+    ('dna_test', 'DNA Test', Decimal('1200.00')),
+]
+INSPECTOR_COUNT = 12
+# remote_id range of the generated SQL Server inspections
+REMOTE_ID_START = 500000
+
+
+def _client_name(rng, index):
+    return f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {index:04d}"
+
+
+def _account_code(commodity, index):
+    return f"RE-IND-{commodity}-NA-{index:04d}"
+
+
+def _touch(path, size=2048):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as handle:
+        handle.write(b'%PDF-1.4\n' + b'0' * size)
+
+
+def generate_benchmark_data(clients=200, inspections=5000, days=180, docs_share=0.3, seed=42, anchor=None):
+    """
+    Fill the current database and MEDIA_ROOT with synthetic data.
+
+    Args:
+        clients: Number of clients
+        inspections: Number of inspections, spread over the last `days` days
+        days: Date range ending at `anchor` (today by default)
+        docs_share: Share of inspection groups given uploaded documents on disk
+        seed: Random seed - same seed, same data
+
+    Returns:
+        dict: Sizes of what was created (stored in the benchmark results)
+    """
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+
+    for inspector_id in range(1, INSPECTOR_COUNT + 1):
+        InspectorMapping.objects.get_or_create(
+            inspector_id=inspector_id, defaults={'inspector_name': f'Inspector {inspector_id:02d}', 'is_active': True},
+        )
+
+    fee_history = 0
+    for fee_code, fee_name, rate in FEES:
+        fee, _ = InspectionFee.objects.get_or_create(fee_code=fee_code, defaults={'fee_name': fee_name, 'rate': rate})
+        # A rate change every quarter across the range
+        history = []
+        for quarter in range(days // 90 + 1):
+            effective = anchor - timedelta(days=days - quarter * 90)
+            history.append(FeeHistory(fee=fee, rate=rate - Decimal(quarter * 5), effective_date=effective))
+        FeeHistory.objects.bulk_create(history)
+        fee_history += len(history)
+
+    client_rows = []
+    for index in range(clients):
+        commodity = COMMODITIES[index % len(COMMODITIES)]
+        client_rows.append(Client(
+            client_id=f'SQL-{index + 1}',
+            name=_client_name(rng, index),
+            internal_account_code=_account_code(commodity, index),
+            email=f'client{index}@example.com',
+        ))
+    Client.objects.bulk_create(client_rows, batch_size=500)
+    client_rows = list(Client.objects.order_by('id'))
+
+    # Inspections come in groups: one client, one day, a few products
+    rows = []
+    remote_id = REMOTE_ID_START
+    while len(rows) < inspections:
+        client = rng.choice(client_rows)
+        commodity = client.internal_account_code.split('-')[2]
+        inspection_date = anchor - timedelta(days=rng.randrange(days))
+        inspector_id = rng.randint(1, INSPECTOR_COUNT)
+        town = rng.choice(TOWNS)
+        for product in rng.sample(PRODUCTS[commodity], k=min(len(PRODUCTS[commodity]), rng.randint(1, 3))):
+            if len(rows) >= inspections:
+                break
+            remote_id += 1
+            rows.append(FoodSafetyAgencyInspection(
+                remote_id=remote_id,
+                commodity=commodity,
+                date_of_inspection=inspection_date,
+                inspector_id=inspector_id,
+                inspector_name=f'Inspector {inspector_id:02d}',
+                client=client,
+                client_name=client.name,
+                internal_account_code=client.internal_account_code,
+                town=town,
+                product_name=product,
+                is_sample_taken=rng.random() < 0.3,
+                fat=rng.random() < 0.2,
+                protein=rng.random() < 0.2,
+                km_traveled=Decimal(rng.randint(5, 250)),
+                hours=Decimal(rng.choice(['0.50', '1.00', '1.50', '2.00'])),
+                is_manual=rng.random() < 0.5,
+                is_sent=rng.random() < 0.4,
+            ))
+    FoodSafetyAgencyInspection.objects.bulk_create(rows, batch_size=500)
+
+    documents = _generate_media_tree(rng, docs_share)
+
+    from .client_autocomplete import refresh_client_search_index
+    from .inspection_groups import rebuild_inspection_groups
+    groups = rebuild_inspection_groups()
+    refresh_client_search_index()
+
+    return {
+        'seed': seed,
+        'clients': clients,
+        'inspections': len(rows),
+        'groups': groups,
+        'fee_history': fee_history,
+        'documents': documents,
+        'days': days,
+    }
+
+
+def _generate_media_tree(rng, docs_share):
+    """Write docs/{client}/{inspection}/{category}/ and legacy inspection/ folders for some groups"""
+    media_root = settings.MEDIA_ROOT
+    written = 0
+    groups = (
+        FoodSafetyAgencyInspection.objects.values_list('client_id', 'client_name', 'date_of_inspection', 'id', 'commodity')
+        .order_by('client_name', 'date_of_inspection', 'id')
+    )
+    seen_groups = set()
+    for client_id, client_name, inspection_date, inspection_id, commodity in groups:
+        group_key = (client_name, inspection_date)
+        if group_key in seen_groups:
+            continue
+        seen_groups.add(group_key)
+        if rng.random() >= docs_share:
+            continue
+
+        for category in rng.sample(DOCS_CATEGORIES, k=rng.randint(1, 3)):
+            _touch(os.path.join(media_root, 'docs', str(client_id), str(inspection_id), category, f'{category}_{inspection_id}.pdf'))
+            written += 1
+
+        # Older uploads live in the legacy tree
+        if rng.random() < 0.5:
+            client_folder = os.path.join(
+                media_root, 'inspection', inspection_date.strftime('%Y'), inspection_date.strftime('%B'),
+                create_folder_name(client_name),
+            )
+            _touch(os.path.join(client_folder, 'rfi', f'RFI-{inspection_id}.pdf'))
+            _touch(os.path.join(client_folder, 'Compliance', commodity, f'{commodity}-{inspection_id}.pdf'))
+            written += 2
+    return written
+
+
+def sql_server_rows():
+    """
+    Rows shaped like FSA_INSPECTION_QUERY's result for every generated SQL Server
+    (non-manual) inspection, so a full sync finds them all unchanged.
+    """
+    rows = []
+    for inspection in FoodSafetyAgencyInspection.objects.filter(
+        is_manual=False, remote_id__gte=REMOTE_ID_START
+    ).order_by('remote_id').values(
+        'remote_id', 'commodity', 'date_of_inspection', 'inspector_id', 'client_name',
+        'internal_account_code', 'product_name', 'is_direction_present_for_this_inspection', 'is_sample_taken',
+    ):
+        rows.append({
+            'Id': inspection['remote_id'],
+            'Commodity': inspection['commodity'],
+            'DateOfInspection': datetime.combine(inspection['date_of_inspection'], datetime.min.time()),
+            'InspectorId': inspection['inspector_id'],
+            'Client': inspection['client_name'],
+            'InternalAccountNumber': inspection['internal_account_code'],
+            'ProductName': inspection['product_name'],
+            'IsDirectionPresentForthisInspection': inspection['is_direction_present_for_this_inspection'],
+            'IsSampleTaken': inspection['is_sample_taken'],
+        })
+    return rows
+
+
+def drive_file_lookup(files_per_client=6, seed=42, anchor=None, days=180):
+    """Compliance ZIP lookup (the shape load_drive_files_real returns) for the generated clients"""
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+    lookup = {}
+    for account_code in Client.objects.order_by('id').values_list('internal_account_code', flat=True):
+        for _ in range(files_per_client):
+            zip_date = anchor - timedelta(days=rng.randrange(days))
+            file_id = f'file-{len(lookup):06d}'
+            name = f'{account_code}-{zip_date:%Y-%m-%d}.zip'
+            lookup[f'{account_code}|{zip_date:%Y-%m-%d}|{file_id}'] = {
+                'name': name,
+                'url': f'https://drive.google.com/file/d/{file_id}/view',
+                'file_id': file_id,
+                'accountCode': account_code,
+                'zipDate': zip_date,
+            }
+    return lookup
+
+
+def _ensure_user_columns():
+    """
+    The role/phone_number/... fields added to User in models.py have no migration,
+    so a freshly migrated database lacks their columns - add them
+    """
+    def existing_columns():
+        with connection.cursor() as cursor:
+            return {column.name for column in connection.introspection.get_table_description(cursor, User._meta.db_table)}
+
+    for field in User._meta.local_fields:
+        # SQLite rebuilds the whole table for some fields, adding the others with it - re-check each time
+        if field.column not in existing_columns():
+            with connection.schema_editor() as schema_editor:
+                schema_editor.add_field(User, field)
+
+
+def create_benchmark_user(username='benchmark', role='super_admin'):
+    _ensure_user_columns()
+    user, _ = User.objects.get_or_create(username=username, defaults={'email': f'{username}@example.com'})
+    user.role = role
+    user.is_staff = True
+    user.save()
+    return user
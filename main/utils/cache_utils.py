@@ -0,0 +1,177 @@
+"""
+Shared Cache Helpers
+Cross-process locks and versioned cache keys built on the configured Django cache.
+
+Locks use cache.add(), which is atomic on Redis, the database cache and
+SharedFileBasedCache, so only one gunicorn worker can hold a lock at a time.
+Versioned keys let a whole family of cached entries be invalidated by bumping
+one counter instead of deleting (or clearing) keys.
+"""
+
+import re
+import time
+import uuid
+
+from django.core.cache import cache
+
+
+def acquire_lock(lock_key, timeout):
+    """
+    Try to take a cross-process lock.
+
+    Args:
+        lock_key: Cache key of the lock
+        timeout: Seconds before the lock expires on its own (protects against crashed workers)
+
+    Returns:
+        str: Owner token to pass to release_lock/refresh_lock, or None if the lock is held
+    """
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout):
+        return token
+    return None
+
+
+def release_lock(lock_key, token):
+    """Release a lock, but only if it is still held by the given token"""
+    if token and cache.get(lock_key) == token:
+        cache.delete(lock_key)
+        return True
+    return False
+
+
+def refresh_lock(lock_key, token, timeout):
+    """
+    Extend a lock held by token.
+
+    A lock that expired or was deleted (e.g. cleared on purpose to stop its
+    holder) is not re-taken - the caller has lost it and must acquire_lock again.
+
+    Returns:
+        bool: True if the caller still holds the lock
+    """
+    if not token:
+        return False
+    if cache.get(lock_key) == token:
+        return bool(cache.touch(lock_key, timeout))
+    return False
+
+
+def is_locked(lock_key):
+    """Return True if somebody currently holds the lock"""
+    return cache.get(lock_key) is not None
+
+
+def _version_key(namespace):
+    return f'cache_version:{namespace}'
+
+
+def get_cache_version(namespace):
+    """
+    Return the current version number of a cache namespace.
+
+    Versions start from a timestamp rather than 1, so a version counter that was
+    evicted and recreated never reuses an old number and revives stale entries.
+    """
+    version_key = _version_key(namespace)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, int(time.time() * 1000), None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_cache_version(namespace):
+    """Invalidate every key built with versioned_key(namespace, ...)"""
+    version_key = _version_key(namespace)
+    try:
+        return cache.incr(version_key)
+    except ValueError:
+        # Counter missing (never used or evicted) - start a fresh one
+        get_cache_version(namespace)
+        return cache.incr(version_key)
+
+
+def versioned_key(namespace, *parts):
+    """Build a cache key that is invalidated when the namespace version is bumped"""
+    suffix = ':'.join(str(part) for part in parts)
+    return f'{namespace}:v{get_cache_version(namespace)}:{suffix}'
+
+
+# Tag-based invalidation
+# A tagged entry remembers the version of each of its tags when it was written and is
+# treated as a miss once any of those tags has been invalidated. Tags group entries by
+# client, inspection date and inspection, so a mutation only drops what it affects.
+
+SHIPMENT_LIST_TAG = 'shipment_list'
+
+
+def client_tag(client_name):
+    """Tag for everything cached about one client (name normalised like group ids)"""
+    return 'client:' + re.sub(r'[^a-zA-Z0-9]', '', client_name or '').lower()
+
+
+def date_tag(inspection_date):
+    """Tag for everything cached about one inspection date"""
+    if hasattr(inspection_date, 'isoformat'):
+        inspection_date = inspection_date.isoformat()
+    return f'date:{str(inspection_date)[:10]}'
+
+
+def inspection_tag(inspection_id):
+    """Tag for everything cached about one inspection"""
+    return f'inspection:{inspection_id}'
+
+
+def _tag_versions(tags):
+    tags = sorted(set(tags))
+    if not tags:
+        return {}
+    version_keys = {tag: _version_key(f'tag:{tag}') for tag in tags}
+    found = cache.get_many(list(version_keys.values()))
+    versions = {}
+    for tag, version_key in version_keys.items():
+        version = found.get(version_key)
+        if version is None:
+            version = get_cache_version(f'tag:{tag}')
+        versions[tag] = version
+    return versions
+
+
+def set_tagged(key, value, tags, timeout):
+    """Cache value under key, tied to the current version of each tag"""
+    cache.set(key, {'tags': _tag_versions(tags), 'value': value}, timeout)
+
+
+def get_tagged(key, default=None):
+    """Return a value stored with set_tagged, or default if missing or any tag was invalidated"""
+    entry = cache.get(key)
+    if not isinstance(entry, dict) or 'tags' not in entry:
+        return default
+    if entry['tags'] and _tag_versions(entry['tags'].keys()) != entry['tags']:
+        return default
+    return entry['value']
+
+
+def invalidate_tags(*tags):
+    """Invalidate every tagged entry carrying any of the given tags"""
+    for tag in set(tags):
+        bump_cache_version(f'tag:{tag}')
+
+
+def invalidate_inspection_caches(client_name=None, inspection_date=None, inspection_ids=()):
+    """
+    Invalidate cached pages/statuses touched by a change to a client/date group.
+
+    The inspections page entries are tagged by client, so a client tag is enough to
+    refresh every page showing that group; date and inspection tags cover entries
+    cached per date or per inspection.
+    """
+    tags = [inspection_tag(inspection_id) for inspection_id in inspection_ids if inspection_id]
+    if client_name:
+        tags.append(client_tag(client_name))
+    if inspection_date:
+        tags.append(date_tag(inspection_date))
+    if tags:
+        invalidate_tags(*tags)
+    return tags
@@ -0,0 +1,375 @@
+"""
+Client Autocomplete Index
+Answers the add-inspection form's client suggestions from memory.
+
+The ClientSearchEntry table holds one row per client name (Client table and
+inspection client names merged) with its account code and most recent town. It
+is refreshed incrementally:
+- the SQL Server inspection sync refreshes the client names in each batch
+- the client syncs diff the whole table (only changed rows are written)
+- inspection and client saves refresh their own name (main/signals.py)
+
+Each process loads the table into a ClientAutocompleteIndex (sorted name, word
+and code lists for prefix matching, trigram postings for substring and typo
+matching) and reloads it when a refresh bumps the shared version in the cache.
+A lookup is then pure Python - no queries per keystroke.
+"""
+
+import bisect
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from ..models import Client, ClientSearchEntry, FoodSafetyAgencyInspection
+
+
+INDEX_VERSION_KEY = 'client_autocomplete_index_version'
+# Seconds between checks of the shared version (stale suggestions for at most this long)
+VERSION_CHECK_INTERVAL = 2
+# Client names recomputed per query (keeps IN lists well inside backend parameter limits)
+REFRESH_BATCH_SIZE = 500
+# Share of the query's trigrams a name must contain to be suggested as a fuzzy match
+TRIGRAM_THRESHOLD = 0.5
+DEFAULT_LIMIT = 15
+
+# Ranking tiers, best first
+EXACT, NAME_PREFIX, WORD_PREFIX, CODE_PREFIX, SUBSTRING, FUZZY = range(6)
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def name_key(name):
+    """Case-insensitive identity of a client name (MySQL's collation treats these as equal)"""
+    return ' '.join((name or '').split()).casefold()[:255]
+
+
+def normalize(text):
+    """Lower-cased words with punctuation removed, e.g. "Joe's Meat (Pty) Ltd" -> "joe s meat pty ltd" """
+    return ' '.join(_NON_WORD.sub(' ', (text or '').casefold()).split())
+
+
+def _compact(code):
+    return _NON_WORD.sub('', (code or '').casefold())
+
+
+def trigrams(text, pad_end=True):
+    """Trigrams of each word, padded like pg_trgm ("  ac", " ac", "acm", "cme", "me ")"""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} ' if pad_end else f'  {word}'
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+# ---------------------------------------------------------------------------
+# Table maintenance
+# ---------------------------------------------------------------------------
+
+def _latest_inspection_value(field):
+    return Subquery(
+        FoodSafetyAgencyInspection.objects.filter(client_name=OuterRef('client_name'))
+        .exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        .order_by('-date_of_inspection', '-id').values(field)[:1]
+    )
+
+
+def _compute_entries(names=None):
+    """
+    Desired ClientSearchEntry values keyed by name_key, for the given client names
+    (every client when names is None).
+    """
+    clients = Client.objects.all()
+    inspections = FoodSafetyAgencyInspection.objects.exclude(client_name__isnull=True).exclude(client_name='')
+    if names is not None:
+        clients = clients.filter(name__in=names)
+        inspections = inspections.filter(client_name__in=names)
+
+    entries = {}
+    for row in inspections.values('client_name').annotate(
+        inspection_count=Count('id'),
+        last_inspection_date=Max('date_of_inspection'),
+        latest_town=_latest_inspection_value('town'),
+        latest_account_code=_latest_inspection_value('internal_account_code'),
+    ).order_by():
+        key = name_key(row['client_name'])
+        if not key:
+            continue
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = {
+                'name': row['client_name'].strip(),
+                'account_code': row['latest_account_code'] or '',
+                'client_code': '',
+                'town': row['latest_town'] or '',
+                'last_inspection_date': row['last_inspection_date'],
+                'inspection_count': row['inspection_count'],
+                'is_client': False,
+            }
+            continue
+        # Spellings differing only in case - the most recent one wins
+        entry['inspection_count'] += row['inspection_count']
+        latest = row['last_inspection_date']
+        if latest and (entry['last_inspection_date'] is None or latest > entry['last_inspection_date']):
+            entry['last_inspection_date'] = latest
+            entry['town'] = row['latest_town'] or entry['town']
+            entry['account_code'] = row['latest_account_code'] or entry['account_code']
+
+    for client in clients.values('client_id', 'name', 'internal_account_code').order_by('id'):
+        display_name = (client['name'] or client['client_id'] or '').strip()
+        key = name_key(display_name)
+        if not key:
+            continue
+        entry = entries.setdefault(key, {
+            'name': display_name,
+            'account_code': '',
+            'client_code': '',
+            'town': '',
+            'last_inspection_date': None,
+            'inspection_count': 0,
+            'is_client': False,
+        })
+        if not entry['is_client']:
+            # The Client table's spelling and account code take precedence
+            entry['name'] = display_name
+            entry['client_code'] = client['client_id'] or ''
+            entry['is_client'] = True
+            if client['internal_account_code']:
+                entry['account_code'] = client['internal_account_code']
+
+    for entry in entries.values():
+        entry['name'] = entry['name'][:255]
+        entry['normalized_name'] = normalize(entry['name'])[:255]
+        entry['account_code'] = (entry['account_code'] or '')[:100]
+        entry['town'] = (entry['town'] or '')[:100]
+    return entries
+
+
+def _apply_entries(computed, existing):
+    """Write the difference between computed values and existing rows. Returns the number of changed rows."""
+    to_create = []
+    to_update = []
+    for key, values in computed.items():
+        entry = existing.pop(key, None)
+        if entry is None:
+            to_create.append(ClientSearchEntry(name_key=key, **values))
+        elif any(getattr(entry, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(entry, field, value)
+            to_update.append(entry)
+
+    stale_ids = [entry.id for entry in existing.values()]
+    for start in range(0, len(stale_ids), REFRESH_BATCH_SIZE):
+        ClientSearchEntry.objects.filter(id__in=stale_ids[start:start + REFRESH_BATCH_SIZE]).delete()
+    if to_create:
+        ClientSearchEntry.objects.bulk_create(to_create, batch_size=REFRESH_BATCH_SIZE)
+    if to_update:
+        ClientSearchEntry.objects.bulk_update(to_update, list(ClientSearchEntry.ENTRY_FIELDS), batch_size=REFRESH_BATCH_SIZE)
+    return len(to_create) + len(to_update) + len(stale_ids)
+
+
+def refresh_client_entries(names):
+    """
+    Recompute the suggestions for the given client names (after inspections or
+    clients with those names were written). Names that no longer appear anywhere
+    are removed. Returns the number of changed rows.
+    """
+    names = sorted({name.strip() for name in names if name and name.strip()})
+    if not names:
+        return 0
+
+    changed = 0
+    for start in range(0, len(names), REFRESH_BATCH_SIZE):
+        batch = names[start:start + REFRESH_BATCH_SIZE]
+        keys = {name_key(name) for name in batch}
+        computed = {key: values for key, values in _compute_entries(batch).items() if key in keys}
+        with transaction.atomic():
+            existing = {
+                entry.name_key: entry
+                for entry in ClientSearchEntry.objects.select_for_update().filter(name_key__in=keys)
+            }
+            changed += _apply_entries(computed, existing)
+
+    if changed:
+        bump_index_version()
+    return changed
+
+
+def refresh_client_search_index():
+    """
+    Bring the whole table up to date (after a client sync replaced the Client
+    table), writing only the entries that changed. Returns the number of changed rows.
+    """
+    computed = _compute_entries()
+    with transaction.atomic():
+        existing = {entry.name_key: entry for entry in ClientSearchEntry.objects.select_for_update()}
+        changed = _apply_entries(computed, existing)
+    if changed:
+        bump_index_version()
+    print(f"[CLIENT AUTOCOMPLETE] Index refreshed: {len(computed)} clients, {changed} changed")
+    return changed
+
+
+def bump_index_version():
+    """Tell every process to reload its in-memory index"""
+    cache.set(INDEX_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+# ---------------------------------------------------------------------------
+# In-memory index
+# ---------------------------------------------------------------------------
+
+class _IndexData:
+    """Immutable search structures built from one load of the table"""
+
+    def __init__(self, rows):
+        self.entries = rows
+        self.names = sorted((row['normalized_name'], i) for i, row in enumerate(rows))
+        self.words = []
+        self.codes = []
+        self.postings = defaultdict(set)
+        for i, row in enumerate(rows):
+            for word in set(row['normalized_name'].split()):
+                self.words.append((word, i))
+            # Whole codes and their parts, so "0042" finds RE-IND-RAW-NA-0042
+            codes = set()
+            for code in (row['account_code'], row['client_code']):
+                codes.add(_compact(code))
+                codes.update(normalize(code).split())
+            for code in codes:
+                if code:
+                    self.codes.append((code, i))
+            for gram in trigrams(row['normalized_name']):
+                self.postings[gram].add(i)
+        self.words.sort()
+        self.codes.sort()
+
+    @staticmethod
+    def _prefixed(sorted_pairs, prefix):
+        start = bisect.bisect_left(sorted_pairs, (prefix,))
+        for value, i in sorted_pairs[start:]:
+            if not value.startswith(prefix):
+                break
+            yield value, i
+
+    def search(self, query, limit):
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        matches = {}
+
+        def match(i, tier, score=0.0):
+            best = matches.get(i)
+            if best is None or (tier, -score) < best:
+                matches[i] = (tier, -score)
+
+        for value, i in self._prefixed(self.names, normalized):
+            match(i, EXACT if value == normalized else NAME_PREFIX)
+
+        # Words of the query matched against consecutive words of the name ("meat pty" in "joes meat pty ltd")
+        first_word = normalized.split()[0]
+        for _, i in self._prefixed(self.words, first_word):
+            if f' {normalized}' in f' {self.entries[i]["normalized_name"]}':
+                match(i, WORD_PREFIX)
+
+        code = _compact(query)
+        if code:
+            for _, i in self._prefixed(self.codes, code):
+                match(i, CODE_PREFIX)
+
+        grams = trigrams(normalized, pad_end=False)
+        if grams:
+            counts = defaultdict(int)
+            for gram in grams:
+                for i in self.postings.get(gram, ()):
+                    counts[i] += 1
+            for i, shared in counts.items():
+                score = shared / len(grams)
+                if normalized in self.entries[i]['normalized_name']:
+                    match(i, SUBSTRING, score)
+                elif score >= TRIGRAM_THRESHOLD:
+                    match(i, FUZZY, score)
+
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (
+                item[1],
+                not self.entries[item[0]]['is_client'],
+                -self.entries[item[0]]['inspection_count'],
+                self.entries[item[0]]['normalized_name'],
+            ),
+        )
+        return [self.entries[i] for i, _ in ranked[:limit]]
+
+
+class ClientAutocompleteIndex:
+    """Per-process client-name index, reloaded from ClientSearchEntry when the shared version changes."""
+
+    def __init__(self):
+        self._data = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        rows = list(ClientSearchEntry.objects.values(
+            'name', 'normalized_name', 'account_code', 'client_code', 'town', 'inspection_count', 'is_client',
+        ))
+        if not rows and (Client.objects.exists() or FoodSafetyAgencyInspection.objects.exists()):
+            # First use after the migration - build the table once
+            try:
+                refresh_client_search_index()
+            except IntegrityError:
+                # Another process is building it at the same time
+                pass
+            rows = list(ClientSearchEntry.objects.values(
+                'name', 'normalized_name', 'account_code', 'client_code', 'town', 'inspection_count', 'is_client',
+            ))
+        started = time.perf_counter()
+        data = _IndexData(rows)
+        print(f"[CLIENT AUTOCOMPLETE] Loaded {len(rows)} clients in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return data
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return self._data
+        with self._lock:
+            if self._data is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+                return self._data
+            version = cache.get(INDEX_VERSION_KEY)
+            if self._data is None or version != self._version:
+                self._data = self._load()
+                self._version = version
+            self._checked_at = now
+            return self._data
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Ranked suggestions for what the user has typed so far.
+
+        Returns:
+            list: dicts with name, account_code, town and type ('client' or 'inspection')
+        """
+        return [
+            {
+                'name': entry['name'],
+                'account_code': entry['account_code'],
+                'town': entry['town'],
+                'type': 'client' if entry['is_client'] else 'inspection',
+            }
+            for entry in self._ensure_current().search(query, limit)
+        ]
+
+
+# Global index instance
+client_autocomplete_index = ClientAutocompleteIndex()
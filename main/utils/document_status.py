@@ -0,0 +1,241 @@
+"""
+Document Status Index
+Maintains the InspectionDocumentStatus table so the inspections page can read
+RFI/invoice/lab/compliance/composition/occurrence flags from the database
+instead of probing the media volume for every group on every page load.
+"""
+
+import os
+import re
+
+from django.conf import settings
+from ..models import FoodSafetyAgencyInspection, InspectionDocumentStatus
+
+
+CATEGORY_BITS = InspectionDocumentStatus.CATEGORY_BITS
+
+# Categories stored under docs/{client_id}/{inspection_id}/{category}/
+DOCS_CATEGORIES = ['rfi', 'invoice', 'lab', 'lab_form', 'compliance', 'composition', 'occurrence', 'retest']
+
+# Folder name variations used in the legacy inspection/YEAR/MONTH/CLIENT/ tree
+LEGACY_FOLDER_VARIATIONS = {
+    'rfi': ['rfi', 'RFI', 'Request For Invoice'],
+    'invoice': ['invoice', 'Invoice'],
+    'lab': ['lab', 'Lab', 'lab results'],
+    'lab_form': ['lab_form', 'Lab_Form', 'lab form'],
+    'compliance': ['compliance', 'Compliance'],
+    'composition': ['composition', 'Composition'],
+    'occurrence': ['occurrence', 'Occurrence'],
+}
+
+
+def create_folder_name(name):
+    """Create the Linux-friendly client folder name used by upload_document"""
+    if not name:
+        return "unknown_client"
+    clean_name = re.sub(r'[^a-zA-Z0-9\s\-_]', '', name)
+    clean_name = clean_name.replace(' ', '_').replace('-', '_')
+    clean_name = re.sub(r'_+', '_', clean_name)
+    clean_name = clean_name.strip('_').lower()
+    return clean_name or "unknown_client"
+
+
+def _folder_has_files(path):
+    """Return True if the folder exists and is not empty"""
+    try:
+        return bool(os.listdir(path))
+    except OSError:
+        return False
+
+
+def scan_docs_flags(client_id, inspection_id):
+    """Scan docs/{client_id}/{inspection_id}/ and return a category bitmask"""
+    if not client_id:
+        return 0
+    insp_path = os.path.join(settings.MEDIA_ROOT, 'docs', str(client_id), str(inspection_id))
+    if not os.path.isdir(insp_path):
+        return 0
+
+    flags = 0
+    for category in DOCS_CATEGORIES:
+        if _folder_has_files(os.path.join(insp_path, category)):
+            flags |= CATEGORY_BITS[category]
+    return flags
+
+
+def scan_legacy_flags(client_name, inspection_date):
+    """Scan inspection/YEAR/MONTH/CLIENT/ and return a category bitmask"""
+    if not inspection_date:
+        return 0
+    parent_path = os.path.join(
+        settings.MEDIA_ROOT,
+        'inspection',
+        inspection_date.strftime('%Y'),
+        inspection_date.strftime('%B')
+    )
+    if not os.path.isdir(parent_path):
+        return 0
+
+    sanitized_client_name = create_folder_name(client_name)
+    client_folder_variations = [sanitized_client_name, f'btn_{sanitized_client_name}']
+    if client_name:
+        client_folder_variations.append(client_name)
+
+    flags = 0
+    for folder_variation in client_folder_variations:
+        client_path = os.path.join(parent_path, folder_variation)
+        if not os.path.isdir(client_path):
+            continue
+        for category, variations in LEGACY_FOLDER_VARIATIONS.items():
+            if flags & CATEGORY_BITS[category]:
+                continue
+            for variation in variations:
+                if _folder_has_files(os.path.join(client_path, variation)):
+                    flags |= CATEGORY_BITS[category]
+                    break
+    return flags
+
+
+def refresh_document_status(inspections):
+    """
+    Rescan the media folders for the given inspections and store the results.
+
+    Args:
+        inspections: Iterable of FoodSafetyAgencyInspection instances
+
+    Returns:
+        dict: {inspection_id: InspectionDocumentStatus}
+    """
+    inspections = [inspection for inspection in inspections if inspection is not None]
+    if not inspections:
+        return {}
+
+    # Legacy folders are shared by every inspection of a client in the same month
+    legacy_cache = {}
+    scanned = {}
+    for inspection in inspections:
+        legacy_key = (
+            inspection.client_name,
+            inspection.date_of_inspection.strftime('%Y-%m') if inspection.date_of_inspection else None
+        )
+        if legacy_key not in legacy_cache:
+            legacy_cache[legacy_key] = scan_legacy_flags(inspection.client_name, inspection.date_of_inspection)
+        scanned[inspection.id] = InspectionDocumentStatus(
+            inspection_id=inspection.id,
+            docs_flags=scan_docs_flags(inspection.client_id, inspection.id),
+            legacy_flags=legacy_cache[legacy_key],
+        )
+
+    existing_ids = set(
+        InspectionDocumentStatus.objects.filter(inspection_id__in=scanned.keys()).values_list('inspection_id', flat=True)
+    )
+    to_create = [status for inspection_id, status in scanned.items() if inspection_id not in existing_ids]
+    to_update = [status for inspection_id, status in scanned.items() if inspection_id in existing_ids]
+
+    if to_create:
+        InspectionDocumentStatus.objects.bulk_create(to_create, ignore_conflicts=True)
+    if to_update:
+        from django.utils import timezone
+        now = timezone.now()
+        for status in to_update:
+            status.scanned_at = now
+        InspectionDocumentStatus.objects.bulk_update(to_update, ['docs_flags', 'legacy_flags', 'scanned_at'])
+
+    return scanned
+
+
+def refresh_group_document_status(client_name, inspection_date):
+    """Rescan every inspection in a client/date group (e.g. after an upload or delete)"""
+    if not client_name or not inspection_date:
+        return {}
+    inspections = FoodSafetyAgencyInspection.objects.filter(
+        client_name__iexact=client_name,
+        date_of_inspection=inspection_date
+    ).only('id', 'client_id', 'client_name', 'date_of_inspection')
+    return refresh_document_status(inspections)
+
+
+def refresh_client_month_document_status(client_name, inspection_date):
+    """Rescan every inspection of a client in the month of inspection_date.
+
+    Files written to the legacy inspection/YEAR/MONTH/CLIENT/ tree (compliance
+    downloads) are visible to all of the client's groups in that month.
+    """
+    if not client_name or not inspection_date:
+        return {}
+    inspections = FoodSafetyAgencyInspection.objects.filter(
+        client_name__iexact=client_name,
+        date_of_inspection__year=inspection_date.year,
+        date_of_inspection__month=inspection_date.month
+    ).only('id', 'client_id', 'client_name', 'date_of_inspection')
+    return refresh_document_status(inspections)
+
+
+def get_document_status_map(inspections):
+    """
+    Load document flags for a batch of inspections with one indexed query.
+
+    Inspections that have never been scanned are scanned once and stored, so
+    the index fills itself in lazily for older data.
+
+    Returns:
+        dict: {inspection_id: InspectionDocumentStatus}
+    """
+    inspections = list(inspections)
+    if not inspections:
+        return {}
+
+    status_map = {
+        status.inspection_id: status
+        for status in InspectionDocumentStatus.objects.filter(inspection_id__in=[i.id for i in inspections])
+    }
+    missing = [inspection for inspection in inspections if inspection.id not in status_map]
+    if missing:
+        print(f"[DOC INDEX] Scanning {len(missing)} unindexed inspection(s)")
+        status_map.update(refresh_document_status(missing))
+    return status_map
+
+
+def group_document_flags(statuses):
+    """
+    Combine the flags of a group's inspections into the button-colour summary.
+
+    Args:
+        statuses: Iterable of InspectionDocumentStatus for the group's inspections
+
+    Returns:
+        dict: has_rfi, has_invoice, has_lab, has_lab_form, has_compliance,
+              has_composition, has_occurrence and file_status
+    """
+    combined = 0
+    for status in statuses:
+        if status is not None:
+            combined |= status.docs_flags | status.legacy_flags
+
+    flags = {
+        f'has_{category}': bool(combined & CATEGORY_BITS[category])
+        for category in ['rfi', 'invoice', 'lab', 'lab_form', 'compliance', 'composition', 'occurrence']
+    }
+
+    if flags['has_rfi'] and flags['has_invoice'] and flags['has_lab'] and flags['has_compliance']:
+        file_status = 'all_files'  # Green
+    elif flags['has_compliance']:
+        file_status = 'compliance_only'  # Orange
+    elif flags['has_rfi'] or flags['has_invoice'] or flags['has_lab']:
+        file_status = 'partial_files'  # Orange
+    else:
+        file_status = 'no_files'  # Red
+    flags['file_status'] = file_status
+    return flags
+
+
+def inspection_document_flags(status):
+    """Per-product upload flags (docs structure only) used by the product rows"""
+    docs_flags = status.docs_flags if status is not None else 0
+    return {
+        'composition': bool(docs_flags & CATEGORY_BITS['composition']),
+        'coa': bool(docs_flags & CATEGORY_BITS['lab']),
+        'retest': bool(docs_flags & CATEGORY_BITS['retest']),
+        'occurrence': bool(docs_flags & CATEGORY_BITS['occurrence']),
+    }
+
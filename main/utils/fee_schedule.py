@@ -0,0 +1,116 @@
+"""
+Fee Schedule Cache
+Loads every InspectionFee and its FeeHistory once and answers historical rate
+lookups from memory, so invoice line generation in export_sheet doesn't query
+the database for every fee code on every line.
+
+The loaded schedule is shared by the process and tied to a version number in
+the shared cache; update_inspection_fees bumps the version so every worker
+reloads after a fee change.
+"""
+
+import threading
+import time
+from bisect import bisect_right
+
+from .cache_utils import get_cache_version, bump_cache_version
+
+
+FEE_SCHEDULE_NAMESPACE = 'fee_schedule'
+# How often (seconds) a worker checks the shared version for changes made by other workers
+VERSION_CHECK_INTERVAL = 5
+
+
+class FeeSchedule:
+    """In-memory fee rates: per fee code, effective dates sorted ascending for bisect."""
+
+    def __init__(self, fees, history):
+        """
+        Args:
+            fees: Iterable of (fee_id, fee_code, current_rate)
+            history: Iterable of (fee_id, effective_date, rate)
+        """
+        self._current = {}
+        code_by_id = {}
+        for fee_id, fee_code, rate in fees:
+            self._current[fee_code] = rate
+            code_by_id[fee_id] = fee_code
+
+        entries = {}
+        for fee_id, effective_date, rate in history:
+            fee_code = code_by_id.get(fee_id)
+            if fee_code is not None:
+                entries.setdefault(fee_code, []).append((effective_date.toordinal(), rate))
+
+        self._history = {}
+        for fee_code, fee_entries in entries.items():
+            fee_entries.sort(key=lambda entry: entry[0])
+            self._history[fee_code] = (
+                [entry[0] for entry in fee_entries],
+                [entry[1] for entry in fee_entries],
+            )
+
+    @classmethod
+    def load(cls):
+        """Build the schedule with two queries."""
+        from ..models import InspectionFee, FeeHistory
+        fees = InspectionFee.objects.values_list('id', 'fee_code', 'rate')
+        history = FeeHistory.objects.values_list('fee_id', 'effective_date', 'rate')
+        return cls(fees, history)
+
+    def has_fee(self, fee_code):
+        return fee_code in self._current
+
+    def rate_for(self, fee_code, target_date=None):
+        """
+        Rate active on target_date (same rules as InspectionFee.get_rate_for_date).
+
+        Returns:
+            Decimal: the rate, or None if the fee code doesn't exist
+        """
+        if fee_code not in self._current:
+            return None
+        if not target_date:
+            return self._current[fee_code]
+
+        if hasattr(target_date, 'date'):
+            target_date = target_date.date()
+
+        dates_rates = self._history.get(fee_code)
+        if dates_rates:
+            ordinals, rates = dates_rates
+            # Most recent history entry with effective_date <= target_date
+            pos = bisect_right(ordinals, target_date.toordinal())
+            if pos:
+                return rates[pos - 1]
+
+        # No history on/before that date - fall back to the current rate
+        return self._current[fee_code]
+
+
+_lock = threading.Lock()
+_state = {'schedule': None, 'version': None, 'checked_at': 0.0}
+
+
+def get_fee_schedule():
+    """Return the process-wide FeeSchedule, reloading it if the shared version changed."""
+    now = time.monotonic()
+    with _lock:
+        schedule = _state['schedule']
+        if schedule is not None and now - _state['checked_at'] < VERSION_CHECK_INTERVAL:
+            return schedule
+
+    version = get_cache_version(FEE_SCHEDULE_NAMESPACE)
+    with _lock:
+        if _state['schedule'] is None or _state['version'] != version:
+            _state['schedule'] = FeeSchedule.load()
+            _state['version'] = version
+        _state['checked_at'] = now
+        return _state['schedule']
+
+
+def invalidate_fee_schedule():
+    """Drop the loaded schedule here and make every other worker reload it."""
+    bump_cache_version(FEE_SCHEDULE_NAMESPACE)
+    with _lock:
+        _state['schedule'] = None
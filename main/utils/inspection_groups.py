@@ -0,0 +1,210 @@
+"""
+Inspection Group Summary
+Maintains the InspectionGroup table: one row per (client_name, date_of_inspection,
+is_manual) group of FoodSafetyAgencyInspection rows, holding the tallies the
+inspections page used to compute with a GROUP BY on every load.
+
+Rows are recomputed per group whenever its inspections change:
+- save()/delete() of an inspection (signals in main/signals.py)
+- queryset.update() calls (update_group_* endpoints, upload clean-up) and the
+  SQL Server sync's bulk_create/bulk_update, which call refresh_groups_for()
+  or refresh_inspection_groups() themselves
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+
+from ..models import FoodSafetyAgencyInspection, InspectionGroup
+
+
+# Groups recomputed per query
+REFRESH_BATCH_SIZE = 200
+# Inspection fields the summary is computed from - saves touching none of them skip the refresh
+GROUP_SOURCE_FIELDS = {
+    'client_name', 'date_of_inspection', 'is_manual', 'is_sent',
+    'rfi_uploaded_by', 'rfi_uploaded_by_id', 'lab_form_uploaded_by', 'lab_form_uploaded_by_id',
+    'km_traveled', 'hours', 'comment', 'approved_status',
+}
+
+# Inspections-page filters that need per-inspection rows (the summary can't answer them)
+INSPECTION_LEVEL_FILTERS = ('claim_no', 'branch', 'sample_status', 'compliance_status')
+# Roles that only see some of a group's inspections
+RESTRICTED_ROLES = ('inspector', 'lab_technician')
+
+_deferred = threading.local()
+
+
+def _group_aggregates(queryset):
+    return queryset.values('client_name', 'date_of_inspection', 'is_manual').annotate(
+        inspection_count=Count('id'),
+        latest_inspection_id=Max('id'),
+        earliest_inspection_id=Min('id'),
+        sent_count=Count('id', filter=Q(is_sent=True)),
+        rfi_count=Count('id', filter=Q(rfi_uploaded_by__isnull=False)),
+        lab_form_count=Count('id', filter=Q(lab_form_uploaded_by__isnull=False)),
+        # Shared by the whole group (set through the update_group_* endpoints)
+        group_km_traveled=Max('km_traveled'),
+        group_hours=Max('hours'),
+        group_comment=Max('comment'),
+        group_approved_status=Max('approved_status'),
+    ).order_by()
+
+
+def _group_values(row):
+    return {
+        'inspection_count': row['inspection_count'],
+        'latest_inspection_id': row['latest_inspection_id'],
+        'earliest_inspection_id': row['earliest_inspection_id'],
+        'sent_count': row['sent_count'],
+        'rfi_count': row['rfi_count'],
+        'lab_form_count': row['lab_form_count'],
+        'km_traveled': row['group_km_traveled'],
+        'hours': row['group_hours'],
+        'comment': row['group_comment'],
+        'approved_status': row['group_approved_status'],
+    }
+
+
+def _key_superset_filter(keys):
+    """Q matching every inspection (or group) whose client name and date appear among keys"""
+    names = {client_name for client_name, _ in keys}
+    dates = {inspection_date for _, inspection_date in keys}
+    name_q = Q(client_name__in=[name for name in names if name is not None])
+    if None in names:
+        name_q |= Q(client_name__isnull=True)
+    date_q = Q(date_of_inspection__in=[value for value in dates if value is not None])
+    if None in dates:
+        date_q |= Q(date_of_inspection__isnull=True)
+    return name_q & date_q
+
+
+def refresh_inspection_groups(keys):
+    """
+    Recompute the InspectionGroup rows for the given (client_name, date_of_inspection) keys.
+
+    Groups that no longer have inspections are deleted. Inside deferred_group_refresh()
+    the keys are collected and refreshed once when the block exits.
+    """
+    keys = {(client_name, inspection_date) for client_name, inspection_date in keys}
+    if not keys:
+        return
+    pending = getattr(_deferred, 'keys', None)
+    if pending is not None:
+        pending.update(keys)
+        return
+
+    keys = list(keys)
+    for start in range(0, len(keys), REFRESH_BATCH_SIZE):
+        _refresh_batch(set(keys[start:start + REFRESH_BATCH_SIZE]))
+
+
+def _refresh_batch(keys):
+    key_filter = _key_superset_filter(keys)
+    computed = {
+        (row['client_name'], row['date_of_inspection'], row['is_manual']): _group_values(row)
+        for row in _group_aggregates(FoodSafetyAgencyInspection.objects.filter(key_filter))
+        if (row['client_name'], row['date_of_inspection']) in keys
+    }
+
+    with transaction.atomic():
+        existing = {
+            (group.client_name, group.date_of_inspection, group.is_manual): group
+            for group in InspectionGroup.objects.select_for_update().filter(key_filter)
+            if (group.client_name, group.date_of_inspection) in keys
+        }
+
+        to_create = []
+        to_update = []
+        for group_key, values in computed.items():
+            group = existing.pop(group_key, None)
+            if group is None:
+                to_create.append(InspectionGroup(
+                    client_name=group_key[0], date_of_inspection=group_key[1], is_manual=group_key[2], **values
+                ))
+            else:
+                for field, value in values.items():
+                    setattr(group, field, value)
+                to_update.append(group)
+
+        if existing:
+            InspectionGroup.objects.filter(id__in=[group.id for group in existing.values()]).delete()
+        if to_create:
+            InspectionGroup.objects.bulk_create(to_create, batch_size=REFRESH_BATCH_SIZE)
+        if to_update:
+            InspectionGroup.objects.bulk_update(to_update, list(InspectionGroup.SUMMARY_FIELDS), batch_size=REFRESH_BATCH_SIZE)
+
+
+def refresh_groups_for(inspections):
+    """Recompute the groups of every inspection in a queryset (call after queryset.update())"""
+    refresh_inspection_groups(inspections.values_list('client_name', 'date_of_inspection').distinct().order_by())
+
+
+@contextmanager
+def deferred_group_refresh():
+    """Collect group refreshes (e.g. from a loop of save() calls) and run them once on exit"""
+    if getattr(_deferred, 'keys', None) is not None:
+        # Already inside an outer block - it refreshes everything on exit
+        yield
+        return
+    _deferred.keys = set()
+    try:
+        yield
+    finally:
+        keys, _deferred.keys = _deferred.keys, None
+        refresh_inspection_groups(keys)
+
+
+def group_page_queryset(request):
+    """
+    Groups for the inspections page read from the summary table, shaped like the
+    live values()/annotate() query (same keys), newest first.
+
+    Returns None when the request can't be answered from the summary - a role
+    that sees only part of each group, or a filter on individual inspections.
+    """
+    if getattr(request.user, 'role', None) in RESTRICTED_ROLES:
+        return None
+    if any(request.GET.get(name) for name in INSPECTION_LEVEL_FILTERS):
+        return None
+
+    groups = InspectionGroup.objects.filter(is_manual=True)
+    client_name = request.GET.get('client')
+    if client_name:
+        groups = groups.filter(client_name__icontains=client_name)
+    if request.GET.get('inspection_date_from'):
+        groups = groups.filter(date_of_inspection__gte=request.GET['inspection_date_from'])
+    if request.GET.get('inspection_date_to'):
+        groups = groups.filter(date_of_inspection__lte=request.GET['inspection_date_to'])
+
+    return groups.annotate(
+        has_sent_inspections=F('sent_count'),
+        has_unsent_inspections=F('inspection_count') - F('sent_count'),
+        has_rfi_inspections=F('rfi_count'),
+        has_no_rfi_inspections=F('inspection_count') - F('rfi_count'),
+        has_lab_form_inspections=F('lab_form_count'),
+        has_no_lab_form_inspections=F('inspection_count') - F('lab_form_count'),
+    ).values(
+        'client_name', 'date_of_inspection', 'inspection_count', 'latest_inspection_id', 'earliest_inspection_id',
+        'has_sent_inspections', 'has_unsent_inspections', 'has_rfi_inspections', 'has_no_rfi_inspections',
+        'has_lab_form_inspections', 'has_no_lab_form_inspections', 'comment',
+    ).order_by('-date_of_inspection', 'client_name')
+
+
+def rebuild_inspection_groups(batch_size=1000):
+    """Recompute the whole table from FoodSafetyAgencyInspection. Returns the number of groups."""
+    groups = [
+        InspectionGroup(
+            client_name=row['client_name'],
+            date_of_inspection=row['date_of_inspection'],
+            is_manual=row['is_manual'],
+            **_group_values(row)
+        )
+        for row in _group_aggregates(FoodSafetyAgencyInspection.objects.all()).iterator(chunk_size=batch_size)
+    ]
+    with transaction.atomic():
+        InspectionGroup.objects.all().delete()
+        InspectionGroup.objects.bulk_create(groups, batch_size=batch_size)
+    return len(groups)
@@ -0,0 +1,338 @@
+"""
+Keyset Pagination
+Seek-based paging for long, newest-first lists (inspections page groups, system logs).
+
+OFFSET n makes the database read and throw away n rows on every deep page; here each
+page is fetched with a WHERE on the sort key of the row the previous page ended on
+plus a LIMIT, so the last page costs the same as the first. The position travels
+between requests in an opaque, signed ?cursor= value.
+
+The ordering must be unique (end it with a unique column such as id) so a row is
+never skipped or shown twice at a page boundary. NULLs are treated as the lowest
+value, which is how MySQL and SQLite sort them.
+
+For the "Page x of y" indicator the total can be approximate: table statistics for an
+unfiltered table, otherwise a COUNT cached for a couple of minutes.
+"""
+
+import hashlib
+import math
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Q
+
+
+CURSOR_SALT = 'main.keyset_pagination'
+# Seconds a filtered COUNT is reused for the page indicator
+APPROXIMATE_COUNT_TIMEOUT = 120
+# Below this many rows (by table statistics) an exact COUNT is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+
+FIRST, NEXT, PREVIOUS, LAST = 'first', 'next', 'previous', 'last'
+
+
+def _serialize(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def encode_cursor(direction, values=(), number=1):
+    """Opaque cursor for the page after/before the row with the given sort-key values"""
+    payload = {'d': direction, 'v': [_serialize(value) for value in values], 'n': number}
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """Cursor payload dict, or None for a missing, tampered or malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get('d') not in (NEXT, PREVIOUS, LAST):
+        return None
+    return payload
+
+
+def _table_row_estimate(model, using):
+    """Row count from the database's table statistics, or None if unavailable"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table]
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except Exception as e:
+        print(f"[Pagination] Could not read table statistics for {table}: {e}")
+        return None
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def approximate_count(queryset, cache_key=None, timeout=APPROXIMATE_COUNT_TIMEOUT):
+    """
+    Row count good enough for a page indicator.
+
+    Returns:
+        tuple: (count, estimated) - estimated is True when the number came from table statistics
+    """
+    query = queryset.query
+    if not query.where and query.group_by is None and not query.distinct:
+        estimate = _table_row_estimate(queryset.model, queryset.db)
+        if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+            return estimate, True
+
+    if cache_key is None:
+        try:
+            cache_key = 'keyset_count_' + hashlib.md5(str(query).encode('utf-8')).hexdigest()
+        except Exception:
+            # Queries that can't be rendered (e.g. an empty __in) - count directly
+            return queryset.count(), False
+
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, timeout)
+    return count, False
+
+
+class KeysetPaginator:
+    """
+    Pages through a queryset in a fixed ordering by seeking past the last row shown.
+
+    Args:
+        queryset: Model or values() queryset; every ordering field must be a model field
+        per_page: Rows per page
+        ordering: Field names, '-' prefix for descending (e.g. ['-timestamp', '-id'])
+        approximate: Use approximate_count() instead of an exact COUNT for the totals
+        count_cache_key: Cache key for the approximate count (defaults to a hash of the SQL)
+    """
+
+    def __init__(self, queryset, per_page, ordering, approximate=False, count_cache_key=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.approximate = approximate
+        self.count_cache_key = count_cache_key
+        self._count = None
+        self._estimated = False
+
+        meta = queryset.model._meta
+        self._fields = {name: meta.get_field(name) for name, _ in self.ordering}
+
+    def __getstate__(self):
+        # Pages end up in the page cache - pickling the queryset would run it unsliced
+        self.count
+        state = self.__dict__.copy()
+        state['queryset'] = None
+        state['_fields'] = {}
+        return state
+
+    @property
+    def count(self):
+        if self._count is None:
+            if self.approximate:
+                self._count, self._estimated = approximate_count(self.queryset, self.count_cache_key)
+            else:
+                self._count = self.queryset.count()
+        return self._count
+
+    @property
+    def count_is_estimate(self):
+        """True when count came from table statistics rather than a COUNT"""
+        return self.count is not None and self._estimated
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def _order_by(self, reverse=False):
+        # Backends that sort NULL as the largest value are told to put it where MySQL does
+        nulls_largest = connections[self.queryset.db].features.nulls_order_largest
+        terms = []
+        for name, descending in self.ordering:
+            descending = descending != reverse
+            if nulls_largest:
+                terms.append(F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_first=True))
+            else:
+                terms.append(f'-{name}' if descending else name)
+        return terms
+
+    def _seek_filter(self, values, reverse=False):
+        """Q for the rows that come after the given sort key (before it when reverse)"""
+        terms = []
+        same = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            descending = descending != reverse
+            nullable = self._fields[name].null
+            if value is None:
+                beyond = None if descending else Q(**{f'{name}__isnull': False})
+                equal = Q(**{f'{name}__isnull': True})
+            else:
+                beyond = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+                if descending and nullable:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                equal = Q(**{name: value})
+            if beyond is not None:
+                terms.append(same & beyond)
+            same &= equal
+
+        if not terms:
+            return Q(pk__in=[])
+        condition = terms[0]
+        for term in terms[1:]:
+            condition |= term
+        return condition
+
+    def _key(self, row):
+        if isinstance(row, dict):
+            return [row.get(name) for name, _ in self.ordering]
+        return [getattr(row, name) for name, _ in self.ordering]
+
+    def _parse_key(self, values):
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError('cursor does not match ordering')
+        return [
+            None if value is None else self._fields[name].to_python(value)
+            for (name, _), value in zip(self.ordering, values)
+        ]
+
+    def _fetch(self, queryset, reverse=False):
+        return list(queryset.order_by(*self._order_by(reverse))[:self.per_page + 1])
+
+    def page(self, cursor=None, page_number=None):
+        """
+        Page addressed by cursor. Without a cursor, page_number (legacy ?page=N links)
+        is served with an OFFSET once; the links on that page are cursors again.
+        """
+        state = decode_cursor(cursor)
+        if state is not None:
+            try:
+                return self._cursor_page(state)
+            except (ValueError, TypeError) as e:
+                print(f"[Pagination] Ignoring invalid cursor: {e}")
+
+        try:
+            page_number = int(page_number or 1)
+        except (TypeError, ValueError):
+            page_number = 1
+        if page_number > 1:
+            return self._offset_page(page_number)
+        return self.first_page()
+
+    def first_page(self):
+        rows = self._fetch(self.queryset)
+        return KeysetPage(self, rows[:self.per_page], 1, has_next=len(rows) > self.per_page, has_previous=False)
+
+    def last_page(self):
+        rows = self._fetch(self.queryset, reverse=True)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        number = max(self.num_pages, 2) if has_previous else 1
+        return KeysetPage(self, rows, number, has_next=False, has_previous=has_previous)
+
+    def _cursor_page(self, state):
+        direction = state['d']
+        if direction == LAST:
+            return self.last_page()
+
+        values = self._parse_key(state.get('v'))
+        number = max(int(state.get('n') or 1), 1)
+
+        if direction == NEXT:
+            rows = self._fetch(self.queryset.filter(self._seek_filter(values)))
+            if not rows:
+                # Everything after the cursor is gone - show the end of the list instead
+                return self.last_page()
+            return KeysetPage(self, rows[:self.per_page], max(number, 2),
+                              has_next=len(rows) > self.per_page, has_previous=True)
+
+        rows = self._fetch(self.queryset.filter(self._seek_filter(values, reverse=True)), reverse=True)
+        has_previous = len(rows) > self.per_page
+        if not rows:
+            return self.first_page()
+        rows = rows[:self.per_page][::-1]
+        number = max(number, 2) if has_previous else 1
+        return KeysetPage(self, rows, number, has_next=True, has_previous=has_previous)
+
+    def _offset_page(self, page_number):
+        offset = (page_number - 1) * self.per_page
+        rows = list(self.queryset.order_by(*self._order_by())[offset:offset + self.per_page + 1])
+        if not rows:
+            return self.last_page()
+        return KeysetPage(self, rows[:self.per_page], page_number,
+                          has_next=len(rows) > self.per_page, has_previous=True)
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator; cursors for the neighbouring pages are built lazily"""
+
+    def __init__(self, paginator, object_list, number, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f"<KeysetPage {self.number} ({len(self.object_list)} rows)>"
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return encode_cursor(NEXT, self.paginator._key(self.object_list[-1]), self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return encode_cursor(PREVIOUS, self.paginator._key(self.object_list[0]), self.number - 1)
+
+    @property
+    def last_cursor(self):
+        return encode_cursor(LAST)
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    @property
+    def count_is_estimate(self):
+        return self.paginator.count_is_estimate
+
+    @property
+    def num_pages(self):
+        """Total pages for the indicator - never below the page being shown"""
+        if not self._has_next:
+            return self.number
+        return max(self.paginator.num_pages, self.number + 1)
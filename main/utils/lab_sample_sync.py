@@ -3,9 +3,46 @@ Lab Sample Sync Utility
 Syncs lab sample data from SQL Server to Django database
 """
 
-import pymssql
-from django.conf import settings
+from collections import defaultdict
+
+from django.db.models import Q
+
 from ..models import FoodSafetyAgencyInspection
+from .sql_server_pool import sql_server_pool
+
+
+# SQL Server allows at most 2100 parameters per statement
+MAX_IN_PARAMS = 2000
+# Inspection IDs handled per bulk sync batch (one IN query per link table, one bulk_update)
+LAB_SYNC_BATCH_SIZE = MAX_IN_PARAMS
+LAB_FLAG_FIELDS = ['fat', 'protein', 'calcium', 'dna']
+
+
+def lab_flags(pmp_samples, raw_samples):
+    """
+    Test flags for an inspection from its active lab sample links.
+
+    PMP samples (Processed Meat Products) are always tested for fat and protein.
+    RAW samples use CategoryTestingId:
+        1 = Standard testing (fat + protein)
+        2 = Extended testing (fat + protein + calcium)
+        3 = DNA testing
+    """
+    has_fat_protein = bool(pmp_samples)
+    has_calcium = False
+    for sample in raw_samples:
+        category_id = sample.get('CategoryTestingId')
+        if category_id in [1, 2]:
+            has_fat_protein = True
+        if category_id == 2 or sample.get('IsCalcuimContentTestRequired', False):
+            has_calcium = True
+
+    return {
+        'fat': has_fat_protein,
+        'protein': has_fat_protein,  # Fat and protein always go together
+        'calcium': has_calcium,
+        'dna': False,  # DNA testing is rare, would need specific CategoryTestingId
+    }
 
 
 def sync_lab_samples_for_inspection(inspection_id, cursor=None):
@@ -25,14 +62,7 @@ def sync_lab_samples_for_inspection(inspection_id, cursor=None):
     try:
         # Connect to SQL Server if cursor not provided
         if cursor is None:
-            sql_config = settings.DATABASES['sql_server']
-            conn = pymssql.connect(
-                server=sql_config['HOST'],
-                port=sql_config['PORT'],
-                user=sql_config['USER'],
-                password=sql_config['PASSWORD'],
-                database=sql_config['NAME']
-            )
+            conn = sql_server_pool.checkout()
             cursor = conn.cursor(as_dict=True)
             close_connection = True
 
@@ -42,12 +72,6 @@ def sync_lab_samples_for_inspection(inspection_id, cursor=None):
         except FoodSafetyAgencyInspection.DoesNotExist:
             return {'success': False, 'error': f'Inspection {inspection_id} not found in Django database'}
 
-        # Initialize flags
-        has_pmp_sample = False
-        has_raw_sample = False
-        has_fat_protein = False
-        has_calcium = False
-
         # Check for PMP lab samples
         cursor.execute("""
             SELECT *
@@ -56,12 +80,6 @@ def sync_lab_samples_for_inspection(inspection_id, cursor=None):
         """, (inspection_id,))
         pmp_samples = cursor.fetchall()
 
-        if pmp_samples:
-            has_pmp_sample = True
-            # For PMP samples, the presence of a record means fat/protein testing
-            # (PMP = Processed Meat Products - always tested for fat and protein)
-            has_fat_protein = True
-
         # Check for RAW lab samples
         cursor.execute("""
             SELECT *
@@ -70,37 +88,18 @@ def sync_lab_samples_for_inspection(inspection_id, cursor=None):
         """, (inspection_id,))
         raw_samples = cursor.fetchall()
 
-        if raw_samples:
-            has_raw_sample = True
-            # Check CategoryTestingId to determine test types
-            for sample in raw_samples:
-                category_id = sample.get('CategoryTestingId')
-                is_calcium = sample.get('IsCalcuimContentTestRequired', False)
-
-                # CategoryTestingId 1 = Standard testing (fat + protein)
-                # CategoryTestingId 2 = Extended testing (fat + protein + calcium)
-                # CategoryTestingId 3 = DNA testing
-                if category_id in [1, 2]:
-                    has_fat_protein = True
-                if category_id == 2 or is_calcium:
-                    has_calcium = True
-
         # Update the inspection with lab sample data
-        inspection.fat = has_fat_protein
-        inspection.protein = has_fat_protein  # Fat and protein always go together
-        inspection.calcium = has_calcium
-        inspection.dna = False  # DNA testing is rare, would need specific CategoryTestingId
+        flags = lab_flags(pmp_samples, raw_samples)
+        for field, value in flags.items():
+            setattr(inspection, field, value)
         inspection.save()
 
         return {
             'success': True,
             'inspection_id': inspection_id,
-            'has_pmp_sample': has_pmp_sample,
-            'has_raw_sample': has_raw_sample,
-            'fat': has_fat_protein,
-            'protein': has_fat_protein,
-            'calcium': has_calcium,
-            'dna': False
+            'has_pmp_sample': bool(pmp_samples),
+            'has_raw_sample': bool(raw_samples),
+            **flags
         }
 
     except Exception as e:
@@ -114,6 +113,106 @@ def sync_lab_samples_for_inspection(inspection_id, cursor=None):
             conn.close()
 
 
+def fetch_lab_sample_links(cursor, inspection_ids):
+    """
+    Active lab sample links for many inspections, in chunked IN queries.
+
+    Args:
+        cursor: SQL Server cursor opened with as_dict=True
+        inspection_ids: SQL Server inspection IDs
+
+    Returns:
+        tuple: ({inspection_id: [PMP link rows]}, {inspection_id: [RAW link rows]})
+    """
+    pmp_links = defaultdict(list)
+    raw_links = defaultdict(list)
+    inspection_ids = list(dict.fromkeys(inspection_ids))
+
+    for start in range(0, len(inspection_ids), MAX_IN_PARAMS):
+        chunk = tuple(inspection_ids[start:start + MAX_IN_PARAMS])
+        placeholders = ', '.join(['%s'] * len(chunk))
+
+        cursor.execute(f"""
+            SELECT InspectionId
+            FROM PMPInspectionLabSampleLinks
+            WHERE IsActive = 1 AND InspectionId IN ({placeholders})
+        """, chunk)
+        for row in cursor.fetchall():
+            pmp_links[row['InspectionId']].append(row)
+
+        cursor.execute(f"""
+            SELECT InspectionId, CategoryTestingId, IsCalcuimContentTestRequired
+            FROM RawRMPInspectionLabSampleLinks
+            WHERE IsActive = 1 AND InspectionId IN ({placeholders})
+        """, chunk)
+        for row in cursor.fetchall():
+            raw_links[row['InspectionId']].append(row)
+
+    return pmp_links, raw_links
+
+
+def sync_lab_samples_bulk(inspection_ids, cursor=None):
+    """
+    Set-based lab sample sync for a batch of SQL Server inspection IDs.
+
+    Links are fetched with fetch_lab_sample_links(), flags are computed in memory
+    and only inspections whose flags changed are written (one bulk_update).
+    PMP links belong to PMP inspections and RAW links to RAW ones - remote IDs are
+    per SQL Server table, so they are matched on (commodity, remote_id).
+
+    Args:
+        inspection_ids: SQL Server inspection IDs
+        cursor: Optional SQL Server cursor (as_dict=True) if already connected
+
+    Returns:
+        dict: Summary statistics
+    """
+    stats = {'success': 0, 'updated': 0, 'not_found': 0, 'pmp_samples': 0, 'raw_samples': 0}
+    if not inspection_ids:
+        return stats
+
+    conn = None
+    try:
+        if cursor is None:
+            conn = sql_server_pool.checkout()
+            cursor = conn.cursor(as_dict=True)
+        pmp_links, raw_links = fetch_lab_sample_links(cursor, inspection_ids)
+    finally:
+        # Released before the Django writes
+        if conn is not None:
+            conn.close()
+
+    links_by_key = {('PMP', inspection_id): (links, []) for inspection_id, links in pmp_links.items()}
+    links_by_key.update({('RAW', inspection_id): ([], links) for inspection_id, links in raw_links.items()})
+    if not links_by_key:
+        return stats
+
+    to_update = []
+    found = 0
+    inspections = FoodSafetyAgencyInspection.objects.filter(
+        Q(commodity='PMP', remote_id__in=list(pmp_links)) | Q(commodity='RAW', remote_id__in=list(raw_links))
+    ).only('id', 'commodity', 'remote_id', *LAB_FLAG_FIELDS)
+
+    for inspection in inspections:
+        pmp_samples, raw_samples = links_by_key[(inspection.commodity, inspection.remote_id)]
+        found += 1
+        stats['pmp_samples' if pmp_samples else 'raw_samples'] += 1
+
+        flags = lab_flags(pmp_samples, raw_samples)
+        if any(getattr(inspection, field) != value for field, value in flags.items()):
+            for field, value in flags.items():
+                setattr(inspection, field, value)
+            to_update.append(inspection)
+
+    if to_update:
+        FoodSafetyAgencyInspection.objects.bulk_update(to_update, LAB_FLAG_FIELDS, batch_size=500)
+
+    stats['success'] = found
+    stats['updated'] = len(to_update)
+    stats['not_found'] = len(links_by_key) - found
+    return stats
+
+
 def sync_all_lab_samples(limit=None, show_progress=True):
     """
     Sync lab sample data for all inspections from SQL Server.
@@ -125,16 +224,10 @@ def sync_all_lab_samples(limit=None, show_progress=True):
     Returns:
         dict: Summary statistics
     """
+    conn = None
     try:
-        # Connect to SQL Server
-        sql_config = settings.DATABASES['sql_server']
-        conn = pymssql.connect(
-            server=sql_config['HOST'],
-            port=sql_config['PORT'],
-            user=sql_config['USER'],
-            password=sql_config['PASSWORD'],
-            database=sql_config['NAME']
-        )
+        # Connect to SQL Server (pooled - close() returns the connection)
+        conn = sql_server_pool.checkout()
         cursor = conn.cursor(as_dict=True)
 
         # Get all inspections with lab samples
@@ -160,36 +253,28 @@ def sync_all_lab_samples(limit=None, show_progress=True):
         stats = {
             'total': len(inspection_ids_with_samples),
             'success': 0,
+            'updated': 0,
             'failed': 0,
             'not_found': 0,
             'pmp_samples': 0,
             'raw_samples': 0
         }
 
-        for idx, inspection_id in enumerate(inspection_ids_with_samples, 1):
-            result = sync_lab_samples_for_inspection(inspection_id, cursor)
-
-            if result['success']:
-                stats['success'] += 1
-                if result.get('has_pmp_sample'):
-                    stats['pmp_samples'] += 1
-                if result.get('has_raw_sample'):
-                    stats['raw_samples'] += 1
-            else:
-                if 'not found' in result.get('error', '').lower():
-                    stats['not_found'] += 1
-                else:
-                    stats['failed'] += 1
+        # PERFORMANCE FIX: Set-based sync - per batch of inspection IDs, one chunked IN query per
+        # link table and one bulk_update, instead of a get(), two SELECT * round trips and a save()
+        # for every inspection
+        for start in range(0, len(inspection_ids_with_samples), LAB_SYNC_BATCH_SIZE):
+            batch = inspection_ids_with_samples[start:start + LAB_SYNC_BATCH_SIZE]
+            batch_stats = sync_lab_samples_bulk(batch, cursor)
+            for key, value in batch_stats.items():
+                stats[key] += value
 
-            # Progress updates
-            if show_progress and idx % 100 == 0:
-                print(f"[LAB SAMPLE SYNC] Progress: {idx}/{stats['total']} processed")
-
-        conn.close()
+            if show_progress:
+                print(f"[LAB SAMPLE SYNC] Progress: {start + len(batch)}/{stats['total']} processed")
 
         if show_progress:
             print(f"\n[LAB SAMPLE SYNC] Complete!")
-            print(f"  [OK] Success: {stats['success']}")
+            print(f"  [OK] Success: {stats['success']} ({stats['updated']} changed)")
             print(f"  [FAIL] Failed: {stats['failed']}")
             print(f"  [INFO] Not found in Django: {stats['not_found']}")
             print(f"  [PMP] PMP samples: {stats['pmp_samples']}")
@@ -204,3 +289,6 @@ def sync_all_lab_samples(limit=None, show_progress=True):
             'success': False,
             'error': str(e)
         }
+    finally:
+        if conn is not None:
+            conn.close()
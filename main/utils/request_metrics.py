@@ -0,0 +1,376 @@
+"""
+Request Metrics
+Opt-in per-request instrumentation (PERF_INSTRUMENTATION=True in the environment).
+
+For every request PerformanceInstrumentationMiddleware records:
+- wall time
+- database queries and their time (connection.execute_wrapper)
+- filesystem calls: os.stat (os.path.exists/isfile/getsize go through it), os.listdir, os.scandir
+- cache hits and misses
+- time spent in Google API, Microsoft Graph, other HTTP and SQL Server (connection pool) calls
+
+The numbers go into the response's Server-Timing header (visible in the browser's
+network panel) and into a per-process ring buffer that the server_status view
+summarises per view, so the slow endpoints can be found without guessing.
+
+The hooks are installed once, when the middleware is enabled; outside an
+instrumented request they only do a ContextVar lookup.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+# Requests kept for the server_status summary (per process)
+BUFFER_SIZE = getattr(settings, 'PERF_INSTRUMENTATION_BUFFER', 500)
+EXTERNAL_KINDS = ('google', 'graph', 'http', 'sqlserver')
+
+_current = ContextVar('request_metrics', default=None)
+_buffer = deque(maxlen=BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+_install_lock = threading.Lock()
+_installed = False
+
+
+class RequestMetrics:
+    """Counters for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.fs_stat = 0
+        self.fs_listdir = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.external = {kind: [0, 0.0] for kind in EXTERNAL_KINDS}
+        # Nested instrumented calls (a Google client refreshing its token over requests) count once
+        self._external_depth = 0
+        self._in_get_many = False
+
+    def add_external(self, kind, seconds):
+        entry = self.external.setdefault(kind, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self, method, path, view, status):
+        return {
+            'method': method,
+            'path': path,
+            'view': view,
+            'status': status,
+            'timestamp': time.time(),
+            'total_ms': round(self.elapsed() * 1000, 1),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_seconds * 1000, 1),
+            'fs_stat': self.fs_stat,
+            'fs_listdir': self.fs_listdir,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'external': {
+                kind: {'calls': calls, 'ms': round(seconds * 1000, 1)}
+                for kind, (calls, seconds) in self.external.items() if calls
+            },
+        }
+
+    def server_timing(self):
+        """Server-Timing header value"""
+        parts = [
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"',
+            f'fs;desc="stat {self.fs_stat}, listdir {self.fs_listdir}"',
+            f'cache;desc="hits {self.cache_hits}, misses {self.cache_misses}"',
+        ]
+        for kind, (calls, seconds) in self.external.items():
+            if calls:
+                parts.append(f'{kind};dur={seconds * 1000:.1f};desc="{calls} calls"')
+        parts.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def current():
+    """Metrics of the request being handled on this thread, or None"""
+    return _current.get()
+
+
+@contextmanager
+def instrument_request():
+    """Collect metrics for the code in the block (one request)"""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+
+    def db_wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.db_queries += 1
+            metrics.db_seconds += time.perf_counter() - started
+
+    try:
+        with ExitStack() as stack:
+            # Wrapping doesn't open a connection - a database the request never touches costs nothing
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(db_wrapper))
+            yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def external_call(kind):
+    """Time a call to an outside service for the current request (no-op outside one)"""
+    metrics = _current.get()
+    if metrics is None or metrics._external_depth:
+        yield
+        return
+    metrics._external_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._external_depth -= 1
+        metrics.add_external(kind, time.perf_counter() - started)
+
+
+def record(sample):
+    with _buffer_lock:
+        _buffer.append(sample)
+
+
+def recent_requests(limit=50):
+    """Newest instrumented requests first"""
+    with _buffer_lock:
+        samples = list(_buffer)
+    return samples[::-1][:limit]
+
+
+def view_summary():
+    """Per-view averages over the ring buffer, slowest total time first"""
+    with _buffer_lock:
+        samples = list(_buffer)
+
+    views = {}
+    for sample in samples:
+        entry = views.setdefault(sample['view'], {
+            'view': sample['view'], 'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'db_queries': 0, 'db_ms': 0.0, 'fs_calls': 0, 'cache_misses': 0, 'external_ms': 0.0,
+        })
+        entry['requests'] += 1
+        entry['total_ms'] += sample['total_ms']
+        entry['max_ms'] = max(entry['max_ms'], sample['total_ms'])
+        entry['db_queries'] += sample['db_queries']
+        entry['db_ms'] += sample['db_ms']
+        entry['fs_calls'] += sample['fs_stat'] + sample['fs_listdir']
+        entry['cache_misses'] += sample['cache_misses']
+        entry['external_ms'] += sum(call['ms'] for call in sample['external'].values())
+
+    summary = []
+    for entry in views.values():
+        count = entry['requests']
+        summary.append({
+            'view': entry['view'],
+            'requests': count,
+            'total_ms': round(entry['total_ms'], 1),
+            'avg_ms': round(entry['total_ms'] / count, 1),
+            'max_ms': entry['max_ms'],
+            'avg_db_queries': round(entry['db_queries'] / count, 1),
+            'avg_db_ms': round(entry['db_ms'] / count, 1),
+            'avg_fs_calls': round(entry['fs_calls'] / count, 1),
+            'avg_cache_misses': round(entry['cache_misses'] / count, 1),
+            'avg_external_ms': round(entry['external_ms'] / count, 1),
+        })
+    summary.sort(key=lambda entry: entry['total_ms'], reverse=True)
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Hooks
+# ---------------------------------------------------------------------------
+
+def _count_fs(func, counter):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            setattr(metrics, counter, getattr(metrics, counter) + 1)
+        return func(*args, **kwargs)
+    wrapper._request_metrics_original = func
+    return wrapper
+
+
+def _install_fs_hooks():
+    for name, counter in (('stat', 'fs_stat'), ('listdir', 'fs_listdir'), ('scandir', 'fs_listdir')):
+        original = getattr(os, name)
+        wrapper = _count_fs(original, counter)
+        setattr(os, name, wrapper)
+        # shutil and friends check these sets before passing dir_fd/follow_symlinks
+        for supported in (os.supports_fd, os.supports_dir_fd, os.supports_follow_symlinks):
+            if original in supported:
+                supported.add(wrapper)
+
+
+_MISSING = object()
+
+
+def _install_cache_hooks():
+    from django.core.cache import caches
+
+    for alias in settings.CACHES:
+        cache_class = type(caches[alias])
+        if getattr(cache_class.get, '_request_metrics_original', None):
+            continue
+        original_get = cache_class.get
+        original_get_many = cache_class.get_many
+
+        @functools.wraps(original_get)
+        def get(self, key, default=None, version=None, _original=original_get):
+            metrics = _current.get()
+            if metrics is None or metrics._in_get_many:
+                return _original(self, key, default, version)
+            value = _original(self, key, _MISSING, version)
+            if value is _MISSING:
+                metrics.cache_misses += 1
+                return default
+            metrics.cache_hits += 1
+            return value
+
+        @functools.wraps(original_get_many)
+        def get_many(self, keys, version=None, _original=original_get_many):
+            metrics = _current.get()
+            if metrics is None or metrics._in_get_many:
+                return _original(self, keys, version)
+            keys = list(keys)
+            metrics._in_get_many = True
+            try:
+                found = _original(self, keys, version)
+            finally:
+                metrics._in_get_many = False
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+            return found
+
+        get._request_metrics_original = original_get
+        get_many._request_metrics_original = original_get_many
+        cache_class.get = get
+        cache_class.get_many = get_many
+
+
+def _http_kind(url):
+    host = str(url).split('://', 1)[-1].split('/', 1)[0].lower()
+    if host.endswith('graph.microsoft.com') or host.endswith('login.microsoftonline.com'):
+        return 'graph'
+    if host.endswith('googleapis.com') or host.endswith('google.com'):
+        return 'google'
+    return 'http'
+
+
+def _install_http_hooks():
+    try:
+        import requests
+    except ImportError:
+        requests = None
+    if requests is not None:
+        original_request = requests.Session.request
+
+        @functools.wraps(original_request)
+        def request(self, method, url, *args, **kwargs):
+            with external_call(_http_kind(url)):
+                return original_request(self, method, url, *args, **kwargs)
+
+        requests.Session.request = request
+
+    try:
+        from googleapiclient import http as google_http
+    except ImportError:
+        google_http = None
+    if google_http is not None:
+        for request_class in (google_http.HttpRequest, google_http.BatchHttpRequest):
+            original_execute = request_class.execute
+
+            @functools.wraps(original_execute)
+            def execute(self, *args, _original=original_execute, **kwargs):
+                with external_call('google'):
+                    return _original(self, *args, **kwargs)
+
+            request_class.execute = execute
+
+
+class _TimedCursor:
+    """SQL Server cursor whose round trips are timed for the current request"""
+
+    TIMED_METHODS = frozenset(('execute', 'executemany', 'callproc', 'fetchone', 'fetchmany', 'fetchall', 'nextset'))
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in self.TIMED_METHODS:
+            @functools.wraps(attr)
+            def timed(*args, **kwargs):
+                with external_call('sqlserver'):
+                    return attr(*args, **kwargs)
+            return timed
+        return attr
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+
+def _install_sqlserver_hooks():
+    # Every SQL Server connection comes from the pool - time checkouts (waiting, pinging,
+    # connecting) and cursor round trips there. Outside a request external_call is a no-op.
+    from .sql_server_pool import PooledConnection, SQLServerPool
+
+    original_checkout = SQLServerPool.checkout
+    original_cursor = PooledConnection.cursor
+    original_commit = PooledConnection.commit
+
+    @functools.wraps(original_checkout)
+    def checkout(self, *args, **kwargs):
+        with external_call('sqlserver'):
+            return original_checkout(self, *args, **kwargs)
+
+    @functools.wraps(original_cursor)
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(original_cursor(self, *args, **kwargs))
+
+    @functools.wraps(original_commit)
+    def commit(self):
+        with external_call('sqlserver'):
+            return original_commit(self)
+
+    SQLServerPool.checkout = checkout
+    PooledConnection.cursor = cursor
+    PooledConnection.commit = commit
+
+
+def install():
+    """Install the filesystem, cache and external-call hooks (once per process)"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _install_fs_hooks()
+        _install_cache_hooks()
+        _install_http_hooks()
+        _install_sqlserver_hooks()
+        _installed = True
+    print(f"[PERF] Request instrumentation enabled (ring buffer of {BUFFER_SIZE} requests)")
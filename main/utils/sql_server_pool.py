@@ -0,0 +1,449 @@
+"""
+SQL Server Connection Pool
+One place to get a connection to the AFS SQL Server.
+
+Every SQL Server reader (inspection and client syncs, product-name and lab-sample
+lookups, client allocation, status checks) checks a connection out of this
+per-process pool instead of calling pymssql.connect() itself. Opening a
+connection to the remote server costs hundreds of milliseconds (TCP, TLS and
+TDS login), so interactive endpoints reuse an open one.
+
+- At most SQL_SERVER_POOL_SIZE connections per process. A checkout past that waits
+  up to SQL_SERVER_POOL_WAIT seconds, then raises SQLServerPoolError.
+- An idle connection is pinged (SELECT 1) before it is handed out again. Dead ones
+  are replaced. Connections older than SQL_SERVER_CONN_MAX_AGE are reopened.
+- Every checkout gets a query timeout: SQL_SERVER_QUERY_TIMEOUT unless the caller
+  passes its own (the full sync uses a longer one).
+- Returned connections are rolled back. If the rollback fails they are dropped.
+
+Usage:
+    with sql_server_pool.connection(query_timeout=180) as connection:
+        cursor = connection.cursor(as_dict=True)
+        cursor.execute(...)
+
+Code written around connect()/close() can use sql_server_pool.checkout(). The
+PooledConnection it returns goes back to the pool on close().
+
+With SQL_SERVER_BACKEND='local', or inside use_local_sql_server() in tests,
+connections come from LocalSQLServer. This in-process stand-in answers queries
+with rows registered on it.
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Connections idle for longer than this are pinged before reuse
+PING_AFTER_IDLE = 30
+
+
+class SQLServerPoolError(Exception):
+    """SQL Server is not configured, cannot be reached, or every pooled connection is busy"""
+
+
+def get_sql_server_config():
+    """Connection settings - DATABASES['sql_server'] if it is re-enabled, otherwise SQL_SERVER"""
+    config = settings.DATABASES.get('sql_server') or getattr(settings, 'SQL_SERVER', {})
+    return {
+        'HOST': config.get('HOST') or '',
+        'PORT': int(config.get('PORT') or 1433),
+        'NAME': config.get('NAME'),
+        'USER': config.get('USER'),
+        'PASSWORD': config.get('PASSWORD'),
+    }
+
+
+def connect_pymssql(query_timeout, connect_timeout):
+    """Open a new pymssql connection with the configured credentials"""
+    config = get_sql_server_config()
+    if not config['HOST']:
+        raise SQLServerPoolError('SQL Server is not configured (set SQL_SERVER_HOST)')
+    if not config['USER']:
+        raise SQLServerPoolError('SQL Server credentials are not configured (set SQL_SERVER_USER and SQL_SERVER_PASSWORD)')
+    import pymssql
+    return pymssql.connect(
+        server=config['HOST'],
+        port=config['PORT'],
+        user=config['USER'],
+        password=config['PASSWORD'],
+        database=config['NAME'],
+        timeout=query_timeout,
+        login_timeout=connect_timeout,
+    )
+
+
+def _set_query_timeout(raw, seconds):
+    # pymssql keeps the query timeout on its underlying _mssql connection
+    target = getattr(raw, '_conn', raw)
+    try:
+        target.query_timeout = seconds
+    except Exception as e:
+        logger.debug(f"Could not set SQL Server query timeout: {e}")
+
+
+def _close_raw(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+class _Entry:
+    """An open connection owned by the pool"""
+
+    __slots__ = ('raw', 'created', 'last_used', 'generation')
+
+    def __init__(self, raw, generation):
+        self.raw = raw
+        self.created = self.last_used = time.monotonic()
+        self.generation = generation
+
+
+class PooledConnection:
+    """A checked-out connection. close() hands it back to the pool instead of disconnecting."""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        # A checkout dropped without close() (an exception path) still frees its slot
+        self._finalizer = weakref.finalize(self, pool._release, entry, True)
+
+    @property
+    def raw(self):
+        if self._entry is None:
+            raise SQLServerPoolError('SQL Server connection was already returned to the pool')
+        return self._entry.raw
+
+    def cursor(self, *args, **kwargs):
+        return self.raw.cursor(*args, **kwargs)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self, discard=False):
+        """Return the connection to the pool (discard=True closes it instead)"""
+        if self._finalizer.detach() is not None:
+            self._pool._release(self._entry, discard)
+        self._entry = None
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SQLServerPool:
+    """Per-process pool of SQL Server connections"""
+
+    def __init__(self, connector=None, max_size=None, wait=None, query_timeout=None,
+                 connect_timeout=None, max_age=None):
+        self._connector = connector
+        self.max_size = max_size or getattr(settings, 'SQL_SERVER_POOL_SIZE', 4)
+        self.wait = wait if wait is not None else getattr(settings, 'SQL_SERVER_POOL_WAIT', 30)
+        self.query_timeout = query_timeout or getattr(settings, 'SQL_SERVER_QUERY_TIMEOUT', 60)
+        self.connect_timeout = connect_timeout or getattr(settings, 'SQL_SERVER_CONNECT_TIMEOUT', 15)
+        self.max_age = max_age or getattr(settings, 'SQL_SERVER_CONN_MAX_AGE', 1800)
+        # RLock: a dropped checkout's finalizer may run while this thread holds the lock
+        self._lock = threading.Condition(threading.RLock())
+        # Most recently used last - reusing it is least likely to hit a stale connection
+        self._idle = []
+        # Idle plus checked-out connections (including ones still being opened)
+        self._open = 0
+        # Bumped by close_all(); older connections are closed when they come back
+        self._generation = 0
+        self._pid = os.getpid()
+        self.counters = {'connects': 0, 'reuses': 0, 'discarded': 0, 'waits': 0}
+
+    def _connect(self, query_timeout):
+        connector = self._connector
+        if connector is None:
+            if getattr(settings, 'SQL_SERVER_BACKEND', 'pymssql') == 'local':
+                connector = local_sql_server.connect
+            else:
+                connector = connect_pymssql
+        return connector(query_timeout, self.connect_timeout)
+
+    def _check_pid(self):
+        # A forked worker must not share its parent's sockets
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle = []
+            self._open = 0
+            self._generation += 1
+
+    def _acquire(self):
+        """An idle entry, or None with a slot reserved for a new connection"""
+        deadline = time.monotonic() + self.wait
+        waited = False
+        with self._lock:
+            self._check_pid()
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._open < self.max_size:
+                    self._open += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SQLServerPoolError(
+                        f"All {self.max_size} SQL Server connections are in use (waited {self.wait}s)"
+                    )
+                if not waited:
+                    self.counters['waits'] += 1
+                    waited = True
+                self._lock.wait(remaining)
+
+    def _usable(self, entry):
+        now = time.monotonic()
+        if now - entry.created > self.max_age:
+            return False
+        if now - entry.last_used < PING_AFTER_IDLE:
+            return True
+        try:
+            cursor = entry.raw.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.info(f"Dropping dead SQL Server connection: {e}")
+            return False
+
+    def checkout(self, query_timeout=None):
+        """Check out a connection; close() it (or use connection()) to give it back"""
+        query_timeout = query_timeout or self.query_timeout
+        entry = self._acquire()
+        if entry is not None and not self._usable(entry):
+            _close_raw(entry.raw)
+            self.counters['discarded'] += 1
+            # Keep its slot for the replacement
+            entry = None
+
+        if entry is None:
+            try:
+                raw = self._connect(query_timeout)
+            except Exception as e:
+                with self._lock:
+                    self._open -= 1
+                    self._lock.notify()
+                # ImportError: pymssql is not installed - callers report that separately
+                if isinstance(e, (SQLServerPoolError, ImportError)):
+                    raise
+                raise SQLServerPoolError(f"Could not connect to SQL Server: {e}") from e
+            with self._lock:
+                self.counters['connects'] += 1
+                entry = _Entry(raw, self._generation)
+        else:
+            self.counters['reuses'] += 1
+            _set_query_timeout(entry.raw, query_timeout)
+        return PooledConnection(self, entry)
+
+    def _release(self, entry, discard=False):
+        if not discard:
+            try:
+                entry.raw.rollback()
+            except Exception:
+                discard = True
+        with self._lock:
+            stale = entry.generation != self._generation
+            if discard or stale:
+                _close_raw(entry.raw)
+                if not stale:
+                    self._open -= 1
+                    self.counters['discarded'] += 1
+            else:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, query_timeout=None):
+        """Checked-out connection for the block, returned to the pool afterwards"""
+        pooled = self.checkout(query_timeout)
+        try:
+            yield pooled
+        finally:
+            pooled.close()
+
+    @contextmanager
+    def cursor(self, as_dict=False, query_timeout=None):
+        """Cursor on a checked-out connection for the block"""
+        with self.connection(query_timeout) as pooled:
+            cursor = pooled.cursor(as_dict=as_dict)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close_all(self):
+        """Close idle connections; checked-out ones are closed when they are returned"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            # Checked-out connections no longer count against the new generation
+            self._open = 0
+            self._generation += 1
+            self._lock.notify_all()
+        for entry in idle:
+            _close_raw(entry.raw)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                **self.counters,
+            }
+
+
+# ---------------------------------------------------------------------------
+# Local stand-in
+# ---------------------------------------------------------------------------
+
+class LocalSQLServerError(Exception):
+    """Raised by LocalSQLServer connections (the stand-in for pymssql.Error)"""
+
+
+class LocalSQLServer:
+    """
+    In-process stand-in for the AFS SQL Server.
+
+    add_result(match, rows) registers an answer: any query containing `match`
+    (case-insensitive; or a callable(sql, params) returning True) returns `rows`
+    (dicts keyed by column; or a callable(sql, params) returning them). Results
+    registered later take precedence, and unmatched queries return no rows. Every
+    executed query is kept in .queries as (sql, params).
+    """
+
+    Error = LocalSQLServerError
+
+    def __init__(self):
+        self._results = []
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.queries = []
+        self.connections_opened = 0
+
+    def add_result(self, match, rows):
+        self._results.insert(0, (match, rows))
+
+    def rows_for(self, sql, params=None):
+        with self._lock:
+            self.queries.append((sql, params))
+        for match, rows in self._results:
+            matched = match(sql, params) if callable(match) else match.lower() in sql.lower()
+            if matched:
+                return list(rows(sql, params) if callable(rows) else rows)
+        return []
+
+    def connect(self, query_timeout=None, connect_timeout=None):
+        connection = LocalConnection(self, query_timeout)
+        with self._lock:
+            self.connections_opened += 1
+        self._connections.add(connection)
+        return connection
+
+    def drop_connections(self):
+        """Break every open connection, like a server restart or network drop"""
+        for connection in list(self._connections):
+            connection.broken = True
+
+
+class LocalConnection:
+
+    def __init__(self, server, query_timeout=None):
+        self.server = server
+        self.query_timeout = query_timeout
+        self.broken = False
+        self.closed = False
+
+    def _check(self):
+        if self.closed or self.broken:
+            raise LocalSQLServerError('Connection is closed')
+
+    def cursor(self, as_dict=False):
+        self._check()
+        return LocalCursor(self, as_dict)
+
+    def commit(self):
+        self._check()
+
+    def rollback(self):
+        self._check()
+
+    def close(self):
+        self.closed = True
+
+
+class LocalCursor:
+
+    def __init__(self, connection, as_dict=False):
+        self.connection = connection
+        self.as_dict = as_dict
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.connection._check()
+        rows = self.connection.server.rows_for(sql, params)
+        columns = list(rows[0].keys()) if rows else []
+        self.description = tuple((column, None, None, None, None, None, None) for column in columns) or None
+        self._rows = [dict(row) if self.as_dict else tuple(row.values()) for row in rows]
+        self.rowcount = len(self._rows)
+
+    def executemany(self, sql, param_sets):
+        for params in param_sets:
+            self.execute(sql, params)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        batch, self._rows = self._rows[:size], self._rows[size:]
+        return batch
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+    def close(self):
+        self._rows = []
+
+
+sql_server_pool = SQLServerPool()
+# Answers SQL_SERVER_BACKEND='local' connections
+local_sql_server = LocalSQLServer()
+
+
+@contextmanager
+def use_local_sql_server(server=None):
+    """Serve sql_server_pool connections from a LocalSQLServer for the block (tests, benchmarks)"""
+    server = server or LocalSQLServer()
+    previous = sql_server_pool._connector
+    sql_server_pool.close_all()
+    sql_server_pool._connector = server.connect
+    try:
+        yield server
+    finally:
+        sql_server_pool.close_all()
+        sql_server_pool._connector = previous
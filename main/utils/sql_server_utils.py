@@ -3,41 +3,44 @@ SQL Server utilities for fetching product names and other data
 Uses pymssql - NO ODBC DRIVERS NEEDED!
 """
 
-import pymssql
-from django.conf import settings
 import logging
 
+from .sql_server_pool import get_sql_server_config, sql_server_pool
+
 logger = logging.getLogger(__name__)
 
 class SQLServerConnection:
     """Utility class for connecting to SQL Server using pymssql (NO ODBC DRIVERS!)"""
 
-    def __init__(self):
-        self.sql_server_config = settings.DATABASES.get('sql_server', {})
+    def __init__(self, query_timeout=None):
+        self.sql_server_config = get_sql_server_config()
+        self.query_timeout = query_timeout
         self.connection = None
 
     def connect(self):
-        """Establish connection to SQL Server using pymssql"""
+        """Check out a connection from the shared SQL Server pool"""
+        # PERFORMANCE FIX: Reuse pooled connections instead of a new TLS/TDS login per call
         try:
-            self.connection = pymssql.connect(
-                server=self.sql_server_config.get('HOST'),
-                port=int(self.sql_server_config.get('PORT', 1433)),
-                user=self.sql_server_config.get('USER'),
-                password=self.sql_server_config.get('PASSWORD'),
-                database=self.sql_server_config.get('NAME'),
-                timeout=10
-            )
+            self.connection = sql_server_pool.checkout(query_timeout=self.query_timeout)
             return True
         except Exception as e:
             logger.error(f"Failed to connect to SQL Server: {e}")
             return False
 
     def disconnect(self):
-        """Close SQL Server connection"""
+        """Return the connection to the pool"""
         if self.connection:
             self.connection.close()
             self.connection = None
 
+    def __enter__(self):
+        if not self.connect():
+            raise ConnectionError("Failed to connect to SQL Server")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disconnect()
+
     def get_product_names_by_inspection_id(self, inspection_id):
         """
         Fetch product names for a specific inspection ID from SQL Server
@@ -0,0 +1,194 @@
+"""
+Streaming Export Helpers
+Build CSV, XLSX and ZIP download responses without holding the whole file in
+memory.
+
+CSV rows are encoded one at a time inside a StreamingHttpResponse, so the first
+bytes go out as soon as the first database chunk is read. XLSX rows are written
+with openpyxl's write-only mode into a spooled temporary file (memory stays flat
+regardless of row count) and the finished file is streamed back in blocks.
+ZIP archives are written entry by entry straight into the response.
+"""
+
+import csv
+import os
+import tempfile
+import zipfile
+
+from django.http import FileResponse, StreamingHttpResponse
+
+
+# Rows fetched per database round trip when streaming a queryset
+EXPORT_CHUNK_SIZE = 2000
+# XLSX files smaller than this stay in memory, larger ones spill to disk
+XLSX_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Block size used when copying files into a streamed ZIP
+ZIP_READ_BLOCK_SIZE = 256 * 1024
+# Formats that are already compressed - stored as-is instead of deflated again
+ZIP_STORED_EXTENSIONS = {
+    '.pdf', '.zip', '.rar', '.7z', '.gz',
+    '.jpg', '.jpeg', '.png', '.gif',
+    '.docx', '.xlsx', '.pptx',
+}
+
+
+def iterate_rows(records, chunk_size=EXPORT_CHUNK_SIZE):
+    """Iterate a queryset in chunks (without filling its result cache); other iterables as-is"""
+    if hasattr(records, 'iterator'):
+        return records.iterator(chunk_size=chunk_size)
+    return iter(records)
+
+
+class StyledRow(list):
+    """
+    Row of values with openpyxl style attributes (font, fill, alignment) applied to
+    every cell when written to xlsx. Behaves as a plain list for CSV.
+    """
+
+    def __init__(self, values, **style):
+        super().__init__(values)
+        self.style = style
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv_rows(rows, headers=None):
+    """Yield each row (headers first) as an encoded CSV line"""
+    writer = csv.writer(_Echo())
+    if headers:
+        yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def streaming_csv_response(rows, filename, headers=None):
+    """StreamingHttpResponse that sends CSV rows as they are produced"""
+    response = StreamingHttpResponse(stream_csv_rows(rows, headers), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def write_xlsx(handle, rows, sheet_title='Sheet1', headers=None, header_style=None, column_widths=None):
+    """
+    Write rows to an xlsx file object using openpyxl write-only mode.
+
+    Args:
+        header_style: Optional dict of openpyxl style attributes (font, fill, alignment) for the header row
+        column_widths: Optional list of column widths (write-only sheets can't be auto-sized afterwards)
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_title)
+
+    for index, width in enumerate(column_widths or [], 1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+
+    def styled_cells(values, style):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(worksheet, value=value)
+            for attribute, style_value in style.items():
+                setattr(cell, attribute, style_value)
+            cells.append(cell)
+        return cells
+
+    if headers:
+        worksheet.append(styled_cells(headers, header_style or {}))
+
+    for row in rows:
+        if isinstance(row, StyledRow):
+            row = styled_cells(row, row.style)
+        worksheet.append(row)
+
+    workbook.save(handle)
+
+
+def streaming_xlsx_response(rows, filename, sheet_title='Sheet1', headers=None, header_style=None, column_widths=None):
+    """FileResponse streaming an xlsx built in write-only mode through a spooled temp file"""
+    spool = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    write_xlsx(spool, rows, sheet_title, headers, header_style, column_widths)
+    spool.seek(0)
+    # FileResponse streams in blocks and closes the temp file when the response finishes
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+class _ZipStreamBuffer:
+    """
+    Write-only sink for zipfile that hands written bytes back to a generator.
+
+    It has no tell()/seek(), so zipfile treats it as unseekable and writes sizes
+    in data descriptors after each entry instead of seeking back.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of (file_path, arcname) entries as it is written.
+
+    Already-compressed formats (ZIP_STORED_EXTENSIONS) use ZIP_STORED, everything
+    else ZIP_DEFLATED. Files that can no longer be opened are skipped. A read error
+    once an entry has been started aborts the archive - part of the entry has
+    already been sent, so skipping it would leave a truncated file in the ZIP.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for file_path, arcname in entries:
+            try:
+                info = zipfile.ZipInfo.from_file(file_path, arcname)
+                source = open(file_path, 'rb')
+            except OSError as e:
+                print(f"[ZIP] Skipping unreadable file {file_path}: {e}")
+                continue
+            extension = os.path.splitext(file_path)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if extension in ZIP_STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with source, archive.open(info, 'w') as target:
+                while True:
+                    try:
+                        block = source.read(ZIP_READ_BLOCK_SIZE)
+                    except OSError as e:
+                        print(f"[ZIP] Aborting archive - {file_path} failed while being read: {e}")
+                        raise
+                    if not block:
+                        break
+                    target.write(block)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # Central directory
+    yield buffer.drain()
+
+
+def streaming_zip_response(entries, filename):
+    """StreamingHttpResponse sending a ZIP of (file_path, arcname) entries as it is built"""
+    response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
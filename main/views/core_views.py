@@ -182,6 +182,11 @@ def delete_client_email(request):
 from .data_views import remote_sqlserver_data_view
 from .utils import apply_filters, clear_messages
 from ..services.google_drive_service import GoogleDriveService
+from ..utils.cache_utils import (
+    SHIPMENT_LIST_TAG, client_tag, get_tagged, set_tagged, invalidate_tags, invalidate_inspection_caches
+)
+from ..utils.inspection_groups import deferred_group_refresh, group_page_queryset, refresh_groups_for
+from ..utils.keyset_pagination import KeysetPaginator
 
 
 # Global flag to track OneDrive operations during batch processing
@@ -811,6 +816,10 @@ def add_fsa_inspection(request):
 
                     first_inspection.save()
 
+                    # Index the uploaded documents for the inspections page
+                    from ..utils.document_status import refresh_document_status
+                    refresh_document_status([first_inspection])
+
                     # Clear file cache
                     from django.core.cache import cache
                     cache_key = f"docs_files:{first_inspection.client.id}:{first_inspection.id}"
@@ -1347,19 +1356,23 @@ def shipment_list(request):
     from django.core.cache import cache
     import time
 
-    # PERFORMANCE FIX: Include page number and filters in cache key so each page/filter combo is cached separately
+    # PERFORMANCE FIX: Include page position and filters in cache key so each page/filter combo is cached separately
     page_number = request.GET.get('page', 1)
+    page_cursor = request.GET.get('cursor', '')
     filter_params = '_'.join(f"{k}_{v}" for k, v in sorted(request.GET.items()) if k in ['claim_no', 'client', 'branch', 'inspection_date_from', 'inspection_date_to', 'sent_status', 'compliance_status'])
-    cache_key = f"shipment_list_{request.user.id}_{getattr(request.user, 'role', 'unknown')}_page_{page_number}_{filter_params}"
+    import hashlib
+    page_position = hashlib.md5(page_cursor.encode()).hexdigest() if page_cursor else page_number
+    cache_key = f"shipment_list_{request.user.id}_{getattr(request.user, 'role', 'unknown')}_page_{page_position}_{filter_params}"
     cache_timestamp_key = f"{cache_key}_timestamp"
 
-    # Manual refresh option (clears all cache)
+    # Manual refresh option (invalidates every cached inspections page, leaves other caches warm)
     if request.GET.get('refresh') == 'true':
-        safe_print("MANUAL CACHE REFRESH requested - clearing ALL cache...")
-        cache.clear()  # Clear ALL cache to ensure fresh data
+        safe_print("MANUAL CACHE REFRESH requested - invalidating inspections page cache...")
+        invalidate_tags(SHIPMENT_LIST_TAG)
+        cache.delete('filter_options')
 
     # Check cached data with automatic expiration
-    cached_data = cache.get(cache_key)
+    cached_data = get_tagged(cache_key)
     cache_timestamp = cache.get(cache_timestamp_key)
 
     if cached_data and cache_timestamp:
@@ -1395,6 +1408,8 @@ def shipment_list(request):
         # Testing parameters (user-editable)
         'fat', 'protein', 'calcium', 'dna', 'is_sample_taken', 'bought_sample', 'lab', 'needs_retest',
         'is_direction_present_for_this_inspection', 'is_manual',
+        # Client link (used by the document status index)
+        'client_id',
         # Location and contact
         'town', 'additional_email', 'internal_account_code'
     ).filter(
@@ -1550,7 +1565,6 @@ def shipment_list(request):
     # DATABASE-LEVEL PAGINATION: Only load data for current page
     from django.db.models import Count, Max, Min, Case, When, BooleanField
     from django.db.models.functions import TruncDate
-    from django.core.paginator import Paginator
     import re
     
     # Function to sanitize group_id
@@ -1565,22 +1579,26 @@ def shipment_list(request):
     # Get page number first
     page_number = request.GET.get('page', 1)
     
-    # Create the base queryset for groups
-    groups_queryset = inspections.values(
-        'client_name',
-        'date_of_inspection'
-    ).annotate(
-        inspection_count=Count('id'),
-        latest_inspection_id=Max('id'),
-        earliest_inspection_id=Min('id'),
-        has_sent_inspections=Count('id', filter=Q(is_sent=True)),  # Count sent inspections in group
-        has_unsent_inspections=Count('id', filter=Q(is_sent=False)),  # Count unsent inspections in group
-        has_rfi_inspections=Count('id', filter=Q(rfi_uploaded_by__isnull=False)),  # Count inspections with RFI uploaded
-        has_no_rfi_inspections=Count('id', filter=Q(rfi_uploaded_by__isnull=True)),  # Count inspections without RFI uploaded
-        has_lab_form_inspections=Count('id', filter=Q(lab_form_uploaded_by__isnull=False)),  # Count inspections with Lab Form uploaded
-        has_no_lab_form_inspections=Count('id', filter=Q(lab_form_uploaded_by__isnull=True)),  # Count inspections without Lab Form uploaded
-        comment=Max('comment')  # Get the comment from the group (all should have the same comment)
-    ).order_by('-date_of_inspection', 'client_name')
+    # PERFORMANCE FIX: Read groups from the InspectionGroup summary table (indexed range scan)
+    # instead of a GROUP BY with conditional counts on every load; roles and filters that
+    # need individual inspections still use the live aggregate below
+    groups_queryset = group_page_queryset(request)
+    if groups_queryset is None:
+        groups_queryset = inspections.values(
+            'client_name',
+            'date_of_inspection'
+        ).annotate(
+            inspection_count=Count('id'),
+            latest_inspection_id=Max('id'),
+            earliest_inspection_id=Min('id'),
+            has_sent_inspections=Count('id', filter=Q(is_sent=True)),  # Count sent inspections in group
+            has_unsent_inspections=Count('id', filter=Q(is_sent=False)),  # Count unsent inspections in group
+            has_rfi_inspections=Count('id', filter=Q(rfi_uploaded_by__isnull=False)),  # Count inspections with RFI uploaded
+            has_no_rfi_inspections=Count('id', filter=Q(rfi_uploaded_by__isnull=True)),  # Count inspections without RFI uploaded
+            has_lab_form_inspections=Count('id', filter=Q(lab_form_uploaded_by__isnull=False)),  # Count inspections with Lab Form uploaded
+            has_no_lab_form_inspections=Count('id', filter=Q(lab_form_uploaded_by__isnull=True)),  # Count inspections without Lab Form uploaded
+            comment=Max('comment')  # Get the comment from the group (all should have the same comment)
+        ).order_by('-date_of_inspection', 'client_name')
     
     # FILTER GROUPS BY SENT STATUS: Apply sent status filter to groups, not individual inspections
     sent_status = request.GET.get('sent_status')
@@ -1613,9 +1631,11 @@ def shipment_list(request):
     #         # Only show groups that have at least one inspection without Lab Form uploaded
     #         groups_queryset = groups_queryset.filter(has_no_lab_form_inspections__gt=0)
 
-    # Apply database-level pagination
-    paginator = Paginator(groups_queryset, 25)  # 25 groups per page
-    page_obj = paginator.get_page(page_number)
+    # PERFORMANCE FIX: Keyset pagination - seek past the last group of the previous page
+    # (date_of_inspection, client_name) instead of OFFSET, with a cached/estimated total
+    # for the page indicator; old ?page=N links still work
+    paginator = KeysetPaginator(groups_queryset, 25, ['-date_of_inspection', 'client_name'], approximate=True)  # 25 groups per page
+    page_obj = paginator.page(page_cursor, page_number)
     
     # Get only the groups for the current page
     client_date_groups = list(page_obj.object_list)
@@ -1782,157 +1802,11 @@ def shipment_list(request):
         key = (inspection.client_name, inspection.date_of_inspection)
         grouped_inspections_dict[key].append(inspection)
     
-    # Helper function to check files for a single group (fast version for page load)
-    def check_group_files(client_name, inspection_date):
-        """Check if files exist for this group - optimized for speed
-
-        Checks NEW structure first: MEDIA_ROOT/docs/{client_id}/{inspection_id}/{category}/
-        Falls back to LEGACY structure: MEDIA_ROOT/inspection/YEAR/MONTH/CLIENT/...
-        """
-        import re
-        from django.conf import settings
-        from main.models import FoodSafetyAgencyInspection
-
-        try:
-            has_rfi = has_invoice = has_lab = has_lab_form = has_compliance = has_composition = has_occurrence = False
-
-            # === NEW STRUCTURE: Check docs/{client_id}/{inspection_id}/ ===
-            # Look up inspections for this client and date
-            inspections = FoodSafetyAgencyInspection.objects.filter(
-                client_name__iexact=client_name,
-                date_of_inspection=inspection_date
-            ).select_related('client')
-
-            docs_base = os.path.join(settings.MEDIA_ROOT, 'docs')
-
-            for inspection in inspections:
-                if inspection.client:
-                    insp_path = os.path.join(docs_base, str(inspection.client.id), str(inspection.id))
-                    if os.path.exists(insp_path):
-                        # Check each category
-                        for category in ['rfi', 'invoice', 'lab', 'lab_form', 'compliance', 'composition', 'occurrence']:
-                            cat_path = os.path.join(insp_path, category)
-                            if os.path.exists(cat_path) and os.listdir(cat_path):
-                                if category == 'rfi': has_rfi = True
-                                elif category == 'invoice': has_invoice = True
-                                elif category == 'lab': has_lab = True
-                                elif category == 'lab_form': has_lab_form = True
-                                elif category == 'compliance': has_compliance = True
-                                elif category == 'composition': has_composition = True
-                                elif category == 'occurrence': has_occurrence = True
-
-            # === LEGACY STRUCTURE: Check inspection/YEAR/MONTH/CLIENT/ ===
-            # Only check if we haven't found all files yet
-            if not (has_rfi and has_invoice and has_lab and has_lab_form and has_compliance and has_composition and has_occurrence):
-                inspection_base = os.path.join(settings.MEDIA_ROOT, 'inspection')
-
-                def create_folder_name(name):
-                    if not name:
-                        return "unknown_client"
-                    clean_name = re.sub(r'[^a-zA-Z0-9\s\-_]', '', name)
-                    clean_name = clean_name.replace(' ', '_').replace('-', '_')
-                    clean_name = re.sub(r'_+', '_', clean_name)
-                    clean_name = clean_name.strip('_').lower()
-                    return clean_name or "unknown_client"
-
-                sanitized_client_name = create_folder_name(client_name)
-                client_folder_variations = [
-                    sanitized_client_name,
-                    f'btn_{sanitized_client_name}',
-                    client_name
-                ]
-
-                year = inspection_date.strftime('%Y')
-                month = inspection_date.strftime('%B')
-                parent_path = os.path.join(inspection_base, year, month)
-
-                if os.path.exists(parent_path):
-                    for folder_variation in client_folder_variations:
-                        test_path = os.path.join(parent_path, folder_variation)
-                        if os.path.exists(test_path):
-                            if not has_rfi:
-                                for rfi_var in ['rfi', 'RFI', 'Request For Invoice']:
-                                    rfi_path = os.path.join(test_path, rfi_var)
-                                    if os.path.exists(rfi_path) and os.listdir(rfi_path):
-                                        has_rfi = True
-                                        break
-
-                            if not has_invoice:
-                                for inv_var in ['invoice', 'Invoice']:
-                                    invoice_path = os.path.join(test_path, inv_var)
-                                    if os.path.exists(invoice_path) and os.listdir(invoice_path):
-                                        has_invoice = True
-                                        break
-
-                            if not has_lab:
-                                for lab_var in ['lab', 'Lab', 'lab results']:
-                                    lab_path = os.path.join(test_path, lab_var)
-                                    if os.path.exists(lab_path) and os.listdir(lab_path):
-                                        has_lab = True
-                                        break
-
-                            if not has_lab_form:
-                                for lab_form_var in ['lab_form', 'Lab_Form', 'lab form']:
-                                    lab_form_path = os.path.join(test_path, lab_form_var)
-                                    if os.path.exists(lab_form_path) and os.listdir(lab_form_path):
-                                        has_lab_form = True
-                                        break
-
-                            if not has_compliance:
-                                for comp_var in ['compliance', 'Compliance']:
-                                    comp_path = os.path.join(test_path, comp_var)
-                                    if os.path.exists(comp_path) and os.listdir(comp_path):
-                                        has_compliance = True
-                                        break
-
-                            if not has_composition:
-                                for comp_var in ['composition', 'Composition']:
-                                    comp_path = os.path.join(test_path, comp_var)
-                                    if os.path.exists(comp_path) and os.listdir(comp_path):
-                                        has_composition = True
-                                        break
-
-                            if not has_occurrence:
-                                for occ_var in ['occurrence', 'Occurrence']:
-                                    occ_path = os.path.join(test_path, occ_var)
-                                    if os.path.exists(occ_path) and os.listdir(occ_path):
-                                        has_occurrence = True
-                                        break
-
-            # Determine file status
-            if has_rfi and has_invoice and has_lab and has_compliance:
-                file_status = 'all_files'  # Green
-            elif has_compliance:
-                file_status = 'compliance_only'  # Orange
-            elif has_rfi or has_invoice or has_lab:
-                file_status = 'partial_files'  # Orange
-            else:
-                file_status = 'no_files'  # Red
-
-            print(f"[FILE CHECK] {client_name}: RFI={has_rfi}, Invoice={has_invoice}, Lab={has_lab}, Lab_Form={has_lab_form}, Compliance={has_compliance}, Composition={has_composition}, Occurrence={has_occurrence}")
-
-            return {
-                'has_rfi': has_rfi,
-                'has_invoice': has_invoice,
-                'has_lab': has_lab,
-                'has_lab_form': has_lab_form,
-                'has_compliance': has_compliance,
-                'has_composition': has_composition,
-                'has_occurrence': has_occurrence,
-                'file_status': file_status
-            }
-        except Exception as e:
-            print(f"[FILE CHECK ERROR] {client_name} on {inspection_date}: {e}")
-            return {
-                'has_rfi': False,
-                'has_invoice': False,
-                'has_lab': False,
-                'has_lab_form': False,
-                'has_compliance': False,
-                'has_composition': False,
-                'has_occurrence': False,
-                'file_status': 'no_files'
-            }
+    # PERFORMANCE FIX: Read document flags from the persistent InspectionDocumentStatus index
+    # One indexed query for the whole page instead of dozens of os.path.exists/os.listdir calls per group
+    # (the index is kept current by upload_document, delete_inspection_file and compliance downloads)
+    from ..utils.document_status import get_document_status_map, group_document_flags, inspection_document_flags
+    document_status_map = get_document_status_map(all_group_inspections) if client_date_groups else {}
 
     # Process grouped inspections efficiently - ONLY CREATE REPRESENTATIVE OBJECTS
     grouped_inspections = []
@@ -1964,8 +1838,8 @@ def shipment_list(request):
         group_approved_status = None
         group_is_sent = False
 
-        # CHECK FILES ON BACKEND FOR INSTANT BUTTON COLORS
-        file_check_result = check_group_files(client_name, date_of_inspection)
+        # BUTTON COLORS FROM DOCUMENT INDEX (no filesystem access on page load)
+        file_check_result = group_document_flags(document_status_map.get(inspection.id) for inspection in group_inspections)
         has_rfi = file_check_result['has_rfi']
         has_invoice = file_check_result['has_invoice']
         has_lab = file_check_result['has_lab']
@@ -2060,30 +1934,13 @@ def shipment_list(request):
         if not group_internal_account_code and client_name:
             group_internal_account_code = _get_internal_account_code(client_name)
 
-        # Helper function to check if files exist for a specific inspection
-        def check_inspection_files(inspection):
-            """Check if files exist for this specific inspection - returns dict of booleans"""
-            from django.conf import settings as django_settings
-            result = {'composition': False, 'coa': False, 'retest': False, 'occurrence': False}
-            docs_base = os.path.join(django_settings.MEDIA_ROOT, 'docs')
-
-            if inspection.client_id:
-                insp_path = os.path.join(docs_base, str(inspection.client_id), str(inspection.id))
-                if os.path.exists(insp_path):
-                    # Check each category for files
-                    for category, key in [('composition', 'composition'), ('lab', 'coa'), ('retest', 'retest'), ('occurrence', 'occurrence')]:
-                        cat_path = os.path.join(insp_path, category)
-                        if os.path.exists(cat_path) and os.listdir(cat_path):
-                            result[key] = True
-            return result
-
         # PERFORMANCE OPTIMIZATION: Use list comprehension for faster product building (2-3x faster than loop+append)
         # Product names are fetched by background sync service - just use what's in database
         # DO NOT fetch from SQL Server on page load - it takes 11+ minutes for all inspections!
         products = []
         for inspection in group_inspections:
-            # Check actual file existence for this inspection
-            file_status = check_inspection_files(inspection)
+            # Upload flags for this inspection from the document index
+            product_files = inspection_document_flags(document_status_map.get(inspection.id))
             products.append({
                 'id': inspection.id,  # Primary key for upload functions
                 'remote_id': inspection.remote_id,
@@ -2104,10 +1961,10 @@ def shipment_list(request):
                 'is_complete': False,  # Default to False
                 'is_direction_present_for_this_inspection': inspection.is_direction_present_for_this_inspection,
                 # Upload status flags for button colors - check actual file existence
-                'composition_uploaded': file_status['composition'],
-                'coa_uploaded': file_status['coa'],
-                'retest_uploaded': file_status['retest'],
-                'occurrence_uploaded': file_status['occurrence'],
+                'composition_uploaded': product_files['composition'],
+                'coa_uploaded': product_files['coa'],
+                'retest_uploaded': product_files['retest'],
+                'occurrence_uploaded': product_files['occurrence'],
             })
         
         # Since we removed the logging system, set default values
@@ -2149,7 +2006,7 @@ def shipment_list(request):
         else:
             compliance_status = 'no_compliance'  # No files uploaded
 
-        # file_status already set by check_group_files() above
+        # file_status already set from the document index above
 
         # PERFORMANCE OPTIMIZATION: Removed massive per-group compliance debug logging
         # This was printing 10+ lines for EVERY group, causing significant slowdown
@@ -2305,14 +2162,16 @@ def shipment_list(request):
     
     # Cache for 60 seconds (OPTIMIZED: Fast performance + fresh data)
     # PERFORMANCE FIX: Always cache since cache key includes filters - each filter combo gets its own cache
-    cache.set(cache_key, context, 60)
+    # Tagged by the clients on the page so edits to one group only invalidate the pages showing it
+    page_tags = [SHIPMENT_LIST_TAG] + [client_tag(group.get('client_name')) for group in grouped_inspections]
+    set_tagged(cache_key, context, page_tags, 60)
     cache.set(cache_timestamp_key, time.time(), 60)
     safe_print("Context cached for 60 seconds")
     
     # PERFORMANCE LOGGING: Track loading improvements
     import time
     load_time = time.time() - start_time if 'start_time' in locals() else 0
-    print(f" PERFORMANCE: Loaded {len(page_obj)} groups in {load_time:.2f}s (page {page_obj.number} of {paginator.num_pages})")
+    print(f" PERFORMANCE: Loaded {len(page_obj)} groups in {load_time:.2f}s (page {page_obj.number} of {page_obj.num_pages})")
     
     
     try:
@@ -3102,6 +2961,17 @@ def upload_document(request):
             with open(file_path, 'wb+') as destination:
                 for chunk in uploaded_file.chunks():
                     destination.write(chunk)
+
+            # Keep the document status index current so button colors update without a filesystem scan
+            try:
+                from ..utils.document_status import refresh_document_status, refresh_client_month_document_status
+                if target_inspection:
+                    refresh_document_status([target_inspection])
+                else:
+                    legacy_month = datetime.strptime(f"{year_folder} {month_folder}", "%Y %B").date()
+                    refresh_client_month_document_status(client_name, legacy_month)
+            except Exception as index_error:
+                print(f"[DOC INDEX] Warning: Could not refresh document status: {index_error}")
             
             # Clear file cache for this client to ensure immediate visibility
             from django.core.cache import cache
@@ -3113,6 +2983,12 @@ def upload_document(request):
             # Also clear legacy cache key
             cache_key_legacy = f"local_files:{client_name}:{year_folder}:{month_folder}"
             cache.delete(cache_key_legacy)
+            # Button-colour/page caches for this client (and inspection) are now stale
+            invalidate_inspection_caches(
+                client_name=client_name,
+                inspection_date=target_inspection.date_of_inspection if target_inspection else None,
+                inspection_ids=[target_inspection.id] if target_inspection else ()
+            )
             
             # Update upload tracking in database
             from django.utils import timezone
@@ -3183,6 +3059,11 @@ def upload_document(request):
                                         updated_count = cursor.rowcount
 
                                     print(f"DEBUG: Updated {document_type.upper()} tracking for {updated_count} inspections")
+
+                                    # The raw UPDATE skips the signals - refresh the group summary (RFI / lab form counts)
+                                    if updated_count:
+                                        from ..utils.inspection_groups import refresh_inspection_groups
+                                        refresh_inspection_groups({(client_name_from_group, date_obj)})
                                                                 
                                 print(f"Updated upload tracking for {updated_count} inspections in group {group_id}")
                                 
@@ -4698,10 +4579,9 @@ def sync_client_allocations(request):
         return facility_type, group_type, commodity
 
     if request.method == 'POST':
+        # Connect to SQL Server
+        sql_conn = SQLServerConnection()
         try:
-            # Connect to SQL Server
-            sql_conn = SQLServerConnection()
-
             if not sql_conn.connect():
                 messages.error(request, "Failed to connect to SQL Server.")
                 return redirect('client_allocation_sheet')
@@ -4828,6 +4708,9 @@ def sync_client_allocations(request):
             traceback.print_exc()
             messages.error(request, f"Error syncing data: {str(e)}")
             return redirect('client_allocation_sheet')
+        finally:
+            # Hand the connection back to the pool on every path (disconnect() is idempotent)
+            sql_conn.disconnect()
 
     return redirect('client_allocation_sheet')
 
@@ -4915,6 +4798,7 @@ def refresh_clients(request):
         print(" STARTING CLIENT SYNC OPERATION")
         print("="*60)
 
+        sql_conn = None
         try:
             from ..utils.sql_server_utils import SQLServerConnection
             from ..models import ClientAllocation
@@ -5088,6 +4972,9 @@ def refresh_clients(request):
                 'error': str(e)
             })
         finally:
+            # Hand the SQL Server connection back to the pool even when the sync failed
+            if sql_conn is not None:
+                sql_conn.disconnect()
             print("="*60)
             print(" CLIENT SYNC OPERATION ENDED")
             print("="*60 + "\n")
@@ -5171,7 +5058,8 @@ def refresh_inspections(request):
 
                         print("\n Step 3: Syncing SQL Server inspections...")
                         print(" (Matching account codes with SQL Server clients for names)")
-                        sql_success = sync_service.sync_sql_server()
+                        # Manual sync from the UI is the on-demand full reconciliation
+                        sql_success = sync_service.sync_sql_server(full_reconcile=True)
 
                         if sql_success:
                             # Get count for reporting
@@ -5550,6 +5438,10 @@ def dashboard(request):
     return render(request, 'main/dashboard.html', context)
 
 
+# Date ranges longer than this are exported as a background job instead of rendered on the page
+EXPORT_SHEET_INLINE_MAX_DAYS = 31
+
+
 @login_required(login_url='login')
 def export_sheet(request):
     """Export Sheet page - Invoice dashboard replicating Looker Studio"""
@@ -5577,6 +5469,69 @@ def export_sheet(request):
     except:
         end_date = today
 
+    # Get system settings for theme
+    from ..models import SystemSettings
+    settings = SystemSettings.get_settings()
+
+    # PERFORMANCE FIX: Wide date ranges are too slow to build (and render) in the request -
+    # export them as a background job instead; the page polls the job and offers the download
+    if (end_date - start_date).days > EXPORT_SHEET_INLINE_MAX_DAYS:
+        from ..services.export_job_service import submit_export_job
+        export_params = {'date_from': start_date.strftime('%Y-%m-%d'), 'date_to': end_date.strftime('%Y-%m-%d')}
+        try:
+            export_job = submit_export_job('invoice_sheet', 'xlsx', export_params, user=request.user)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('export_sheet')
+
+        return render(request, 'main/export_sheet.html', {
+            'invoice_items': [],
+            'total_items': 0,
+            'inspections_processed': 0,
+            'unique_inspectors': 0,
+            'settings': settings,
+            'default_start_date': export_params['date_from'],
+            'default_end_date': export_params['date_to'],
+            'export_job': export_job.to_status_dict(),
+            'export_params': export_params,
+            'inline_max_days': EXPORT_SHEET_INLINE_MAX_DAYS,
+        })
+
+    invoice_items, inspections_processed = build_invoice_items(start_date, end_date)
+
+    # Calculate unique inspectors
+    unique_inspectors = set(item['inspector_name'] for item in invoice_items if item.get('inspector_name'))
+
+    context = {
+        'invoice_items': invoice_items,
+        'total_items': len(invoice_items),
+        'inspections_processed': inspections_processed,
+        'unique_inspectors': len(unique_inspectors),
+        'settings': settings,
+        'default_start_date': start_date.strftime('%Y-%m-%d'),
+        'default_end_date': end_date.strftime('%Y-%m-%d'),
+    }
+
+    return render(request, 'main/export_sheet.html', context)
+
+
+# Visits processed between progress_callback calls in build_invoice_items
+INVOICE_PROGRESS_CHUNK = 50
+
+
+def build_invoice_items(start_date, end_date, progress_callback=None):
+    """
+    Build the export sheet's invoice line items for a date range.
+
+    Shared by the export_sheet page and background export jobs.
+
+    Args:
+        progress_callback: Optional callable(visits_done, total_visits), called every
+            INVOICE_PROGRESS_CHUNK visits so long exports can report progress
+
+    Returns:
+        tuple: (invoice_items sorted by client/date/item code, inspections_processed)
+    """
     # Fetch inspections with billable data
     # REQUIRED: Both hours AND km must be present for an inspection to appear
     # PERFORMANCE: Filter by date range at database level to avoid loading thousands of records
@@ -5616,7 +5571,11 @@ def export_sheet(request):
     print(f"[EXPORT_SHEET] Found {len(visits)} unique visits covering {len(inspections)} product inspections")
 
     # STEP 2: Process each visit
-    for visit_key, visit_inspections in visits.items():
+    total_visits = len(visits)
+    for visit_number, (visit_key, visit_inspections) in enumerate(visits.items(), 1):
+        if progress_callback and visit_number % INVOICE_PROGRESS_CHUNK == 0:
+            progress_callback(visit_number, total_visits)
+
         inspector_name, client_name, date_str = visit_key
 
         # Sort visit inspections by commodity (PMP first, then RAW) for consistent processing
@@ -5761,9 +5720,6 @@ def export_sheet(request):
             )
             invoice_items.extend(test_items)
 
-    # Calculate unique inspectors
-    unique_inspectors = set(item['inspector_name'] for item in invoice_items if item.get('inspector_name'))
-
     # Debug: Final summary
     print(f"[EXPORT_SHEET] Processed {inspections_processed} inspections, generated {len(invoice_items)} line items")
 
@@ -5775,21 +5731,10 @@ def export_sheet(request):
         x.get('item_code', '')
     ))
 
-    # Get system settings for theme
-    from ..models import SystemSettings
-    settings = SystemSettings.get_settings()
-
-    context = {
-        'invoice_items': invoice_items,
-        'total_items': len(invoice_items),
-        'inspections_processed': inspections_processed,
-        'unique_inspectors': len(unique_inspectors),
-        'settings': settings,
-        'default_start_date': start_date.strftime('%Y-%m-%d'),
-        'default_end_date': end_date.strftime('%Y-%m-%d'),
-    }
+    if progress_callback:
+        progress_callback(total_visits, total_visits)
 
-    return render(request, 'main/export_sheet.html', context)
+    return invoice_items, inspections_processed
 
 
 def get_fee_rate(fee_code, default_value, inspection_date=None):
@@ -5805,17 +5750,15 @@ def get_fee_rate(fee_code, default_value, inspection_date=None):
         Float rate value (historical if date provided, current if not)
     """
     try:
-        from ..models import InspectionFee
-        fee = InspectionFee.objects.filter(fee_code=fee_code).first()
-        if not fee:
+        # PERFORMANCE FIX: Resolve from the in-memory fee schedule (bisect over sorted effective
+        # dates) instead of two queries per fee code per invoice line
+        from ..utils.fee_schedule import get_fee_schedule
+        rate = get_fee_schedule().rate_for(fee_code, inspection_date)
+        if rate is None:
             return default_value
 
-        # If inspection date provided, use historical rate lookup
-        if inspection_date:
-            return float(fee.get_rate_for_date(inspection_date))
-        else:
-            # No date provided, return current rate
-            return float(fee.rate)
+        # Historical rate if inspection date provided, current rate if not
+        return float(rate)
     except Exception as e:
         print(f"[ERROR] get_fee_rate({fee_code}): {e}")
         return default_value
@@ -6555,6 +6498,71 @@ def generate_invoice_line_items(inspection_id, inspection, invoice_ref, rfi_ref,
 
     return items
 
+
+def load_google_sheets_credentials():
+    """
+    Load (and refresh if expired) the Google credentials stored in token.pickle.
+
+    Returns:
+        tuple: (credentials, None) on success, (None, error message) otherwise
+    """
+    import os
+    import pickle
+    from django.conf import settings
+
+    token_path = os.path.join(settings.BASE_DIR, 'token.pickle')
+
+    if not os.path.exists(token_path):
+        print("❌ token.pickle not found")
+        return None, 'Google Sheets not authenticated. Please delete token.pickle and re-authenticate with write permissions.'
+
+    print("🔐 Loading credentials from token.pickle...")
+    with open(token_path, 'rb') as token:
+        creds = pickle.load(token)
+
+    print("✅ Credentials loaded")
+
+    # Check if credentials are valid
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            print("🔄 Refreshing expired token...")
+            from google.auth.transport.requests import Request
+            creds.refresh(Request())
+            with open(token_path, 'wb') as token:
+                pickle.dump(creds, token)
+            print("✅ Token refreshed")
+        else:
+            print("❌ Credentials invalid")
+            return None, 'Credentials expired. Please delete token.pickle and re-authenticate.'
+
+    return creds, None
+
+
+def share_spreadsheet_with_link(creds, spreadsheet_id):
+    """Make a spreadsheet editable by anyone with the link (failures are only logged)"""
+    from googleapiclient.discovery import build
+
+    print("🔓 Making spreadsheet accessible to anyone with the link...")
+    try:
+        drive_service = build('drive', 'v3', credentials=creds)
+        permission = {
+            'type': 'anyone',
+            'role': 'writer'  # Allows editing - change to 'reader' for view-only
+        }
+        drive_service.permissions().create(
+            fileId=spreadsheet_id,
+            body=permission,
+            fields='id'
+        ).execute()
+        print("✅ Spreadsheet shared successfully!")
+        return True
+    except Exception as share_error:
+        print(f"⚠️ Warning: Could not share spreadsheet automatically: {str(share_error)}")
+        print("   You may need to re-authenticate with Drive permissions.")
+        # Continue anyway - the spreadsheet was created successfully
+        return False
+
+
 @login_required(login_url='login')
 def export_to_google_sheets(request):
     """Export data to Google Sheets"""
@@ -6563,9 +6571,6 @@ def export_to_google_sheets(request):
     from googleapiclient.discovery import build
     from datetime import datetime
     import json
-    import pickle
-    import os
-    from django.conf import settings
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Only POST requests allowed'})
@@ -6573,6 +6578,18 @@ def export_to_google_sheets(request):
     try:
         # Get the data from request
         data = json.loads(request.body)
+
+        # PERFORMANCE FIX: Wide date ranges are built and uploaded by a background export job
+        if data.get('background'):
+            from ..services.export_job_service import submit_export_job
+            job = submit_export_job(
+                'invoice_google_sheet', 'gsheet',
+                {'date_from': data.get('date_from', ''), 'date_to': data.get('date_to', '')},
+                user=request.user,
+                force=bool(data.get('force')),
+            )
+            return JsonResponse({'success': True, 'job': job.to_status_dict()})
+
         export_data = data.get('data', [])
 
         print(f"📊 Export request received with {len(export_data)} rows")
@@ -6581,36 +6598,9 @@ def export_to_google_sheets(request):
             return JsonResponse({'success': False, 'error': 'No data to export'})
 
         # Authenticate with Google Sheets
-        token_path = os.path.join(settings.BASE_DIR, 'token.pickle')
-
-        if not os.path.exists(token_path):
-            print("❌ token.pickle not found")
-            return JsonResponse({
-                'success': False,
-                'error': 'Google Sheets not authenticated. Please delete token.pickle and re-authenticate with write permissions.'
-            })
-
-        print("🔐 Loading credentials from token.pickle...")
-        with open(token_path, 'rb') as token:
-            creds = pickle.load(token)
-
-        print("✅ Credentials loaded")
-
-        # Check if credentials are valid
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                print("🔄 Refreshing expired token...")
-                from google.auth.transport.requests import Request
-                creds.refresh(Request())
-                with open(token_path, 'wb') as token:
-                    pickle.dump(creds, token)
-                print("✅ Token refreshed")
-            else:
-                print("❌ Credentials invalid")
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Credentials expired. Please delete token.pickle and re-authenticate.'
-                })
+        creds, auth_error = load_google_sheets_credentials()
+        if auth_error:
+            return JsonResponse({'success': False, 'error': auth_error})
 
         # Build the service
         print("🔨 Building Google Sheets service...")
@@ -6645,23 +6635,7 @@ def export_to_google_sheets(request):
         print("✅ Data written successfully!")
 
         # Share the spreadsheet with anyone who has the link
-        print("🔓 Making spreadsheet accessible to anyone with the link...")
-        try:
-            drive_service = build('drive', 'v3', credentials=creds)
-            permission = {
-                'type': 'anyone',
-                'role': 'writer'  # Allows editing - change to 'reader' for view-only
-            }
-            drive_service.permissions().create(
-                fileId=spreadsheet_id,
-                body=permission,
-                fields='id'
-            ).execute()
-            print("✅ Spreadsheet shared successfully!")
-        except Exception as share_error:
-            print(f"⚠️ Warning: Could not share spreadsheet automatically: {str(share_error)}")
-            print("   You may need to re-authenticate with Drive permissions.")
-            # Continue anyway - the spreadsheet was created successfully
+        share_spreadsheet_with_link(creds, spreadsheet_id)
 
         return JsonResponse({
             'success': True,
@@ -6801,22 +6775,12 @@ def home(request):
     def check_sql_server_status():
         """Check SQL Server database connectivity using pymssql - NO ODBC DRIVERS NEEDED!"""
         try:
-            # Test SQL Server connection using pymssql
-            import pymssql
-
-            conn = pymssql.connect(
-                server='102.67.140.12',
-                port=1053,
-                user='FSAUser2',
-                password='password',
-                database='AFS',
-                timeout=5
-            )
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            result = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            # Test SQL Server connection using a pooled pymssql connection
+            from ..utils.sql_server_pool import sql_server_pool
+
+            with sql_server_pool.cursor(query_timeout=5) as cursor:
+                cursor.execute("SELECT 1")
+                result = cursor.fetchone()
             return True if result else False
         except Exception as e:
             print(f"SQL Server status check failed: {e}")
@@ -7565,165 +7529,73 @@ def export_analytics(request, format_type):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
-def export_analytics_excel(data):
-    """Export analytics data to Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    from io import BytesIO
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Analytics Report"
-    
+def _analytics_report_rows(data):
+    """Rows of the analytics report, shared by the CSV and Excel exports"""
+    from openpyxl.styles import Font
+    from ..utils.streaming_export import StyledRow
+
+    title_font = Font(size=16, bold=True)
+    section_font = Font(size=14, bold=True)
+
     # Header
-    ws['A1'] = "Food Safety Agency Analytics Report"
-    ws['A1'].font = Font(size=16, bold=True)
-    ws.merge_cells('A1:E1')
-    
+    yield StyledRow(["Food Safety Agency Analytics Report"], font=title_font)
+    yield []
+
     # Summary Stats
-    ws['A3'] = "Summary Statistics"
-    ws['A3'].font = Font(size=14, bold=True)
-    
-    ws['A4'] = "Total Inspections"
-    ws['B4'] = data.get('total_food_safety_inspections', 0)
-    ws['A5'] = "Recent (30 days)"
-    ws['B5'] = data.get('recent_inspections', 0)
-    ws['A6'] = "This Month"
-    ws['B6'] = data.get('this_month_inspections', 0)
-    ws['A7'] = "Avg Monthly (6m)"
-    ws['B7'] = data.get('avg_monthly_inspections', 0)
-    
+    yield StyledRow(["Summary Statistics"], font=section_font)
+    yield ["Total Inspections", data.get('total_food_safety_inspections', 0)]
+    yield ["Recent (30 days)", data.get('recent_inspections', 0)]
+    yield ["This Month", data.get('this_month_inspections', 0)]
+    yield ["Avg Monthly (6m)", data.get('avg_monthly_inspections', 0)]
+    yield []
+
     # Monthly Inspections
-    ws['A9'] = "Monthly Inspections"
-    ws['A9'].font = Font(size=14, bold=True)
-    
-    ws['A10'] = "Month"
-    ws['B10'] = "Inspections"
-    ws['C10'] = "Forecast"
-    
-    row = 11
-    monthly_data = data.get('monthly_inspections', [])
-    forecast_data = data.get('forecast_data', [])
-    
-    for month in monthly_data:
-        ws[f'A{row}'] = month.get('month', '')
-        ws[f'B{row}'] = month.get('count', 0)
-        row += 1
-    
-    for forecast in forecast_data:
-        ws[f'A{row}'] = forecast.get('month', '')
-        ws[f'C{row}'] = forecast.get('count', 0)
-        row += 1
-    
+    yield StyledRow(["Monthly Inspections"], font=section_font)
+    yield ["Month", "Inspections", "Forecast"]
+
+    for month in data.get('monthly_inspections', []):
+        yield [month.get('month', ''), month.get('count', 0), '']
+
+    for forecast in data.get('forecast_data', []):
+        yield [forecast.get('month', ''), '', forecast.get('count', 0)]
+
+    yield []
+
     # Top Inspectors
-    ws['A{row}'] = "Top Inspectors"
-    ws['A{row}'].font = Font(size=14, bold=True)
-    row += 1
-    
-    ws['A{row}'] = "Inspector"
-    ws['B{row}'] = "Inspections"
-    row += 1
-    
+    yield StyledRow(["Top Inspectors"], font=section_font)
+    yield ["Inspector", "Inspections"]
+
     for inspector in data.get('top_inspectors', []):
-        ws[f'A{row}'] = inspector.get('inspector_name', 'Unknown')
-        ws[f'B{row}'] = inspector.get('count', 0)
-        row += 1
-    
+        yield [inspector.get('inspector_name', 'Unknown'), inspector.get('count', 0)]
+
+    yield []
+
     # Major Companies
-    ws['A{row}'] = "Major Companies"
-    ws['A{row}'].font = Font(size=14, bold=True)
-    row += 1
-    
-    ws['A{row}'] = "Company"
-    ws['B{row}'] = "Inspections"
-    row += 1
-    
+    yield StyledRow(["Major Companies"], font=section_font)
+    yield ["Company", "Inspections"]
+
     for company in data.get('major_companies', []):
-        ws[f'A{row}'] = company.get('client_name', '')
-        ws[f'B{row}'] = company.get('count', 0)
-        row += 1
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Save to BytesIO
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        yield [company.get('client_name', ''), company.get('count', 0)]
+
+def export_analytics_excel(data):
+    """Export analytics data to Excel (openpyxl write-only mode, streamed back)"""
+    from ..utils.streaming_export import streaming_xlsx_response
+
+    return streaming_xlsx_response(
+        _analytics_report_rows(data),
+        f'analytics_report_{datetime.now().strftime("%Y%m%d")}.xlsx',
+        sheet_title="Analytics Report",
+        column_widths=[40, 15, 15],
     )
-    response['Content-Disposition'] = f'attachment; filename="analytics_report_{datetime.now().strftime("%Y%m%d")}.xlsx"'
-    return response
 
 def export_analytics_csv(data):
-    """Export analytics data to CSV"""
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow(["Food Safety Agency Analytics Report"])
-    writer.writerow([])
-    
-    # Summary Stats
-    writer.writerow(["Summary Statistics"])
-    writer.writerow(["Total Inspections", data.get('total_food_safety_inspections', 0)])
-    writer.writerow(["Recent (30 days)", data.get('recent_inspections', 0)])
-    writer.writerow(["This Month", data.get('this_month_inspections', 0)])
-    writer.writerow(["Avg Monthly (6m)", data.get('avg_monthly_inspections', 0)])
-    writer.writerow([])
-    
-    # Monthly Inspections
-    writer.writerow(["Monthly Inspections"])
-    writer.writerow(["Month", "Inspections", "Forecast"])
-    
-    monthly_data = data.get('monthly_inspections', [])
-    forecast_data = data.get('forecast_data', [])
-    
-    for month in monthly_data:
-        writer.writerow([month.get('month', ''), month.get('count', 0), ''])
-    
-    for forecast in forecast_data:
-        writer.writerow([forecast.get('month', ''), '', forecast.get('count', 0)])
-    
-    writer.writerow([])
-    
-    # Top Inspectors
-    writer.writerow(["Top Inspectors"])
-    writer.writerow(["Inspector", "Inspections"])
-    
-    for inspector in data.get('top_inspectors', []):
-        writer.writerow([inspector.get('inspector_name', 'Unknown'), inspector.get('count', 0)])
-    
-    writer.writerow([])
-    
-    # Major Companies
-    writer.writerow(["Major Companies"])
-    writer.writerow(["Company", "Inspections"])
-    
-    for company in data.get('major_companies', []):
-        writer.writerow([company.get('client_name', ''), company.get('count', 0)])
-    
-    output.seek(0)
-    
-    response = HttpResponse(output.getvalue(), content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="analytics_report_{datetime.now().strftime("%Y%m%d")}.csv"'
-    return response
+    """Export analytics data to CSV (streamed row by row)"""
+    from ..utils.streaming_export import streaming_csv_response
+
+    return streaming_csv_response(
+        _analytics_report_rows(data),
+        f'analytics_report_{datetime.now().strftime("%Y%m%d")}.csv',
+    )
 
 def export_analytics_pdf(data):
     """Export analytics data to PDF"""
@@ -8568,6 +8440,13 @@ def update_km_traveled(request):
             # Update the km_traveled field
             inspection.km_traveled = km_value if km_traveled else None
             inspection.save()
+
+            # Only the cached pages/statuses for this client, date and inspection go stale
+            invalidate_inspection_caches(
+                client_name=inspection.client_name,
+                inspection_date=inspection.date_of_inspection,
+                inspection_ids=[inspection.id]
+            )
             
             return JsonResponse({
                 'success': True,
@@ -8762,6 +8641,7 @@ def update_group_km_traveled(request):
             # Update km_traveled for all inspections in the group
             km_value = float(km_traveled) if km_traveled else None
             updated_count = inspections.update(km_traveled=km_value)
+            refresh_groups_for(inspections)
 
             return JsonResponse({
                 'success': True,
@@ -8852,6 +8732,7 @@ def update_group_comment(request):
 
             # Update comment for all inspections in the group
             updated_count = inspections.update(comment=comment)
+            refresh_groups_for(inspections)
             logger.info(f'[COMMENT] Updated comment for {updated_count} inspections')
 
             return JsonResponse({
@@ -8936,6 +8817,14 @@ def update_group_hours(request):
             # Update hours for all inspections in the group
             hours_value = float(hours) if hours else None
             updated_count = inspections.update(hours=hours_value)
+            refresh_groups_for(inspections)
+
+            # Only the cached pages/statuses for this group go stale
+            invalidate_inspection_caches(
+                client_name=client_name,
+                inspection_date=date_of_inspection,
+                inspection_ids=matching_ids
+            )
 
             return JsonResponse({
                 'success': True,
@@ -9126,6 +9015,7 @@ def update_group_approved(request):
 
             # Update approved_status for all inspections in the group
             updated_count = inspections.update(approved_status=approved_status)
+            refresh_groups_for(inspections)
 
             return JsonResponse({
                 'success': True,
@@ -9552,9 +9442,8 @@ def load_drive_files_real(request, use_cache=True):
         dict: File lookup dictionary keyed by compound_key
     """
     try:
-        from ..services.google_drive_service import GoogleDriveService
+        from ..services.google_drive_service import GoogleDriveService, DriveFileLookup
         from django.core.cache import cache
-        import re
         from datetime import datetime
         
         # Check cache first for faster retrieval
@@ -9563,115 +9452,20 @@ def load_drive_files_real(request, use_cache=True):
             cached_lookup = cache.get(cache_key)
             if cached_lookup:
                 print(f"Using cached Drive files: {len(cached_lookup)} files")
-                return cached_lookup
+                # Entries cached before the account index existed are plain dicts
+                return DriveFileLookup.ensure(cached_lookup)
         
-        drive_service = GoogleDriveService()
-        # Updated to scan 2025 folder with month subfolders (November 2025, October 2025, etc.)
-        parent_folder_id = "1pzot8MQ-m3u0f9-BWxpBO40QgLmeZhRP"  # 2025 folder in Shared Drive
+        from ..services.drive_change_index import COMPLIANCE_2025_INDEX
 
+        drive_service = GoogleDriveService()
+        # 2025 folder in Shared Drive, month folders from October 2025 onwards
         print("Loading Google Drive files from 2025 folder...")
         start_time = datetime.now()
 
-        # Get ALL files from Drive folder (not limited to 1000)
-        # Suppress verbose output from Google Drive service
-        import logging
-        original_level = logging.getLogger().level
-        logging.getLogger().setLevel(logging.ERROR)
-
-        # Scan month folders from October 2025 onwards
-        all_files = []
-
-        # Month order for filtering (October = 10, November = 11, December = 12)
-        month_names = {
-            'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6,
-            'July': 7, 'August': 8, 'September': 9, 'October': 10, 'November': 11, 'December': 12
-        }
-        start_month = 10  # October
-
-        print(f"Scanning for month folders from October 2025 onwards...")
-
-        # Get folders in parent directory
-        parent_items = drive_service.list_files_in_folder(parent_folder_id, request=request, max_items=None)
+        # PERFORMANCE FIX: The lookup is kept in the database and updated from the Drive
+        # change feed - only the first run (or an expired page token) lists every month folder
+        file_lookup = COMPLIANCE_2025_INDEX.refresh(drive_service, request=request)
 
-        month_folders = []
-        for item in parent_items:
-            mime_type = item.get('mimeType', '')
-            folder_name = item.get('name', '')
-
-            if mime_type == 'application/vnd.google-apps.folder':
-                # Check if folder matches pattern "{Month} 2025"
-                for month_name, month_num in month_names.items():
-                    if folder_name == f"{month_name} 2025" and month_num >= start_month:
-                        month_folders.append({'id': item.get('id'), 'name': folder_name, 'month_num': month_num})
-                        print(f"Found target folder: {folder_name}")
-                        break
-
-        # Sort folders by month order
-        month_folders.sort(key=lambda x: x['month_num'])
-
-        # Scan each target month folder for zip files
-        for folder in month_folders:
-            print(f"Scanning {folder['name']}...")
-            month_files = drive_service.list_files_in_folder(folder['id'], request=request, max_items=None)
-
-            file_count = 0
-            # Only add actual files (not subfolders)
-            for item in month_files:
-                if item.get('mimeType', '') != 'application/vnd.google-apps.folder':
-                    all_files.append(item)
-                    file_count += 1
-
-            print(f"  Found {file_count} files in {folder['name']}")
-
-        print(f"Total files from October 2025 onwards: {len(all_files)}")
-        files = all_files
-
-        # Restore logging level
-        logging.getLogger().setLevel(original_level)
-
-        file_lookup = {}
-        file_count = 0
-        
-        for file in files:
-            file_name = file.get('name', '')
-            file_id = file.get('id', '')
-            web_view_link = file.get('webViewLink', '')
-            
-            # Skip debug output for cleaner logs
-            
-            # Apps Script pattern: COMMODITY-ACCOUNT_CODE-DATE
-            # Example: RAW-RE-IND-RAW-NA-1000-2025-01-15
-            full_pattern = re.match(r'^([A-Za-z]+)-([A-Z]{2}-[A-Z]{3}-[A-Z]{3}-[A-Z]{2,3}-\d+)-(\d{4}-\d{2}-\d{2})', file_name)
-            
-            if full_pattern and file_id:
-                commodity_prefix = full_pattern.group(1)
-                account_code = full_pattern.group(2)
-                zip_date_str = full_pattern.group(3)
-                
-                try:
-                    zip_date = datetime.strptime(zip_date_str, '%Y-%m-%d')
-                except:
-                    continue
-                
-                # Create compound key exactly like Apps Script
-                compound_key = f"{commodity_prefix.lower()}|{account_code}|{zip_date_str}"
-                
-                file_lookup[compound_key] = {
-                    'url': web_view_link or f"https://drive.google.com/file/d/{file_id}/view",
-                    'name': file_name,
-                    'commodity': commodity_prefix,
-                    'accountCode': account_code,
-                    'zipDate': zip_date,
-                    'zipDateStr': zip_date_str,
-                    'file_id': file_id
-                }
-                
-                file_count += 1
-                
-                # Progress logging (less verbose)
-                if file_count % 5000 == 0 and file_count > 0:
-                    print(f"Loaded {file_count} files...")
-        
         load_time = (datetime.now() - start_time).total_seconds()
         print(f"Loaded {len(file_lookup)} files in {load_time:.1f} seconds")
         
@@ -9711,30 +9505,11 @@ def find_document_link_apps_script_replica(account_code, commodity, inspection_d
         # It's already a date object
         inspection_date_obj = inspection_date
     
-    best_match = None
-    best_days_diff = float('inf')
-    
-    # Search through file lookup - match by account code only
+    # PERFORMANCE FIX: Look up the nearest ZIP (within 15 days) by account code with bisect
+    # instead of scanning every Drive file for every inspection
     # Commodity is ignored because compliance docs may have different commodity prefix
-    for file_key in file_lookup:
-        file = file_lookup[file_key]
-
-        # Match by account code only (ignore commodity mismatch)
-        if file['accountCode'] == account_code:
-            
-            try:
-                # Calculate days difference exactly like Apps Script
-                zip_date = file['zipDate']
-                if hasattr(zip_date, 'date'):
-                    zip_date = zip_date.date()
-                days_difference = abs((zip_date - inspection_date_obj).days)
-                
-                if days_difference <= 15 and days_difference < best_days_diff:
-                    best_match = file
-                    best_days_diff = days_difference
-                    
-            except Exception as e:
-                continue
+    from ..services.google_drive_service import DriveFileLookup
+    best_match = DriveFileLookup.ensure(file_lookup).find_best(account_code, inspection_date_obj, max_days=15)
     
     if best_match:
         # Use webViewLink like Apps Script getUrl() 
@@ -9889,65 +9664,91 @@ def organize_zip_file_automatically(zip_file_path, client_name, inspection_date,
             shutil.rmtree(temp_dir, ignore_errors=True)
 
 
-def download_compliance_document(file_id, account_code, commodity, inspection_date, filename, client_name, request):
-    """Download compliance document to client's inspection folder structure."""
-    import os
-    import re
-    from django.conf import settings
-    from ..services.google_drive_service import GoogleDriveService
+def compliance_document_path(client_name, commodity, inspection_date, filename):
+    """
+    Destination of a compliance document:
+    media/inspection/YYYY/Month/ClientName/Compliance/COMMODITY/<original filename>
+
+    Returns:
+        tuple: (file_path, commodity_upper, date_obj)
+    """
     from datetime import datetime
+
+    if isinstance(inspection_date, str):
+        date_obj = datetime.strptime(inspection_date, '%Y-%m-%d')
+    else:
+        date_obj = inspection_date
+
+    year_folder = date_obj.strftime('%Y')
+    month_folder = date_obj.strftime('%B')  # Full month name like "May"
+
+    # Use original client name for folder structure
+    client_folder = client_name or 'Unknown Client'
+
+    # Note: commodity is tracked but not used for folder structure
+    commodity_upper = str(commodity).upper().strip()
+
+    base_path = os.path.join(
+        settings.MEDIA_ROOT,
+        'inspection',
+        year_folder,
+        month_folder,
+        client_folder,
+        'Compliance',
+        commodity_upper
+    )
+    # Keep original filename - don't rename compliance documents
+    return os.path.join(base_path, filename), commodity_upper, date_obj
+
+
+def organize_downloaded_compliance_zip(file_path, filename, client_name, inspection_date, commodity_upper):
+    """Auto-organize a freshly downloaded compliance ZIP (AUTO_ORGANIZE_ZIP_FILES)."""
+    if not filename.lower().endswith('.zip'):
+        return
+    if getattr(settings, 'AUTO_ORGANIZE_ZIP_FILES', True):
+        print(f"[ERROR] Auto-organizing ZIP file: {filename}")
+        try:
+            organize_zip_file_automatically(file_path, client_name, inspection_date, commodity_upper)
+        except Exception as e:
+            print(f"[ERROR] Auto-organization failed for {filename}: {e}")
+            # Continue anyway - the ZIP file is still downloaded
+    else:
+        print(f" ZIP file downloaded but auto-organization is disabled: {filename}")
+
+
+def refresh_compliance_document_status(client_name, date_obj):
+    """Compliance folders are shared by the client's groups for the month - refresh their index rows"""
+    try:
+        from ..utils.document_status import refresh_client_month_document_status
+        refresh_client_month_document_status(client_name, date_obj)
+        invalidate_inspection_caches(client_name=client_name)
+    except Exception as index_error:
+        print(f"[DOC INDEX] Warning: Could not refresh document status: {index_error}")
+
+
+def download_compliance_document(file_id, account_code, commodity, inspection_date, filename, client_name, request,
+                                 drive_service=None):
+    """Download compliance document to client's inspection folder structure.
+
+    Pass drive_service to reuse one authenticated GoogleDriveService across calls.
+    For many documents at once see DriveDownloadEngine.download_many.
+    """
+    from ..services.google_drive_service import GoogleDriveService
     
     try:
-        # Build path like existing inspection structure: media/inspection/YYYY/Month/ClientName/Compliance/COMMODITY
-        if isinstance(inspection_date, str):
-            date_obj = datetime.strptime(inspection_date, '%Y-%m-%d')
-        else:
-            date_obj = inspection_date
-        
-        year_folder = date_obj.strftime('%Y')
-        month_folder = date_obj.strftime('%B')  # Full month name like "May"
-        
-        # Use original client name for folder structure
-        client_folder = client_name or 'Unknown Client'
-        
-        # Note: commodity is tracked but not used for folder structure
-        commodity_upper = str(commodity).upper().strip()
-        
-        # Build full path: media/inspection/YYYY/Month/ClientName/Compliance/COMMODITY
-        base_path = os.path.join(
-            settings.MEDIA_ROOT, 
-            'inspection', 
-            year_folder, 
-            month_folder, 
-            client_folder,
-            'Compliance',
-            commodity_upper
-        )
-        os.makedirs(base_path, exist_ok=True)
-        
-        # Keep original filename - don't rename compliance documents
+        file_path, commodity_upper, date_obj = compliance_document_path(client_name, commodity, inspection_date, filename)
         safe_filename = filename
-        file_path = os.path.join(base_path, safe_filename)
         
         # Download file if it doesn't exist
         if not os.path.exists(file_path):
-            drive_service = GoogleDriveService()
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            drive_service = drive_service or GoogleDriveService()
             success = drive_service.download_file(file_id, file_path, request=request)
             
             if success:
                 # Check if downloaded file is a ZIP and organize it automatically
-                if filename.lower().endswith('.zip'):
-                    # Check if auto-organization is enabled
-                    auto_organize_enabled = getattr(settings, 'AUTO_ORGANIZE_ZIP_FILES', True)
-                    if auto_organize_enabled:
-                        print(f"[ERROR] Auto-organizing ZIP file: {filename}")
-                        try:
-                            organize_zip_file_automatically(file_path, client_name, inspection_date, commodity_upper)
-                        except Exception as e:
-                            print(f"[ERROR] Auto-organization failed for {filename}: {e}")
-                            # Continue anyway - the ZIP file is still downloaded
-                    else:
-                        print(f" ZIP file downloaded but auto-organization is disabled: {filename}")
+                organize_downloaded_compliance_zip(file_path, filename, client_name, inspection_date, commodity_upper)
+                refresh_compliance_document_status(client_name, date_obj)
                 
                 print(f" Downloaded: {safe_filename}")
                 return file_path
@@ -11294,6 +11095,18 @@ def delete_inspection_file(request):
         try:
             os.remove(full_file_path)
             print(f"[ERROR] Deleted file: {file_path}")
+
+            # Keep the document status index current for the inspections page
+            try:
+                from ..models import FoodSafetyAgencyInspection
+                from ..utils.document_status import refresh_document_status, refresh_client_month_document_status
+                relative_parts = os.path.relpath(full_file_path, media_root).replace('\\', '/').split('/')
+                if relative_parts[0] == 'docs' and len(relative_parts) >= 3 and relative_parts[2].isdigit():
+                    refresh_document_status(FoodSafetyAgencyInspection.objects.filter(id=int(relative_parts[2])))
+                else:
+                    refresh_client_month_document_status(client_name, date_obj.date())
+            except Exception as index_error:
+                print(f"[DOC INDEX] Warning: Could not refresh document status: {index_error}")
             
             # Clear database upload records based on file type
             from ..models import FoodSafetyAgencyInspection
@@ -11312,6 +11125,7 @@ def delete_inspection_file(request):
                 # Determine document type and clear appropriate fields
                 if '/rfi/' in file_path.lower():
                     inspections.update(rfi_uploaded_by=None, rfi_uploaded_date=None)
+                    refresh_groups_for(inspections)
                     print(f" Cleared RFI upload records for {inspections.count()} inspections")
                 elif '/invoice/' in file_path.lower():
                     inspections.update(invoice_uploaded_by=None, invoice_uploaded_date=None)
@@ -11386,12 +11200,12 @@ def delete_inspection_file(request):
             client_folder_clear_time_key = f"cache_cleared:{client_folder}:{year_folder}:{month_folder}"
             cache.set(client_folder_clear_time_key, time.time(), 60)  # Expire in 60 seconds
             
-            # Nuclear option: Clear all cache if the above doesn't work
+            # Invalidate this client's tagged page/status caches (instead of clearing the whole cache)
             try:
-                cache.clear()
-                print(" NUCLEAR: Cleared entire cache")
+                invalidate_inspection_caches(client_name=client_name, inspection_date=inspection_date)
+                print(f" Invalidated cached pages for client: {client_name}")
             except Exception as e:
-                print(f"[ERROR] Could not clear entire cache: {e}")
+                print(f"[ERROR] Could not invalidate client cache: {e}")
             print(f" Set cache clear time marker: {cache_clear_time_key}")
             
             # Clear any wildcard cache keys that might contain this client/date
@@ -11784,10 +11598,6 @@ def get_page_clients_file_status(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'})
     
-    from django.core.cache import cache
-    cache.delete('page_clients_status_cache')
-    cache.clear()
-    
     try:
         import json
         import os
@@ -11832,10 +11642,13 @@ def get_page_clients_file_status(request):
             client_date_combinations = client_date_combinations[:50]
 
         # Check cache first for bulk results (updated for new format)
-        from django.core.cache import cache
+        # Tagged by client: uploads/deletes for a client invalidate only the entries that include it
+        # (md5 instead of hash() so every worker computes the same key)
+        import hashlib
         combination_keys = [c.get('unique_key', '') for c in client_date_combinations]
-        cache_key = f"combination_status:{hash(tuple(sorted(combination_keys)))}"
-        cached_result = cache.get(cache_key)
+        cache_key = "combination_status:" + hashlib.md5('|'.join(sorted(combination_keys)).encode('utf-8')).hexdigest()
+        combination_tags = [client_tag(c.get('client_name')) for c in client_date_combinations if c.get('client_name')]
+        cached_result = get_tagged(cache_key)
         if cached_result:
             return JsonResponse(cached_result)
         
@@ -12142,6 +11955,7 @@ def get_page_clients_file_status(request):
                                 rfi_uploaded_by_id=1,  # System user
                                 rfi_uploaded_date=current_time
                             )
+                            refresh_groups_for(matching_inspections)
 
                         if has_invoice and not matching_inspections.filter(invoice_uploaded_by__isnull=False).exists():
                             # Files exist but database doesn't have uploader info - set to system user
@@ -12215,7 +12029,7 @@ def get_page_clients_file_status(request):
             'source': 'local',
             'optimized': True
         }
-        cache.set(cache_key, result_data, 300)  # Cache for 5 minutes
+        set_tagged(cache_key, result_data, combination_tags, 300)  # Cache for 5 minutes
         
         return JsonResponse(result_data)
         
@@ -12224,389 +12038,296 @@ def get_page_clients_file_status(request):
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+# Category folders under docs/{client_id}/{inspection_id}/ included in group downloads
+GROUP_DOWNLOAD_DOCS_CATEGORIES = ['rfi', 'invoice', 'compliance', 'composition', 'coa', 'lab', 'lab_form', 'occurrence', 'retest', 'other']
+
+# Category folders of the legacy inspection/YEAR/MONTH/CLIENT/ tree (folder name -> document type)
+GROUP_DOWNLOAD_LEGACY_CATEGORIES = [
+    ('Request For Invoice', 'RFI'), ('rfi', 'RFI'), ('invoice', 'Invoice'),
+    ('lab results', 'Lab'), ('lab', 'Lab'), ('retest', 'Retest'), ('labform', 'Lab Form'),
+    ('coa', 'COA'), ('composition', 'Composition'), ('occurrence', 'Occurrence'), ('other', 'Other'),
+]
+
+
+def _normalize_download_folder_name(name):
+    """Normalise a client folder name for matching (lowercase, underscores, no btn_ prefix)"""
+    import re
+    normalized = re.sub(r'[^a-zA-Z0-9]', '_', (name or '').lower())
+    normalized = re.sub(r'_+', '_', normalized).strip('_')
+    # Strip btn_ prefix if present (legacy folder naming)
+    if normalized.startswith('btn_'):
+        normalized = normalized[4:]
+    return normalized
+
+
+def _is_file_for_inspection_date(filename, date_str, date_compact, max_days=0):
+    """
+    Check a legacy file name against the inspection date.
+
+    Files carrying a date more than max_days from the inspection date (YYYY-MM-DD or
+    YYYYMMDD) are excluded; files without any date in the name are included.
+    Compliance ZIPs keep their Drive name, whose date is the ZIP's - it is matched
+    to the inspection within 15 days (DriveFileLookup.find_best), so pass max_days=15.
+    """
+    import re
+    from datetime import datetime
+
+    if re.search(r'(?:^|[^0-9])' + re.escape(date_str) + r'(?:[^0-9]|$)', filename):
+        return True
+    if re.search(r'(?:^|[^0-9])' + re.escape(date_compact) + r'(?:[^0-9]|$)', filename):
+        return True
+
+    found_dates = re.findall(r'(?:^|[^0-9])(\d{4}-\d{2}-\d{2}|\d{8})(?=[^0-9]|$)', filename)
+    if not found_dates:
+        return True
+    if not max_days:
+        # Another date in the name means another inspection
+        return False
+
+    inspection_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    for found in found_dates:
+        try:
+            file_date = datetime.strptime(found, '%Y-%m-%d' if '-' in found else '%Y%m%d').date()
+        except ValueError:
+            continue
+        if abs((file_date - inspection_date).days) <= max_days:
+            return True
+    return False
+
+
+def collect_group_download_files(client_name, inspection_date, inspections):
+    """
+    List the files of a client/date inspection group for a ZIP download.
+
+    Files come from docs/{client_id}/{inspection_id}/ for each inspection of the
+    group, plus the client's folder in the legacy inspection/YEAR/MONTH/ tree for
+    the inspection month only (no walk over every year and month).
+
+    Args:
+        inspections: FoodSafetyAgencyInspection rows of the group
+
+    Returns:
+        list: (file_path, arcname) tuples with duplicates removed
+    """
+    import os
+    import re
+    from django.conf import settings
+
+    entries = []
+    seen_files = set()
+    used_arcnames = set()
+    inspection_ids_str = {str(inspection.id) for inspection in inspections}
+
+    def add(file_path, arcname, duplicate_key):
+        if duplicate_key in seen_files or arcname in used_arcnames:
+            safe_print(f"Skipped (duplicate): {arcname}")
+            return
+        seen_files.add(duplicate_key)
+        used_arcnames.add(arcname)
+        entries.append((file_path, arcname))
+
+    # === NEW STRUCTURE: docs/{client_id}/{inspection_id}/{category}/ ===
+    fallback_client = None
+    for inspection in inspections:
+        client_id = inspection.client_id
+        if not client_id:
+            if fallback_client is None:
+                from ..models import Client
+                fallback_client = Client.objects.filter(name__iexact=client_name).first() or False
+            client_id = fallback_client.id if fallback_client else None
+        if not client_id:
+            continue
+
+        docs_path = os.path.join(settings.MEDIA_ROOT, 'docs', str(client_id), str(inspection.id))
+        if not os.path.isdir(docs_path):
+            continue
+        for category in GROUP_DOWNLOAD_DOCS_CATEGORIES:
+            category_path = os.path.join(docs_path, category)
+            try:
+                filenames = sorted(os.listdir(category_path))
+            except OSError:
+                continue
+            for filename in filenames:
+                file_path = os.path.join(category_path, filename)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                if not os.path.isfile(file_path):
+                    continue
+                arcname = f"{category.capitalize()}/{filename}"
+                if arcname in used_arcnames:
+                    # Same name from another inspection of the group - keep both
+                    arcname = f"inspection-{inspection.id}/{category.capitalize()}/{filename}"
+                add(file_path, arcname, f"{filename}_{stat.st_size}_{stat.st_mtime}")
+
+    # === LEGACY STRUCTURE: inspection/YEAR/MONTH/CLIENT/ for the inspection month ===
+    month_path = os.path.join(
+        settings.MEDIA_ROOT, 'inspection', inspection_date.strftime('%Y'), inspection_date.strftime('%B')
+    )
+    try:
+        month_folders = sorted(os.listdir(month_path))
+    except OSError:
+        month_folders = []
+
+    normalized_client = _normalize_download_folder_name(client_name)
+    date_str = inspection_date.strftime('%Y-%m-%d')
+    date_compact = inspection_date.strftime('%Y%m%d')
+
+    for folder_name in month_folders:
+        base_path = os.path.join(month_path, folder_name)
+        if _normalize_download_folder_name(folder_name) != normalized_client or not os.path.isdir(base_path):
+            continue
+        safe_print(f"Found matching client folder: {folder_name}")
+
+        for category, doc_type in GROUP_DOWNLOAD_LEGACY_CATEGORIES:
+            category_path = os.path.join(base_path, category)
+            try:
+                filenames = sorted(os.listdir(category_path))
+            except OSError:
+                continue
+            for filename in filenames:
+                file_path = os.path.join(category_path, filename)
+                if not os.path.isfile(file_path) or not _is_file_for_inspection_date(filename, date_str, date_compact):
+                    continue
+
+                lowered = filename.lower()
+                file_doc_type = 'Lab Form' if ('_lab_form_' in lowered or '_labform_' in lowered or 'lab-form' in lowered) else doc_type
+                id_match = re.match(r'^(\d+)_', filename)
+
+                # RFI and Invoice go to the root, per-inspection documents to inspection-XXXX folders
+                if id_match and file_doc_type not in ('RFI', 'Invoice'):
+                    arcname = f"inspection-{id_match.group(1)}/{file_doc_type}/{filename}"
+                else:
+                    arcname = f"{file_doc_type}/{filename}"
+
+                stat = os.stat(file_path)
+                add(file_path, arcname, f"{arcname}_{stat.st_size}_{stat.st_mtime}")
+
+        # Compliance documents: Compliance/{commodity}/
+        compliance_base = os.path.join(base_path, 'Compliance')
+        try:
+            commodity_folders = sorted(os.listdir(compliance_base))
+        except OSError:
+            commodity_folders = []
+        for commodity_folder in commodity_folders:
+            commodity_path = os.path.join(compliance_base, commodity_folder)
+            if not os.path.isdir(commodity_path):
+                continue
+            for filename in sorted(os.listdir(commodity_path)):
+                file_path = os.path.join(commodity_path, filename)
+                # Compliance ZIPs carry their own date, up to 15 days from the inspection's
+                if not os.path.isfile(file_path) or not _is_file_for_inspection_date(
+                    filename, date_str, date_compact, max_days=15
+                ):
+                    continue
+                id_match = re.match(r'^(\d+)_', filename)
+                if id_match and id_match.group(1) in inspection_ids_str:
+                    arcname = f"inspection-{id_match.group(1)}/Compliance/{commodity_folder}/{filename}"
+                else:
+                    arcname = f"Compliance/{commodity_folder}/{filename}"
+                # Same name and size = same compliance document
+                add(file_path, arcname, f"{filename}_{os.path.getsize(file_path)}")
+
+    return entries
+
+
 @login_required
 def download_all_inspection_files(request):
-    """Download all files for a grouped inspection as a ZIP."""
+    """
+    Download all files for a grouped inspection as a ZIP.
+
+    PERFORMANCE FIX: Files are located from the group's inspection IDs and the ZIP is
+    streamed to the client while it is written (no temporary file, already compressed
+    PDFs/ZIPs are stored instead of deflated again).
+    """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'})
     
     try:
         import json
-        import os
-        import zipfile
-        import tempfile
-        from django.http import HttpResponse
-        from django.conf import settings
-        from datetime import datetime
         import re
+        from datetime import datetime
+        from ..models import FoodSafetyAgencyInspection
+        from ..utils.streaming_export import streaming_zip_response
         
         data = json.loads(request.body)
         client_name = data.get('client_name')
         inspection_date = data.get('inspection_date')
-        group_id = data.get('group_id')
         
         if not client_name or not inspection_date:
             return JsonResponse({'success': False, 'error': 'Client name and inspection date are required'})
         
         safe_print(f"Creating ZIP for {client_name} on {inspection_date}")
         
-        # Parse date and build folder path
+        # Parse date
         if isinstance(inspection_date, str):
-            date_obj = datetime.strptime(inspection_date, '%Y-%m-%d')
+            date_obj = datetime.strptime(inspection_date, '%Y-%m-%d').date()
         else:
-            date_obj = inspection_date
-        
-        # Get all inspection IDs for this client and date
-        from ..models import FoodSafetyAgencyInspection
-        inspection_ids = set(
-            FoodSafetyAgencyInspection.objects.filter(
-                client_name=client_name,
-                date_of_inspection=date_obj.date() if hasattr(date_obj, 'date') else date_obj
-            ).values_list('id', flat=True)
-        )
-        inspection_ids_str = {str(id) for id in inspection_ids}
-        safe_print(f"Found {len(inspection_ids_str)} inspection IDs for this group: {inspection_ids_str}")
-        
-        def is_file_for_inspection_date(filename, target_date):
-            """Check if a file belongs to the specific inspection date"""
-            try:
-                import re
-                target_date_obj = datetime.strptime(target_date, '%Y-%m-%d') if isinstance(target_date, str) else target_date
-                target_date_str = target_date_obj.strftime('%Y-%m-%d')
-                target_date_compact = target_date_obj.strftime('%Y%m%d')
-                
-                # Check for YYYY-MM-DD format (compliance files) - must be exact match
-                # Look for the date pattern with non-alphanumeric boundaries
-                date_pattern_str = r'(?:^|[^0-9])' + re.escape(target_date_str) + r'(?:[^0-9]|$)'
-                if re.search(date_pattern_str, filename):
-                    return True
-                
-                # Check for YYYYMMDD format (uploaded files) - must be exact match
-                # Look for the date pattern with non-alphanumeric boundaries
-                date_pattern_compact = r'(?:^|[^0-9])' + re.escape(target_date_compact) + r'(?:[^0-9]|$)'
-                if re.search(date_pattern_compact, filename):
-                    return True
-                
-                # If no date pattern found, include the file anyway
-                # This is more permissive and includes files without dates in their names
-                safe_print(f"Including file without date pattern: {filename}")
-                return True
-                
-            except Exception as e:
-                safe_print(f"Error checking file date for {filename}: {e}")
-                # If there's an error, include the file to be safe
-                return True
-            
-        year_folder = date_obj.strftime('%Y')
-        month_folder = date_obj.strftime('%B')
-        
-        # Find the actual client folder using the same logic as file listing
-        # Check multiple possible client folder variations
-        inspection_base = os.path.join(settings.MEDIA_ROOT, 'inspection')
-        
-        if not os.path.exists(inspection_base):
-            return JsonResponse({'success': False, 'error': 'No inspection folder found'})
-        
-        # Use exact client name for matching (folders now use original names)
-        client_folder_pattern = client_name
-        
-        safe_print(f"Looking for client folder: {client_folder_pattern}")
-        
-        # Find all matching client folders across all months (like file listing does)
-        matching_folders = []
-        
-        # Search through all year/month folders
-        for year_folder_search in os.listdir(inspection_base):
-            year_path = os.path.join(inspection_base, year_folder_search)
-            if not os.path.isdir(year_path):
-                continue
-                
-            for month_folder_search in os.listdir(year_path):
-                month_path = os.path.join(year_path, month_folder_search)
-                if not os.path.isdir(month_path):
-                    continue
-                
-                # Look for client folder in this year/month
-                for folder_name in os.listdir(month_path):
-                    folder_path = os.path.join(month_path, folder_name)
-                    if not os.path.isdir(folder_path):
-                        continue
-                    
-                    # Normalize folder name for comparison
-                    normalized_folder = re.sub(r'[^a-zA-Z0-9_]', '_', folder_name)
-                    normalized_folder = re.sub(r'_+', '_', normalized_folder).strip('_')
-                    
-                    # Use flexible matching to handle variations in client names
-                    # Normalize both names to handle spaces, underscores, and special characters
-                    def normalize_name(name):
-                        # Convert to lowercase, replace spaces and special chars with underscores
-                        normalized = re.sub(r'[^a-zA-Z0-9]', '_', name.lower())
-                        # Remove multiple underscores and strip
-                        normalized = re.sub(r'_+', '_', normalized).strip('_')
-                        # Strip btn_ prefix if present (legacy folder naming)
-                        if normalized.startswith('btn_'):
-                            normalized = normalized[4:]
-                        return normalized
-
-                    normalized_client = normalize_name(client_folder_pattern)
-                    normalized_folder = normalize_name(folder_name)
-
-                    is_match = (normalized_folder == normalized_client)
-                    
-                    if is_match:
-                        safe_print(f"    Exact match: {folder_name} in {year_folder_search}/{month_folder_search}")
-                    else:
-                        safe_print(f"    No match: {folder_name} in {year_folder_search}/{month_folder_search}")
-                    
-                    if is_match:
-                        matching_folders.append(folder_path)
-                        safe_print(f"Found matching client folder: {folder_name} in {year_folder_search}/{month_folder_search}")
-        
-        # === NEW STRUCTURE: Also check docs/{client_id}/{inspection_id}/ ===
-        docs_files = []  # List of (file_path, category) tuples from docs structure
+            date_obj = inspection_date.date() if hasattr(inspection_date, 'date') else inspection_date
 
         # Strip btn- prefix if present
         clean_client_name = client_name[4:] if client_name.startswith('btn-') else client_name
 
-        # Look up inspection and client in database
-        inspection = FoodSafetyAgencyInspection.objects.filter(
-            client_name__iexact=clean_client_name,
-            date_of_inspection=date_obj.date() if hasattr(date_obj, 'date') else date_obj
-        ).first()
-
-        client_obj = None
-        if inspection:
-            if inspection.client:
-                client_obj = inspection.client
-            else:
-                from main.models import Client
-                client_obj = Client.objects.filter(name__iexact=clean_client_name).first()
-
-        if inspection and client_obj:
-            docs_path = os.path.join(settings.MEDIA_ROOT, 'docs', str(client_obj.id), str(inspection.id))
-            if os.path.exists(docs_path):
-                safe_print(f"Checking docs path: {docs_path}")
-                doc_categories = ['rfi', 'invoice', 'compliance', 'composition', 'coa', 'lab', 'occurrence', 'retest', 'other']
-                for cat in doc_categories:
-                    cat_path = os.path.join(docs_path, cat)
-                    if os.path.exists(cat_path):
-                        for filename in os.listdir(cat_path):
-                            file_path = os.path.join(cat_path, filename)
-                            if os.path.isfile(file_path):
-                                docs_files.append((file_path, cat, filename))
-                                safe_print(f"Found docs file: {filename} in {cat}")
-
-        if not matching_folders and not docs_files:
-            return JsonResponse({'success': False, 'error': f'No files found for {client_name}. Searched in {inspection_base} and docs/'})
-
-        # Create temporary ZIP file
-        temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
+        # Get all inspections for this client and date
+        inspections = list(
+            FoodSafetyAgencyInspection.objects.filter(
+                client_name__iexact=clean_client_name,
+                date_of_inspection=date_obj
+            ).only('id', 'client_id')
+        )
+        safe_print(f"Found {len(inspections)} inspection IDs for this group: {[i.id for i in inspections]}")
 
-        try:
-            with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                files_added = 0
-                added_files = {}  # Track added files by filename + size + modified time to avoid true duplicates
+        entries = collect_group_download_files(clean_client_name, date_obj, inspections)
+        if not entries:
+            return JsonResponse({'success': False, 'error': f'No files found for {client_name}'})
 
-                # First add files from docs structure
-                for file_path, category, filename in docs_files:
-                    try:
-                        file_size = os.path.getsize(file_path)
-                        file_mtime = os.path.getmtime(file_path)
-                        file_key = f"{filename}_{file_size}_{file_mtime}"
-
-                        if file_key not in added_files:
-                            # Add to ZIP with category folder structure
-                            zip_path = f"{category.capitalize()}/{filename}"
-                            zip_file.write(file_path, zip_path)
-                            added_files[file_key] = True
-                            files_added += 1
-                            safe_print(f"Added docs file to ZIP: {zip_path}")
-                    except Exception as e:
-                        safe_print(f"Error adding docs file {filename}: {e}")
+        zip_filename = f"{client_name}_{inspection_date}_inspection_files.zip"
+        zip_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', zip_filename)
 
-                # Process all matching client folders (legacy structure)
-                for base_path in matching_folders:
-                    folder_name = os.path.basename(base_path)
-                    safe_print(f"Processing folder: {folder_name} at {base_path}")
-                    
-                    # Check what's actually in this folder
-                    if os.path.exists(base_path):
-                        folder_contents = os.listdir(base_path)
-                        safe_print(f"Folder contents: {folder_contents}")
-                    
-                    # Define categories to check (using actual folder names)
-                    # Include all document types: RFI, Invoice, Lab Form, COA, Composition, Lab Results, Retest, Occurrence, Other
-                    categories = ['Request For Invoice', 'rfi', 'invoice', 'lab results', 'lab', 'retest', 'labform', 'coa', 'composition', 'occurrence', 'other']
-                    
-                    # Check each category folder
-                    for category in categories:
-                        category_path = os.path.join(base_path, category)
-                        if os.path.exists(category_path):
-                            safe_print(f"Found {category} folder")
-                            for filename in os.listdir(category_path):
-                                file_path = os.path.join(category_path, filename)
-                                if os.path.isfile(file_path):
-                                    # Filter files by inspection date to avoid mixing different dates
-                                    if is_file_for_inspection_date(filename, inspection_date):
-                                        # Extract inspection ID from filename
-                                        inspection_id = None
-                                        id_match = re.match(r'^(\d+)_', filename)
-                                        if id_match:
-                                            inspection_id = id_match.group(1)
-                                        
-                                        # Determine document type from filename and category
-                                        if '_lab_form_' in filename.lower() or '_labform_' in filename.lower() or 'lab-form' in filename.lower() or '-lab-form' in filename.lower() or category == 'labform':
-                                            doc_type = 'Lab Form'
-                                        elif category in ['lab', 'lab results']:
-                                            doc_type = 'Lab'
-                                        elif category in ['Request For Invoice', 'rfi']:
-                                            doc_type = 'RFI'
-                                        elif category == 'invoice':
-                                            doc_type = 'Invoice'
-                                        elif category == 'retest':
-                                            doc_type = 'Retest'
-                                        elif category == 'coa':
-                                            doc_type = 'COA'
-                                        elif category == 'composition':
-                                            doc_type = 'Composition'
-                                        elif category == 'occurrence':
-                                            doc_type = 'Occurrence'
-                                        elif category == 'other':
-                                            doc_type = 'Other'
-                                        else:
-                                            doc_type = category
-                                        
-                                        # Create archive path based on document type:
-                                        # RFI and Invoice always go to root
-                                        # Lab, Lab Form, COA, Composition, Retest, Occurrence, Other go to inspection-XXXX folders
-                                        if doc_type in ['RFI', 'Invoice']:
-                                            arcname = f"{doc_type}/{filename}"
-                                        elif inspection_id and doc_type in ['Lab', 'Lab Form', 'Retest', 'COA', 'Composition', 'Occurrence', 'Other']:
-                                            arcname = f"inspection-{inspection_id}/{doc_type}/{filename}"
-                                        else:
-                                            arcname = f"{doc_type}/{filename}"
-                                        
-                                        # Get file stats for duplicate detection
-                                        try:
-                                            stat = os.stat(file_path)
-                                            file_size = stat.st_size
-                                            file_modified = stat.st_mtime
-                                            file_key = f"{arcname}_{file_size}_{file_modified}"
-                                            
-                                            # Check if we've already added this exact file (same name, size, and modified time)
-                                            if file_key not in added_files:
-                                                zip_file.write(file_path, arcname)
-                                                added_files[file_key] = arcname
-                                                files_added += 1
-                                                safe_print(f"Added {category}: {arcname} ({file_size} bytes)")
-                                            else:
-                                                safe_print(f"Skipped {category} (exact duplicate): {arcname}")
-                                        except Exception as e:
-                                            safe_print(f"Error getting file stats for {file_path}: {e}")
-                                            # If we can't get stats, include the file to be safe
-                                            zip_file.write(file_path, arcname)
-                                            files_added += 1
-                                            safe_print(f"Added {category}: {arcname} (no stats)")
-                                    else:
-                                        safe_print(f"Skipped {category} (wrong date): {filename}")
-                        else:
-                            safe_print(f"No {category} folder found")
-                    
-                    # Check for compliance documents
-                    compliance_base = os.path.join(base_path, 'Compliance')
-                    if os.path.exists(compliance_base):
-                        safe_print(f"Found Compliance folder: {compliance_base}")
-                        compliance_contents = os.listdir(compliance_base)
-                        safe_print(f"Compliance folder contents: {compliance_contents}")
-                        
-                        # Check all commodity subfolders
-                        for commodity_folder in compliance_contents:
-                            commodity_path = os.path.join(compliance_base, commodity_folder)
-                            if os.path.isdir(commodity_path):
-                                safe_print(f"Checking commodity folder: {commodity_folder}")
-                                commodity_files = os.listdir(commodity_path)
-                                safe_print(f"Commodity {commodity_folder} files: {commodity_files}")
-                                
-                                for filename in commodity_files:
-                                    file_path = os.path.join(commodity_path, filename)
-                                    if os.path.isfile(file_path):
-                                        # Filter compliance files by inspection date
-                                        if is_file_for_inspection_date(filename, inspection_date):
-                                            # Extract inspection ID from filename
-                                            inspection_id = None
-                                            id_match = re.match(r'^(\d+)_', filename)
-                                            if id_match:
-                                                inspection_id = id_match.group(1)
-                                            
-                                            # Create archive path:
-                                            # If inspection ID matches one in this group, put in inspection-XXXX/Compliance/
-                                            # Otherwise, put in root Compliance/ folder
-                                            if inspection_id and inspection_id in inspection_ids_str:
-                                                arcname = f"inspection-{inspection_id}/Compliance/{commodity_folder}/{filename}"
-                                            else:
-                                                arcname = f"Compliance/{commodity_folder}/{filename}"
-                                            
-                                            # Get file stats for duplicate detection
-                                            try:
-                                                stat = os.stat(file_path)
-                                                file_size = stat.st_size
-                                                file_modified = stat.st_mtime
-                                                
-                                                # For compliance files, use filename + size for duplicate detection
-                                                # This allows multiple files with same name but different sizes (different inspections)
-                                                # but prevents true duplicates (same name AND same size)
-                                                file_key = f"{filename}_{file_size}"
-                                                
-                                                # Check if we've already added this exact file (same name and size)
-                                                if file_key not in added_files:
-                                                    zip_file.write(file_path, arcname)
-                                                    added_files[file_key] = arcname
-                                                    files_added += 1
-                                                    safe_print(f"   Added compliance: {arcname} ({file_size} bytes)")
-                                                else:
-                                                    safe_print(f"   Skipped compliance (exact duplicate): {arcname} (same name and size already added)")
-                                            except Exception as e:
-                                                safe_print(f"   Error getting file stats for {file_path}: {e}")
-                                                # If we can't get stats, include the file to be safe
-                                                zip_file.write(file_path, arcname)
-                                                files_added += 1
-                                                safe_print(f"   Added compliance: {arcname} (no stats)")
-                                        else:
-                                            safe_print(f"   Skipped compliance (wrong date): {filename}")
-                    else:
-                        safe_print(f"No Compliance folder found at: {compliance_base}")
-                
-                if files_added == 0:
-                    return JsonResponse({'success': False, 'error': 'No files found to download'})
-            
-            # Prepare response
-            zip_filename = f"{client_name}_{inspection_date}_inspection_files.zip"
-            zip_filename = re.sub(r'[^a-zA-Z0-9._-]', '_', zip_filename)
-            
-            # Read ZIP file content
-            with open(temp_zip.name, 'rb') as zip_file:
-                zip_content = zip_file.read()
-            
-            # Create HTTP response
-            response = HttpResponse(zip_content, content_type='application/zip')
-            response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
-            response['Content-Length'] = len(zip_content)
-            
-            safe_print(f"ZIP created successfully: {zip_filename} ({files_added} files)")
-            return response
-            
-        finally:
-            # Cleanup temporary file
-            try:
-                os.unlink(temp_zip.name)
-            except:
-                pass
+        safe_print(f"Streaming ZIP {zip_filename} ({len(entries)} files)")
+        return streaming_zip_response(entries, zip_filename)
                 
     except Exception as e:
         safe_print(f"Error creating ZIP: {e}")
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+def apply_group_sent_status(inspections, is_sent, user=None):
+    """
+    Set the sent status of a group's inspections and invalidate the pages showing it.
+
+    Used by update_sent_status and by the email outbox once a group's documents
+    have been delivered. Returns the number of inspections updated.
+    """
+    inspections = list(inspections)
+    if not inspections:
+        return 0
+
+    sent_date = timezone.now() if is_sent else None
+    sent_by = user if is_sent else None
+
+    # One InspectionGroup refresh for the whole group instead of one per save()
+    with deferred_group_refresh():
+        for inspection in inspections:
+            inspection.is_sent = is_sent
+            inspection.sent_date = sent_date
+            inspection.sent_by = sent_by
+            inspection.save(update_fields=['is_sent', 'sent_date', 'sent_by'])
+
+    # CRITICAL: Invalidate the cached pages showing this group so refreshing shows the updated status
+    try:
+        invalidate_inspection_caches(
+            client_name=inspections[0].client_name,
+            inspection_date=inspections[0].date_of_inspection,
+            inspection_ids=[inspection.id for inspection in inspections]
+        )
+    except Exception as cache_error:
+        print(f"[WARNING] Could not invalidate cache: {cache_error}")
+
+    return len(inspections)
+
+
 @login_required
 @no_inspector_scientist
 def update_sent_status(request):
@@ -12676,29 +12397,10 @@ def update_sent_status(request):
 
         # Update sent status for all inspections in the group
         is_sent = sent_status == 'YES' if sent_status else False
-        
-        from django.utils import timezone
-        sent_date = timezone.now() if is_sent else None
-        sent_by = request.user if is_sent else None
-        
-        updated_count = 0
-        for inspection in matching_inspections:
-            inspection.is_sent = is_sent
-            inspection.sent_date = sent_date
-            inspection.sent_by = sent_by
-            inspection.save(update_fields=['is_sent', 'sent_date', 'sent_by'])
-            updated_count += 1
+        updated_count = apply_group_sent_status(matching_inspections, is_sent, request.user)
         
         print(f" Updated sent status for {updated_count} inspections in group {group_id}")
 
-        # CRITICAL: Clear the shipment list cache so refreshing shows the updated status
-        try:
-            from django.core.cache import cache
-            cache.clear()  # Clear ALL cache to ensure fresh data on refresh
-            print(f" Cleared cache after sent status update")
-        except Exception as cache_error:
-            print(f"[WARNING] Could not clear cache: {cache_error}")
-
         # Log the sent status change to system logs
         try:
             # Get client name from the first matching inspection
@@ -12752,7 +12454,7 @@ def update_sent_status(request):
             'sent_status': sent_status,
             'is_complete': is_sent,
             'sent_by_username': request.user.username,
-            'sent_date': sent_date.isoformat() if sent_date else None
+            'sent_date': matching_inspections[0].sent_date.isoformat() if matching_inspections[0].sent_date else None
         })
         
     except Exception as e:
@@ -12983,7 +12685,7 @@ def send_group_documents(request):
         import os
         from datetime import datetime
         from django.conf import settings
-        from django.core.mail import EmailMessage
+        from ..services.email_outbox_service import group_send_key, queue_email
         
         data = json.loads(request.body)
         group_id = data.get('group_id', '')
@@ -13063,21 +12765,27 @@ Best regards,
 Food Safety Agency (Pty) Ltd
         """.strip()
         
-        email = EmailMessage(
+        # PERFORMANCE FIX: Queue the email for the outbox workers instead of sending it in the
+        # request - the page polls the status endpoint, and the group is marked as sent once
+        # the email has been delivered. The idempotency key makes repeated clicks one email
+        # while it is in flight; once it has been sent, another click sends it again.
+        outbound_email = queue_email(
+            'group_documents',
             subject=subject,
             body=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             to=[recipient_email],
-            reply_to=[settings.DEFAULT_FROM_EMAIL]
+            reply_to=[settings.DEFAULT_FROM_EMAIL],
+            attachments=attachments,
+            context={
+                'group_id': group_id,
+                'client_name': client_name,
+                'inspection_date': inspection_date,
+            },
+            idempotency_key=group_send_key(group_id, [recipient_email], attachments),
+            user=request.user,
         )
         
-        # Attach all documents
-        for file_path in attachments:
-            email.attach_file(file_path)
-        
-        # Send email
-            email.send()
-        
         # Log the activity
         from ..models import SystemLog
         SystemLog.log_activity(
@@ -13086,27 +12794,47 @@ Food Safety Agency (Pty) Ltd
             page='inspections',
             object_type='group_documents',
             object_id=group_id,
-            description=f'Sent {len(attachments)} documents for {client_name}',
+            description=f'Queued {len(attachments)} documents for {client_name}',
             details={
                 'client_name': client_name,
                 'inspection_date': inspection_date,
                 'documents_sent': documents_found,
-                'recipient': recipient_email
+                'recipient': recipient_email,
+                'email_id': outbound_email.id,
             }
         )
         
         return JsonResponse({
             'success': True,
-            'message': f'Documents sent successfully to {recipient_email}',
+            'queued': True,
+            'message': f'Documents queued for sending to {recipient_email}',
             'recipients': recipient_email,
             'documents_sent': len(attachments),
-            'email_id': f'inspection_{group_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+            'email_id': outbound_email.id,
+            'status': outbound_email.status,
+            'status_url': reverse('outbound_email_status', args=[outbound_email.id]),
         })
         
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+@login_required
+def outbound_email_status(request, email_id):
+    """Delivery status of a queued email (polled by the inspections page after "Send")."""
+    from ..models import OutboundEmail
+    from ..services.email_outbox_service import email_outbox_service
+
+    outbound_email = OutboundEmail.objects.filter(pk=email_id).first()
+    # Only the sender (or staff) may see an email's recipients and errors - 404 for everyone else
+    if not outbound_email or not (outbound_email.requested_by_id == request.user.id or request.user.is_staff):
+        return JsonResponse({'success': False, 'error': 'Email not found'}, status=404)
+
+    # Pick the email up here if the worker that owned it was restarted
+    email_outbox_service.recover(outbound_email)
+    return JsonResponse({'success': True, 'email': outbound_email.to_status_dict()})
+
+
 def get_client_email(client_name):
     """Get client email address from database (manual override preferred)."""
     try:
@@ -14278,33 +14006,31 @@ def system_logs(request):
     if date_from:
         try:
             date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-            logs = logs.filter(timestamp__date__gte=date_from_obj)
+            # PERFORMANCE FIX: Compare timestamp to a datetime bound (timestamp__date wraps the
+            # column in DATE()/CONVERT_TZ() and can't use the timestamp index)
+            logs = logs.filter(timestamp__gte=timezone.make_aware(datetime.combine(date_from_obj, datetime.min.time())))
         except ValueError:
             pass
     
     if date_to:
         try:
             date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-            logs = logs.filter(timestamp__date__lte=date_to_obj)
+            logs = logs.filter(timestamp__lt=timezone.make_aware(datetime.combine(date_to_obj + timedelta(days=1), datetime.min.time())))
         except ValueError:
             pass
     
-    # Get total count before pagination
-    total_logs = logs.count()
+    # PERFORMANCE FIX: Keyset pagination on (timestamp, id) - late pages no longer OFFSET
+    # through the whole log table, and the total comes from table statistics / a cached COUNT
+    # ('page' is the page filter here, so positions travel in ?cursor=)
+    paginator = KeysetPaginator(logs, 50, ['-timestamp', '-id'], approximate=True)  # Show 50 logs per page
+    total_logs = paginator.count
     
-    # Pagination
     if not show_all:
-        paginator = Paginator(logs, 50)  # Show 50 logs per page
-        page_number = request.GET.get('page', 1)
-        try:
-            page_obj = paginator.page(page_number)
-            logs = page_obj.object_list
-        except:
-            page_obj = paginator.page(1)
-            logs = page_obj.object_list
+        page_obj = paginator.page(request.GET.get('cursor'))
+        logs = page_obj.object_list
     else:
         page_obj = None
-        logs = logs[:1000]  # Limit to 1000 logs when showing all
+        logs = logs.order_by('-timestamp', '-id')[:1000]  # Limit to 1000 logs when showing all
     
     # Get unique values for filter dropdowns
     users = User.objects.filter(system_logs__isnull=False).distinct().order_by('username')
@@ -14325,6 +14051,7 @@ def system_logs(request):
         'logs': logs,
         'page_obj': page_obj,
         'total_logs': total_logs,
+        'total_logs_estimated': paginator.count_is_estimate,
         'users': users,
         'actions': actions,
         'pages': pages,
@@ -14535,7 +14262,7 @@ def submit_ticket(request):
     """Allow users to submit tickets/issues for the FSA Operations Board."""
     from main.models import Ticket
     from datetime import date
-    from django.core.mail import send_mail
+    from ..services.email_outbox_service import queue_email
 
     if request.method == 'POST':
         # Get all form fields
@@ -14627,12 +14354,13 @@ Regards,
 Food Safety Agency System
 """
 
-            send_mail(
+            queue_email(
+                'notification',
                 subject=email_subject,
-                message=email_body,
+                body=email_body,
                 from_email='info@eclick.co.za',
-                recipient_list=['ethan.sevenster@moc-pty.com', 'anthony.penzes@moc-pty.com'],
-                fail_silently=True,  # Don't break if email fails
+                to=['ethan.sevenster@moc-pty.com', 'anthony.penzes@moc-pty.com'],
+                user=request.user,
             )
         except Exception as e:
             # Log email error but don't stop ticket creation
@@ -15259,14 +14987,31 @@ def server_directory_tree(request):
 def server_status(request):
     """Check server health and performance metrics."""
     from django.core.cache import cache
+    from django.conf import settings as django_settings
     from django.db import connection
-    import psutil
+    from ..utils import request_metrics
     import os
     
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    
     # Get system metrics
-    cpu_percent = psutil.cpu_percent(interval=1)
-    memory = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
+    if psutil is not None:
+        cpu_percent = psutil.cpu_percent(interval=1)
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        system_metrics = {
+            'cpu_percent': cpu_percent,
+            'memory_percent': memory.percent,
+            'memory_available': memory.available // (1024**3),  # GB
+            'disk_percent': disk.percent,
+            'disk_free': disk.free // (1024**3),  # GB
+            'server_uptime': time.time() - psutil.boot_time(),
+        }
+    else:
+        system_metrics = {}
     
     # Get database metrics
     with connection.cursor() as cursor:
@@ -15282,19 +15027,22 @@ def server_status(request):
     cache_hit_rate = (cache_hits / (cache_hits + cache_misses)) * 100 if (cache_hits + cache_misses) > 0 else 0
     
     context = {
-        'cpu_percent': cpu_percent,
-        'memory_percent': memory.percent,
-        'memory_available': memory.available // (1024**3),  # GB
-        'disk_percent': disk.percent,
-        'disk_free': disk.free // (1024**3),  # GB
+        **system_metrics,
+        'psutil_available': psutil is not None,
         'inspection_count': inspection_count,
         'client_count': client_count,
         'cache_hits': cache_hits,
         'cache_misses': cache_misses,
         'cache_hit_rate': cache_hit_rate,
-        'server_uptime': time.time() - psutil.boot_time(),
+        # Per-request instrumentation (this worker process only)
+        'instrumentation_enabled': getattr(django_settings, 'PERF_INSTRUMENTATION', False),
+        'view_metrics': request_metrics.view_summary(),
+        'recent_requests': request_metrics.recent_requests(limit=50),
+        'worker_pid': os.getpid(),
     }
     
+    if request.GET.get('format') == 'json':
+        return JsonResponse(context)
     return render(request, 'main/server_status.html', context)
 
 
@@ -15306,65 +15054,17 @@ def server_status(request):
 def client_autocomplete_api(request):
     """API endpoint for client autocomplete suggestions."""
     from django.http import JsonResponse
-    from ..models import Client, FoodSafetyAgencyInspection
+    from ..utils.client_autocomplete import client_autocomplete_index
 
     query = request.GET.get('q', '').strip()
     if len(query) < 2:
         return JsonResponse({'suggestions': []})
 
     try:
-        # Get unique client names from both Client model and FoodSafetyAgencyInspection
-        # This ensures we get all clients that have inspections
-        client_suggestions = []
-
-        # Get clients from Client model
-        clients = Client.objects.filter(
-            Q(client_id__icontains=query) |
-            Q(name__icontains=query)
-        ).values('client_id', 'name', 'internal_account_code').distinct()[:10]
-
-        for client in clients:
-            client_name = client['name'] or client['client_id']
-            if client_name:
-                # Get the most recent town for this client from inspections
-                town = FoodSafetyAgencyInspection.objects.filter(
-                    client_name__iexact=client_name
-                ).exclude(town__isnull=True).exclude(town='').order_by('-date_of_inspection').values_list('town', flat=True).first()
-
-                client_suggestions.append({
-                    'name': client_name,
-                    'account_code': client['internal_account_code'] or '',
-                    'town': town or '',
-                    'type': 'client'
-                })
-
-        # Get additional clients from inspection data that might not be in Client model
-        inspection_clients = FoodSafetyAgencyInspection.objects.filter(
-            client_name__icontains=query
-        ).exclude(client_name__isnull=True).exclude(client_name='').values('client_name').annotate(
-            latest_town=models.Max('town')
-        ).distinct()[:10]
-
-        for client_data in inspection_clients:
-            client_name = client_data['client_name']
-            if client_name and not any(s['name'] == client_name for s in client_suggestions):
-                # Get the most recent town for this client
-                town = FoodSafetyAgencyInspection.objects.filter(
-                    client_name__iexact=client_name
-                ).exclude(town__isnull=True).exclude(town='').order_by('-date_of_inspection').values_list('town', flat=True).first()
-
-                client_suggestions.append({
-                    'name': client_name,
-                    'account_code': '',
-                    'town': town or '',
-                    'type': 'inspection'
-                })
-
-        # Sort by name and limit to 15 total suggestions
-        client_suggestions.sort(key=lambda x: x['name'].lower())
-        client_suggestions = client_suggestions[:15]
-
-        return JsonResponse({'suggestions': client_suggestions})
+        # PERFORMANCE FIX: Answered from the in-memory client index (prefix, account code and
+        # trigram matching over Client and inspection client names) instead of two icontains
+        # scans plus a "most recent town" query per suggestion on every keystroke
+        return JsonResponse({'suggestions': client_autocomplete_index.search(query, limit=15)})
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -16016,9 +15716,9 @@ def send_password_reset_email(request):
     from django.contrib.auth.tokens import default_token_generator
     from django.utils.http import urlsafe_base64_encode
     from django.utils.encoding import force_bytes
-    from django.core.mail import send_mail
     from django.template.loader import render_to_string
     from django.conf import settings
+    from ..services.email_outbox_service import queue_email
 
     # Check if user has admin permissions
     if not (request.user.has_role_permission('admin') or
@@ -16100,14 +15800,15 @@ Food Safety Agency Team
         </html>
         '''
 
-        # Send email
-        send_mail(
+        # Queue the email - the outbox workers send (and retry) it outside the request
+        queue_email(
+            'password_reset',
             subject=subject,
-            message=message,
+            body=message,
+            html_body=html_message,
             from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@foodsafetyagency.com'),
-            recipient_list=[target_user.email],
-            fail_silently=False,
-            html_message=html_message
+            to=[target_user.email],
+            user=request.user,
         )
 
         # Log the action
@@ -16120,7 +15821,7 @@ Food Safety Agency Team
 
         return JsonResponse({
             'success': True,
-            'message': f'Password reset email sent to {target_user.email}'
+            'message': f'Password reset email queued for {target_user.email}'
         })
 
     except User.DoesNotExist:
@@ -16148,7 +15849,7 @@ def forgot_password(request):
     from django.contrib.auth.tokens import default_token_generator
     from django.utils.http import urlsafe_base64_encode
     from django.utils.encoding import force_bytes
-    from django.core.mail import send_mail
+    from ..services.email_outbox_service import queue_email
     from django.template.loader import render_to_string
     from django.conf import settings
     from datetime import datetime
@@ -16189,14 +15890,14 @@ def forgot_password(request):
             # Render email template
             html_message = render_to_string('main/password_reset_email.html', context)
 
-            # Send email with proper no-reply display name
-            send_mail(
+            # Queue email with proper no-reply display name (sent by the outbox workers)
+            queue_email(
+                'password_reset',
                 subject='Food Safety Agency – Password Reset Instructions',
-                message=f'Hello {user.username},\n\nClick the link below to reset your password:\n\n{reset_link}\n\nThis link will expire in 1 hour.\n\nIf you did not request this, please ignore this email.',
+                body=f'Hello {user.username},\n\nClick the link below to reset your password:\n\n{reset_link}\n\nThis link will expire in 1 hour.\n\nIf you did not request this, please ignore this email.',
                 from_email='Food Safety Agency - No Reply <info@eclick.co.za>',
-                recipient_list=[email],
-                html_message=html_message,
-                fail_silently=False,
+                to=[email],
+                html_body=html_message,
             )
 
             messages.success(request, 'Password reset link has been sent to your email. Please check your inbox (and spam folder).')
@@ -8,9 +8,10 @@ from django.db import transaction
 from django.utils.dateparse import parse_date
 from ..models import Shipment, Client
 from .utils import apply_filters, clear_messages
+from ..utils.streaming_export import iterate_rows, streaming_csv_response, streaming_xlsx_response
+from ..utils.sql_server_pool import SQLServerPoolError, sql_server_pool
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill
-import csv
 import io
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, landscape
@@ -129,17 +130,8 @@ def remote_sqlserver_data_view(request):
     error_message = None
     
     try:
-        import pymssql
-
-        # Use pymssql - NO ODBC DRIVERS NEEDED!
-        connection = pymssql.connect(
-            server='102.67.140.12',
-            port=1053,
-            user='FSAUser2',
-            password='password',
-            database='AFS',
-            timeout=30
-        )
+        # Use pymssql - NO ODBC DRIVERS NEEDED! (pooled; close() returns the connection)
+        connection = sql_server_pool.checkout(query_timeout=30)
         cursor = connection.cursor()
         
         # Execute the FSA inspection query
@@ -168,8 +160,8 @@ def remote_sqlserver_data_view(request):
         connection.close()
         
     except ImportError as e:
-        error_message = f"SQL Server connector not installed. Please install pyodbc. Error: {str(e)}"
-    except pyodbc.Error as e:
+        error_message = f"SQL Server connector not installed. Please install pymssql. Error: {str(e)}"
+    except SQLServerPoolError as e:
         error_message = f"SQL Server connection error: {str(e)}"
     except Exception as e:
         error_message = f"Unexpected error: {str(e)}"
@@ -199,6 +191,13 @@ def export_shipments(request):
     export_format = request.GET.get('format', 'excel')
     client_id = request.GET.get('client')
     
+    # PERFORMANCE FIX: background=1 queues an export job instead of building the file in this request
+    if request.GET.get('background'):
+        return _queue_export_job(
+            request, 'shipments', {'excel': 'xlsx'}.get(export_format, export_format), request.GET.dict(),
+            force=bool(request.GET.get('force')),
+        )
+
     # Get shipments with filters if provided - Use optimized queryset
     shipments = Shipment.objects.select_related('client').all()
     shipments = apply_filters(request, shipments)
@@ -241,221 +240,234 @@ def export_shipments_excel(request):
     return export_shipments(request)
 
 
+# =============================================================================
+# BACKGROUND EXPORT JOBS
+# =============================================================================
+
+def _queue_export_job(request, export_type, export_format, params, force=False):
+    """Queue (or reuse) an export job and return its status as JSON."""
+    from ..services.export_job_service import submit_export_job
+
+    try:
+        job = submit_export_job(export_type, export_format, params, user=request.user, force=force)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'job': job.to_status_dict()})
+
+
+def _user_export_jobs(request):
+    """Export jobs the requesting user may see - their own, or every job for staff"""
+    from ..models import ExportJob
+
+    if request.user.is_staff:
+        return ExportJob.objects.all()
+    return ExportJob.objects.filter(requested_by=request.user)
+
+
+@login_required(login_url='login')
+@require_POST
+def start_export_job(request):
+    """
+    Start a background export.
+
+    Body (JSON): {"export_type": "invoice_sheet" | "invoice_google_sheet" | "shipments",
+                  "format": "xlsx" | "csv" | "pdf" | "gsheet", "params": {...}, "force": false}
+    """
+    import json
+
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+
+    return _queue_export_job(
+        request, data.get('export_type', ''), data.get('format', ''), data.get('params') or {},
+        force=bool(data.get('force')),
+    )
+
+
+@login_required(login_url='login')
+def export_job_status(request, job_id):
+    """Progress of a background export (polled by the page until it completes)."""
+    from ..services.export_job_service import export_job_service
+
+    job = _user_export_jobs(request).filter(pk=job_id).first()
+    if not job:
+        return JsonResponse({'success': False, 'error': 'Export job not found'}, status=404)
+
+    # Pick the job up here if the worker that owned it was restarted
+    export_job_service.recover_job(job)
+    return JsonResponse({'success': True, 'job': job.to_status_dict()})
+
+
+@login_required(login_url='login')
+def download_export_job(request, job_id):
+    """Download the file produced by a completed export job."""
+    from django.http import FileResponse
+
+    job = _user_export_jobs(request).filter(pk=job_id, status='completed').exclude(artifact_path='').first()
+    if not job:
+        return JsonResponse({'success': False, 'error': 'Export is not ready'}, status=404)
+
+    path = os.path.join(settings.MEDIA_ROOT, job.artifact_path)
+    if not os.path.exists(path):
+        return JsonResponse({'success': False, 'error': 'Export file has expired - please run the export again'}, status=404)
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
+
+
 # =============================================================================
 # EXPORT HELPER FUNCTIONS - MATCHING TABLE COLUMNS EXACTLY
 # =============================================================================
 
-def export_to_excel(shipments, filename_base):
-    """Helper function to export data to Excel format - matches table columns exactly."""
-    # Create a workbook and active worksheet
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'Shipments'
-    
-    # Define headers exactly as shown in the table
-    headers = [
-        'Shipment No', 'Brand', 'Claimant', 'Claim ID', 'Client Name', 
-        'Intent', 'Intent Date', 'Formal', 'Formal Date', 'Value', 
-        'ISCM Paid', 'Carrier Paid', 'Insurance', 'Branch', 'Savings',
-        'Settlement', 'Exposure', 'Status', 'Closed', 'Actions'
+# Shared by the Excel and CSV exports - the table columns, in order
+SHIPMENT_EXPORT_HEADERS = [
+    'Shipment No', 'Brand', 'Claimant', 'Claim ID', 'Client Name', 
+    'Intent', 'Intent Date', 'Formal', 'Formal Date', 'Value', 
+    'ISCM Paid', 'Carrier Paid', 'Insurance', 'Branch', 'Savings',
+    'Settlement', 'Exposure', 'Status', 'Closed', 'Actions'
+]
+
+# Fixed Excel column widths (write-only sheets can't be auto-sized after the rows are written)
+SHIPMENT_EXCEL_COLUMN_WIDTHS = [
+    30, 15, 20, 12, 30,
+    8, 12, 8, 12, 14,
+    14, 14, 14, 20, 14,
+    16, 14, 16, 12, 12
+]
+
+
+def _shipment_common_fields(shipment):
+    """Values formatted the same way in the Excel and CSV exports."""
+    return {
+        'client_id': shipment.client.client_id if shipment.client else 'N/A',
+        'client_name': shipment.client.name if shipment.client else 'Unknown',
+        'intend_date': shipment.Intend_Claim_Date.strftime("%m/%d/%y") if shipment.Intend_Claim_Date else '-',
+        'formal_date': shipment.Formal_Claim_Date_Received.strftime("%m/%d/%y") if shipment.Formal_Claim_Date_Received else '-',
+        'closed_date': shipment.Closed_Date.strftime("%m/%d/%y") if shipment.Closed_Date else '-',
+        'claimed_amount': f"${shipment.Claimed_Amount:,.0f}" if shipment.Claimed_Amount else "$0",
+        'iscm_paid': f"${shipment.Amount_Paid_By_Awa:,.0f}" if shipment.Amount_Paid_By_Awa else "$0",
+        'carrier_paid': f"${shipment.Amount_Paid_By_Carrier:,.0f}" if shipment.Amount_Paid_By_Carrier else "$0",
+        'insurance_paid': f"${shipment.Amount_Paid_By_Insurance:,.0f}" if shipment.Amount_Paid_By_Insurance else "$0",
+        'total_savings': f"${shipment.Total_Savings:,.0f}" if shipment.Total_Savings else "$0",
+        'financial_exposure': f"${shipment.Financial_Exposure:,.0f}" if shipment.Financial_Exposure else "$0",
+    }
+
+
+def _shipment_row(shipment, fields, intent_to_claim, formal_claim, settlement_status, status_display):
+    return [
+        shipment.Claim_No,  # New format: ClientName-X-YYYYMMDD
+        shipment.Brand or '-',
+        shipment.Claimant or '-',
+        fields['client_id'],
+        fields['client_name'],
+        intent_to_claim,
+        fields['intend_date'],
+        formal_claim,
+        fields['formal_date'],
+        fields['claimed_amount'],
+        fields['iscm_paid'],
+        fields['carrier_paid'],
+        fields['insurance_paid'],
+        shipment.Branch,
+        fields['total_savings'],
+        settlement_status,
+        fields['financial_exposure'],
+        status_display,
+        fields['closed_date'],
+        'Edit/Delete'  # Actions column placeholder
     ]
-    
-    # Style for headers
-    header_font = Font(bold=True, color='FFFFFF')
-    header_fill = PatternFill(start_color='2563EB', end_color='2563EB', fill_type='solid')
-    
-    # Add headers with styling
-    for col_num, header in enumerate(headers, 1):
-        cell = worksheet.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center')
-    
-    # Add data rows
-    for row_num, shipment in enumerate(shipments, 2):
-        # Use the new client-specific shipment numbers
-        client_id = shipment.client.client_id if shipment.client else 'N/A'
-        client_name = shipment.client.name if shipment.client else 'Unknown'
-        
-        # Format dates
-        intend_date = shipment.Intend_Claim_Date.strftime("%m/%d/%y") if shipment.Intend_Claim_Date else '-'
-        formal_date = shipment.Formal_Claim_Date_Received.strftime("%m/%d/%y") if shipment.Formal_Claim_Date_Received else '-'
-        closed_date = shipment.Closed_Date.strftime("%m/%d/%y") if shipment.Closed_Date else '-'
-        
-        # Format amounts
-        claimed_amount = f"${shipment.Claimed_Amount:,.0f}" if shipment.Claimed_Amount else "$0"
-        iscm_paid = f"${shipment.Amount_Paid_By_Awa:,.0f}" if shipment.Amount_Paid_By_Awa else "$0"
-        carrier_paid = f"${shipment.Amount_Paid_By_Carrier:,.0f}" if shipment.Amount_Paid_By_Carrier else "$0"
-        insurance_paid = f"${shipment.Amount_Paid_By_Insurance:,.0f}" if shipment.Amount_Paid_By_Insurance else "$0"
-        total_savings = f"${shipment.Total_Savings:,.0f}" if shipment.Total_Savings else "$0"
-        financial_exposure = f"${shipment.Financial_Exposure:,.0f}" if shipment.Financial_Exposure else "$0"
-        
-        # Format boolean fields as icons/text
-        intent_to_claim = "✓" if shipment.Intent_To_Claim == 'YES' else "✗"
-        formal_claim = "✓" if shipment.Formal_Claim_Received == 'YES' else "✗"
-        
-        # Format status badges
-        settlement_status = ''
-        if shipment.Settlement_Status == 'SETTLED':
-            settlement_status = '✓ Settled'
-        elif shipment.Settlement_Status == 'NOT_SETTLED':
-            settlement_status = '✗ Not Settled'
-        elif shipment.Settlement_Status == 'PARTIAL':
-            settlement_status = '~ Partial'
-        else:
-            settlement_status = '-'
-        
-        status_display = ''
-        if shipment.Status == 'OPEN':
-            status_display = '● Open'
-        elif shipment.Status == 'CLOSED':
-            status_display = '✓ Closed'
-        elif shipment.Status == 'PENDING':
-            status_display = '⏳ Pending'
-        elif shipment.Status == 'REJECTED':
-            status_display = '✗ Rejected'
-        elif shipment.Status == 'UNDER_REVIEW':
-            status_display = '◐ Under Review'
-        else:
-            status_display = shipment.Status
-        
-        # Create row data matching table exactly
-        row_data = [
-            shipment.Claim_No,  # This will now be the new format: ClientName-X-YYYYMMDD
-            shipment.Brand or '-',
-            shipment.Claimant or '-',
-            client_id,
-            client_name,
-            intent_to_claim,
-            intend_date,
-            formal_claim,
-            formal_date,
-            claimed_amount,
-            iscm_paid,
-            carrier_paid,
-            insurance_paid,
-            shipment.Branch,
-            total_savings,
-            settlement_status,
-            financial_exposure,
-            status_display,
-            closed_date,
-            'Edit/Delete'  # Actions column placeholder
-        ]
-        
-        # Add row to worksheet
-        for col_num, cell_value in enumerate(row_data, 1):
-            worksheet.cell(row=row_num, column=col_num, value=cell_value)
-    
-    # Auto-adjust column widths
-    for column in worksheet.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            if cell.value:
-                max_length = max(max_length, len(str(cell.value)))
-        adjusted_width = min(max_length + 2, 50)  # Cap at 50 for very long text
-        worksheet.column_dimensions[column_letter].width = adjusted_width
-    
 
-    
-    # Create response for download
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def shipment_excel_row(shipment):
+    """Excel export row - boolean fields and statuses shown as icons."""
+    fields = _shipment_common_fields(shipment)
+
+    # Format boolean fields as icons/text
+    intent_to_claim = "✓" if shipment.Intent_To_Claim == 'YES' else "✗"
+    formal_claim = "✓" if shipment.Formal_Claim_Received == 'YES' else "✗"
+
+    # Format status badges
+    if shipment.Settlement_Status == 'SETTLED':
+        settlement_status = '✓ Settled'
+    elif shipment.Settlement_Status == 'NOT_SETTLED':
+        settlement_status = '✗ Not Settled'
+    elif shipment.Settlement_Status == 'PARTIAL':
+        settlement_status = '~ Partial'
+    else:
+        settlement_status = '-'
+
+    if shipment.Status == 'OPEN':
+        status_display = '● Open'
+    elif shipment.Status == 'CLOSED':
+        status_display = '✓ Closed'
+    elif shipment.Status == 'PENDING':
+        status_display = '⏳ Pending'
+    elif shipment.Status == 'REJECTED':
+        status_display = '✗ Rejected'
+    elif shipment.Status == 'UNDER_REVIEW':
+        status_display = '◐ Under Review'
+    else:
+        status_display = shipment.Status
+
+    return _shipment_row(shipment, fields, intent_to_claim, formal_claim, settlement_status, status_display)
+
+
+def shipment_csv_row(shipment):
+    """CSV export row - plain text instead of icons."""
+    fields = _shipment_common_fields(shipment)
+
+    # Format boolean fields
+    intent_to_claim = "Yes" if shipment.Intent_To_Claim == 'YES' else "No"
+    formal_claim = "Yes" if shipment.Formal_Claim_Received == 'YES' else "No"
+
+    # Format status
+    if shipment.Settlement_Status == 'SETTLED':
+        settlement_status = 'Settled'
+    elif shipment.Settlement_Status == 'NOT_SETTLED':
+        settlement_status = 'Not Settled'
+    elif shipment.Settlement_Status == 'PARTIAL':
+        settlement_status = 'Partial'
+    else:
+        settlement_status = '-'
+
+    status_display = shipment.get_Status_display() if shipment.Status else 'Open'
+
+    return _shipment_row(shipment, fields, intent_to_claim, formal_claim, settlement_status, status_display)
+
+
+def export_to_excel(shipments, filename_base):
+    """
+    Helper function to export data to Excel format - matches table columns exactly.
+
+    PERFORMANCE FIX: Rows are written in openpyxl write-only mode from a chunked
+    queryset iterator and streamed back, so memory stays flat for any number of shipments.
+    """
+    rows = (shipment_excel_row(shipment) for shipment in iterate_rows(shipments))
+
+    return streaming_xlsx_response(
+        rows,
+        f"{filename_base}.xlsx",
+        sheet_title='Shipments',
+        headers=SHIPMENT_EXPORT_HEADERS,
+        header_style={
+            'font': Font(bold=True, color='FFFFFF'),
+            'fill': PatternFill(start_color='2563EB', end_color='2563EB', fill_type='solid'),
+            'alignment': Alignment(horizontal='center'),
+        },
+        column_widths=SHIPMENT_EXCEL_COLUMN_WIDTHS,
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-    
-    # Save workbook to response
-    workbook.save(response)
-    return response
 
 
 def export_to_csv(shipments, filename_base):
-    """Helper function to export data to CSV format - matches table columns exactly."""
-    # Create a file-like buffer for response
-    response_buffer = io.StringIO()
-    
-    # Create CSV writer
-    response_writer = csv.writer(response_buffer)
-    
-    # Write header row exactly as shown in table
-    headers = [
-        'Shipment No', 'Brand', 'Claimant', 'Claim ID', 'Client Name', 
-        'Intent', 'Intent Date', 'Formal', 'Formal Date', 'Value', 
-        'ISCM Paid', 'Carrier Paid', 'Insurance', 'Branch', 'Savings',
-        'Settlement', 'Exposure', 'Status', 'Closed', 'Actions'
-    ]
-    response_writer.writerow(headers)
-    
-    # Write data rows
-    for shipment in shipments:
-        client_id = shipment.client.client_id if shipment.client else 'N/A'
-        client_name = shipment.client.name if shipment.client else 'Unknown'
-        
-        # Format dates
-        intend_date = shipment.Intend_Claim_Date.strftime("%m/%d/%y") if shipment.Intend_Claim_Date else '-'
-        formal_date = shipment.Formal_Claim_Date_Received.strftime("%m/%d/%y") if shipment.Formal_Claim_Date_Received else '-'
-        closed_date = shipment.Closed_Date.strftime("%m/%d/%y") if shipment.Closed_Date else '-'
-        
-        # Format amounts
-        claimed_amount = f"${shipment.Claimed_Amount:,.0f}" if shipment.Claimed_Amount else "$0"
-        iscm_paid = f"${shipment.Amount_Paid_By_Awa:,.0f}" if shipment.Amount_Paid_By_Awa else "$0"
-        carrier_paid = f"${shipment.Amount_Paid_By_Carrier:,.0f}" if shipment.Amount_Paid_By_Carrier else "$0"
-        insurance_paid = f"${shipment.Amount_Paid_By_Insurance:,.0f}" if shipment.Amount_Paid_By_Insurance else "$0"
-        total_savings = f"${shipment.Total_Savings:,.0f}" if shipment.Total_Savings else "$0"
-        financial_exposure = f"${shipment.Financial_Exposure:,.0f}" if shipment.Financial_Exposure else "$0"
-        
-        # Format boolean fields
-        intent_to_claim = "Yes" if shipment.Intent_To_Claim == 'YES' else "No"
-        formal_claim = "Yes" if shipment.Formal_Claim_Received == 'YES' else "No"
-        
-        # Format status
-        settlement_status = ''
-        if shipment.Settlement_Status == 'SETTLED':
-            settlement_status = 'Settled'
-        elif shipment.Settlement_Status == 'NOT_SETTLED':
-            settlement_status = 'Not Settled'
-        elif shipment.Settlement_Status == 'PARTIAL':
-            settlement_status = 'Partial'
-        else:
-            settlement_status = '-'
-        
-        status_display = shipment.get_Status_display() if shipment.Status else 'Open'
-        
-        row = [
-            shipment.Claim_No,  # New format: ClientName-X-YYYYMMDD
-            shipment.Brand or '-',
-            shipment.Claimant or '-',
-            client_id,
-            client_name,
-            intent_to_claim,
-            intend_date,
-            formal_claim,
-            formal_date,
-            claimed_amount,
-            iscm_paid,
-            carrier_paid,
-            insurance_paid,
-            shipment.Branch,
-            total_savings,
-            settlement_status,
-            financial_exposure,
-            status_display,
-            closed_date,
-            'Edit/Delete'  # Actions column placeholder
-        ]
-        
-        # Write to response
-        response_writer.writerow(row)
-    
+    """
+    Helper function to export data to CSV format - matches table columns exactly.
 
-    
-    # Create response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-    response.write(response_buffer.getvalue())
-    
-    return response
+    PERFORMANCE FIX: Streams one CSV line per shipment while the queryset is read
+    in chunks, so the download starts immediately and nothing is buffered.
+    """
+    rows = (shipment_csv_row(shipment) for shipment in iterate_rows(shipments))
+    return streaming_csv_response(rows, f"{filename_base}.csv", headers=SHIPMENT_EXPORT_HEADERS)
 
 
 def export_to_pdf(shipments, filename_base):
@@ -950,6 +962,11 @@ def update_inspection_fees(request):
                 except Exception as e:
                     errors.append(f"Error updating fee {fee_id}: {str(e)}")
 
+        if updated_count:
+            # Cached fee schedule (used by export_sheet invoice lines) is now stale in every worker
+            from ..utils.fee_schedule import invalidate_fee_schedule
+            invalidate_fee_schedule()
+
         response_data = {
             'success': True,
             'message': f'Updated {updated_count} fees successfully',
@@ -29,14 +29,17 @@ DEBUG = env.bool('DEBUG', default=True)  # Set to True for demo
 LOGIN_REDIRECT_URL = 'home'
 LOGIN_URL = 'login'
 
-# Session Configuration - Use database sessions to avoid Redis conflicts
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
-print("Using database sessions to avoid Redis conflicts during sync operations")
+# Session Configuration - Sessions are read from the cache and kept in the database
+# (cached_db); requests that only refresh last_activity skip the database write
+SESSION_ENGINE = 'main.session_backend'
+print("Using cached database sessions (activity-only saves written behind)")
+SESSION_DB_WRITE_INTERVAL = env.int('SESSION_DB_WRITE_INTERVAL', default=300)  # Max seconds between DB writes of an idle-change session
+SESSION_ACTIVITY_UPDATE_INTERVAL = env.int('SESSION_ACTIVITY_UPDATE_INTERVAL', default=60)  # Max one last_activity write per session per N seconds
 
 SESSION_COOKIE_AGE = 86400  # Keep users logged in for 1 day
 SESSION_COOKIE_SECURE = env.bool('SESSION_COOKIE_SECURE', default=False)  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True  # Prevent JavaScript access to cookies
-SESSION_SAVE_EVERY_REQUEST = True  # Save session on every request for long operations
+SESSION_SAVE_EVERY_REQUEST = False  # Saved when modified - SessionTimeoutMiddleware bumps last_activity (and the expiry) every minute while active
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False  # Keep session active after closing the browser
 SESSION_COOKIE_SAMESITE = 'Lax'  # Prevent session issues with CSRF
 
@@ -77,6 +80,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.PerformanceInstrumentationMiddleware',  # Per-request metrics - only loaded when PERF_INSTRUMENTATION=True
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Enables static file serving in production
     'main.middleware.SecurityHeadersMiddleware',  # Custom security headers middleware
@@ -90,6 +94,10 @@ MIDDLEWARE = [
     'main.middleware.ActivityLoggingMiddleware',  # Custom activity logging middleware
 ]
 
+# Per-request performance instrumentation (Server-Timing header + server status summary)
+PERF_INSTRUMENTATION = env.bool('PERF_INSTRUMENTATION', default=False)
+PERF_INSTRUMENTATION_BUFFER = env.int('PERF_INSTRUMENTATION_BUFFER', default=500)  # Requests kept per process
+
 ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
@@ -146,13 +154,62 @@ DATABASES = {
     # }
 }
 
-# Use local memory cache for development (no Redis dependency)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+# SQL Server (AFS) - read through the pooled connection manager in main/utils/sql_server_pool.py
+# (not a Django database). Leave SQL_SERVER_HOST empty to keep SQL Server disabled.
+# There are no credential defaults - set SQL_SERVER_USER and SQL_SERVER_PASSWORD in .env.
+# SQL_SERVER_BACKEND: 'pymssql' (default) or 'local' (in-process stand-in for tests and offline runs)
+SQL_SERVER = {
+    'HOST': env('SQL_SERVER_HOST', default=''),
+    'PORT': env.int('SQL_SERVER_PORT', default=1053),
+    'NAME': env('SQL_SERVER_NAME', default='AFS'),
+    'USER': env('SQL_SERVER_USER', default=''),
+    'PASSWORD': env('SQL_SERVER_PASSWORD', default=''),
 }
+SQL_SERVER_BACKEND = env('SQL_SERVER_BACKEND', default='pymssql')
+SQL_SERVER_POOL_SIZE = env.int('SQL_SERVER_POOL_SIZE', default=4)  # Max open connections per process
+SQL_SERVER_POOL_WAIT = env.int('SQL_SERVER_POOL_WAIT', default=30)  # Seconds to wait for a free connection
+SQL_SERVER_CONNECT_TIMEOUT = env.int('SQL_SERVER_CONNECT_TIMEOUT', default=15)
+SQL_SERVER_QUERY_TIMEOUT = env.int('SQL_SERVER_QUERY_TIMEOUT', default=60)  # Default per-query timeout
+SQL_SERVER_CONN_MAX_AGE = env.int('SQL_SERVER_CONN_MAX_AGE', default=1800)  # Reconnect after N seconds
+
+# Shared cache - sync locks, sync progress and page caches must be visible to every gunicorn worker
+# CACHE_BACKEND: 'redis' (needs the redis package and REDIS_URL), 'file' (default, no extra
+# dependencies), 'database' (run: python manage.py createcachetable) or 'locmem' (single process only)
+REDIS_URL = env('REDIS_URL', default='')
+CACHE_BACKEND = env('CACHE_BACKEND', default='redis' if REDIS_URL else 'file')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL or 'redis://127.0.0.1:6379/1',
+            'KEY_PREFIX': 'inspection_system',
+        }
+    }
+elif CACHE_BACKEND == 'database':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'main_cache_table',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'main.cache_backend.SharedFileBasedCache',
+            'LOCATION': env('CACHE_LOCATION', default=str(BASE_DIR / 'cache_data')),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+print(f"Cache backend: {CACHE_BACKEND}")
 
 # Server settings to handle large responses
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
@@ -266,4 +323,28 @@ ALLOWED_UPLOAD_EXTENSIONS = [
     '.zip', '.rar', '.7z',
     '.txt', '.csv'
 ]
-MAX_FILE_SIZE_MB = 50  # Maximum file size in megabytes
\ No newline at end of file
+MAX_FILE_SIZE_MB = 50  # Maximum file size in megabytes
+
+# =============================
+# ACTIVITY LOGGING
+# =============================
+# ActivityLoggingMiddleware queues SystemLog rows for a background bulk writer
+ACTIVITY_LOG_ASYNC = env.bool('ACTIVITY_LOG_ASYNC', default=True)  # False = INSERT inside the request (old behaviour)
+ACTIVITY_LOG_BATCH_SIZE = env.int('ACTIVITY_LOG_BATCH_SIZE', default=50)  # Rows per bulk_create
+ACTIVITY_LOG_FLUSH_MS = env.int('ACTIVITY_LOG_FLUSH_MS', default=2000)  # Max delay before queued rows are written
+# Sampling for high-frequency polling paths: (path regex, fraction logged) - first match wins, 0 = never log
+ACTIVITY_LOG_SAMPLE_RATES = [
+    (r'^/check-sync-status/', 0.0),
+    (r'^/session-status/', 0.0),
+    (r'^/page-clients-status/', 0.05),
+    (r'^/api/notifications/$', 0.05),
+    (r'/status/$', 0.05),
+]
+
+# =============================
+# GOOGLE DRIVE DOWNLOADS
+# =============================
+# Compliance ZIPs are downloaded in parallel, in chunks, with retry/resume (main/services/drive_download_engine.py)
+DRIVE_DOWNLOAD_WORKERS = env.int('DRIVE_DOWNLOAD_WORKERS', default=4)  # Concurrent downloads
+DRIVE_DOWNLOAD_CHUNK_SIZE = env.int('DRIVE_DOWNLOAD_CHUNK_SIZE', default=8 * 1024 * 1024)  # Bytes per Range request
+DRIVE_DOWNLOAD_MAX_RETRIES = env.int('DRIVE_DOWNLOAD_MAX_RETRIES', default=4)  # Per file, exponential backoff
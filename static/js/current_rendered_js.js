@@ -1580,6 +1580,23 @@
             return parseFloat((bytes / Math.pow(k, i)).toFixed(1)) + ' ' + sizes[i];
         }
         
+        // Poll a queued email until it is sent or failed (gives up after ~2 minutes)
+        async function waitForEmailDelivery(statusUrl) {
+            for (let attempt = 0; attempt < 60; attempt++) {
+                try {
+                    const response = await fetch(statusUrl);
+                    const data = await response.json();
+                    if (data.success && (data.email.status === 'sent' || data.email.status === 'failed')) {
+                        return data.email;
+                    }
+                } catch (error) {
+                    console.warn('Email status check failed:', error);
+                }
+                await new Promise(resolve => setTimeout(resolve, 2000));
+            }
+            return null;
+        }
+        
         // Send group documents function
         async function sendGroupDocuments(groupId, clientName, inspectionDate) {
             try {
@@ -1613,13 +1630,27 @@
                 const result = await response.json();
                 
                 if (result.success) {
-                    // Update button to show sent state
-                    sendButton.innerHTML = '<i class="fas fa-check"></i> Sent';
-                    sendButton.classList.add('sent');
-                    sendButton.disabled = false;
-                    
-                    // Show success message
-                    alert('✅ Documents sent successfully!\n\nSent to: ' + result.recipients + '\nDocuments: ' + result.documents_sent + '\nEmail ID: ' + result.email_id || 'N/A');
+                    // The email is queued - poll its delivery status instead of waiting on the request
+                    sendButton.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Queued...';
+                    const email = await waitForEmailDelivery(result.status_url);
+                    
+                    if (email && email.status === 'sent') {
+                        // Update button to show sent state
+                        sendButton.innerHTML = '<i class="fas fa-check"></i> Sent';
+                        sendButton.classList.add('sent');
+                        sendButton.disabled = false;
+                        
+                        // Show success message
+                        alert('✅ Documents sent successfully!\n\nSent to: ' + result.recipients + '\nDocuments: ' + result.documents_sent + '\nEmail ID: ' + (result.email_id || 'N/A'));
+                    } else if (email && email.status === 'failed') {
+                        sendButton.innerHTML = originalText;
+                        sendButton.disabled = false;
+                        alert('❌ Error sending documents: ' + (email.error || 'delivery failed'));
+                    } else {
+                        // Still retrying in the background - the group turns "sent" once delivered
+                        sendButton.innerHTML = '<i class="fas fa-clock"></i> Sending';
+                        sendButton.disabled = false;
+                    }
                 } else {
                     // Restore button on error
                     sendButton.innerHTML = originalText;